@@ -1,41 +1,48 @@
-import json
+import asyncio
 import logging
 import os
-import uvicorn
-from collections.abc import AsyncGenerator
-from adk_agent import create_agent
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Callable, Optional
+import httpx
 from dotenv import load_dotenv
-from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk import Runner
-from google.adk.events import Event
-from google.genai import types
-from starlette.routing import Route
-from starlette.responses import PlainTextResponse, HTMLResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, PlainTextResponse, HTMLResponse, JSONResponse, StreamingResponse
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
+from a2a.server.tasks import BasePushNotificationSender, InMemoryPushNotificationConfigStore, InMemoryTaskStore
 from a2a.server.agent_execution import AgentExecutor
 from a2a.server.agent_execution.context import RequestContext
 from a2a.server.events.event_queue import EventQueue
-from a2a.server.tasks import TaskUpdater
+from a2a.utils.constants import DEFAULT_RPC_URL
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
     AgentSkill,
-    FilePart,
-    FileWithBytes,
-    FileWithUri,
-    Part,
-    TaskState,
-    TextPart,
-    UnsupportedOperationError,
 )
-from a2a.utils.errors import ServerError
-from a2a.utils.message import new_agent_text_message
 from starlette.applications import Starlette
+from server import ServerConfig, serve
+from shared_libraries.api_auth import ADMIN_API_TOKEN, authenticate, is_admin
+from shared_libraries.artifact_store import ARTIFACT_STORE
+from shared_libraries.metrics import METRICS
+from shared_libraries.model_config import MODEL_CONFIG
+from shared_libraries.rate_limit import RateLimitConfig, RateLimitMiddleware
+from shared_libraries.tenant_middleware import TenantMiddleware
+from sub_agents.ticket_management.archive import MaintenanceScheduler
+from sub_agents.ticket_management.database import READ_POOLS
+from sub_agents.ticket_management.dispatch import DEPARTMENT_ASSIGNERS, TICKET_DISPATCHER
+from sub_agents.ticket_management.history_writer import HISTORY_WRITER
+from sub_agents.ticket_management.export import MEDIA_TYPES, export_stream
+from sub_agents.ticket_management.notifications import (
+    NOTIFICATION_DISPATCHER, check_webhook_request, list_subscriptions, subscribe, unsubscribe,
+)
+from sub_agents.ticket_management.reports import get_operations_report
+
+# google.adk and google.genai take several seconds to import, so nothing in
+# this module imports them directly. They are loaded through adk_executor
+# when the agent graph is first needed; see LazyAgentExecutor.
 
 load_dotenv()
 
@@ -53,170 +60,59 @@ logging.basicConfig(
     ],
 )
 
-# Configure logger for ADKAgentExecutor
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-def _content_to_dict(content: types.Content) -> dict:
-    parts_data = []
-    for part in content.parts:
-        if part.text:
-            parts_data.append({"type": "text", "value": part.text})
-        elif part.file_data:
-            parts_data.append({"type": "file_data", "uri": part.file_data.file_uri, "mime_type": part.file_data.mime_type})
-        elif part.inline_data:
-            parts_data.append({"type": "inline_data", "mime_type": part.inline_data.mime_type, "size": len(part.inline_data.data)})
-    return {"parts": parts_data}
-
-class ADKAgentExecutor(AgentExecutor):
-    """An AgentExecutor that runs an ADK-based Agent."""
-
-    def __init__(self, runner: Runner, card: AgentCard):
-        self.runner = runner
-        self._card = card
-        self._running_sessions = {}
-
-    def _run_agent(
-        self, session_id, new_message: types.Content
-    ) -> AsyncGenerator[Event, None]:
-        return self.runner.run_async(
-            session_id=session_id, user_id="self", new_message=new_message
-        )
+class LazyAgentExecutor(AgentExecutor):
+    """
+    An AgentExecutor that builds the real ADK executor on first use.
 
-    async def _process_request(
-        self,
-        new_message: types.Content,
-        session_id: str,
-        task_updater: TaskUpdater,
-    ) -> None:
-        # The call to self._upsert_session was returning a coroutine object,
-        # leading to an AttributeError when trying to access .id on it directly.
-        # We need to await the coroutine to get the actual session object.
-        session_obj = await self._upsert_session(session_id)
-        # Update session_id with the ID from the resolved session object
-        # to be used in self._run_agent.
-        session_id = session_obj.id
-
-        logger.info(f"LLM Input: {json.dumps(_content_to_dict(new_message), indent=2)}")
-
-        async for event in self._run_agent(session_id, new_message):
-            if event.is_final_response():
-                parts = convert_genai_parts_to_a2a(event.content.parts)
-                await task_updater.add_artifact(parts)
-                await task_updater.complete()
-                logger.info(f"LLM Final Response: {json.dumps(_content_to_dict(event.content), indent=2)}")
-                break
-            if not event.get_function_calls():
-                await task_updater.update_status(
-                    TaskState.working,
-                    message=task_updater.new_agent_message(
-                        convert_genai_parts_to_a2a(event.content.parts),
-                    ),
-                )
-                logger.info(f"LLM Intermediate Response: {json.dumps(_content_to_dict(event.content), indent=2)}")
-            else:
-                logger.debug("Skipping event")
-
-    async def execute(
-        self,
-        context: RequestContext,
-        event_queue: EventQueue,
-    ):
-        # Run the agent until either complete or the task is suspended.
-        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
-        # Immediately notify that the task is submitted.
-        if not context.current_task:
-            await updater.submit()
-        await updater.start_work()
-        await self._process_request(
-            types.UserContent(
-                parts=convert_a2a_parts_to_genai(context.message.parts),
-            ),
-            context.context_id,
-            updater,
-        )
-        logger.debug("[tech] execute exiting")
+    This lets the server bind its port and serve the agent card before
+    google.adk is imported and the LlmAgent graph is constructed.
+    """
+
+    def __init__(self, factory: Callable[[], AgentExecutor]):
+        self._factory = factory
+        self._executor: Optional[AgentExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> AgentExecutor:
+        """Returns the underlying executor, building it if necessary. Thread-safe."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    started = time.perf_counter()
+                    self._executor = self._factory()
+                    logger.info(f"Agent graph ready in {time.perf_counter() - started:.2f}s")
+        return self._executor
+
+    def warm_in_background(self) -> None:
+        threading.Thread(target=self.get, name="agent-warmup", daemon=True).start()
+
+    async def _resolve(self) -> AgentExecutor:
+        if self._executor is not None:
+            return self._executor
+        # Imports and agent construction are blocking; keep them off the event loop.
+        return await asyncio.to_thread(self.get)
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue):
+        executor = await self._resolve()
+        await executor.execute(context, event_queue)
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
-        # Ideally: kill any ongoing tasks.
-        raise ServerError(error=UnsupportedOperationError())
-
-    async def _upsert_session(self, session_id: str):
-        """
-        Retrieves a session if it exists, otherwise creates a new one.
-        Ensures that async session service methods are properly awaited.
-        """
-        session = await self.runner.session_service.get_session(
-            app_name=self.runner.app_name, user_id="self", session_id=session_id
-        )
-        if session is None:
-            session = await self.runner.session_service.create_session(
-                app_name=self.runner.app_name, user_id="self", session_id=session_id
-            )
-        # According to ADK InMemorySessionService, create_session should always return a Session object.
-        if session is None:
-            logger.error(
-                f"Critical error: Session is None even after create_session for session_id: {session_id}"
-            )
-            raise RuntimeError(f"Failed to get or create session: {session_id}")
-        return session
-
-def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
-    """Convert a list of A2A Part types into a list of Google Gen AI Part types."""
-    return [convert_a2a_part_to_genai(part) for part in parts]
-
-def convert_a2a_part_to_genai(part: Part) -> types.Part:
-    """Convert a single A2A Part type into a Google Gen AI Part type."""
-    part = part.root
-    if isinstance(part, TextPart):
-        return types.Part(text=part.text)
-    if isinstance(part, FilePart):
-        if isinstance(part.file, FileWithUri):
-            return types.Part(
-                file_data=types.FileData(
-                    file_uri=part.file.uri, mime_type=part.file.mime_type
-                )
-            )
-        if isinstance(part.file, FileWithBytes):
-            return types.Part(
-                inline_data=types.Blob(
-                    data=part.file.bytes, mime_type=part.file.mime_type
-                )
-            )
-        raise ValueError(f"Unsupported file type: {type(part.file)}")
-    raise ValueError(f"Unsupported part type: {type(part)}")
-
-def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
-    """Convert a list of Google Gen AI Part types into a list of A2A Part types."""
-    return [
-        convert_genai_part_to_a2a(part)
-        for part in parts
-        if (part.text or part.file_data or part.inline_data)
-    ]
-
-def convert_genai_part_to_a2a(part: types.Part) -> Part:
-    """Convert a single Google Gen AI Part type into an A2A Part type."""
-    if part.text:
-        return TextPart(text=part.text)
-    if part.file_data:
-        return FilePart(
-            file=FileWithUri(
-                uri=part.file_data.file_uri,
-                mime_type=part.file_data.mime_type,
-            )
-        )
-    if part.inline_data:
-        return Part(
-            root=FilePart(
-                file=FileWithBytes(
-                    bytes=part.inline_data.data,
-                    mime_type=part.inline_data.mime_type,
-                )
-            )
-        )
-    raise ValueError(f"Unsupported part type: {part}")
+        executor = await self._resolve()
+        await executor.cancel(context, event_queue)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.close()
+
+
+def _build_adk_executor(agent_card: AgentCard, config: ServerConfig) -> AgentExecutor:
+    from adk_executor import create_agent_executor
 
+    return create_agent_executor(agent_card, config)
 
 async def get_raw_logs(request):
     log_file_path = os.path.join("logs", "officer_agent.log")
@@ -230,6 +126,171 @@ async def get_raw_logs(request):
         logger.error(f"Error reading log file: {e}")
         return PlainTextResponse(f"Error reading log file: {e}", status_code=500)
 
+async def get_artifact(request):
+    digest = ARTIFACT_STORE.digest_from_uri(
+        ARTIFACT_STORE.uri_for(request.path_params["digest"])
+    )
+    if digest is None or not ARTIFACT_STORE.exists(digest):
+        return PlainTextResponse("Artifact not found.", status_code=404)
+    return FileResponse(
+        ARTIFACT_STORE.path_for(digest),
+        media_type=ARTIFACT_STORE.mime_type_for(digest) or "application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+async def get_metrics(request):
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+def _unauthorized() -> PlainTextResponse:
+    return PlainTextResponse(
+        "A valid bearer token is required.", status_code=401, headers={"WWW-Authenticate": "Bearer"}
+    )
+
+def _admin_only(request, disabled: str) -> Optional[PlainTextResponse]:
+    """The response refusing a non-admin caller, or None for the admin; `disabled` explains a 403 without ADMIN_API_TOKEN."""
+    if not ADMIN_API_TOKEN:
+        return PlainTextResponse(f"{disabled}: ADMIN_API_TOKEN is not set.", status_code=403)
+    if not is_admin(authenticate(request.headers.get("authorization"))):
+        return _unauthorized()
+    return None
+
+async def post_batch_assignments(request):
+    """
+    Assigns the open backlog in one batch; body: {"date", "department", "dry_run"}, all optional.
+    Needs the admin bearer token.
+    """
+    rejection = _admin_only(request, "Batch assignment is disabled")
+    if rejection is not None:
+        return rejection
+    # Imported on first use so startup does not load scipy.
+    from sub_agents.ticket_management.batch_assigner import assign_backlog
+
+    try:
+        body = await request.json() if await request.body() else {}
+    except ValueError:
+        return PlainTextResponse("Request body must be JSON.", status_code=400)
+    if not isinstance(body, dict):
+        return PlainTextResponse("Request body must be a JSON object.", status_code=400)
+    if body.get("department") and body["department"] not in DEPARTMENT_ASSIGNERS:
+        return PlainTextResponse(f"Unknown department: {body['department']}", status_code=400)
+    try:
+        result = await run_in_threadpool(
+            assign_backlog, body.get("date"), body.get("department"), bool(body.get("dry_run", False))
+        )
+    except ValueError as e:
+        return PlainTextResponse(f"Invalid request: {e}", status_code=400)
+    if result is None:
+        return PlainTextResponse("Batch assignment failed.", status_code=500)
+    return JSONResponse(result)
+
+async def model_config(request):
+    """
+    GET returns each agent's model and generation settings. PUT merges
+    overrides, e.g. {"CIVIC_AGENT": {"temperature": 0.2}}, or null to drop an
+    agent's overrides; it needs the admin bearer token, so without
+    ADMIN_API_TOKEN the configuration is read-only.
+    """
+    if request.method == "PUT":
+        rejection = _admin_only(request, "Model configuration is read-only")
+        if rejection is not None:
+            return rejection
+        try:
+            changes = await request.json()
+        except ValueError:
+            return PlainTextResponse("Request body must be JSON.", status_code=400)
+        try:
+            return JSONResponse(await run_in_threadpool(MODEL_CONFIG.update_overrides, changes))
+        except ValueError as e:
+            return PlainTextResponse(f"Invalid overrides: {e}", status_code=400)
+    return JSONResponse(MODEL_CONFIG.snapshot())
+
+async def subscriptions(request):
+    """
+    GET lists the caller's webhook subscriptions (query parameter: ticket_id).
+    POST subscribes a webhook to ticket changes; body: {"url", "token",
+    "ticket_id"}, where no ticket_id means every ticket. Both need a bearer
+    token (see shared_libraries/api_auth.py); the admin token lists everyone's.
+    """
+    client = authenticate(request.headers.get("authorization"))
+    if client is None:
+        return _unauthorized()
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except ValueError:
+            return PlainTextResponse("Request body must be JSON.", status_code=400)
+        if not isinstance(body, dict):
+            return PlainTextResponse("Request body must be a JSON object.", status_code=400)
+        ticket_id = body.get("ticket_id")
+        if ticket_id is not None and not isinstance(ticket_id, int):
+            return PlainTextResponse("ticket_id must be an integer.", status_code=400)
+        try:
+            subscription_id = await run_in_threadpool(
+                subscribe, body.get("url"), body.get("token"), ticket_id, client
+            )
+        except ValueError as e:
+            return PlainTextResponse(f"Cannot subscribe: {e}", status_code=400)
+        if subscription_id is None:
+            return PlainTextResponse("Could not save the subscription.", status_code=500)
+        return JSONResponse({"id": subscription_id, "url": body["url"], "ticket_id": ticket_id}, status_code=201)
+    try:
+        ticket_id = int(request.query_params["ticket_id"]) if "ticket_id" in request.query_params else None
+    except ValueError:
+        return PlainTextResponse("ticket_id must be an integer.", status_code=400)
+    result = await run_in_threadpool(list_subscriptions, ticket_id, None if is_admin(client) else client)
+    if result is None:
+        return PlainTextResponse("Could not list subscriptions.", status_code=500)
+    return JSONResponse(result)
+
+async def delete_subscription(request):
+    """Removes one of the caller's subscriptions; the admin token may remove anyone's."""
+    client = authenticate(request.headers.get("authorization"))
+    if client is None:
+        return _unauthorized()
+    try:
+        subscription_id = int(request.path_params["subscription_id"])
+    except ValueError:
+        return PlainTextResponse("Subscription id must be an integer.", status_code=400)
+    if not await run_in_threadpool(unsubscribe, subscription_id, None if is_admin(client) else client):
+        return PlainTextResponse("Subscription not found.", status_code=404)
+    return PlainTextResponse("", status_code=204)
+
+async def get_reports(request):
+    """Operations dashboard; query parameters: department, days."""
+    try:
+        days = int(request.query_params.get("days", "7"))
+    except ValueError:
+        return PlainTextResponse("days must be an integer.", status_code=400)
+    report = await run_in_threadpool(get_operations_report, request.query_params.get("department"), days)
+    if report is None:
+        return PlainTextResponse("Could not build the report.", status_code=500)
+    return JSONResponse(report)
+
+async def get_export(request):
+    """
+    Streams tickets and history; query parameters: format (csv, jsonl, parquet),
+    since, until, after (event id to resume from) and archived=0 to skip archives.
+    Needs the admin bearer token.
+    """
+    rejection = _admin_only(request, "Export is disabled")
+    if rejection is not None:
+        return rejection
+    params = request.query_params
+    export_format = params.get("format", "csv")
+    try:
+        after = int(params.get("after", "0"))
+        chunks = export_stream(
+            export_format, params.get("since"), params.get("until"), after, params.get("archived", "1") != "0"
+        )
+    except (ValueError, ImportError) as e:
+        return PlainTextResponse(f"Cannot export: {e}", status_code=400)
+    # Sync iterators are advanced in the thread pool, so the event loop never waits on SQLite.
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="tickets-export.{export_format}"'},
+    )
+
 async def view_logs(request):
     html_file_path = os.path.join("agents", "officer_side_agent", "templates", "logs_ui.html")
     try:
@@ -242,13 +303,36 @@ async def view_logs(request):
         logger.error(f"Error reading UI template: {e}")
         return PlainTextResponse(f"Error reading UI template: {e}", status_code=500)
 
-def main():
-    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") != "TRUE" and not os.getenv("GOOGLE_API_KEY"):
-        raise ValueError(
-            "GOOGLE_API_KEY environment variable not set and "
-            "GOOGLE_GENAI_USE_VERTEXAI is not TRUE."
-        )
+@asynccontextmanager
+async def lifespan(app, agent_executor: LazyAgentExecutor, startup_mode: str, push_client: httpx.AsyncClient):
+    if startup_mode == "warm":
+        agent_executor.warm_in_background()
+    # Archival and vacuum run in transactions, so every worker may run its own scheduler.
+    maintenance = MaintenanceScheduler()
+    maintenance.start()
+    TICKET_DISPATCHER.start()
+    NOTIFICATION_DISPATCHER.start()
+    route_planner = None
+    if os.getenv("ROUTE_PLANNING_TIME"):
+        # Imported only when enabled, so plain startups do not load numpy.
+        from sub_agents.ticket_management.route_planner import DailyRoutePlanner
+        route_planner = DailyRoutePlanner()
+        route_planner.start()
+    yield
+    if route_planner is not None:
+        route_planner.stop()
+    TICKET_DISPATCHER.stop()
+    # Undelivered notifications stay in the outbox for the next start.
+    NOTIFICATION_DISPATCHER.stop()
+    maintenance.stop()
+    agent_executor.close()
+    # Commits history events still queued in fire-and-forget mode.
+    HISTORY_WRITER.close()
+    READ_POOLS.close_all()
+    await push_client.aclose()
 
+def create_app(config: ServerConfig) -> Starlette:
+    """Builds the A2A Starlette application. Called once per worker process."""
     skill = AgentSkill(
         id="city_officer_agent_assist",
         name="City Officer Agent Assistance",
@@ -264,22 +348,39 @@ def main():
         version="1.0.0",
         defaultInputModes=["text"],
         defaultOutputModes=["text"],
-        capabilities=AgentCapabilities(streaming=True),
+        capabilities=AgentCapabilities(streaming=True, pushNotifications=True),
         skills=[skill],
     )
 
-    adk_agent = create_agent()
-    runner = Runner(
-        app_name=agent_card.name,
-        agent=adk_agent,
-        artifact_service=InMemoryArtifactService(),
-        session_service=InMemorySessionService(),
-        memory_service=InMemoryMemoryService()
-    )
-    agent_executor = ADKAgentExecutor(runner, agent_card)
+    if config.shared_state:
+        from a2a.server.tasks import DatabasePushNotificationConfigStore, DatabaseTaskStore
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        # Every worker process opens the same SQLite file, so tasks started on
+        # one worker can be polled through any other, and push configs reach every worker.
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{config.state_path('tasks.db')}",
+            connect_args={"timeout": 30},
+        )
+        task_store = DatabaseTaskStore(engine)
+        push_config_store = DatabasePushNotificationConfigStore(engine)
+    else:
+        task_store = InMemoryTaskStore()
+        push_config_store = InMemoryPushNotificationConfigStore()
+    # Task updates go to the webhook a client set for its task; ticket changes
+    # made later go through the notification outbox (see notifications.py).
+    # Neither is sent to private, loopback or link-local addresses.
+    push_client = httpx.AsyncClient(timeout=10, event_hooks={"request": [check_webhook_request]})
+
+    agent_executor = LazyAgentExecutor(partial(_build_adk_executor, agent_card, config))
+    if config.startup_mode == "eager":
+        agent_executor.get()
 
     request_handler = DefaultRequestHandler(
-        agent_executor=agent_executor, task_store=InMemoryTaskStore()
+        agent_executor=agent_executor,
+        task_store=task_store,
+        push_config_store=push_config_store,
+        push_sender=BasePushNotificationSender(push_client, push_config_store),
     )
 
     a2a_app = A2AStarletteApplication(
@@ -288,11 +389,39 @@ def main():
     )
     
     # Build the Starlette application and add routes to it
-    starlette_app = a2a_app.build()
+    starlette_app = a2a_app.build(
+        lifespan=partial(
+            lifespan, agent_executor=agent_executor, startup_mode=config.startup_mode, push_client=push_client
+        )
+    )
     starlette_app.add_route("/logs", view_logs)
     starlette_app.add_route("/logs/raw", get_raw_logs)
+    starlette_app.add_route("/artifacts/{digest}", get_artifact)
+    starlette_app.add_route("/metrics", get_metrics)
+    starlette_app.add_route("/reports", get_reports)
+    starlette_app.add_route("/export", get_export)
+    starlette_app.add_route("/assignments/batch", post_batch_assignments, methods=["POST"])
+    starlette_app.add_route("/config/models", model_config, methods=["GET", "PUT"])
+    starlette_app.add_route("/subscriptions", subscriptions, methods=["GET", "POST"])
+    starlette_app.add_route("/subscriptions/{subscription_id}", delete_subscription, methods=["DELETE"])
+    # Sheds message/send and message/stream before they reach the request handler.
+    # MAX_IN_FLIGHT_REQUESTS is server-wide, so each worker takes its share.
+    starlette_app.add_middleware(
+        RateLimitMiddleware, rpc_path=DEFAULT_RPC_URL, config=RateLimitConfig.from_env(workers=config.workers)
+    )
+    # Outermost: strips /tenants/<tenant> so the routes and the rate limiter see plain paths.
+    starlette_app.add_middleware(TenantMiddleware)
+    return starlette_app
+
+def main():
+    if os.getenv("GOOGLE_GENAI_USE_VERTEXAI") != "TRUE" and not os.getenv("GOOGLE_API_KEY"):
+        raise ValueError(
+            "GOOGLE_API_KEY environment variable not set and "
+            "GOOGLE_GENAI_USE_VERTEXAI is not TRUE."
+        )
 
-    uvicorn.run(starlette_app, host="0.0.0.0", port="8080")
+    config = ServerConfig.from_env()
+    serve(partial(create_app, config), config)
     
 if __name__ == "__main__":
     main()
@@ -1,18 +1,25 @@
 from google.adk.agents import LlmAgent
-# from sub_agents.citizen_info_support.citizen_info_agent import citizen_info_agent
-from sub_agents.licensing_transport_safety_department.safety_agent import safety_agent
-from sub_agents.parks_community_civic_department.civic_agent import civic_agent
-from sub_agents.public_work_department.public_work_agent import public_work_agent
-from sub_agents.sanitation_utilities_department.sanitation_agent import sanitation_agent
-from sub_agents.ticket_management.ticket_management_agent import ticket_management_agent
 from google.adk.tools.agent_tool import AgentTool
 from shared_libraries.prompts import OFFICE_SIDE_AGENT_PROMPT
-from tools import UPDATE_TECHNICIAN_WORK_DATE_TOOL
+
 
 def create_agent() -> LlmAgent:
     """Constructs the ADK agent."""
+    # Department packages build their LlmAgents and FunctionTools at import
+    # time, so they are only imported once the agent graph is actually needed.
+    # from sub_agents.citizen_info_support.citizen_info_agent import citizen_info_agent
+    from sub_agents.licensing_transport_safety_department.safety_agent import safety_agent
+    from sub_agents.parks_community_civic_department.civic_agent import civic_agent
+    from sub_agents.public_work_department.public_work_agent import public_work_agent
+    from sub_agents.sanitation_utilities_department.sanitation_agent import sanitation_agent
+    from sub_agents.ticket_management.ticket_management_agent import ticket_management_agent
+    from shared_libraries.adk_artifact_service import rehydrate_artifact_parts
+    from shared_libraries.context_window import STATIC_CONTEXT_CACHE, compact_context, record_token_usage
+    from shared_libraries.model_config import MODEL_CONFIG
+    from tools import FIND_FREE_TECHNICIANS_TOOL, UPDATE_TECHNICIAN_WORK_DATE_TOOL
+
     return LlmAgent(
-        model="gemini-2.0-flash-001",
+        model=MODEL_CONFIG.build_model("AGENT_ASSIST"),
         name="AGENT_ASSIST",
         description="An agent that assists with various city office tasks, including ticket management for issues and assigning to respective technicians to reslove the issues.",
         instruction =OFFICE_SIDE_AGENT_PROMPT,
@@ -23,6 +30,12 @@ def create_agent() -> LlmAgent:
             AgentTool(public_work_agent), 
             AgentTool(sanitation_agent), 
             AgentTool(ticket_management_agent),
-            UPDATE_TECHNICIAN_WORK_DATE_TOOL
+            UPDATE_TECHNICIAN_WORK_DATE_TOOL,
+            FIND_FREE_TECHNICIANS_TOOL
             ],
+        # Old turns are compacted first, so only uploads still in the window are
+        # inlined; uploads stay artifact:// references in the session itself.
+        # The model settings come first: the context cache is keyed by model name.
+        before_model_callback=[MODEL_CONFIG.apply, compact_context, rehydrate_artifact_parts, STATIC_CONTEXT_CACHE.apply],
+        after_model_callback=record_token_usage,
     )
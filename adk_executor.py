@@ -0,0 +1,478 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncGenerator
+from typing import Optional
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.adk.events import Event
+from google.genai import types
+from a2a.server.agent_execution import AgentExecutor
+from a2a.server.agent_execution.context import RequestContext
+from a2a.server.events.event_queue import EventQueue
+from a2a.server.tasks import TaskUpdater
+from a2a.types import (
+    AgentCard,
+    FilePart,
+    FileWithBytes,
+    FileWithUri,
+    Part,
+    TaskState,
+    InvalidParamsError,
+    TextPart,
+    UnsupportedOperationError,
+)
+from a2a.utils.errors import ServerError
+from adk_agent import create_agent
+from server import ServerConfig
+from shared_libraries.adk_artifact_service import FileArtifactService
+from shared_libraries.artifact_store import ARTIFACT_STORE
+from shared_libraries.image_preprocessing import IMAGE_PREPROCESSOR
+from shared_libraries.metrics import METRICS
+from shared_libraries.resilient_llm import ModelUnavailableError
+from shared_libraries.sqlite_memory_service import SqliteMemoryService
+from sub_agents.ticket_management.database import CURRENT_TENANT, tenant_exists
+from sub_agents.ticket_management.idempotency import (
+    IN_PROGRESS, REQUEST_KEY, abandon, begin_request, mark_in_progress, remember, wait_for,
+)
+from sub_agents.ticket_management.notifications import REQUEST_WEBHOOK, validate_webhook_url
+from sub_agents.ticket_management.ticket_manager import add_history_log, create_ticket
+
+# Configure logger for ADKAgentExecutor
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+STREAM_PARTIAL_RESPONSES = os.getenv("STREAM_PARTIAL_RESPONSES", "TRUE").upper() == "TRUE"
+# Partial model text is forwarded once this many characters are buffered...
+STREAM_MIN_CHARS = int(os.getenv("STREAM_MIN_CHARS", "48"))
+# ...or once this long has passed since the previous forwarded chunk.
+STREAM_MAX_INTERVAL_SECONDS = float(os.getenv("STREAM_MAX_INTERVAL_MS", "200")) / 1000
+# When the model is unavailable, the citizen's message is logged as an unrouted ticket.
+DEGRADED_TICKET_LOGGING = os.getenv("DEGRADED_TICKET_LOGGING", "TRUE").upper() == "TRUE"
+DEGRADED_TICKET_REPLY = (
+    "Our assistant is temporarily unavailable, but your report has been logged as ticket {ticket_id}. "
+    "It will be routed to the right department as soon as possible; no need to report it again."
+)
+DEGRADED_REPLY = "Our assistant is temporarily unavailable. Please try again in a few minutes."
+# A retry that arrives while its message is still being answered waits this long for that reply.
+RETRY_WAIT_SECONDS = float(os.getenv("IDEMPOTENT_RETRY_WAIT_SECONDS", "120"))
+IN_PROGRESS_REPLY = "Your message is still being processed. Please check back in a minute; there is no need to send it again."
+
+
+def _log_unrouted_ticket(text: str) -> Optional[int]:
+    """Logs a citizen's message as an open ticket for later routing; returns its ID."""
+    title = " ".join(text.split())
+    ticket_id = create_ticket(title if len(title) <= 80 else title[:79] + "…", description=text)
+    if ticket_id is not None:
+        add_history_log(ticket_id, log_message="Logged while the assistant was unavailable; routing pending")
+    return ticket_id
+
+def _message_key(message) -> Optional[str]:
+    """A message's idempotency key: the `idempotency_key` in its metadata, else its message id."""
+    return (message.metadata or {}).get("idempotency_key") or message.messageId
+
+def _message_tenant(message) -> Optional[str]:
+    """The tenant named by the `tenant` in a message's metadata, or None. Raises ValueError if it is unknown."""
+    tenant = (message.metadata or {}).get("tenant")
+    if tenant is None:
+        return None
+    if not isinstance(tenant, str) or not tenant_exists(tenant):
+        raise ValueError(f"Unknown tenant: {tenant!r}")
+    return tenant
+
+async def _remember_reply(parts: list[Part], metadata: dict) -> None:
+    """Keeps the reply to the message being served, for replaying to a retry of it."""
+    reply = {"parts": [part.model_dump(mode="json", exclude_none=True) for part in parts], "metadata": metadata}
+    await asyncio.to_thread(remember, "a2a_message", REQUEST_KEY.get(), reply)
+
+def _content_to_dict(content: types.Content) -> dict:
+    parts_data = []
+    for part in content.parts:
+        if part.text:
+            parts_data.append({"type": "text", "value": part.text})
+        elif part.file_data:
+            parts_data.append({"type": "file_data", "uri": part.file_data.file_uri, "mime_type": part.file_data.mime_type})
+        elif part.inline_data:
+            parts_data.append({"type": "inline_data", "mime_type": part.inline_data.mime_type, "size": len(part.inline_data.data)})
+    return {"parts": parts_data}
+
+class PartialTextCoalescer:
+    """
+    Buffers partial text deltas from a streaming model turn and releases them
+    in batches, so a fast token stream does not become one A2A event per token.
+    """
+
+    def __init__(self, min_chars: int = STREAM_MIN_CHARS, max_interval: float = STREAM_MAX_INTERVAL_SECONDS):
+        self.min_chars = min_chars
+        self.max_interval = max_interval
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        # The first chunk is released immediately to keep time-to-first-token low.
+        self._last_flush = float("-inf")
+
+    def add(self, text: str) -> Optional[str]:
+        """Buffers `text` and returns the coalesced delta if it is due, else None."""
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if (
+            self._pending_chars >= self.min_chars
+            or time.monotonic() - self._last_flush >= self.max_interval
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Returns everything buffered so far, or None if nothing is pending."""
+        if not self._pending:
+            return None
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        return text
+
+class ADKAgentExecutor(AgentExecutor):
+    """An AgentExecutor that runs an ADK-based Agent."""
+
+    def __init__(self, runner: Runner, card: AgentCard):
+        self.runner = runner
+        self._card = card
+        self._running_sessions = {}
+        self._run_config = RunConfig(
+            streaming_mode=StreamingMode.SSE if STREAM_PARTIAL_RESPONSES else StreamingMode.NONE
+        )
+
+    def _run_agent(
+        self, session_id, new_message: types.Content
+    ) -> AsyncGenerator[Event, None]:
+        return self.runner.run_async(
+            session_id=session_id, user_id="self", new_message=new_message,
+            run_config=self._run_config,
+        )
+
+    async def _send_partial_text(self, task_updater: TaskUpdater, text: str) -> None:
+        await task_updater.update_status(
+            TaskState.working,
+            message=task_updater.new_agent_message(
+                [TextPart(text=text)], metadata={"partial": True},
+            ),
+        )
+
+    async def _process_request(
+        self,
+        new_message: types.Content,
+        session_id: str,
+        task_updater: TaskUpdater,
+        request_started: Optional[float] = None,
+    ) -> None:
+        if request_started is None:
+            request_started = time.monotonic()
+        # The call to self._upsert_session was returning a coroutine object,
+        # leading to an AttributeError when trying to access .id on it directly.
+        # We need to await the coroutine to get the actual session object.
+        session_obj = await self._upsert_session(session_id)
+        # Update session_id with the ID from the resolved session object
+        # to be used in self._run_agent.
+        session_id = session_obj.id
+
+        logger.info(f"LLM Input: {json.dumps(_content_to_dict(new_message), indent=2)}")
+
+        coalescer = PartialTextCoalescer()
+        # Tokens of every model call made for this request (root agent only).
+        usage = {"prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+        first_token_seen = False
+        # Set while the current model turn has been streamed as partial chunks.
+        turn_streamed = False
+        async for event in self._run_agent(session_id, new_message):
+            if event.partial:
+                parts = event.content.parts if event.content and event.content.parts else []
+                text = "".join(part.text for part in parts if part.text)
+                if not text:
+                    continue
+                if not first_token_seen:
+                    first_token_seen = True
+                    ttft = time.monotonic() - request_started
+                    METRICS.summary(
+                        "a2a_time_to_first_token_seconds",
+                        "Seconds from an A2A request arriving to the first streamed model text.",
+                    ).observe(ttft)
+                    logger.info(f"Time to first token: {ttft:.3f}s")
+                turn_streamed = True
+                delta = coalescer.add(text)
+                if delta:
+                    await self._send_partial_text(task_updater, delta)
+                continue
+
+            if event.usage_metadata:
+                usage["prompt_tokens"] += event.usage_metadata.prompt_token_count or 0
+                usage["cached_tokens"] += event.usage_metadata.cached_content_token_count or 0
+                usage["output_tokens"] += event.usage_metadata.candidates_token_count or 0
+
+            # A complete event closes the streamed turn; release the tail first.
+            delta = coalescer.flush()
+            if delta:
+                await self._send_partial_text(task_updater, delta)
+
+            if event.is_final_response():
+                # ADK aggregates the streamed chunks into this event, so the
+                # artifact is taken from it instead of re-joining the deltas.
+                parts = convert_genai_parts_to_a2a(event.content.parts)
+                await task_updater.add_artifact(parts, metadata={"usage": usage})
+                await _remember_reply(parts, {"usage": usage})
+                await task_updater.complete()
+                METRICS.summary(
+                    "a2a_request_duration_seconds",
+                    "Seconds from an A2A request arriving to its final artifact.",
+                ).observe(time.monotonic() - request_started)
+                METRICS.summary(
+                    "a2a_request_prompt_tokens", "Prompt tokens sent to the model per A2A request.",
+                ).observe(usage["prompt_tokens"])
+                logger.info(f"Tokens for this request: {usage}")
+                logger.info(f"LLM Final Response: {json.dumps(_content_to_dict(event.content), indent=2)}")
+                break
+            if turn_streamed:
+                logger.debug("Skipping aggregated event already streamed as partial text")
+            elif not event.get_function_calls():
+                await task_updater.update_status(
+                    TaskState.working,
+                    message=task_updater.new_agent_message(
+                        convert_genai_parts_to_a2a(event.content.parts),
+                    ),
+                )
+                logger.info(f"LLM Intermediate Response: {json.dumps(_content_to_dict(event.content), indent=2)}")
+            else:
+                logger.debug("Skipping event")
+            turn_streamed = False
+
+    async def execute(
+        self,
+        context: RequestContext,
+        event_queue: EventQueue,
+    ):
+        request_started = time.monotonic()
+        if CURRENT_TENANT.get() is None:
+            # Without a tenant path or header, the message may name its city itself.
+            try:
+                CURRENT_TENANT.set(_message_tenant(context.message))
+            except ValueError as e:
+                raise ServerError(error=InvalidParamsError(message=str(e)))
+        # Run the agent until either complete or the task is suspended.
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        # Immediately notify that the task is submitted.
+        if not context.current_task:
+            await updater.submit()
+        await updater.start_work()
+        # A retried message gets the reply it already had, without running the agent or writing again.
+        key = _message_key(context.message)
+        begin_request(key)
+        reply = await asyncio.to_thread(mark_in_progress, "a2a_message", key)
+        if reply == IN_PROGRESS:
+            logger.info(f"Message {key} is already being answered; waiting for that reply")
+            reply = await asyncio.to_thread(wait_for, "a2a_message", key, RETRY_WAIT_SECONDS)
+            if reply is None:
+                # The first run ended without a reply to keep; this one answers instead.
+                reply = await asyncio.to_thread(mark_in_progress, "a2a_message", key)
+        if reply == IN_PROGRESS:
+            await updater.add_artifact([Part(root=TextPart(text=IN_PROGRESS_REPLY))], metadata={"in_progress": True})
+            await updater.complete()
+            return
+        if reply is not None:
+            logger.info(f"Replaying the reply to message {key}")
+            await updater.add_artifact(
+                [Part.model_validate(part) for part in reply["parts"]], metadata={**reply["metadata"], "replayed": True},
+            )
+            await updater.complete()
+            return
+        try:
+            await self._run(context, updater, request_started)
+        finally:
+            # A run that kept no reply lets a retry of the message run again.
+            await asyncio.to_thread(abandon, "a2a_message", key)
+
+    async def _run(self, context: RequestContext, updater: TaskUpdater, request_started: float) -> None:
+        try:
+            genai_parts = convert_a2a_parts_to_genai(context.message.parts)
+        except ValueError as e:
+            # A malformed file or unsupported part is the caller's error; the task fails with the reason.
+            logger.warning(f"Rejecting message {context.message.messageId}: {e}")
+            await updater.failed(
+                message=updater.new_agent_message([Part(root=TextPart(text=f"Invalid message: {e}"))])
+            )
+            return
+        # Photos are downscaled and stripped off the event loop before they
+        # reach the model; repeated uploads hit the preprocessing cache.
+        parts = await IMAGE_PREPROCESSOR.process_parts(genai_parts)
+        new_message = types.UserContent(parts=parts)
+        push_config = context.configuration.pushNotificationConfig if context.configuration else None
+        if push_config is not None:
+            # Tickets created for this request are subscribed to the caller's webhook, if it may be sent to.
+            try:
+                REQUEST_WEBHOOK.set((await asyncio.to_thread(validate_webhook_url, push_config.url), push_config.token))
+            except ValueError as e:
+                logger.warning(f"Not subscribing new tickets to the push notification URL: {e}")
+        try:
+            await self._process_request(new_message, context.context_id, updater, request_started)
+        except ModelUnavailableError as e:
+            logger.error(f"Model unavailable, serving a degraded reply: {e}")
+            await self._serve_degraded_reply(new_message, updater)
+        logger.debug("[tech] execute exiting")
+
+    async def _serve_degraded_reply(self, new_message: types.Content, task_updater: TaskUpdater) -> None:
+        """Completes the task without the model: logs the message as a ticket and says so."""
+        text = " ".join(part.text for part in new_message.parts if part.text).strip()
+        ticket_id = None
+        if text and DEGRADED_TICKET_LOGGING:
+            ticket_id = await asyncio.to_thread(_log_unrouted_ticket, text)
+        reply = DEGRADED_TICKET_REPLY.format(ticket_id=ticket_id) if ticket_id is not None else DEGRADED_REPLY
+        parts = [Part(root=TextPart(text=reply))]
+        metadata = {"degraded": True, "ticket_id": ticket_id}
+        await task_updater.add_artifact(parts, metadata=metadata)
+        if ticket_id is not None:
+            # A retry must not log the message again; one without a ticket may try the model again.
+            await _remember_reply(parts, metadata)
+        await task_updater.complete()
+        METRICS.counter(
+            "a2a_degraded_replies_total", "A2A requests answered without the model.",
+            ticket_logged=ticket_id is not None,
+        ).inc()
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue):
+        # Ideally: kill any ongoing tasks.
+        raise ServerError(error=UnsupportedOperationError())
+
+    def close(self) -> None:
+        """Releases worker pools owned by the executor."""
+        IMAGE_PREPROCESSOR.shutdown()
+
+    async def _upsert_session(self, session_id: str):
+        """
+        Retrieves a session if it exists, otherwise creates a new one.
+        Ensures that async session service methods are properly awaited.
+        """
+        session = await self.runner.session_service.get_session(
+            app_name=self.runner.app_name, user_id="self", session_id=session_id
+        )
+        if session is None:
+            session = await self.runner.session_service.create_session(
+                app_name=self.runner.app_name, user_id="self", session_id=session_id
+            )
+        # According to ADK InMemorySessionService, create_session should always return a Session object.
+        if session is None:
+            logger.error(
+                f"Critical error: Session is None even after create_session for session_id: {session_id}"
+            )
+            raise RuntimeError(f"Failed to get or create session: {session_id}")
+        return session
+
+def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
+    """Convert a list of A2A Part types into a list of Google Gen AI Part types."""
+    return [convert_a2a_part_to_genai(part) for part in parts]
+
+def convert_a2a_part_to_genai(part: Part) -> types.Part:
+    """
+    Convert a single A2A Part type into a Google Gen AI Part type.
+
+    Raises ValueError for an unsupported part or a file whose bytes are not valid base64.
+    """
+    part = part.root
+    if isinstance(part, TextPart):
+        return types.Part(text=part.text)
+    if isinstance(part, FilePart):
+        if isinstance(part.file, FileWithUri):
+            return types.Part(
+                file_data=types.FileData(
+                    file_uri=part.file.uri, mime_type=part.file.mime_type
+                )
+            )
+        if isinstance(part.file, FileWithBytes):
+            # Spool the upload to the artifact store so sessions keep a reference
+            # rather than the decoded bytes; fall back to inline data if the
+            # store is not writable.
+            try:
+                stored = ARTIFACT_STORE.put_base64(part.file.bytes, part.file.mime_type)
+            except ValueError as e:
+                # Sending it inline would not help: the model cannot use a payload that does not decode.
+                label = f"File {part.file.name!r}" if part.file.name else "An attached file"
+                raise ValueError(f"{label} could not be read: {e}") from e
+            except OSError as e:
+                logger.warning(f"Artifact store unavailable, sending file inline: {e}")
+                return types.Part(
+                    inline_data=types.Blob(
+                        data=part.file.bytes, mime_type=part.file.mime_type
+                    )
+                )
+            return types.Part(
+                file_data=types.FileData(
+                    file_uri=stored.uri, mime_type=part.file.mime_type
+                )
+            )
+        raise ValueError(f"Unsupported file type: {type(part.file)}")
+    raise ValueError(f"Unsupported part type: {type(part)}")
+
+def convert_genai_parts_to_a2a(parts: list[types.Part]) -> list[Part]:
+    """Convert a list of Google Gen AI Part types into a list of A2A Part types."""
+    return [
+        convert_genai_part_to_a2a(part)
+        for part in parts
+        if (part.text or part.file_data or part.inline_data)
+    ]
+
+def convert_genai_part_to_a2a(part: types.Part) -> Part:
+    """Convert a single Google Gen AI Part type into an A2A Part type."""
+    if part.text:
+        return TextPart(text=part.text)
+    if part.file_data:
+        digest = ARTIFACT_STORE.digest_from_uri(part.file_data.file_uri)
+        public_url = ARTIFACT_STORE.public_url_for(digest) if digest else None
+        return FilePart(
+            file=FileWithUri(
+                uri=public_url or part.file_data.file_uri,
+                mime_type=part.file_data.mime_type,
+            )
+        )
+    if part.inline_data:
+        if ARTIFACT_STORE.public_base_url:
+            stored = ARTIFACT_STORE.put_bytes(part.inline_data.data, part.inline_data.mime_type)
+            return FilePart(
+                file=FileWithUri(
+                    uri=ARTIFACT_STORE.public_url_for(stored.digest),
+                    mime_type=part.inline_data.mime_type,
+                )
+            )
+        return Part(
+            root=FilePart(
+                file=FileWithBytes(
+                    bytes=part.inline_data.data,
+                    mime_type=part.inline_data.mime_type,
+                )
+            )
+        )
+    raise ValueError(f"Unsupported part type: {part}")
+
+def create_agent_executor(agent_card: AgentCard, config: ServerConfig) -> ADKAgentExecutor:
+    """Builds the ADK agent graph, its runner services and the A2A executor around them."""
+    if config.shared_state:
+        # Every worker process opens the same SQLite files, so a follow-up
+        # message can land on any worker and still find its session.
+        session_service = DatabaseSessionService(
+            db_url=f"sqlite:///{config.state_path('sessions.db')}",
+            connect_args={"timeout": 30},
+        )
+        memory_service = SqliteMemoryService(config.state_path("memory.db"))
+    else:
+        session_service = InMemorySessionService()
+        memory_service = InMemoryMemoryService()
+
+    adk_agent = create_agent()
+    runner = Runner(
+        app_name=agent_card.name,
+        agent=adk_agent,
+        artifact_service=FileArtifactService(ARTIFACT_STORE),
+        session_service=session_service,
+        memory_service=memory_service,
+    )
+    return ADKAgentExecutor(runner, agent_card)
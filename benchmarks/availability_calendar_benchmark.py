@@ -0,0 +1,222 @@
+"""
+Compares answering department-wide availability questions from SQL with the
+in-memory availability calendar.
+
+Each run copies the city office database to a temporary directory and adds
+`--technicians` technicians spread over the four departments, each working
+a random 5 of every 7 days for `--days` days. Two questions are asked for
+every department, `--repeat` times each:
+
+- who is free on any day of a given week
+- each technician's earliest free date on or after a given day
+
+They are answered the old way (one query per technician and day, like the
+assigners did), with one aggregate SQL query per question, and from
+AvailabilityCalendar, both checking technician_versions before every query
+(the default) and without that check. The answers are compared. Writes a
+Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/availability_calendar_benchmark.py [--technicians 1000] [--days 365] [--repeat 10]
+"""
+import argparse
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database  # noqa: E402
+from sub_agents.ticket_management.availability import AvailabilityCalendar  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection, read_connection  # noqa: E402
+
+DEPARTMENTS = ("Licensing Transport Safety", "Parks Community Civic", "Public Work", "Sanitation Utilities")
+FIRST_DAY = date(2030, 1, 1)
+
+
+def _seed(technicians: int, days: int) -> None:
+    rng = random.Random(7)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    rows = []
+    for i in range(technicians):
+        cursor.execute("INSERT INTO technicians (name, department) VALUES (?, ?)",
+                       (f"Bench tech {i}", DEPARTMENTS[i % len(DEPARTMENTS)]))
+        technician_id = cursor.lastrowid
+        for week in range(0, days, 7):
+            for day in rng.sample(range(7), 5):
+                if week + day < days:
+                    rows.append((technician_id, (FIRST_DAY + timedelta(days=week + day)).isoformat()))
+    cursor.executemany(
+        "INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+        "VALUES (?, ?, '08:00', '17:00')", rows
+    )
+    conn.commit()
+    conn.close()
+
+
+# Who is free on any day of the week starting `start`
+
+def _week_per_row(department: str, start: date) -> set:
+    with read_connection() as conn:
+        free = set()
+        technicians = conn.execute("SELECT id FROM technicians WHERE department = ?", (department,)).fetchall()
+        for (technician_id,) in technicians:
+            for offset in range(7):
+                if conn.execute(
+                    "SELECT 1 FROM technician_availability WHERE technician_id = ? AND available_date = ?",
+                    (technician_id, (start + timedelta(days=offset)).isoformat()),
+                ).fetchone():
+                    free.add(technician_id)
+                    break
+        return free
+
+
+def _week_sql(department: str, start: date) -> set:
+    with read_connection() as conn:
+        return {row[0] for row in conn.execute('''
+            SELECT DISTINCT t.id FROM technicians t JOIN technician_availability a ON a.technician_id = t.id
+            WHERE t.department = ? AND a.available_date BETWEEN ? AND ?
+        ''', (department, start.isoformat(), (start + timedelta(days=6)).isoformat()))}
+
+
+def _week_calendar(calendar):
+    def ask(department: str, start: date) -> set:
+        return {t['id'] for t in calendar.free_technicians(department, start, start + timedelta(days=6))}
+    return ask
+
+
+# Each technician's earliest free date on or after `start`
+
+def _earliest_per_row(department: str, start: date) -> dict:
+    with read_connection() as conn:
+        technicians = conn.execute("SELECT id FROM technicians WHERE department = ?", (department,)).fetchall()
+        earliest = {}
+        for (technician_id,) in technicians:
+            row = conn.execute(
+                "SELECT MIN(available_date) FROM technician_availability WHERE technician_id = ? AND available_date >= ?",
+                (technician_id, start.isoformat()),
+            ).fetchone()
+            earliest[technician_id] = row[0]
+        return earliest
+
+
+def _earliest_sql(department: str, start: date) -> dict:
+    with read_connection() as conn:
+        earliest = {row[0]: None for row in conn.execute("SELECT id FROM technicians WHERE department = ?",
+                                                         (department,))}
+        earliest.update(conn.execute('''
+            SELECT t.id, MIN(a.available_date) FROM technicians t JOIN technician_availability a ON a.technician_id = t.id
+            WHERE t.department = ? AND a.available_date >= ? GROUP BY t.id
+        ''', (department, start.isoformat())).fetchall())
+        return earliest
+
+
+def _earliest_calendar(calendar):
+    def ask(department: str, start: date) -> dict:
+        return {technician_id: day.isoformat() if day else None
+                for technician_id, day in calendar.earliest_free_dates(department, start).items()}
+    return ask
+
+
+def _time(ask, starts: list) -> tuple[list, list]:
+    answers, latencies = [], []
+    for start in starts:
+        for department in DEPARTMENTS:
+            began = time.perf_counter()
+            answers.append(ask(department, start))
+            latencies.append(time.perf_counter() - began)
+    return answers, latencies
+
+
+def run(args, source: str) -> tuple[list, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(source, database.DATABASE_PATH)
+        _seed(args.technicians, args.days)
+        synced = AvailabilityCalendar(sync_seconds=0)
+        began = time.perf_counter()
+        synced.free_technicians(None, FIRST_DAY)
+        load_seconds = time.perf_counter() - began
+        unsynced = AvailabilityCalendar(sync_seconds=float("inf"))
+        unsynced.free_technicians(None, FIRST_DAY)
+
+        rng = random.Random(11)
+        starts = [FIRST_DAY + timedelta(days=rng.randrange(args.days - 7)) for _ in range(args.repeat)]
+        results = []
+        for question, setups in (
+            ("free on any day of a week", (
+                ("per technician and day (before)", _week_per_row),
+                ("one aggregate SQL query", _week_sql),
+                ("calendar, version check per query", _week_calendar(synced)),
+                ("calendar, no version check", _week_calendar(unsynced)),
+            )),
+            ("earliest free date of each technician", (
+                ("per technician (before)", _earliest_per_row),
+                ("one aggregate SQL query", _earliest_sql),
+                ("calendar, version check per query", _earliest_calendar(synced)),
+                ("calendar, no version check", _earliest_calendar(unsynced)),
+            )),
+        ):
+            reference = None
+            for name, ask in setups:
+                answers, latencies = _time(ask, starts)
+                reference = reference if reference is not None else answers
+                results.append({
+                    "question": question,
+                    "name": name,
+                    "mean_us": statistics.mean(latencies) * 1e6,
+                    "p95_us": statistics.quantiles(latencies, n=20)[-1] * 1e6,
+                    "matches": answers == reference,
+                })
+    return results, load_seconds
+
+
+def render_report(results: list, load_seconds: float, args) -> str:
+    lines = [
+        "# Availability calendar benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/availability_calendar_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.technicians} technicians over {len(DEPARTMENTS)} departments, each working 5 of every 7 days for "
+        f"{args.days} days; {args.repeat} random start dates x {len(DEPARTMENTS)} departments per question. "
+        f"Loading the calendar took {load_seconds * 1000:.0f} ms.",
+        "",
+        "| question | answered by | mean µs per department | p95 µs | same answers as before |",
+        "|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['question']} | {r['name']} | {r['mean_us']:.0f} | {r['p95_us']:.0f} "
+            f"| {'yes' if r['matches'] else 'NO'} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--technicians", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "availability_calendar.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    results, load_seconds = run(args, source)
+    database.DATABASE_PATH = source
+    report = render_report(results, load_seconds, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Measures the dispatch queue at tens of thousands of pending tickets.
+
+For each size, fills a copy of the city office database with that many
+queued tickets of mixed priority, then times loading them into the
+in-memory heaps (DispatchQueue.sync), popping every ticket in order, and
+re-keying a sample in the IndexedHeap. Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/dispatch_queue_benchmark.py [--sizes 10000 50000 100000]
+"""
+import argparse
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.dispatch import (  # noqa: E402
+    DEPARTMENT_ASSIGNERS, DispatchQueue, sla_deadline_for, virtual_deadline,
+)
+
+
+def _fill(database_path: str, size: int) -> None:
+    rng = random.Random(size)
+    departments = list(DEPARTMENT_ASSIGNERS)
+    now = time.time()
+    conn = get_db_connection(database_path)
+    rows = []
+    for i in range(size):
+        priority = rng.choice((1, 2, 3, 3, 3, 4))
+        sla = sla_deadline_for(priority)
+        # Spread enqueue times over the last two days so aging matters
+        enqueued = now - rng.uniform(0, 48 * 3600)
+        rows.append((f"benchmark ticket {i}", priority, sla, rng.choice(departments), enqueued))
+    conn.executemany("INSERT INTO tickets (title, priority, sla_deadline, department) VALUES (?, ?, ?, ?)",
+                     [r[:4] for r in rows])
+    ticket_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM tickets WHERE title LIKE 'benchmark ticket %' ORDER BY id")]
+    conn.executemany('''
+        INSERT INTO dispatch_queue (ticket_id, department, priority, sla_deadline, virtual_deadline)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (ticket_id, r[3], r[1], r[2], virtual_deadline(r[1], r[4], r[2]))
+        for ticket_id, r in zip(ticket_ids, rows)
+    ])
+    conn.commit()
+    conn.close()
+
+
+def run(size: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(database.DATABASE_PATH, database_path)
+        _fill(database_path, size)
+
+        queue = DispatchQueue()
+        conn = get_db_connection(database_path)
+        started = time.perf_counter()
+        loaded = queue.sync(conn)
+        sync_seconds = time.perf_counter() - started
+        conn.close()
+
+    # Re-key 10% of one department's heap, as re-prioritised tickets would be
+    department = next(iter(DEPARTMENT_ASSIGNERS))
+    heap = queue._heaps[department]
+    sample = [item for _, item in list(heap)[: max(1, len(heap) // 10)]]
+    started = time.perf_counter()
+    for ticket_id in sample:
+        deadline, seq = heap.key_of(ticket_id)
+        heap.push(ticket_id, (deadline - 3600, seq))
+    rekey_seconds = time.perf_counter() - started
+
+    popped = 0
+    in_order = True
+    started = time.perf_counter()
+    for department in queue.departments():
+        last = float("-inf")
+        while True:
+            entry = queue.pop(department)
+            if entry is None:
+                break
+            in_order = in_order and entry[1] >= last
+            last = entry[1]
+            popped += 1
+    pop_seconds = time.perf_counter() - started
+    return {
+        "size": size,
+        "loaded": loaded,
+        "sync_ms": sync_seconds * 1000,
+        "pop_us": pop_seconds / popped * 1e6,
+        "rekey_us": rekey_seconds / len(sample) * 1e6,
+        "in_order": in_order,
+    }
+
+
+def render_report(results: list) -> str:
+    lines = [
+        "# Dispatch queue benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/dispatch_queue_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        "Sync loads every queued ticket from SQLite into the per-department heaps (a cold start); "
+        "later syncs only read entries added since. Pop and re-key are per operation.",
+        "",
+        "| pending tickets | cold sync (ms) | pop (µs/op) | re-key (µs/op) | popped in deadline order |",
+        "|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['size']} | {r['sync_ms']:.0f} | {r['pop_us']:.2f} | {r['rekey_us']:.2f} | {r['in_order']} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "dispatch_queue.md"))
+    args = parser.parse_args()
+
+    report = render_report([run(size) for size in args.sizes])
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
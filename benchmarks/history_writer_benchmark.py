@@ -0,0 +1,145 @@
+"""
+Compares history logging throughput with per-call commits against the
+group-commit HistoryWriter in both durability modes.
+
+Each run copies the city office database to a temporary directory, then
+`--threads` threads each append `--events` notes to existing tickets,
+the way concurrent add_history_log calls would. Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/history_writer_benchmark.py [--threads 32] [--events 100]
+"""
+import argparse
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.history_writer import HistoryWriter  # noqa: E402
+from sub_agents.ticket_management.ticket_events import append_ticket_event  # noqa: E402
+
+
+def _per_call_commit(database_path: str):
+    """The pre-writer behaviour: one connection, one transaction, one fsync per event."""
+    def append(ticket_id: int, message: str):
+        conn = get_db_connection(database_path)
+        try:
+            append_ticket_event(conn, ticket_id, 'note', log_message=message)
+            conn.commit()
+        finally:
+            conn.close()
+    return append, lambda: None
+
+
+def _group_commit(database_path: str, durability: str, flush_interval_ms: float):
+    writer = HistoryWriter(database_path, flush_interval_ms=flush_interval_ms, durability=durability)
+
+    def append(ticket_id: int, message: str):
+        writer.submit(ticket_id, 'note', log_message=message)
+
+    def finish():
+        writer.flush()
+        writer.close()
+    return append, finish
+
+
+def run(strategy: str, threads: int, events: int, flush_interval_ms: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(database.DATABASE_PATH, database_path)
+        conn = get_db_connection(database_path)
+        ticket_ids = [row[0] for row in conn.execute("SELECT id FROM tickets ORDER BY id")]
+        conn.close()
+
+        if strategy == "per-call commit":
+            append, finish = _per_call_commit(database_path)
+        else:
+            append, finish = _group_commit(database_path, strategy, flush_interval_ms)
+
+        latencies = []
+        latencies_lock = threading.Lock()
+
+        def worker(worker_id: int):
+            local = []
+            for i in range(events):
+                started = time.perf_counter()
+                append(ticket_ids[(worker_id + i) % len(ticket_ids)], f"benchmark note {worker_id}/{i}")
+                local.append(time.perf_counter() - started)
+            with latencies_lock:
+                latencies.extend(local)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        finish()
+        elapsed = time.perf_counter() - started
+
+        conn = get_db_connection(database_path)
+        written = conn.execute("SELECT COUNT(*) FROM history WHERE log_message LIKE 'benchmark note %'").fetchone()[0]
+        conn.close()
+
+    latencies.sort()
+    return {
+        "events": written,
+        "seconds": elapsed,
+        "throughput": written / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+    }
+
+
+def render_report(results: dict, args) -> str:
+    lines = [
+        "# History writer benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/history_writer_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.threads} threads x {args.events} notes each, flush interval {args.flush_interval_ms} ms. "
+        "Latency is what the caller of add_history_log waits for; in fire_and_forget mode "
+        "the total time still includes the final flush.",
+        "",
+        "| strategy | events | total (s) | events/s | p50 call (ms) | p99 call (ms) |",
+        "|---|---|---|---|---|---|",
+    ]
+    for strategy, r in results.items():
+        lines.append(
+            f"| {strategy} | {r['events']} | {r['seconds']:.2f} | {r['throughput']:.0f} "
+            f"| {r['p50_ms']:.2f} | {r['p99_ms']:.2f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--flush-interval-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "history_writer.md"))
+    args = parser.parse_args()
+
+    results = {
+        strategy: run(strategy, args.threads, args.events, args.flush_interval_ms)
+        for strategy in ("per-call commit", "wait", "fire_and_forget")
+    }
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
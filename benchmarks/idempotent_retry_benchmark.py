@@ -0,0 +1,153 @@
+"""
+Retries ticket creation and assignment the way A2A clients and the model do,
+and counts the duplicate writes, with and without idempotency keys.
+
+Each run copies the city office database to a temporary directory and adds
+`--technicians` Public Work technicians, available on the work date.
+`--requests` simulated requests each create a ticket and assign it, and
+are sent `--attempts` times: the first attempts concurrently, as a client
+that timed out and retried while the first was still running, the rest one
+after another. Without keys every attempt writes; with them every attempt
+of a request runs under the same request key, as the executor sets it from
+the A2A message id. Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/idempotent_retry_benchmark.py [--requests 40] [--attempts 3] [--technicians 100]
+"""
+import argparse
+import contextvars
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.public_work_department import public_work_technician_assigner as assigner  # noqa: E402
+from sub_agents.ticket_management import database  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.idempotency import begin_request  # noqa: E402
+from sub_agents.ticket_management.ticket_manager import create_ticket  # noqa: E402
+
+DEPARTMENT = "Public Work"
+WORK_DATE = "01-01-2030"
+
+
+def _seed(technicians: int) -> None:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    work_day = datetime.strptime(WORK_DATE, '%d-%m-%Y').strftime('%Y-%m-%d')
+    for i in range(technicians):
+        cursor.execute("INSERT INTO technicians (name, department) VALUES (?, ?)", (f"Bench tech {i}", DEPARTMENT))
+        cursor.execute(
+            "INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+            "VALUES (?, ?, '08:00', '17:00')", (cursor.lastrowid, work_day)
+        )
+    conn.commit()
+    conn.close()
+
+
+def _attempt(request: int, latencies: list, lock: threading.Lock) -> None:
+    started = time.perf_counter()
+    ticket_id = create_ticket(f"Bench request {request}", description="Retried request")
+    if ticket_id is not None:
+        assigner.assign_public_work_ticket(ticket_id, WORK_DATE)
+    with lock:
+        latencies.append(time.perf_counter() - started)
+
+
+def run(name: str, keyed: bool, args, source: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(source, database.DATABASE_PATH)
+        _seed(args.technicians)
+        first, retries = [], []
+        lock = threading.Lock()
+
+        def send(request: int, latencies: list):
+            context = contextvars.copy_context()
+            if keyed:
+                context.run(begin_request, f"bench-message-{request}")
+            return threading.Thread(target=context.run, args=(_attempt, request, latencies, lock))
+
+        started = time.perf_counter()
+        for request in range(args.requests):
+            # The client times out and retries while the first attempt is still running
+            racing = [send(request, first if i == 0 else retries) for i in range(min(2, args.attempts))]
+            for t in racing:
+                t.start()
+            for t in racing:
+                t.join()
+            for _ in range(args.attempts - len(racing)):
+                t = send(request, retries)
+                t.start()
+                t.join()
+        elapsed = time.perf_counter() - started
+
+        conn = get_db_connection()
+        tickets = conn.execute("SELECT COUNT(*) FROM tickets WHERE title LIKE 'Bench request %'").fetchone()[0]
+        held = conn.execute(
+            "SELECT COUNT(*) FROM technicians WHERE name LIKE 'Bench tech %' AND assigned_ticket_id IS NOT NULL"
+        ).fetchone()[0]
+        conn.close()
+
+    return {
+        "name": name,
+        "attempts": args.requests * args.attempts,
+        "tickets": tickets,
+        "technicians": held,
+        "first_ms": statistics.mean(first) * 1000,
+        "retry_ms": statistics.mean(retries) * 1000 if retries else 0.0,
+        "seconds": elapsed,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Idempotent retry benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/idempotent_retry_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.requests} requests that create and assign one ticket each, sent {args.attempts} times "
+        f"(the first two concurrently), with {args.technicians} free technicians.",
+        "",
+        "| setup | attempts | tickets created | technicians consumed | first attempt ms | retry ms | seconds |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | {r['attempts']} | {r['tickets']} | {r['technicians']} | {r['first_ms']:.1f} "
+            f"| {r['retry_ms']:.1f} | {r['seconds']:.2f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--technicians", type=int, default=100)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "idempotent_retry.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    results = [run(name, keyed, args, source) for name, keyed in (
+        ("no idempotency keys (before)", False),
+        ("keys derived from the request", True),
+    )]
+    database.DATABASE_PATH = source
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Compares the latency and cost of per-agent model configurations on a stub backend.
+
+Replays the model calls of a typical citizen request (report an issue, create
+the ticket, assign a technician) through MODEL_CONFIG.apply and ResilientLlm,
+with every configuration profile, against a stub model. The stub waits a
+time-to-first-token plus a per-output-token time that depend on the model,
+and reports usage from the prompt size and the capped answer length. Cost
+uses list prices per million tokens. Waits are scaled by --time-scale and
+scaled back in the report. Writes a Markdown report.
+
+The stub latencies and prices in MODEL_PROFILES are assumptions, not
+measurements; edit them to match current figures.
+
+Usage (from the repository root):
+    python benchmarks/model_tiering_benchmark.py [--requests 20] [--time-scale 0.05]
+"""
+import argparse
+import asyncio
+import os
+import platform
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_request import LlmRequest  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.genai import types  # noqa: E402
+
+from shared_libraries import prompts  # noqa: E402
+from shared_libraries.model_config import AGENT_MODELS, FULL_MODEL, LITE_MODEL, ModelTiering  # noqa: E402
+from shared_libraries.resilient_llm import ResilienceConfig, ResilientLlm  # noqa: E402
+
+# model -> (time to first token s, output tokens per second, $ per 1M input tokens, $ per 1M output tokens)
+MODEL_PROFILES = {
+    FULL_MODEL: (0.45, 200.0, 0.10, 0.40),
+    LITE_MODEL: (0.30, 250.0, 0.075, 0.30),
+}
+
+INSTRUCTIONS = {
+    "AGENT_ASSIST": prompts.OFFICE_SIDE_AGENT_PROMPT,
+    "TICKET_MANAGEMENT_AGENT": prompts.TICKET_MANAGEMENT_AGENT_PROMPT,
+    "PUBLIC_WORK_AGENT": prompts.PUBLIC_WORK_AGENT_PROMPT,
+}
+# Tool declarations sent with each call, in tokens (rough sizes of the FunctionTool schemas).
+TOOL_TOKENS = {"AGENT_ASSIST": 600, "TICKET_MANAGEMENT_AGENT": 1400, "PUBLIC_WORK_AGENT": 120}
+
+# The model calls of one request: (agent, output tokens the model would like to write).
+WORKLOAD = (
+    ("AGENT_ASSIST", 40),              # route to the ticket agent
+    ("TICKET_MANAGEMENT_AGENT", 60),   # call create_ticket
+    ("TICKET_MANAGEMENT_AGENT", 120),  # confirm the ticket
+    ("AGENT_ASSIST", 40),              # route to the department
+    ("PUBLIC_WORK_AGENT", 40),         # call assign_public_work_ticket
+    ("PUBLIC_WORK_AGENT", 300),        # describe the assignment
+    ("AGENT_ASSIST", 250),             # final reply to the citizen
+)
+
+PROFILES = {
+    "uniform full model (before)": {name: replace(AGENT_MODELS[name], model=FULL_MODEL, temperature=None,
+                                                  max_output_tokens=None) for name in AGENT_MODELS},
+    "tiered (default AGENT_MODELS)": AGENT_MODELS,
+    "all lite": {name: replace(config, model=LITE_MODEL) for name, config in AGENT_MODELS.items()},
+}
+
+
+class StubBackend(BaseLlm):
+    """Waits and reports usage like the profiled model would; answers with filler text."""
+
+    agent_name: str
+    time_scale: float = 0.05
+    desired_tokens: int = 100
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        ttft, tokens_per_second, _, _ = MODEL_PROFILES[llm_request.model]
+        limit = llm_request.config.max_output_tokens
+        output_tokens = min(self.desired_tokens, limit) if limit else self.desired_tokens
+        prompt_chars = len(llm_request.config.system_instruction or "") + sum(
+            len(part.text or "") for content in llm_request.contents for part in content.parts or [])
+        await asyncio.sleep((ttft + output_tokens / tokens_per_second) * self.time_scale)
+        yield LlmResponse(
+            content=types.ModelContent(parts=[types.Part(text="ok " * output_tokens)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4 + TOOL_TOKENS[self.agent_name],
+                candidates_token_count=output_tokens,
+            ),
+        )
+
+
+async def run_profile(name: str, defaults: dict, requests: int, time_scale: float) -> dict:
+    tiering = ModelTiering(defaults)
+    resilience = ResilienceConfig(attempt_timeout=60, deadline=120)
+    totals = {"seconds": 0.0, "prompt": 0, "output": 0, "cost": 0.0}
+    for _ in range(requests):
+        history = [types.Content(role="user", parts=[types.Part(text="There is a big pothole on 5th street, South.")])]
+        for agent_name, desired in WORKLOAD:
+            stub = StubBackend(model="stub", agent_name=agent_name, time_scale=time_scale, desired_tokens=desired)
+            model = ResilientLlm(model=FULL_MODEL, inner=stub, config=resilience)
+            request = LlmRequest(model=FULL_MODEL, contents=list(history), config=types.GenerateContentConfig(
+                system_instruction=INSTRUCTIONS[agent_name]))
+            tiering.apply(SimpleNamespace(agent_name=agent_name), request)
+            started = time.perf_counter()
+            async for response in model.generate_content_async(request):
+                usage = response.usage_metadata
+                history.append(response.content)
+            totals["seconds"] += (time.perf_counter() - started) / time_scale
+            _, _, input_price, output_price = MODEL_PROFILES[request.model]
+            totals["prompt"] += usage.prompt_token_count
+            totals["output"] += usage.candidates_token_count
+            totals["cost"] += (usage.prompt_token_count * input_price
+                               + usage.candidates_token_count * output_price) / 1_000_000
+    return {
+        "profile": name,
+        "seconds": totals["seconds"] / requests,
+        "prompt": totals["prompt"] / requests,
+        "output": totals["output"] / requests,
+        "cost_per_1000": totals["cost"] / requests * 1000,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Model tiering benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/model_tiering_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.requests} simulated requests of {len(WORKLOAD)} sequential model calls each, on a stub backend. "
+        "Stub model profiles (time to first token, tokens/s, $/1M in, $/1M out): "
+        + "; ".join(f"`{model}` {p[0]}s, {p[1]:.0f}, {p[2]}, {p[3]}" for model, p in MODEL_PROFILES.items()) + ".",
+        "",
+        "| profile | model time per request (s) | prompt tokens | output tokens | $ per 1000 requests |",
+        "|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['profile']} | {r['seconds']:.2f} | {r['prompt']:.0f} | {r['output']:.0f} "
+            f"| {r['cost_per_1000']:.3f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "model_tiering.md"))
+    args = parser.parse_args()
+
+    async def run_all():
+        return [await run_profile(name, defaults, args.requests, args.time_scale)
+                for name, defaults in PROFILES.items()]
+
+    results = asyncio.run(run_all())
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
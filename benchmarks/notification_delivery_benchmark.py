@@ -0,0 +1,220 @@
+"""
+Delivers ticket change notifications to a local HTTP receiver and reports
+latency, batching and retries, next to what polling would cost.
+
+Each scenario copies the city office database to a temporary directory,
+subscribes a webhook on a local receiver to every ticket and starts a
+NotificationDispatcher. `--threads` threads then change ticket statuses
+through append_ticket_event, `--events` each. The receiver records when each
+notification arrives; it can answer 503 for its first requests or not listen
+at all. Retry delays are scaled down so the run takes seconds. Writes a
+Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/notification_delivery_benchmark.py [--threads 8] [--events 50]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database, notifications  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.notifications import NotificationDispatcher, add_subscription  # noqa: E402
+from sub_agents.ticket_management.ticket_events import append_ticket_event  # noqa: E402
+
+TOKEN = "benchmark-token"
+STATUSES = ("In Progress", "On Hold", "Open")
+# name, requests the receiver answers with 503 first, receiver listening
+SCENARIOS = (
+    ("healthy receiver", 0, True),
+    ("first 5 requests get 503", 5, True),
+    ("receiver down", 0, False),
+)
+
+
+class Receiver:
+    """A local webhook that records each notification's arrival time."""
+
+    def __init__(self, fail_first: int):
+        self.fail_first = fail_first
+        self.requests = 0
+        self.rejected = 0
+        self.bad_tokens = 0
+        self.arrivals: dict[int, float] = {}
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with receiver.lock:
+                    receiver.requests += 1
+                    if receiver.requests <= receiver.fail_first:
+                        receiver.rejected += 1
+                        self.send_response(503)
+                        self.end_headers()
+                        return
+                    if self.headers.get(notifications.TOKEN_HEADER) != TOKEN:
+                        receiver.bad_tokens += 1
+                    now = time.perf_counter()
+                    for notification in json.loads(body)["notifications"]:
+                        receiver.arrivals.setdefault(notification["event_id"], now)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/ticket-events"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _unused_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}/ticket-events"
+
+
+def run(name: str, fail_first: int, listening: bool, threads: int, events: int, source: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp, Receiver(fail_first) as receiver:
+        database.DATABASE_PATH = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(source, database.DATABASE_PATH)
+        url = receiver.url if listening else _unused_url()
+        conn = get_db_connection()
+        ticket_ids = [row[0] for row in conn.execute("SELECT id FROM tickets ORDER BY id")]
+        add_subscription(conn, url, TOKEN)
+        conn.commit()
+        conn.close()
+
+        committed: dict[int, float] = {}
+        committed_lock = threading.Lock()
+
+        def worker(worker_id: int):
+            conn = get_db_connection()
+            try:
+                for i in range(events):
+                    ticket_id = ticket_ids[(worker_id * events + i) % len(ticket_ids)]
+                    event_id = append_ticket_event(conn, ticket_id, 'status_changed', status=STATUSES[i % 3])
+                    conn.commit()
+                    with committed_lock:
+                        committed[event_id] = time.perf_counter()
+            finally:
+                conn.close()
+
+        dispatcher = NotificationDispatcher(interval_seconds=0.5)
+        notifications.NOTIFICATION_DISPATCHER = dispatcher
+        dispatcher.start()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        expected = threads * events
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            conn = get_db_connection()
+            pending = conn.execute("SELECT COUNT(*) FROM notification_outbox WHERE status = 'pending'").fetchone()[0]
+            conn.close()
+            if pending == 0:
+                break
+            time.sleep(0.1)
+        dispatcher.stop()
+
+        conn = get_db_connection()
+        failed, attempts = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(attempts), 0) FROM notification_outbox WHERE status = 'failed'"
+        ).fetchone()
+        conn.close()
+        latencies = [receiver.arrivals[e] - committed[e] for e in committed if e in receiver.arrivals]
+        return {
+            "name": name,
+            "changes": expected,
+            "tickets": len({ticket_ids[i % len(ticket_ids)] for i in range(expected)}),
+            "delivered": len(latencies),
+            "failed": failed,
+            "failed_attempts": attempts,
+            "requests": receiver.requests,
+            "rejected": receiver.rejected,
+            "bad_tokens": receiver.bad_tokens,
+            "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+            "p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else 0.0,
+        }
+
+
+def render_report(results: list, args) -> str:
+    healthy = results[0]
+    lines = [
+        "# Ticket notification delivery benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/notification_delivery_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.threads} threads x {args.events} committed status changes, one subscription to every ticket, "
+        f"batch window {notifications.NOTIFY_BATCH_WINDOW_SECONDS}s, up to {notifications.NOTIFY_MAX_PER_REQUEST} "
+        f"notifications per request, {notifications.NOTIFY_MAX_ATTEMPTS} attempts, retry base "
+        f"{notifications.NOTIFY_RETRY_BASE_SECONDS}s (scaled down).",
+        "",
+        "| scenario | changes | delivered | failed (attempts) | HTTP requests | 503s | wrong token "
+        "| commit-to-receipt mean ms | p95 ms |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | {r['changes']} | {r['delivered']} | {r['failed']} ({r['failed_attempts']}) "
+            f"| {r['requests']} | {r['rejected']} | {r['bad_tokens']} | {r['mean_ms']:.0f} | {r['p95_ms']:.0f} |"
+        )
+    lines.append("")
+    for interval in (5, 30):
+        lines.append(
+            f"Polling the {healthy['tickets']} changed tickets every {interval}s instead costs "
+            f"{healthy['tickets'] * 3600 // interval} requests per hour whether or not they change, "
+            f"and sees a change {interval / 2:.1f}s late on average."
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "notification_delivery.md"))
+    args = parser.parse_args()
+
+    notifications.NOTIFY_RETRY_BASE_SECONDS = 0.05
+    notifications.NOTIFY_RETRY_MAX_SECONDS = 0.5
+    notifications.NOTIFY_MAX_ATTEMPTS = 5
+    # The receiver listens on loopback.
+    notifications.WEBHOOK_ALLOW_PRIVATE = True
+    source = database.DATABASE_PATH
+    results = [run(*scenario, args.threads, args.events, source) for scenario in SCENARIOS]
+    database.DATABASE_PATH = source
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
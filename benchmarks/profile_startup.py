@@ -0,0 +1,156 @@
+"""
+Measures cold-start cost of the officer agent server.
+
+Reports the import-time profile of the server module (via `python -X importtime`)
+and, for each STARTUP_MODE, how long a fresh process takes to serve the agent
+card and to finish building the agent graph. Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/profile_startup.py [--output benchmarks/reports/startup_profile.md]
+"""
+import argparse
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SERVER_MODULE = (
+    "import importlib.util; "
+    "spec = importlib.util.spec_from_file_location('officer_app', '__main__.py'); "
+    "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)"
+)
+IMPORT_AGENT_GRAPH = "import adk_executor, adk_agent; adk_agent.create_agent()"
+PROFILE_MARKER = "profile-startup: measure from here"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env(**overrides) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "profile-startup-placeholder")
+    env.update(overrides)
+    return env
+
+
+def import_profile(code: str, setup: str = "") -> tuple[float, list[tuple[str, float]]]:
+    """Returns total import seconds for `code` (after `setup`) and self seconds per package."""
+    program = f"{setup}\nimport sys; print({PROFILE_MARKER!r}, file=sys.stderr)\n{code}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", program],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    per_package = defaultdict(float)
+    total_us = 0
+    stderr = result.stderr.split(PROFILE_MARKER, 1)[1]
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if len(indent) == 1:
+            # Top-level cumulative times already include their children.
+            total_us += int(cumulative_us)
+        # Attribute self time to the owning distribution, e.g. google.adk or pydantic.
+        root = name.split(".")[0]
+        if root == "google":
+            root = ".".join(name.split(".")[:2])
+        per_package[root] += int(self_us) / 1e6
+    ranked = sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+    return total_us / 1e6, ranked
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_startup(mode: str, timeout: float = 120.0) -> tuple[float, float]:
+    """Starts the server in `mode`; returns seconds to agent card and to agent graph ready."""
+    port = _free_port()
+    card_url = f"http://127.0.0.1:{port}/.well-known/agent.json"
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = _env(
+            PORT=str(port), HOST="127.0.0.1", SERVER_MODE="development",
+            STARTUP_MODE=mode, STATE_DIR=state_dir, ARTIFACT_STORE_DIR=state_dir,
+        )
+        log_path = os.path.join(state_dir, "server.log")
+        with open(log_path, "w") as log:
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "__main__.py"], cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+        card_seconds = graph_seconds = float("nan")
+        try:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited early in {mode} mode; see {log_path}")
+                if card_seconds != card_seconds:
+                    try:
+                        with urllib.request.urlopen(card_url, timeout=1) as response:
+                            if response.status == 200:
+                                card_seconds = time.perf_counter() - started
+                    except OSError:
+                        pass
+                with open(log_path) as log:
+                    if "Agent graph ready" in log.read():
+                        graph_seconds = time.perf_counter() - started
+                if card_seconds == card_seconds and (graph_seconds == graph_seconds or mode == "lazy"):
+                    break
+                time.sleep(0.02)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return card_seconds, graph_seconds
+
+
+def render_report(server_import, agent_import, startup) -> str:
+    lines = [
+        "# Startup profile",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/profile_startup.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        "Re-run it after changing imports in `__main__.py`, `adk_executor.py` or the sub-agent packages.",
+        "",
+        "## Time to serve the agent card",
+        "",
+        "| STARTUP_MODE | agent card served (s) | agent graph ready (s) |",
+        "|---|---|---|",
+    ]
+    for mode, (card_seconds, graph_seconds) in startup.items():
+        graph = "on first request" if graph_seconds != graph_seconds else f"{graph_seconds:.2f}"
+        lines.append(f"| {mode} | {card_seconds:.2f} | {graph} |")
+    for title, (total, ranked) in (
+        ("Import profile: server module (`__main__.py`)", server_import),
+        ("Import profile: deferred agent graph (`adk_executor`, `create_agent()`)", agent_import),
+    ):
+        lines += ["", f"## {title}", "", f"Total: {total:.2f}s", "", "| package | self time (s) |", "|---|---|"]
+        lines += [f"| `{name}` | {seconds:.3f} |" for name, seconds in ranked[:12]]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "startup_profile.md"))
+    args = parser.parse_args()
+
+    server_import = import_profile(IMPORT_SERVER_MODULE)
+    agent_import = import_profile(IMPORT_AGENT_GRAPH, setup=IMPORT_SERVER_MODULE)
+    startup = {mode: server_startup(mode) for mode in ("eager", "warm", "lazy")}
+
+    report = render_report(server_import, agent_import, startup)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
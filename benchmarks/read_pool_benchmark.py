@@ -0,0 +1,176 @@
+"""
+Measures ticket lookup latency while a sustained write load runs, with and
+without the read-only connection pool.
+
+Each run copies the city office database to a temporary directory. `--writers`
+threads keep committing batches of status changes through
+append_ticket_event, the way the history writer and the dispatcher do, while
+`--readers` threads call fetch_ticket_by_id for `--seconds`. Three setups are
+compared:
+
+- rollback journal, a new read-write connection per lookup (the old path)
+- WAL, a new read-write connection per lookup
+- WAL, pooled read-only snapshot connections (read_connection)
+
+Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/read_pool_benchmark.py [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database, ticket_manager  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.ticket_events import append_ticket_event  # noqa: E402
+
+STATUSES = ("In Progress", "On Hold", "Open")
+# Events per write transaction, like one history writer flush.
+WRITE_BATCH = 20
+
+
+@contextmanager
+def _read_write_connection(database_path=None):
+    """The old read path: a fresh read-write connection per lookup."""
+    conn = get_db_connection(database_path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+SETUPS = (
+    ("rollback journal, connection per read (before)", "delete", _read_write_connection),
+    ("WAL, connection per read", "wal", _read_write_connection),
+    ("WAL, read-only pool", "wal", database.read_connection),
+)
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(name: str, journal_mode: str, reader, args, source: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "city_office.db")
+        database.DATABASE_JOURNAL_MODE = journal_mode
+        shutil.copyfile(source, database.DATABASE_PATH)
+        ticket_manager.read_connection = reader
+        conn = get_db_connection()
+        ticket_ids = [row[0] for row in conn.execute("SELECT id FROM tickets ORDER BY id")]
+        conn.close()
+
+        stop = threading.Event()
+        latencies: list[float] = []
+        errors = [0]
+        writes = [0]
+        lock = threading.Lock()
+
+        def write_load(worker_id: int):
+            conn = get_db_connection()
+            i = 0
+            try:
+                while not stop.is_set():
+                    try:
+                        for _ in range(WRITE_BATCH):
+                            append_ticket_event(conn, ticket_ids[i % len(ticket_ids)], 'status_changed',
+                                                status=STATUSES[(i + worker_id) % 3])
+                            i += 1
+                        conn.commit()
+                        with lock:
+                            writes[0] += WRITE_BATCH
+                    except Exception:
+                        conn.rollback()
+            finally:
+                conn.close()
+
+        def read_load(worker_id: int):
+            local = []
+            i = worker_id
+            while not stop.is_set():
+                started = time.perf_counter()
+                result = ticket_manager.fetch_ticket_by_id(ticket_ids[i % len(ticket_ids)])
+                local.append(time.perf_counter() - started)
+                if result is None:
+                    with lock:
+                        errors[0] += 1
+                i += 1
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=write_load, args=(i,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=read_load, args=(i,)) for i in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    return {
+        "name": name,
+        "reads_per_second": len(latencies) / args.seconds,
+        "writes_per_second": writes[0] / args.seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "errors": errors[0],
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Read connection pool benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/read_pool_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.readers} threads calling fetch_ticket_by_id while {args.writers} threads commit status changes "
+        f"in batches of {WRITE_BATCH}, for {args.seconds}s per setup.",
+        "",
+        "| setup | lookups/s | events written/s | p50 ms | p95 ms | p99 ms | max ms | failed lookups |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | {r['reads_per_second']:.0f} | {r['writes_per_second']:.0f} | {r['p50_ms']:.2f} "
+            f"| {r['p95_ms']:.2f} | {r['p99_ms']:.2f} | {r['max_ms']:.1f} | {r['errors']} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "read_pool.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    original = (database.DATABASE_JOURNAL_MODE, ticket_manager.read_connection)
+    results = [run(*setup, args, source) for setup in SETUPS]
+    database.DATABASE_PATH = source
+    database.DATABASE_JOURNAL_MODE, ticket_manager.read_connection = original
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
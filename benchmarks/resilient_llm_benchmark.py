@@ -0,0 +1,125 @@
+"""
+Runs ResilientLlm against FakeLlm fault scripts and reports how each call ends.
+
+Each scenario gets a fresh circuit breaker and a fake model following a
+script (see shared_libraries/fake_llm.py), then makes `--calls` model calls
+and records the outcome, the number of requests the fake model received and
+the latency. Timeouts are scaled down so the whole run takes seconds.
+Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/resilient_llm_benchmark.py [--calls 5]
+"""
+import argparse
+import asyncio
+import os
+import platform
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from google.adk.models.llm_request import LlmRequest  # noqa: E402
+from google.genai import errors, types  # noqa: E402
+
+from shared_libraries import resilient_llm  # noqa: E402
+from shared_libraries.fake_llm import FakeLlm  # noqa: E402
+from shared_libraries.resilient_llm import ModelUnavailableError, ResilienceConfig, ResilientLlm  # noqa: E402
+
+CONFIG = ResilienceConfig(
+    attempt_timeout=0.5, deadline=2.0, max_attempts=3, retry_base=0.05, retry_max=0.2,
+    hedge_after=0.0, breaker_failures=2, breaker_reset=60.0,
+)
+
+# name, fake model script, hedge, streaming, config overrides
+SCENARIOS = (
+    ("healthy", ["ok"], False, False, {}),
+    ("one 503 per call", ["error:503", "ok"], False, False, {}),
+    ("one 429 per call", ["error:429", "ok"], False, False, {}),
+    ("hang then ok", ["hang", "ok"], False, False, {}),
+    ("slow tail, no hedging", ["slow:1.0", "ok"], False, False, {}),
+    ("slow tail, hedged after 0.1s", ["slow:1.0", "ok"], True, False, {"hedge_after": 0.1}),
+    ("failure mid-stream", ["midstream:503"], False, True, {}),
+    ("invalid request (400)", ["error:400"], False, False, {}),
+    ("outage (503), breaker opens", ["error:503"], False, False, {}),
+)
+
+
+async def _call(model: ResilientLlm, streaming: bool) -> str:
+    request = LlmRequest(
+        model=model.model, contents=[types.Content(role="user", parts=[types.Part(text="Pothole on 5th street")])],
+    )
+    try:
+        async for _ in model.generate_content_async(request, stream=streaming):
+            pass
+        return "ok"
+    except ModelUnavailableError as e:
+        return "refused (circuit open)" if "circuit open" in str(e) else "unavailable"
+    except errors.APIError as e:
+        return f"raised {e.code}"
+
+
+async def run_scenario(name, script, hedge, streaming, overrides, calls: int) -> dict:
+    resilient_llm.CIRCUIT_BREAKERS.clear()
+    fake = FakeLlm(model="fake-model", script=script)
+    model = ResilientLlm(model="fake-model", inner=fake, hedge=hedge, config=replace(CONFIG, **overrides))
+    outcomes = []
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        outcomes.append(await _call(model, streaming))
+        latencies.append(time.perf_counter() - started)
+    return {
+        "name": name,
+        "script": ",".join(script),
+        "outcomes": ", ".join(f"{outcome} x{outcomes.count(outcome)}" for outcome in dict.fromkeys(outcomes)),
+        "requests": fake.calls,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "circuit": resilient_llm.CIRCUIT_BREAKERS["fake-model"].state,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Resilient model call benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/resilient_llm_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.calls} sequential calls per scenario against FakeLlm. Attempt timeout {CONFIG.attempt_timeout}s, "
+        f"deadline {CONFIG.deadline}s, {CONFIG.max_attempts} attempts, breaker opens after "
+        f"{CONFIG.breaker_failures} failed calls.",
+        "",
+        "| scenario | fake script | outcomes | model requests | mean ms | max ms | circuit after |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | `{r['script']}` | {r['outcomes']} | {r['requests']} | {r['mean_ms']:.0f} "
+            f"| {r['max_ms']:.0f} | {r['circuit']} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "resilient_llm.md"))
+    args = parser.parse_args()
+
+    async def run_all():
+        return [await run_scenario(*scenario, args.calls) for scenario in SCENARIOS]
+
+    results = asyncio.run(run_all())
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Times the daily route planner on one department with thousands of open tickets.
+
+Fills a copy of the city office database with `--tickets` located open
+tickets scattered over the gazetteer and `--technicians` Public Work
+technicians available on the plan date. Then times plan_department for
+several per-job service times; shorter jobs mean more stops per route.
+Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/route_planner_benchmark.py [--tickets 5000] [--technicians 25]
+"""
+import argparse
+import csv
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database, route_planner  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from shared_libraries.gazetteer import GAZETTEER, GAZETTEER_PATH  # noqa: E402
+
+DEPARTMENT = "Public Work"
+PLAN_DATE = date(2030, 1, 15)
+
+
+def _fill(database_path: str, tickets: int, technicians: int) -> None:
+    rng = random.Random(tickets)
+    with open(GAZETTEER_PATH, newline='') as f:
+        places = [(float(r['latitude']), float(r['longitude'])) for r in csv.DictReader(f)]
+    conn = get_db_connection(database_path)
+    rows = []
+    for i in range(tickets):
+        lat, lon = rng.choice(places)
+        # Jitter up to ~300 m so tickets are not stacked on gazetteer points
+        lat, lon = lat + rng.uniform(-0.0027, 0.0027), lon + rng.uniform(-0.0035, 0.0035)
+        rows.append((f"benchmark ticket {i}", rng.choice((1, 2, 3, 3, 4)), DEPARTMENT, lat, lon))
+    conn.executemany(
+        "INSERT INTO tickets (title, priority, department, latitude, longitude) VALUES (?, ?, ?, ?, ?)", rows,
+    )
+    for i in range(technicians):
+        cursor = conn.execute("INSERT INTO technicians (name, department) VALUES (?, ?)", (f"bench tech {i}", DEPARTMENT))
+        conn.execute(
+            "INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) VALUES (?, ?, ?, ?)",
+            (cursor.lastrowid, PLAN_DATE.isoformat(), "08:00", "17:00"),
+        )
+    conn.commit()
+    conn.close()
+
+
+def run(database_path: str, service_minutes: float) -> dict:
+    route_planner.SERVICE_MINUTES = service_minutes
+    depot_place = GAZETTEER.geocode(route_planner.DEPOT_ADDRESS)
+    conn = get_db_connection(database_path)
+    started = time.perf_counter()
+    plan = route_planner.plan_department(conn, DEPARTMENT, PLAN_DATE, (depot_place.latitude, depot_place.longitude))
+    seconds = time.perf_counter() - started
+    conn.close()
+    stops = [len(s) for s in plan['routes'].values()]
+    meters = sum(stop['leg_meters'] for route in plan['routes'].values() for stop in route)
+    return {
+        "service_minutes": service_minutes,
+        "routed": sum(stops) + len(plan['unplanned']),
+        "planned": sum(stops),
+        "max_stops": max(stops) if stops else 0,
+        "km_per_stop": meters / 1000 / max(1, sum(stops)),
+        "seconds": seconds,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Route planner benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/route_planner_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.tickets} open located tickets and {args.technicians} technicians (08:00-17:00) in one department. "
+        "Only the most urgent tickets that could fit in the shifts are routed.",
+        "",
+        "| service min/job | tickets routed | stops planned | max stops/route | km per stop | plan time (s) |",
+        "|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['service_minutes']:.0f} | {r['routed']} | {r['planned']} | {r['max_stops']} "
+            f"| {r['km_per_stop']:.2f} | {r['seconds']:.2f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--technicians", type=int, default=25)
+    parser.add_argument("--service-minutes", type=float, nargs="+", default=[30, 10, 5])
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "route_planner.md"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_path = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(database.DATABASE_PATH, database_path)
+        _fill(database_path, args.tickets, args.technicians)
+        results = [run(database_path, minutes) for minutes in args.service_minutes]
+
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
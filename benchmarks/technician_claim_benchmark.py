@@ -0,0 +1,195 @@
+"""
+Races parallel dispatchers for the same technicians and counts lost assignments.
+
+Each run copies the city office database to a temporary directory and adds
+`--technicians` free Public Work technicians, available on the work date,
+and twice as many open tickets. `--dispatchers` threads then take tickets
+from a shared list and assign each to a free technician, either the old way
+(assign the first listed technician with an unconditional UPDATE) or with
+assign_first_available's compare-and-set claims. A lost assignment is one
+that was reported as done but that the database no longer holds: the
+technician's assigned_ticket_id names another ticket. Writes a Markdown
+report.
+
+Usage (from the repository root):
+    python benchmarks/technician_claim_benchmark.py [--dispatchers 16] [--technicians 100]
+"""
+import argparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.public_work_department import public_work_technician_assigner as assigner  # noqa: E402
+from sub_agents.ticket_management import database, technician_claims  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+from sub_agents.ticket_management.ticket_events import append_ticket_event  # noqa: E402
+
+DEPARTMENT = "Public Work"
+WORK_DATE = "01-01-2030"
+
+
+def _seed(technicians: int) -> list[int]:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    work_day = datetime.strptime(WORK_DATE, '%d-%m-%Y').strftime('%Y-%m-%d')
+    for i in range(technicians):
+        cursor.execute("INSERT INTO technicians (name, department) VALUES (?, ?)", (f"Bench tech {i}", DEPARTMENT))
+        cursor.execute(
+            "INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+            "VALUES (?, ?, '08:00', '17:00')", (cursor.lastrowid, work_day)
+        )
+    ticket_ids = []
+    for i in range(technicians * 2):
+        cursor.execute("INSERT INTO tickets (title) VALUES (?)", (f"Bench ticket {i}",))
+        ticket_ids.append(cursor.lastrowid)
+        append_ticket_event(conn, cursor.lastrowid, 'created', status='Open')
+    conn.commit()
+    conn.close()
+    return ticket_ids
+
+
+def _assign_unconditionally(ticket_id: int, outcomes: Counter) -> bool:
+    """The old assigner: the first listed technician, overwritten without a condition."""
+    candidates = assigner.get_available_technicians(DEPARTMENT, WORK_DATE)
+    if not candidates:
+        outcomes[technician_claims.NO_TECHNICIAN] += 1
+        return False
+    conn = get_db_connection()
+    try:
+        technician_id = candidates[0]['id']
+        conn.execute("UPDATE technicians SET assigned_ticket_id = ?, assigned_work_date = ? WHERE id = ?",
+                     (ticket_id, WORK_DATE, technician_id))
+        append_ticket_event(conn, ticket_id, 'assigned', assigned_technician_id=technician_id,
+                            assigned_work_date=WORK_DATE)
+        conn.commit()
+    finally:
+        conn.close()
+    outcomes[technician_claims.CLAIMED] += 1
+    return True
+
+
+def _assign_with_claims(ticket_id: int, outcomes: Counter) -> bool:
+    outcome, _ = technician_claims.assign_first_available(
+        ticket_id, DEPARTMENT, WORK_DATE, assigner.get_available_technicians
+    )
+    outcomes[outcome] += 1
+    return outcome == technician_claims.CLAIMED
+
+
+STRATEGIES = (
+    ("unconditional update, first listed technician (before)", _assign_unconditionally),
+    ("compare-and-set claim, next candidate on conflict", _assign_with_claims),
+)
+
+
+def run(name: str, assign, args, source: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_PATH = os.path.join(tmp, "city_office.db")
+        shutil.copyfile(source, database.DATABASE_PATH)
+        ticket_ids = _seed(args.technicians)
+
+        pending = list(reversed(ticket_ids))
+        reported: list[int] = []
+        outcomes: Counter = Counter()
+        claim_outcomes: Counter = Counter()
+        lock = threading.Lock()
+        claim_technician = technician_claims.claim_technician
+
+        def counted_claim(*claim_args, **kwargs):
+            outcome = claim_technician(*claim_args, **kwargs)
+            with lock:
+                claim_outcomes[outcome] += 1
+            return outcome
+
+        technician_claims.claim_technician = counted_claim
+
+        def dispatcher():
+            local = Counter()
+            while True:
+                with lock:
+                    if not pending:
+                        break
+                    ticket_id = pending.pop()
+                if assign(ticket_id, local):
+                    with lock:
+                        reported.append(ticket_id)
+            with lock:
+                outcomes.update(local)
+
+        threads = [threading.Thread(target=dispatcher) for _ in range(args.dispatchers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        technician_claims.claim_technician = claim_technician
+
+        conn = get_db_connection()
+        held = {row[0] for row in conn.execute(
+            "SELECT assigned_ticket_id FROM technicians WHERE name LIKE 'Bench tech %' AND assigned_ticket_id IS NOT NULL"
+        )}
+        conn.close()
+
+    return {
+        "name": name,
+        "tickets": len(ticket_ids),
+        "reported": len(reported),
+        "held": len(held),
+        "lost": sum(1 for ticket_id in reported if ticket_id not in held),
+        "queued": outcomes[technician_claims.NO_TECHNICIAN],
+        "conflicts": claim_outcomes[technician_claims.TECHNICIAN_TAKEN],
+        "seconds": elapsed,
+        "assignments_per_second": len(reported) / elapsed,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Technician claim contention benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/technician_claim_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.dispatchers} parallel dispatchers assign {args.technicians * 2} tickets to {args.technicians} "
+        "free technicians; at most one ticket per technician can be assigned.",
+        "",
+        "| strategy | assignments reported | held by a technician | lost | left for the queue "
+        "| claim conflicts retried | seconds | assignments/s |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | {r['reported']} | {r['held']} | {r['lost']} | {r['queued']} | {r['conflicts']} "
+            f"| {r['seconds']:.2f} | {r['assignments_per_second']:.0f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dispatchers", type=int, default=16)
+    parser.add_argument("--technicians", type=int, default=100)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "technician_claim.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    results = [run(name, assign, args, source) for name, assign in STRATEGIES]
+    database.DATABASE_PATH = source
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Serves ticket lookups for many tenants from one process and measures read
+latency and open file descriptors, with and without a cap on open read pools.
+
+Each run copies the city office database to `--tenants` tenant databases in
+a temporary directory. `--reads` lookups then pick a tenant with a skewed
+(Zipf-like) popularity, as a few large cities and many small ones would,
+and read one ticket through read_connection() under that tenant. The pool
+cache keeps every tenant's pool open, or at most `--max-open` pools (LRU).
+Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/tenant_pool_benchmark.py [--tenants 200] [--reads 20000] [--max-open 16 64]
+"""
+import argparse
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database  # noqa: E402
+from sub_agents.ticket_management.database import READ_POOLS, read_connection, use_tenant  # noqa: E402
+
+
+def _open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def run(name: str, max_open: int, args) -> dict:
+    READ_POOLS.close_all()
+    READ_POOLS.max_open = max_open
+    READ_POOLS.idle_seconds = float("inf")
+    tenants = [f"city-{i:04d}" for i in range(args.tenants)]
+    rng = random.Random(3)
+    weights = [1 / (rank + 1) for rank in range(args.tenants)]
+    picks = rng.choices(tenants, weights, k=args.reads)
+    baseline = _open_fds()
+    peak = baseline
+    latencies = []
+    opened = 0
+    started = time.perf_counter()
+    for i, tenant in enumerate(picks):
+        began = time.perf_counter()
+        with use_tenant(tenant):
+            if READ_POOLS.get(database.current_database_path()) is None:
+                opened += 1
+            with read_connection() as conn:
+                conn.execute("SELECT * FROM tickets WHERE id = ?", (1 + i % 6,)).fetchone()
+        latencies.append(time.perf_counter() - began)
+        if i % 100 == 0:
+            peak = max(peak, _open_fds())
+    elapsed = time.perf_counter() - started
+    peak = max(peak, _open_fds())
+    READ_POOLS.close_all()
+    return {
+        "name": name,
+        "pools_opened": opened,
+        "fds": peak - baseline,
+        "mean_us": statistics.mean(latencies) * 1e6,
+        "p95_us": statistics.quantiles(latencies, n=20)[-1] * 1e6,
+        "reads_per_s": args.reads / elapsed,
+    }
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Tenant read pool benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/tenant_pool_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"{args.reads} single-ticket reads over {args.tenants} tenant databases, tenants picked with "
+        f"Zipf-like popularity.",
+        "",
+        "| read pools | pools opened | peak extra file descriptors | mean µs | p95 µs | reads/s |",
+        "|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['name']} | {r['pools_opened']} | {r['fds']} | {r['mean_us']:.0f} | {r['p95_us']:.0f} "
+            f"| {r['reads_per_s']:.0f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--max-open", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "tenant_pool.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.TENANT_DATABASE_DIR = tmp
+        for i in range(args.tenants):
+            shutil.copyfile(source, os.path.join(tmp, f"city-{i:04d}.db"))
+            # Migrate up front, so the runs only measure opening pools
+            database.get_db_connection(os.path.join(tmp, f"city-{i:04d}.db")).close()
+        results = [run("unbounded, one per tenant", args.tenants + 1, args)]
+        results += [run(f"LRU of {n}", n, args) for n in args.max_open]
+    database.TENANT_DATABASE_DIR = ""
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Compares the size of fetch_ticket_by_id results that end up in the model context.
+
+Fills a copy of the city office database with assigned tickets whose
+histories hold `--history` events each (status changes, reassignments and
+technician notes of realistic length). Then fetches each ticket in full,
+with a field projection, with only the latest events, and in summary mode,
+and reports the JSON size, an approximate token count (4 characters per
+token) and the fetch time. Writes a Markdown report.
+
+Usage (from the repository root):
+    python benchmarks/ticket_payload_benchmark.py [--tickets 50] [--history 10 50 200]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sub_agents.ticket_management import database, ticket_manager  # noqa: E402
+from sub_agents.ticket_management.database import get_db_connection  # noqa: E402
+
+DEPARTMENT = "Public Work"
+NOTES = (
+    "Technician visited the site and inspected the damage; spare parts ordered from the central store.",
+    "Citizen called again asking for an update, informed them the crew is scheduled this week.",
+    "Road surface needs to dry before the repair can be completed, revisit planned.",
+    "Supervisor reviewed the job and asked for photos of the finished work.",
+)
+STATUSES = ("Open", "In Progress", "On Hold", "In Progress")
+
+VARIANTS = (
+    ("full", {}),
+    ("fields=status,assigned_work_date", {"fields": ["status", "assigned_work_date"]}),
+    ("fields=status,history + history_limit=5", {"fields": ["status", "history"], "history_limit": 5}),
+    ("history_limit=5", {"history_limit": 5}),
+    ("summary", {"summary": True}),
+)
+
+
+def _fill(database_path: str, tickets: int, events: int) -> list:
+    rng = random.Random(events)
+    conn = get_db_connection(database_path)
+    technicians = [
+        conn.execute("INSERT INTO technicians (name, department) VALUES (?, ?)",
+                     (f"bench tech {i}", DEPARTMENT)).lastrowid
+        for i in range(10)
+    ]
+    ticket_ids = []
+    start = datetime(2030, 1, 1)
+    for i in range(tickets):
+        technician = rng.choice(technicians)
+        ticket_id = conn.execute(
+            "INSERT INTO tickets (title, description, status, priority, department, address, assigned_technician_id, "
+            "assigned_work_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (f"Pothole on main road {i}", "Large pothole near the bus stop causing traffic to swerve. " * 3,
+             "In Progress", 2, DEPARTMENT, "3rd street, South", technician, "15-01-2030"),
+        ).lastrowid
+        rows = []
+        for j in range(events):
+            at = (start + timedelta(hours=j)).strftime('%Y-%m-%d %H:%M:%S')
+            kind = rng.choice(("note", "note", "status_changed", "assigned"))
+            if kind == "status_changed":
+                status = rng.choice(STATUSES)
+                rows.append((ticket_id, at, kind, status, f"Status changed to {status}", None, None))
+            elif kind == "assigned":
+                rows.append((ticket_id, at, kind, None, "Technician assigned", rng.choice(technicians), "15-01-2030"))
+            else:
+                rows.append((ticket_id, at, kind, None, rng.choice(NOTES), None, None))
+        conn.executemany(
+            "INSERT INTO history (ticket_id, timestamp, event_type, status, log_message, assigned_technician_id, "
+            "assigned_work_date) VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+        )
+        conn.execute(
+            "UPDATE tickets SET event_count = ?, last_event_id = (SELECT MAX(id) FROM history WHERE ticket_id = ?) "
+            "WHERE id = ?", (events, ticket_id, ticket_id),
+        )
+        ticket_ids.append(ticket_id)
+    conn.commit()
+    conn.close()
+    return ticket_ids
+
+
+def run(ticket_ids: list, events: int) -> list:
+    results = []
+    for name, kwargs in VARIANTS:
+        sizes = []
+        started = time.perf_counter()
+        for ticket_id in ticket_ids:
+            sizes.append(len(json.dumps(ticket_manager.fetch_ticket_by_id(ticket_id, **kwargs), default=str)))
+        seconds = time.perf_counter() - started
+        chars = sum(sizes) / len(sizes)
+        results.append({
+            "events": events,
+            "variant": name,
+            "chars": chars,
+            "tokens": chars / 4,
+            "ms": seconds * 1000 / len(ticket_ids),
+        })
+    return results
+
+
+def render_report(results: list, args) -> str:
+    lines = [
+        "# Ticket payload benchmark",
+        "",
+        f"Generated {datetime.now(timezone.utc):%Y-%m-%d %H:%M} UTC by `benchmarks/ticket_payload_benchmark.py` "
+        f"on Python {platform.python_version()} ({platform.machine()}, {os.cpu_count()} CPUs).",
+        f"Averages over {args.tickets} assigned tickets per history length. Tokens are approximated as "
+        "JSON characters / 4.",
+        "",
+        "| history events | call | JSON chars | ~tokens | vs full | fetch time (ms) |",
+        "|---|---|---|---|---|---|",
+    ]
+    full = {r["events"]: r["chars"] for r in results if r["variant"] == "full"}
+    for r in results:
+        lines.append(
+            f"| {r['events']} | `{r['variant']}` | {r['chars']:.0f} | {r['tokens']:.0f} "
+            f"| {r['chars'] / full[r['events']]:.1%} | {r['ms']:.2f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "reports", "ticket_payload.md"))
+    args = parser.parse_args()
+
+    source = database.DATABASE_PATH
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for events in args.history:
+            database_path = os.path.join(tmp, f"city_office_{events}.db")
+            shutil.copyfile(source, database_path)
+            ticket_ids = _fill(database_path, args.tickets, events)
+            database.DATABASE_PATH = database_path
+            results += run(ticket_ids, events)
+
+    report = render_report(results, args)
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
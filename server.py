@@ -0,0 +1,118 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+import uvicorn
+from starlette.applications import Starlette
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    """
+    How the HTTP server is run.
+
+    In "development" mode a single uvicorn process serves the app with
+    in-memory state, as before. In "production" mode gunicorn supervises
+    `workers` uvicorn worker processes, and session, task and memory state
+    are kept in SQLite files under `state_dir` so every worker sees the same
+    data.
+
+    `startup_mode` controls when the ADK agent graph is built: "eager" before
+    the port is bound, "warm" in a background thread right after startup, or
+    "lazy" on the first A2A request. The agent card is served immediately in
+    the latter two.
+    """
+    host: str = "0.0.0.0"
+    port: int = 8080
+    mode: str = "development"
+    workers: int = 1
+    keepalive: int = 5
+    backlog: int = 2048
+    graceful_timeout: int = 30
+    max_requests: int = 0
+    startup_mode: str = "warm"
+    state_dir: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
+
+    @classmethod
+    def from_env(cls) -> "ServerConfig":
+        mode = os.getenv("SERVER_MODE", cls.mode).lower()
+        if mode not in ("development", "production"):
+            raise ValueError(f"SERVER_MODE must be 'development' or 'production', got {mode!r}.")
+        startup_mode = os.getenv("STARTUP_MODE", cls.startup_mode).lower()
+        if startup_mode not in ("eager", "warm", "lazy"):
+            raise ValueError(f"STARTUP_MODE must be 'eager', 'warm' or 'lazy', got {startup_mode!r}.")
+        default_workers = (os.cpu_count() or 1) if mode == "production" else 1
+        return cls(
+            host=os.getenv("HOST", cls.host),
+            port=int(os.getenv("PORT", cls.port)),
+            mode=mode,
+            workers=int(os.getenv("SERVER_WORKERS", default_workers)),
+            keepalive=int(os.getenv("SERVER_KEEPALIVE", cls.keepalive)),
+            backlog=int(os.getenv("SERVER_BACKLOG", cls.backlog)),
+            graceful_timeout=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", cls.graceful_timeout)),
+            max_requests=int(os.getenv("SERVER_MAX_REQUESTS", cls.max_requests)),
+            startup_mode=startup_mode,
+            state_dir=os.getenv("STATE_DIR", cls.state_dir),
+        )
+
+    @property
+    def shared_state(self) -> bool:
+        """Whether stateful services must be safe to share across processes."""
+        return self.mode == "production"
+
+    def state_path(self, filename: str) -> str:
+        os.makedirs(self.state_dir, exist_ok=True)
+        return os.path.join(self.state_dir, filename)
+
+
+def serve(app_factory: Callable[[], Starlette], config: ServerConfig) -> None:
+    """Runs the app built by `app_factory` according to `config`."""
+    if config.mode == "production":
+        _serve_with_gunicorn(app_factory, config)
+        return
+
+    logger.info(f"Starting development server on {config.host}:{config.port}")
+    uvicorn.run(
+        app_factory(),
+        host=config.host,
+        port=config.port,
+        backlog=config.backlog,
+        timeout_keep_alive=config.keepalive,
+        timeout_graceful_shutdown=config.graceful_timeout,
+    )
+
+
+def _serve_with_gunicorn(app_factory: Callable[[], Starlette], config: ServerConfig) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{config.host}:{config.port}",
+                "workers": config.workers,
+                "worker_class": "uvicorn_worker.UvicornWorker",
+                "keepalive": config.keepalive,
+                "backlog": config.backlog,
+                # On SIGTERM, workers stop accepting and get this long to drain in-flight requests.
+                "graceful_timeout": config.graceful_timeout,
+                # Agent runs can take a while; let graceful_timeout govern shutdown instead.
+                "timeout": 0,
+                "max_requests": config.max_requests,
+                "max_requests_jitter": config.max_requests // 10,
+                # Build the app inside each worker so no event loop, engine or
+                # SQLite handle crosses a fork.
+                "preload_app": False,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app_factory()
+
+    logger.info(
+        f"Starting production server on {config.host}:{config.port} with {config.workers} workers"
+    )
+    _Application().run()
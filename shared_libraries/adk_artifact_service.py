@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import urllib.parse
+from typing import Optional
+
+from google.adk.artifacts.base_artifact_service import BaseArtifactService
+from google.genai import types
+
+from shared_libraries.artifact_store import ARTIFACT_STORE, ContentAddressedArtifactStore
+
+logger = logging.getLogger(__name__)
+
+
+class FileArtifactService(BaseArtifactService):
+    """
+    An ADK artifact service that keeps artifact bytes in a ContentAddressedArtifactStore.
+
+    Each saved version is a small JSON reference file on disk; the payload itself
+    lives in the shared object store, so sessions only ever hold references.
+    """
+
+    def __init__(self, store: ContentAddressedArtifactStore):
+        self.store = store
+
+    def _scope_dir(self, app_name: str, user_id: str, scope: str) -> str:
+        return os.path.join(
+            self.store.root_dir, 'refs', _quote_path_component(app_name), _quote_path_component(user_id), scope
+        )
+
+    def _refs_dir(self, app_name: str, user_id: str, session_id: str, filename: str) -> str:
+        if filename.startswith('user:'):
+            scope = 'user'
+        else:
+            scope = 'session-' + _quote_path_component(session_id)
+        return os.path.join(self._scope_dir(app_name, user_id, scope), _quote_path_component(filename))
+
+    def _existing_versions(self, path: str) -> list[int]:
+        try:
+            return sorted(int(name[:-5]) for name in os.listdir(path) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    async def save_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        artifact: types.Part,
+    ) -> int:
+        if artifact.inline_data is not None:
+            stored = self.store.put_bytes(artifact.inline_data.data or b'', artifact.inline_data.mime_type)
+            ref = {'file_uri': stored.uri, 'mime_type': stored.mime_type}
+        elif artifact.file_data is not None:
+            ref = {'file_uri': artifact.file_data.file_uri, 'mime_type': artifact.file_data.mime_type}
+        elif artifact.text is not None:
+            ref = {'text': artifact.text}
+        else:
+            raise ValueError("Only inline_data, file_data and text artifacts are supported.")
+
+        path = self._refs_dir(app_name, user_id, session_id, filename)
+        os.makedirs(path, exist_ok=True)
+        versions = self._existing_versions(path)
+        version = versions[-1] + 1 if versions else 0
+        while True:
+            # O_EXCL makes concurrent writers (other workers) pick distinct versions.
+            try:
+                fd = os.open(os.path.join(path, f"{version}.json"), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+                break
+            except FileExistsError:
+                version += 1
+        with os.fdopen(fd, 'w') as f:
+            json.dump(ref, f)
+        return version
+
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        path = self._refs_dir(app_name, user_id, session_id, filename)
+        versions = self._existing_versions(path)
+        if not versions:
+            return None
+        if version is None:
+            version = versions[-1]
+        try:
+            with open(os.path.join(path, f"{version}.json"), 'r') as f:
+                ref = json.load(f)
+        except FileNotFoundError:
+            return None
+        if 'text' in ref:
+            return types.Part(text=ref['text'])
+        return types.Part(file_data=types.FileData(file_uri=ref['file_uri'], mime_type=ref.get('mime_type')))
+
+    async def list_artifact_keys(self, *, app_name: str, user_id: str, session_id: str) -> list[str]:
+        filenames = set()
+        for scope in ('session-' + _quote_path_component(session_id), 'user'):
+            try:
+                names = os.listdir(self._scope_dir(app_name, user_id, scope))
+            except FileNotFoundError:
+                continue
+            filenames.update(urllib.parse.unquote(name) for name in names)
+        return sorted(filenames)
+
+    async def delete_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> None:
+        # Only the references are removed; blobs may still be shared with other sessions.
+        path = self._refs_dir(app_name, user_id, session_id, filename)
+        for version in self._existing_versions(path):
+            try:
+                os.remove(os.path.join(path, f"{version}.json"))
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+    async def list_versions(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> list[int]:
+        return self._existing_versions(self._refs_dir(app_name, user_id, session_id, filename))
+
+
+def _quote_path_component(value: str) -> str:
+    # Percent-encode separators and dots so no name can escape the refs directory.
+    return urllib.parse.quote(value, safe='').replace('.', '%2E')
+
+
+def rehydrate_artifact_parts(callback_context, llm_request):
+    """
+    before_model_callback that swaps artifact:// references for inline bytes.
+
+    Session history only ever stores the reference; the bytes are read from disk
+    for the outgoing model request and dropped again once the call returns.
+    """
+    for content in llm_request.contents or []:
+        for index, part in enumerate(content.parts or []):
+            if not part.file_data:
+                continue
+            digest = ARTIFACT_STORE.digest_from_uri(part.file_data.file_uri)
+            if digest is None:
+                continue
+            if not ARTIFACT_STORE.exists(digest):
+                logger.warning(f"Artifact {digest} referenced in session is missing from the store.")
+                content.parts[index] = types.Part(text="[attachment no longer available]")
+                continue
+            content.parts[index] = types.Part(
+                inline_data=types.Blob(
+                    data=ARTIFACT_STORE.read_bytes(digest),
+                    mime_type=part.file_data.mime_type or ARTIFACT_STORE.mime_type_for(digest),
+                )
+            )
+    return None
@@ -0,0 +1,65 @@
+"""
+Bearer-token authentication for the management routes.
+
+The A2A endpoint and the agent card stay open; routes that act on behalf
+of a client (/subscriptions) or change the server for everyone (PUT
+/config/models, POST /assignments/batch) or read every ticket (/export)
+need an `Authorization: Bearer <token>` header.
+
+API_TOKENS names the clients and their tokens, comma-separated
+`client=token` pairs, e.g. "crm=3f9c...,field-app=8d21...". A client only
+sees and removes its own webhook subscriptions. ADMIN_API_TOKEN is the
+operator's token: it changes the model configuration, runs batch
+assignment and exports, and manages every client's subscriptions, including those made
+through A2A push notification configs, which have no owner. With neither
+set, those routes answer 401, or 403 for the admin-only ones.
+"""
+import hmac
+import os
+from typing import Optional
+
+# Client name used for requests made with ADMIN_API_TOKEN.
+ADMIN_CLIENT = "admin"
+
+
+def _parse_tokens(raw: str) -> dict[str, str]:
+    """Parses "client=token,..." into {token: client}. Raises ValueError for a malformed entry."""
+    tokens = {}
+    for entry in raw.split(","):
+        if not entry.strip():
+            continue
+        client, sep, token = entry.partition("=")
+        if not sep or not client.strip() or not token.strip():
+            raise ValueError(f"API_TOKENS entries must be client=token, got {entry.strip()!r}.")
+        if client.strip() == ADMIN_CLIENT:
+            raise ValueError(f"'{ADMIN_CLIENT}' is reserved for ADMIN_API_TOKEN.")
+        tokens[token.strip()] = client.strip()
+    return tokens
+
+
+API_TOKENS = _parse_tokens(os.getenv("API_TOKENS", ""))
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+
+def _matches(token: str, expected: str) -> bool:
+    # Compared in constant time, so response timing does not leak a token's prefix.
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+def authenticate(authorization: Optional[str]) -> Optional[str]:
+    """Returns the client named by a bearer Authorization header value, ADMIN_CLIENT, or None."""
+    scheme, _, token = (authorization or "").strip().partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        return None
+    if ADMIN_API_TOKEN and _matches(token, ADMIN_API_TOKEN):
+        return ADMIN_CLIENT
+    client = None
+    for expected, name in API_TOKENS.items():
+        if _matches(token, expected):
+            client = name
+    return client
+
+
+def is_admin(client: Optional[str]) -> bool:
+    return client == ADMIN_CLIENT
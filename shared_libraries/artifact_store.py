@@ -0,0 +1,167 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_STORE_DIR = os.getenv(
+    "ARTIFACT_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'artifacts'),
+)
+# Base URL under which the server's /artifacts route is reachable, e.g. the Cloud Run URL.
+ARTIFACT_PUBLIC_BASE_URL = os.getenv("ARTIFACT_PUBLIC_BASE_URL")
+ARTIFACT_URI_PREFIX = "artifact://sha256/"
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class StoredArtifact:
+    """A blob that has been spooled into the content-addressed store."""
+    digest: str
+    mime_type: Optional[str]
+    size: int
+    uri: str
+
+
+class ContentAddressedArtifactStore:
+    """
+    Stores uploaded files on disk keyed by their SHA-256 digest.
+
+    Uploads are written chunk by chunk into a temporary file and hashed on the
+    way, then atomically renamed into place. Identical uploads therefore share
+    one file on disk, and nothing larger than a single chunk is held in memory.
+    """
+
+    def __init__(self, root_dir: str, public_base_url: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.root_dir = os.path.abspath(root_dir)
+        self.public_base_url = public_base_url.rstrip('/') if public_base_url else None
+        self.chunk_size = chunk_size
+
+    def _objects_dir(self) -> str:
+        return os.path.join(self.root_dir, 'objects')
+
+    def path_for(self, digest: str) -> str:
+        """Returns the on-disk path of the blob with the given digest."""
+        return os.path.join(self._objects_dir(), digest[:2], digest)
+
+    def _meta_path_for(self, digest: str) -> str:
+        return self.path_for(digest) + '.meta'
+
+    @staticmethod
+    def uri_for(digest: str) -> str:
+        return f"{ARTIFACT_URI_PREFIX}{digest}"
+
+    @staticmethod
+    def digest_from_uri(uri: Optional[str]) -> Optional[str]:
+        """Extracts the digest from an artifact:// URI, or None for foreign URIs."""
+        if not uri or not uri.startswith(ARTIFACT_URI_PREFIX):
+            return None
+        digest = uri[len(ARTIFACT_URI_PREFIX):]
+        if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+            return None
+        return digest
+
+    def public_url_for(self, digest: str) -> Optional[str]:
+        """Returns the HTTP URL serving this blob, if a public base URL is configured."""
+        if not self.public_base_url:
+            return None
+        return f"{self.public_base_url}/artifacts/{digest}"
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def mime_type_for(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._meta_path_for(digest), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def put_stream(self, chunks: Iterable[bytes], mime_type: Optional[str] = None) -> StoredArtifact:
+        """Spools an iterable of byte chunks to disk and returns the stored artifact."""
+        os.makedirs(self._objects_dir(), exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir(), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            final_path = self.path_for(digest)
+            if os.path.exists(final_path):
+                # Same content was uploaded before; keep the existing copy.
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if mime_type and not os.path.exists(self._meta_path_for(digest)):
+            with open(self._meta_path_for(digest), 'w') as f:
+                f.write(mime_type)
+        logger.debug(f"Stored artifact {digest} ({size} bytes, {mime_type})")
+        return StoredArtifact(digest=digest, mime_type=mime_type, size=size, uri=self.uri_for(digest))
+
+    def put_bytes(self, data: bytes, mime_type: Optional[str] = None) -> StoredArtifact:
+        view = memoryview(data)
+        return self.put_stream(
+            (view[i:i + self.chunk_size] for i in range(0, len(view), self.chunk_size)),
+            mime_type,
+        )
+
+    def put_base64(self, data: str, mime_type: Optional[str] = None) -> StoredArtifact:
+        """
+        Decodes a base64 payload (as carried by A2A FileWithBytes) straight to disk.
+
+        The text is decoded in slices that are a multiple of four characters so
+        the full decoded payload never has to exist in memory at once.
+        """
+        return self.put_stream(_iter_base64_chunks(data, self.chunk_size), mime_type)
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path_for(digest), 'rb')
+
+    def iter_chunks(self, digest: str) -> Iterator[bytes]:
+        with self.open(digest) as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def read_bytes(self, digest: str) -> bytes:
+        with self.open(digest) as f:
+            return f.read()
+
+
+def _iter_base64_chunks(data: str, chunk_size: int) -> Iterator[bytes]:
+    # Strip whitespace lazily per slice; 4 base64 characters decode to 3 bytes.
+    step = max(4, (chunk_size // 3) * 4)
+    pending = ''
+    for i in range(0, len(data), step):
+        piece = pending + ''.join(data[i:i + step].split())
+        usable = len(piece) - (len(piece) % 4)
+        pending = piece[usable:]
+        if usable:
+            try:
+                yield base64.b64decode(piece[:usable], validate=True)
+            except binascii.Error as e:
+                raise ValueError(f"Invalid base64 file payload: {e}") from e
+    if pending:
+        raise ValueError("Invalid base64 file payload: truncated input")
+
+
+ARTIFACT_STORE = ContentAddressedArtifactStore(ARTIFACT_STORE_DIR, public_base_url=ARTIFACT_PUBLIC_BASE_URL)
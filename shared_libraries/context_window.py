@@ -0,0 +1,249 @@
+"""
+Bounded model context for long-lived A2A sessions.
+
+The executor reuses one ADK session per A2A context, so without help every
+model call would resend the whole conversation, including full ticket dicts
+returned by tools. The callbacks here keep the request bounded:
+
+- compact_context keeps the last CONTEXT_WINDOW_TURNS user turns verbatim
+  and replaces older ones with a running summary kept in session state.
+  Each turn is summarized once, when it leaves the window, into a line with
+  the user's request, the tools called with their key results, and the
+  agent's reply. The summary is extractive, so compaction costs no extra
+  model call.
+- STATIC_CONTEXT_CACHE moves the system instruction and tool declarations
+  into a Gemini explicit context cache, when CONTEXT_CACHE_TTL_SECONDS is
+  set, so they are not re-billed as prompt tokens on every call.
+- record_token_usage reports prompt, cached and output tokens per call.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from google.genai import types
+
+from shared_libraries.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# User turns sent to the model verbatim; older turns are summarized. 0 disables compaction.
+CONTEXT_WINDOW_TURNS = int(os.getenv("CONTEXT_WINDOW_TURNS", "6"))
+# The running summary keeps its most recent lines within this many characters.
+CONTEXT_SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "4000"))
+SUMMARY_FIELD_MAX_CHARS = 200
+# Lifetime of explicit context caches; 0 disables caching. Gemini only caches
+# content above a model-specific minimum size, so smaller prompts fall back to
+# sending the instruction inline.
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "0"))
+
+# After a failed cache creation (e.g. prompt below the minimum size), requests go inline this long.
+CONTEXT_CACHE_RETRY_SECONDS = 600
+
+SUMMARY_STATE_KEY = "context_summary"
+SUMMARIZED_TURNS_STATE_KEY = "context_summarized_turns"
+SUMMARY_PREAMBLE = "Summary of the earlier part of this conversation (older turns are not shown):\n"
+
+
+def _clip(text: str, limit: int = SUMMARY_FIELD_MAX_CHARS) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    parts = content.parts or []
+    return (
+        content.role == "user"
+        and any(part.text or part.inline_data or part.file_data for part in parts)
+        and not any(part.function_response for part in parts)
+    )
+
+
+def split_turns(contents: list[types.Content]) -> list[list[types.Content]]:
+    """Groups request contents into turns, each starting at a user message."""
+    turns: list[list[types.Content]] = []
+    for content in contents:
+        if not turns or _is_turn_start(content):
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def summarize_turn(turn: list[types.Content]) -> str:
+    """One summary line: what the user asked, which tools ran with what result, and the reply."""
+    request = None
+    reply = None
+    calls = []
+    results = {}
+    for content in turn:
+        for part in content.parts or []:
+            if part.function_call:
+                args = json.dumps(part.function_call.args or {}, default=str, ensure_ascii=False)
+                calls.append((part.function_call.name, _clip(args, 80)))
+            elif part.function_response:
+                results[part.function_response.name] = _clip(
+                    json.dumps(part.function_response.response, default=str, ensure_ascii=False), 80
+                )
+            elif part.text and content.role == "user" and request is None:
+                request = part.text
+            elif part.text and content.role == "model":
+                reply = part.text
+            elif (part.inline_data or part.file_data) and content.role == "user" and request is None:
+                request = "[attachment]"
+    line = f"- User: {_clip(request or '')}"
+    if calls:
+        line += " | Tools: " + "; ".join(
+            f"{name}({args})" + (f" -> {results[name]}" if name in results else "") for name, args in calls
+        )
+    if reply:
+        line += f" | Agent: {_clip(reply)}"
+    return line
+
+
+def _bounded_summary(lines: list[str]) -> str:
+    # Keeps the newest lines; the oldest drop off first.
+    kept = []
+    size = 0
+    for line in reversed(lines):
+        size += len(line) + 1
+        if size > CONTEXT_SUMMARY_MAX_CHARS and kept:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+def compact_context(callback_context, llm_request):
+    """
+    before_model_callback that sends only the recent turns plus a running
+    summary of the older ones.
+
+    Turns are summarized once, as they leave the window; the summary and the
+    number of turns it covers live in session state.
+    """
+    if CONTEXT_WINDOW_TURNS <= 0 or not llm_request.contents:
+        return None
+    turns = split_turns(llm_request.contents)
+    keep_from = len(turns) - CONTEXT_WINDOW_TURNS
+    if keep_from <= 0:
+        return None
+    state = callback_context.state
+    summary = state.get(SUMMARY_STATE_KEY) or ""
+    summarized = state.get(SUMMARIZED_TURNS_STATE_KEY) or 0
+    if summarized > keep_from:
+        # The session is shorter than the summary claims (e.g. rewound); start over.
+        summary, summarized = "", 0
+    if summarized < keep_from:
+        new_lines = [summarize_turn(turn) for turn in turns[summarized:keep_from]]
+        summary = _bounded_summary(summary.splitlines() + new_lines)
+        state[SUMMARY_STATE_KEY] = summary
+        state[SUMMARIZED_TURNS_STATE_KEY] = keep_from
+        METRICS.counter(
+            "context_turns_summarized_total", "Conversation turns compacted into the running summary."
+        ).inc(len(new_lines))
+    llm_request.contents = [types.Content(role="user", parts=[types.Part(text=SUMMARY_PREAMBLE + summary)])] + [
+        content for turn in turns[keep_from:] for content in turn
+    ]
+    return None
+
+
+class StaticContextCache:
+    """
+    Keeps one Gemini explicit cache per distinct (model, system instruction,
+    tools) and points requests at it instead of resending that static prefix.
+    """
+
+    def __init__(self, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # key -> (cache name, monotonic time after which it is recreated)
+        self._caches: dict[str, tuple[str, float]] = {}
+        # key -> monotonic time before which creating its cache is not retried
+        self._unavailable: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google.genai import Client
+
+            self._client = Client()
+        return self._client
+
+    @staticmethod
+    def _key(llm_request) -> str:
+        config = llm_request.config
+        payload = [
+            llm_request.model,
+            config.system_instruction,
+            [tool.model_dump(mode="json", exclude_none=True) for tool in config.tools or []],
+            config.tool_config.model_dump(mode="json", exclude_none=True) if config.tool_config else None,
+        ]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def _cache_name(self, key: str, llm_request) -> Optional[str]:
+        async with self._lock:
+            cached = self._caches.get(key)
+            # Recreated a minute early so a request never points at an expired cache.
+            if cached and time.monotonic() < cached[1]:
+                return cached[0]
+            if time.monotonic() < self._unavailable.get(key, 0.0):
+                return None
+            config = llm_request.config
+            try:
+                cache = await self._get_client().aio.caches.create(
+                    model=llm_request.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=config.system_instruction,
+                        tools=config.tools,
+                        tool_config=config.tool_config,
+                        ttl=f"{self.ttl_seconds}s",
+                        display_name=f"officer-agent-{key[:12]}",
+                    ),
+                )
+            except Exception as e:
+                logger.warning(f"Context caching unavailable for {llm_request.model}, sending instructions inline: {e}")
+                self._unavailable[key] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+                return None
+            self._caches[key] = (cache.name, time.monotonic() + max(0, self.ttl_seconds - 60))
+            METRICS.counter("context_caches_created_total", "Gemini context caches created.").inc()
+            return cache.name
+
+    async def apply(self, callback_context, llm_request):
+        """before_model_callback that swaps the static prefix for a cache reference."""
+        config = llm_request.config
+        if self.ttl_seconds <= 0 or config is None or not config.system_instruction or config.cached_content:
+            return None
+        name = await self._cache_name(self._key(llm_request), llm_request)
+        if name:
+            # Gemini rejects requests that repeat what the cache already holds.
+            config.cached_content = name
+            config.system_instruction = None
+            config.tools = None
+            config.tool_config = None
+        return None
+
+
+STATIC_CONTEXT_CACHE = StaticContextCache()
+
+
+def record_token_usage(callback_context, llm_response):
+    """after_model_callback that reports the tokens of each complete model response."""
+    usage = llm_response.usage_metadata
+    if llm_response.partial or usage is None:
+        return None
+    agent = callback_context.agent_name
+    counts = {
+        "prompt": usage.prompt_token_count or 0,
+        "cached": usage.cached_content_token_count or 0,
+        "output": usage.candidates_token_count or 0,
+    }
+    for kind, tokens in counts.items():
+        METRICS.counter("llm_tokens_total", "Tokens used by model calls.", agent=agent, kind=kind).inc(tokens)
+    METRICS.summary("llm_prompt_tokens", "Prompt tokens per model call.", agent=agent).observe(counts["prompt"])
+    logger.info(
+        f"Token usage for {agent}: prompt={counts['prompt']} (cached={counts['cached']}) output={counts['output']}"
+    )
+    return None
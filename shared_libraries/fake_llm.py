@@ -0,0 +1,73 @@
+"""
+A local stand-in for Gemini that injects faults, for exercising ResilientLlm
+and the degraded reply path without network access or API quota.
+
+Run the server against it with e.g. LLM_FAKE_SCRIPT=ok,error:503,hang, or
+see benchmarks/resilient_llm_benchmark.py.
+"""
+import asyncio
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+
+
+class FakeLlm(BaseLlm):
+    """
+    Answers each call according to the next step of `script`, cycling:
+
+    - ok: replies at once, echoing the last user text;
+    - slow:SECONDS: replies after that long;
+    - hang: never replies;
+    - error:CODE: raises a google.genai API error with that HTTP status;
+    - disconnect: raises ConnectionError;
+    - midstream:CODE: streams the first chunk, then fails with CODE
+      (non-streaming calls fail at once).
+    """
+
+    script: list[str] = ["ok"]
+    calls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        step = self.script[self.calls % len(self.script)].strip()
+        self.calls += 1
+        kind, _, argument = step.partition(":")
+        if kind == "slow":
+            await asyncio.sleep(float(argument))
+        elif kind == "hang":
+            await asyncio.Event().wait()
+        elif kind == "error" or (kind == "midstream" and not stream):
+            raise _api_error(int(argument))
+        elif kind == "disconnect":
+            raise ConnectionError("fake model connection reset")
+        elif kind not in ("ok", "midstream"):
+            raise ValueError(f"Unknown fake model step {step!r}")
+
+        text = f"Fake reply to: {_last_user_text(llm_request)}"
+        if not stream:
+            yield LlmResponse(content=types.ModelContent(parts=[types.Part(text=text)]))
+            return
+        half = len(text) // 2
+        yield LlmResponse(content=types.ModelContent(parts=[types.Part(text=text[:half])]), partial=True)
+        if kind == "midstream":
+            raise _api_error(int(argument))
+        yield LlmResponse(content=types.ModelContent(parts=[types.Part(text=text[half:])]), partial=True)
+        yield LlmResponse(content=types.ModelContent(parts=[types.Part(text=text)]))
+
+
+def _api_error(code: int) -> errors.APIError:
+    error_class = errors.ServerError if code >= 500 else errors.ClientError
+    return error_class(code, {"error": {"code": code, "message": "injected by FakeLlm", "status": "FAKE"}})
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user":
+            text = " ".join(part.text for part in content.parts or [] if part.text)
+            if text:
+                return text
+    return ""
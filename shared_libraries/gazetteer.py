@@ -0,0 +1,109 @@
+"""
+Offline geocoding of free-text city addresses against a local gazetteer file.
+
+The gazetteer is a CSV of known places (name, district, latitude, longitude).
+Streets appear once per district they run through; landmarks may leave the
+district empty. An address such as "3rd street, South, NA" is normalized to
+"3rd street, south" and resolved to that row's coordinates.
+"""
+import csv
+import math
+import os
+import re
+import threading
+from typing import NamedTuple, Optional
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+)
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE_LATITUDE = 111320.0
+
+_ABBREVIATIONS = {
+    'st': 'street', 'str': 'street', 'ave': 'avenue', 'av': 'avenue', 'rd': 'road', 'dr': 'drive',
+    'blvd': 'boulevard', 'ln': 'lane', 'n': 'north', 's': 'south', 'e': 'east', 'w': 'west',
+    'first': '1st', 'second': '2nd', 'third': '3rd', 'fourth': '4th', 'fifth': '5th', 'sixth': '6th',
+    'seventh': '7th', 'eighth': '8th', 'ninth': '9th', 'tenth': '10th', 'eleventh': '11th', 'twelfth': '12th',
+}
+
+
+class Place(NamedTuple):
+    address: str
+    latitude: float
+    longitude: float
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases, strips punctuation and expands common abbreviations."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return " ".join(_ABBREVIATIONS.get(word, word) for word in words)
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def bounding_box(latitude: float, longitude: float, radius_meters: float) -> tuple[float, float, float, float]:
+    """Returns (min_lat, max_lat, min_lon, max_lon) enclosing a circle of `radius_meters`."""
+    d_lat = radius_meters / METERS_PER_DEGREE_LATITUDE
+    d_lon = radius_meters / (METERS_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 1e-6))
+    return latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon
+
+
+class Gazetteer:
+    def __init__(self, path: str = GAZETTEER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        # name -> {district or '': (lat, lon)}
+        self._places: dict[str, dict[str, tuple[float, float]]] = {}
+        self._districts: set[str] = set()
+        self._names_longest_first: list[str] = []
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, newline='') as f:
+                    for row in csv.DictReader(f):
+                        name = normalize_text(row['name'])
+                        district = normalize_text(row.get('district') or '')
+                        self._places.setdefault(name, {})[district] = (float(row['latitude']), float(row['longitude']))
+                        if district:
+                            self._districts.add(district)
+            except OSError as e:
+                print(f"Could not read gazetteer {self.path}: {e}")
+            self._names_longest_first = sorted(self._places, key=len, reverse=True)
+            self._loaded = True
+
+    def geocode(self, address: Optional[str]) -> Optional[Place]:
+        """
+        Resolves a free-text address to a normalized address and coordinates.
+        Returns None if no known place is mentioned.
+        """
+        if not address:
+            return None
+        self._load()
+        text = f" {normalize_text(address)} "
+        for name in self._names_longest_first:
+            if f" {name} " not in text:
+                continue
+            by_district = self._places[name]
+            remainder = text.replace(f" {name} ", " ")
+            district = next((d for d in by_district if d and f" {d} " in remainder), None)
+            if district is None:
+                # Prefer the place's own unqualified entry, else any district it runs through
+                district = '' if '' in by_district else next(iter(sorted(by_district)))
+            latitude, longitude = by_district[district]
+            normalized = f"{name}, {district}" if district else name
+            return Place(normalized, latitude, longitude)
+        return None
+
+
+GAZETTEER = Gazetteer()
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from google.genai import types
+from PIL import Image, ImageOps
+
+from shared_libraries.artifact_store import ARTIFACT_STORE, ContentAddressedArtifactStore, StoredArtifact
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImagePreprocessConfig:
+    """Settings for shrinking uploaded photos before they are sent to the model."""
+    enabled: bool = True
+    max_dimension: int = 1536
+    max_bytes: int = 512 * 1024
+    initial_quality: int = 85
+    min_quality: int = 45
+    output_format: str = "JPEG"
+    workers: int = 2
+
+    @classmethod
+    def from_env(cls) -> "ImagePreprocessConfig":
+        """Reads the IMAGE_* settings. Raises ValueError if Pillow cannot write IMAGE_OUTPUT_FORMAT."""
+        config = cls(
+            enabled=os.getenv("IMAGE_PREPROCESSING_ENABLED", "TRUE").upper() == "TRUE",
+            max_dimension=int(os.getenv("IMAGE_MAX_DIMENSION", cls.max_dimension)),
+            max_bytes=int(os.getenv("IMAGE_MAX_BYTES", cls.max_bytes)),
+            initial_quality=int(os.getenv("IMAGE_INITIAL_QUALITY", cls.initial_quality)),
+            min_quality=int(os.getenv("IMAGE_MIN_QUALITY", cls.min_quality)),
+            output_format=os.getenv("IMAGE_OUTPUT_FORMAT", cls.output_format).upper(),
+            workers=int(os.getenv("IMAGE_PREPROCESS_WORKERS", cls.workers)),
+        )
+        Image.init()
+        # The output needs a save plugin and a MIME type for the stored artifact.
+        if config.output_format not in Image.SAVE or config.output_format not in Image.MIME:
+            writable = sorted(set(Image.SAVE) & set(Image.MIME))
+            raise ValueError(
+                f"IMAGE_OUTPUT_FORMAT {config.output_format!r} is not a format Pillow can save; "
+                f"use one of {', '.join(writable)}."
+            )
+        return config
+
+    def cache_key(self) -> str:
+        """A short fingerprint of the settings that affect the output bytes."""
+        settings = asdict(self)
+        settings.pop("enabled")
+        settings.pop("workers")
+        return hashlib.sha256(repr(sorted(settings.items())).encode()).hexdigest()[:16]
+
+
+def _encode_within_budget(image: Image.Image, config: ImagePreprocessConfig) -> bytes:
+    """Re-encodes the image, lowering quality and then resolution until it fits max_bytes."""
+    while True:
+        quality = config.initial_quality
+        while True:
+            buffer = io.BytesIO()
+            # No exif/icc arguments are passed, so metadata is dropped on save.
+            image.save(buffer, format=config.output_format, quality=quality, optimize=True)
+            if buffer.tell() <= config.max_bytes or quality <= config.min_quality:
+                break
+            quality = max(config.min_quality, quality - 10)
+        if buffer.tell() <= config.max_bytes or min(image.size) <= 64:
+            return buffer.getvalue()
+        image = image.resize(
+            (max(1, int(image.width * 0.75)), max(1, int(image.height * 0.75))),
+            Image.Resampling.LANCZOS,
+        )
+
+
+def _preprocess_blob(
+    store: ContentAddressedArtifactStore, digest: str, config: ImagePreprocessConfig
+) -> StoredArtifact:
+    """Decodes, downscales, strips and re-encodes one stored image. Runs in a worker process."""
+    with Image.open(store.path_for(digest)) as source:
+        # Apply the EXIF orientation before the EXIF block is discarded.
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((config.max_dimension, config.max_dimension), Image.Resampling.LANCZOS)
+        if config.output_format == "JPEG" and image.mode != "RGB":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        data = _encode_within_budget(image, config)
+    return store.put_bytes(data, Image.MIME[config.output_format])
+
+
+class ImagePreprocessor:
+    """
+    Shrinks image parts in the A2A -> GenAI conversion path.
+
+    Work is done on a process pool so decoding never blocks the event loop. The
+    result for each (source digest, settings) pair is recorded next to the
+    artifact store, so re-sending the same photo costs a single file lookup.
+    """
+
+    def __init__(
+        self,
+        store: ContentAddressedArtifactStore,
+        config: ImagePreprocessConfig,
+        executor: Optional[Executor] = None,
+    ):
+        self.store = store
+        self.config = config
+        self._executor = executor
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.config.workers)
+        return self._executor
+
+    def _cache_path(self, digest: str) -> str:
+        return os.path.join(self.store.root_dir, "derived", self.config.cache_key(), digest[:2], digest)
+
+    def _cached(self, digest: str) -> Optional[StoredArtifact]:
+        try:
+            with open(self._cache_path(digest), "r") as f:
+                derived = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if not self.store.exists(derived):
+            return None
+        return StoredArtifact(
+            digest=derived,
+            mime_type=self.store.mime_type_for(derived),
+            size=os.path.getsize(self.store.path_for(derived)),
+            uri=self.store.uri_for(derived),
+        )
+
+    def _remember(self, digest: str, derived: StoredArtifact) -> None:
+        path = self._cache_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(derived.digest)
+        os.replace(tmp_path, path)
+
+    async def process_digest(self, digest: str) -> Optional[StoredArtifact]:
+        """Returns the preprocessed artifact for a stored image, or None if it cannot be decoded."""
+        cached = self._cached(digest)
+        if cached is not None:
+            return cached
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            derived = await loop.run_in_executor(executor, _preprocess_blob, self.store, digest, self.config)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory); later images get a fresh pool.
+            logger.warning(f"Image worker pool broke on {digest}, forwarding original: {e}")
+            if self._executor is executor:
+                self.shutdown()
+            return None
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Could not preprocess image {digest}, forwarding original: {e}")
+            return None
+        original_size = os.path.getsize(self.store.path_for(digest))
+        logger.info(f"Preprocessed image {digest}: {original_size} -> {derived.size} bytes")
+        self._remember(digest, derived)
+        return derived
+
+    async def process_part(self, part: types.Part) -> types.Part:
+        if not self.config.enabled or not part.file_data:
+            return part
+        mime_type = part.file_data.mime_type or ""
+        digest = self.store.digest_from_uri(part.file_data.file_uri)
+        if digest is None or not mime_type.startswith("image/"):
+            return part
+        derived = await self.process_digest(digest)
+        if derived is None:
+            return part
+        return types.Part(file_data=types.FileData(file_uri=derived.uri, mime_type=derived.mime_type))
+
+    async def process_parts(self, parts: list[types.Part]) -> list[types.Part]:
+        return list(await asyncio.gather(*(self.process_part(part) for part in parts)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+IMAGE_PREPROCESSOR = ImagePreprocessor(ARTIFACT_STORE, ImagePreprocessConfig.from_env())
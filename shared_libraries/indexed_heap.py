@@ -0,0 +1,96 @@
+from typing import Any, Hashable, Iterator, Optional
+
+
+class IndexedHeap:
+    """
+    A binary min-heap of (key, item) pairs that also knows where each item sits,
+    so an item can be re-keyed or removed in O(log n) without a linear search.
+
+    Items must be hashable and unique; pushing an item that is already in the
+    heap updates its key.
+    """
+
+    def __init__(self):
+        self._entries: list[tuple[Any, Hashable]] = []
+        self._positions: dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._positions
+
+    def __iter__(self) -> Iterator[tuple[Any, Hashable]]:
+        """Iterates over (key, item) pairs in heap order, not sorted order."""
+        return iter(list(self._entries))
+
+    def key_of(self, item: Hashable) -> Any:
+        return self._entries[self._positions[item]][0]
+
+    def push(self, item: Hashable, key: Any) -> None:
+        """Adds `item` with `key`, or moves it to `key` if it is already queued."""
+        position = self._positions.get(item)
+        if position is not None:
+            old_key = self._entries[position][0]
+            self._entries[position] = (key, item)
+            if key < old_key:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
+            return
+        self._entries.append((key, item))
+        self._positions[item] = len(self._entries) - 1
+        self._sift_up(len(self._entries) - 1)
+
+    def peek(self) -> Optional[tuple[Any, Hashable]]:
+        return self._entries[0] if self._entries else None
+
+    def pop(self) -> tuple[Any, Hashable]:
+        """Removes and returns the (key, item) pair with the smallest key."""
+        if not self._entries:
+            raise IndexError("pop from an empty IndexedHeap")
+        return self._remove_at(0)
+
+    def remove(self, item: Hashable) -> bool:
+        """Removes `item` if present. Returns whether it was queued."""
+        position = self._positions.get(item)
+        if position is None:
+            return False
+        self._remove_at(position)
+        return True
+
+    def _remove_at(self, position: int) -> tuple[Any, Hashable]:
+        entry = self._entries[position]
+        last = self._entries.pop()
+        del self._positions[entry[1]]
+        if position < len(self._entries):
+            self._entries[position] = last
+            self._positions[last[1]] = position
+            self._sift_up(position)
+            self._sift_down(self._positions[last[1]])
+        return entry
+
+    def _swap(self, i: int, j: int) -> None:
+        self._entries[i], self._entries[j] = self._entries[j], self._entries[i]
+        self._positions[self._entries[i][1]] = i
+        self._positions[self._entries[j][1]] = j
+
+    def _sift_up(self, position: int) -> None:
+        while position > 0:
+            parent = (position - 1) // 2
+            if not self._entries[position][0] < self._entries[parent][0]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position: int) -> None:
+        size = len(self._entries)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._entries[child][0] < self._entries[smallest][0]:
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
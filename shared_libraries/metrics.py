@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+from typing import Optional
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: tuple, extra: Optional[dict] = None) -> str:
+    items = list(key) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Summary:
+    """Count and sum of all observations plus quantiles over a sliding window."""
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.sum = 0.0
+        self.window = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.window.append(value)
+
+    def quantiles(self) -> dict[float, float]:
+        ordered = sorted(self.window)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in self.QUANTILES}
+
+
+class MetricsRegistry:
+    """
+    A small in-process metrics registry rendered in Prometheus text format.
+
+    Metrics are created on first use and identified by name plus labels, e.g.
+    METRICS.summary("a2a_time_to_first_token_seconds").observe(0.42).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, tuple[str, str, dict]] = {}
+
+    def _get(self, kind: str, factory, name: str, help_text: str, labels: dict):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = (kind, help_text, {})
+            registered_kind, _, series = self._metrics[name]
+            if registered_kind != kind:
+                raise ValueError(f"Metric {name} is already registered as a {registered_kind}.")
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._get("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._get("gauge", Gauge, name, help_text, labels)
+
+    def summary(self, name: str, help_text: str = "", **labels) -> Summary:
+        return self._get("summary", Summary, name, help_text, labels)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, series) in sorted(self._metrics.items()):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, metric in series.items():
+                    if kind == "summary":
+                        for q, value in metric.quantiles().items():
+                            lines.append(f"{name}{_format_labels(key, {'quantile': q})} {value}")
+                        lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                    else:
+                        lines.append(f"{name}{_format_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,183 @@
+"""
+Which model each agent runs on, and with which generation settings.
+
+AGENT_MODELS is the tiering: the root agent and the ticket management agent
+talk to citizens and chain several tools, so they keep the full model. The
+department agents only pick a technician through one assign tool, so they use
+the lite model with temperature 0 and a small output budget.
+
+Overrides change this at runtime, per agent and per field, without a
+restart. They come from the AGENT_MODEL_OVERRIDES environment variable (JSON)
+at startup, and from PUT /config/models. With AGENT_MODEL_OVERRIDES_PATH
+set, overrides are kept in that JSON file and re-read whenever it changes, so
+every worker process follows the same overrides; once that file exists it
+replaces AGENT_MODEL_OVERRIDES. An override looks like:
+
+    {"PUBLIC_WORK_AGENT": {"model": "gemini-2.0-flash-001", "max_output_tokens": 512}}
+
+and null instead of an agent's fields removes that agent's overrides.
+
+The settings are applied by MODEL_CONFIG.apply, a before_model_callback, so
+they take effect on the next model call. It must run before other callbacks
+that depend on the model name, such as the context cache.
+
+This module does not import google.adk or google.genai, so the HTTP server
+can serve and change the configuration before the agent graph is loaded.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, replace
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+FULL_MODEL = os.getenv("FULL_AGENT_MODEL", "gemini-2.0-flash-001")
+LITE_MODEL = os.getenv("LITE_AGENT_MODEL", "gemini-2.0-flash-lite-001")
+
+
+@dataclass(frozen=True)
+class AgentModelConfig:
+    """The model of one agent; None leaves a generation setting at the model's default."""
+    model: str
+    temperature: Optional[float] = None
+    max_output_tokens: Optional[int] = None
+    # Send a duplicate request when a call is slow (see resilient_llm); fixed when the agent is built.
+    hedge: bool = False
+
+
+AGENT_MODELS = {
+    "AGENT_ASSIST": AgentModelConfig(FULL_MODEL, temperature=0.2, max_output_tokens=1024, hedge=True),
+    "TICKET_MANAGEMENT_AGENT": AgentModelConfig(FULL_MODEL, temperature=0.1, max_output_tokens=2048),
+    "PUBLIC_WORK_AGENT": AgentModelConfig(LITE_MODEL, temperature=0.0, max_output_tokens=256),
+    "CIVIC_AGENT": AgentModelConfig(LITE_MODEL, temperature=0.0, max_output_tokens=256),
+    "SAFETY_AGENT": AgentModelConfig(LITE_MODEL, temperature=0.0, max_output_tokens=256),
+    "SANITATION_AGENT": AgentModelConfig(LITE_MODEL, temperature=0.0, max_output_tokens=256),
+}
+
+# Fields an override may change.
+OVERRIDABLE_FIELDS = ("model", "temperature", "max_output_tokens")
+
+
+def _validate_fields(agent_name: str, values: dict) -> dict:
+    if not isinstance(values, dict):
+        raise ValueError(f"Overrides for {agent_name} must be an object or null.")
+    unknown = set(values) - set(OVERRIDABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields for {agent_name}: {', '.join(sorted(unknown))}")
+    if "model" in values and (not isinstance(values["model"], str) or not values["model"]):
+        raise ValueError(f"model for {agent_name} must be a model name.")
+    temperature = values.get("temperature")
+    if temperature is not None and (not isinstance(temperature, (int, float)) or not 0 <= temperature <= 2):
+        raise ValueError(f"temperature for {agent_name} must be between 0 and 2.")
+    max_tokens = values.get("max_output_tokens")
+    if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens < 1):
+        raise ValueError(f"max_output_tokens for {agent_name} must be a positive integer.")
+    return dict(values)
+
+
+class ModelTiering:
+    """The per-agent model configuration with runtime overrides. Thread-safe."""
+
+    def __init__(self, defaults: dict[str, AgentModelConfig], overrides_path: Optional[str] = None,
+                 initial_overrides: Optional[dict] = None):
+        self.defaults = dict(defaults)
+        self.overrides_path = overrides_path
+        self._lock = threading.Lock()
+        self._overrides: dict[str, dict] = {}
+        self._loaded_mtime: Optional[float] = None
+        if initial_overrides:
+            self._overrides = self._merged({}, initial_overrides)
+
+    def _merged(self, current: dict, changes: dict) -> dict:
+        if not isinstance(changes, dict):
+            raise ValueError("Overrides must be an object keyed by agent name.")
+        merged = {name: dict(values) for name, values in current.items()}
+        for agent_name, values in changes.items():
+            if agent_name not in self.defaults:
+                raise ValueError(f"Unknown agent {agent_name!r}; known agents: {', '.join(sorted(self.defaults))}")
+            if values is None:
+                merged.pop(agent_name, None)
+            else:
+                merged.setdefault(agent_name, {}).update(_validate_fields(agent_name, values))
+        return merged
+
+    def _refresh(self) -> None:
+        """Re-reads the overrides file if it changed. Called with the lock held."""
+        if not self.overrides_path:
+            return
+        try:
+            mtime = os.stat(self.overrides_path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.overrides_path) as f:
+                self._overrides = self._merged({}, json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring invalid model overrides in {self.overrides_path}: {e}")
+        self._loaded_mtime = mtime
+
+    def get(self, agent_name: str) -> AgentModelConfig:
+        """The effective configuration of `agent_name`; unknown agents get the full model."""
+        with self._lock:
+            self._refresh()
+            base = self.defaults.get(agent_name, AgentModelConfig(FULL_MODEL))
+            return replace(base, **self._overrides.get(agent_name, {}))
+
+    def update_overrides(self, changes: dict) -> dict:
+        """Merges `changes` into the overrides, persisting them if a file is configured. Raises ValueError."""
+        with self._lock:
+            self._refresh()
+            overrides = self._merged(self._overrides, changes)
+            if self.overrides_path:
+                temporary = f"{self.overrides_path}.{os.getpid()}.tmp"
+                with open(temporary, "w") as f:
+                    json.dump(overrides, f, indent=2, sort_keys=True)
+                os.replace(temporary, self.overrides_path)
+                self._loaded_mtime = os.stat(self.overrides_path).st_mtime
+            self._overrides = overrides
+        logger.info(f"Model overrides are now {overrides}")
+        return self.snapshot()
+
+    def snapshot(self) -> dict:
+        """The effective configuration of every agent, and the overrides behind it."""
+        with self._lock:
+            self._refresh()
+            overrides = {name: dict(values) for name, values in self._overrides.items()}
+        return {
+            "agents": {name: asdict(self.get(name)) for name in sorted(self.defaults)},
+            "overrides": overrides,
+        }
+
+    def build_model(self, agent_name: str):
+        """The model object for an LlmAgent; see resilient_llm.resilient_model."""
+        from shared_libraries.resilient_llm import resilient_model
+
+        config = self.get(agent_name)
+        return resilient_model(config.model, hedge=config.hedge)
+
+    def apply(self, callback_context, llm_request):
+        """before_model_callback that sets the agent's current model and generation settings."""
+        config = self.get(callback_context.agent_name)
+        llm_request.model = config.model
+        if config.temperature is not None:
+            llm_request.config.temperature = config.temperature
+        if config.max_output_tokens is not None:
+            llm_request.config.max_output_tokens = config.max_output_tokens
+        return None
+
+
+def _initial_overrides() -> dict:
+    raw = os.getenv("AGENT_MODEL_OVERRIDES")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"AGENT_MODEL_OVERRIDES is not valid JSON: {e}") from e
+
+
+MODEL_CONFIG = ModelTiering(AGENT_MODELS, os.getenv("AGENT_MODEL_OVERRIDES_PATH"), _initial_overrides())
@@ -0,0 +1,295 @@
+"""
+Admission control for the A2A endpoint.
+
+RateLimitMiddleware is a plain ASGI middleware in front of the A2A JSON-RPC
+route. For requests that start agent work (message/send, message/stream) it
+checks, in order and before the request handler sees them:
+
+- a cap on such requests in flight (503 when reached),
+- a token bucket per client (429),
+- a token bucket per client and A2A context id (429).
+
+Rejections carry a JSON-RPC error body and a Retry-After header, so they
+cost no session, task or model work. Other methods (tasks/get, the agent
+card, ...) pass through untouched, so clients can keep polling while shed.
+
+The client is the value of RATE_LIMIT_CLIENT_HEADER when set (e.g. an API
+gateway's consumer header), otherwise the peer address as seen by uvicorn
+(which honours X-Forwarded-For from trusted proxies); both come from the
+headers. The method and context id are in the JSON-RPC body, so only its
+first RATE_LIMIT_PEEK_BYTES are read before admission: the whole body when
+it is that small, which a text message is, otherwise they are scanned for in
+that prefix. A truncated body whose method is not found counts as starting
+work. Clients may also name the context in RATE_LIMIT_CONTEXT_HEADER or the
+`contextId` query parameter. A rejected request's body is never read past
+the prefix, and admitted bodies are streamed on to the handler unbuffered.
+
+Limits are kept per process. MAX_IN_FLIGHT_REQUESTS is the cap for the whole
+server and is divided between the SERVER_WORKERS worker processes; the token
+buckets are not, so a client whose requests land on several workers gets up
+to the bucket rate on each of them.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import parse_qs
+
+from shared_libraries.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC methods that start an agent run.
+LIMITED_METHODS = frozenset({"message/send", "message/stream"})
+# JSON-RPC "server error" code used for shed requests.
+OVERLOADED_ERROR_CODE = -32000
+# Query parameter naming the A2A context of a request.
+CONTEXT_QUERY_PARAMETER = "contextId"
+
+# Fields looked for in a body prefix too large to parse; the method and id
+# are top-level members and a2a clients send them ahead of the params.
+_METHOD_PATTERN = re.compile(rb'"method"\s*:\s*"([^"\\]*)"')
+_ID_PATTERN = re.compile(rb'"id"\s*:\s*("[^"\\]*"|-?\d+)')
+_CONTEXT_PATTERN = re.compile(rb'"contextId"\s*:\s*"([^"\\]*)"')
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """Limits for work-starting A2A requests of one process; 0 disables a limit."""
+    client_per_minute: float = 60
+    context_per_minute: float = 20
+    burst: int = 10
+    max_in_flight: int = 32
+    client_header: str = ""
+    context_header: str = "x-a2a-context-id"
+    # Body bytes read to find the method and context id before admission.
+    peek_bytes: int = 8192
+    # Buckets kept in memory; the least recently used are dropped beyond this.
+    max_buckets: int = 10000
+
+    @classmethod
+    def from_env(cls, workers: int = 1) -> "RateLimitConfig":
+        """Reads the limits; MAX_IN_FLIGHT_REQUESTS is shared out between `workers` processes."""
+        max_in_flight = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", cls.max_in_flight))
+        return cls(
+            client_per_minute=float(os.getenv("RATE_LIMIT_CLIENT_PER_MINUTE", cls.client_per_minute)),
+            context_per_minute=float(os.getenv("RATE_LIMIT_CONTEXT_PER_MINUTE", cls.context_per_minute)),
+            burst=int(os.getenv("RATE_LIMIT_BURST", cls.burst)),
+            max_in_flight=math.ceil(max_in_flight / max(1, workers)) if max_in_flight > 0 else 0,
+            client_header=os.getenv("RATE_LIMIT_CLIENT_HEADER", cls.client_header).lower(),
+            context_header=os.getenv("RATE_LIMIT_CONTEXT_HEADER", cls.context_header).lower(),
+            peek_bytes=int(os.getenv("RATE_LIMIT_PEEK_BYTES", cls.peek_bytes)),
+            max_buckets=int(os.getenv("RATE_LIMIT_MAX_BUCKETS", cls.max_buckets)),
+        )
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets refilled at `per_minute` up to `burst`, one per key.
+
+    Only used from the event loop, so it needs no lock. A bucket that has
+    been idle long enough is full again, which is what a new bucket is, so
+    evicting the least recently used ones loses nothing that matters.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_buckets: int, name: str):
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_buckets = max_buckets
+        self.name = name
+        # key -> (tokens, monotonic time of the last refill)
+        self._buckets: OrderedDict[tuple, tuple[float, float]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _tokens(self, key: tuple, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key: tuple, now: Optional[float] = None) -> float:
+        """Seconds until `key` has a whole token; 0 if it has one now."""
+        if not self.enabled:
+            return 0.0
+        tokens = self._tokens(key, time.monotonic() if now is None else now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key: tuple, now: Optional[float] = None) -> None:
+        """Spends one token of `key`; call retry_after first."""
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        METRICS.gauge("rate_limit_buckets", "Token buckets held in memory.", scope=self.name).set(len(self._buckets))
+
+
+class RateLimitMiddleware:
+    """ASGI middleware that sheds work-starting A2A requests over the limits; see the module docstring."""
+
+    def __init__(self, app, rpc_path: str = "/", config: Optional[RateLimitConfig] = None):
+        self.app = app
+        self.rpc_path = rpc_path
+        self.config = config or RateLimitConfig.from_env()
+        self.clients = TokenBucketLimiter(
+            self.config.client_per_minute, self.config.burst, self.config.max_buckets, "client")
+        self.contexts = TokenBucketLimiter(
+            self.config.context_per_minute, self.config.burst, self.config.max_buckets, "context")
+        self.in_flight = 0
+        self._in_flight_gauge = METRICS.gauge(
+            "a2a_requests_in_flight", "Work-starting A2A requests being handled by this process.")
+
+    def _header(self, scope, header: str) -> Optional[str]:
+        for name, value in scope.get("headers") or ():
+            if name.decode("latin-1") == header:
+                return value.decode("latin-1")
+        return None
+
+    def _client_id(self, scope) -> str:
+        if self.config.client_header:
+            value = self._header(scope, self.config.client_header)
+            if value is not None:
+                return "header:" + value
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _request_context_id(self, scope) -> Optional[str]:
+        """The context id named by the request's header or query string, if any."""
+        if self.config.context_header:
+            value = self._header(scope, self.config.context_header)
+            if value:
+                return value
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return query.get(CONTEXT_QUERY_PARAMETER, [None])[0]
+
+    async def _peek(self, receive) -> Optional[tuple[bytes, bool]]:
+        """Reads the body up to peek_bytes. Returns (prefix, more_body), or None if the client went away."""
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body and size < self.config.peek_bytes:
+            message = await receive()
+            if message["type"] != "http.request":
+                return None
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more_body = message.get("more_body", False)
+        return b"".join(chunks), more_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.rpc_path:
+            await self.app(scope, receive, send)
+            return
+
+        client = self._client_id(scope)
+        peeked = await self._peek(receive)
+        if peeked is None:
+            return
+        prefix, more_body = peeked
+        replayed = False
+
+        async def replay():
+            # The prefix goes downstream first, then the rest of the body as it arrives.
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": prefix, "more_body": more_body}
+            return await receive()
+
+        method, request_id, context_id = _scan_body(prefix, complete=not more_body)
+        limited = method in LIMITED_METHODS or (more_body and method is None)
+        if not limited:
+            # Other methods, and malformed requests, are left to the A2A handler.
+            await self.app(scope, replay, send)
+            return
+
+        rejection = self._admit(client, self._request_context_id(scope) or context_id)
+        if rejection is not None:
+            status, reason, retry_after = rejection
+            await self._reject(send, request_id, status, reason, retry_after)
+            return
+
+        self.in_flight += 1
+        self._in_flight_gauge.set(self.in_flight)
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            self.in_flight -= 1
+            self._in_flight_gauge.set(self.in_flight)
+
+    def _admit(self, client: str, context_id: Optional[str]) -> Optional[tuple[int, str, float]]:
+        """Returns (HTTP status, reason, retry after seconds) to shed the request, or None to admit it."""
+        config = self.config
+        if config.max_in_flight > 0 and self.in_flight >= config.max_in_flight:
+            return 503, "in_flight", 1.0
+        now = time.monotonic()
+        wait = self.clients.retry_after((client,), now)
+        if wait > 0:
+            return 429, "client", wait
+        # A message without a context id starts a new conversation; the client bucket covers those.
+        if context_id is not None:
+            wait = self.contexts.retry_after((client, context_id), now)
+            if wait > 0:
+                return 429, "context", wait
+            self.contexts.take((client, context_id), now)
+        self.clients.take((client,), now)
+        METRICS.counter("rate_limit_admitted_total", "Work-starting A2A requests admitted.").inc()
+        return None
+
+    async def _reject(self, send, request_id, status: int, reason: str, retry_after: float) -> None:
+        METRICS.counter("rate_limit_rejected_total", "Work-starting A2A requests shed.", reason=reason).inc()
+        logger.warning(f"Shedding A2A request ({reason}), retry after {retry_after:.1f}s")
+        message = ("Server is busy, retry later." if reason == "in_flight"
+                   else "Too many requests, retry later.")
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": OVERLOADED_ERROR_CODE, "message": message, "data": {"reason": reason}},
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _scan_body(body: bytes, complete: bool) -> tuple[Optional[str], object, Optional[str]]:
+    """
+    Returns the (method, id, message contextId) of a JSON-RPC request body,
+    parsed when `complete`, otherwise scanned for in the prefix; None for those not found.
+    """
+    if complete:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None, None, None
+        if not isinstance(payload, dict):
+            return None, None, None
+        params = payload.get("params")
+        message = params.get("message") if isinstance(params, dict) else None
+        context_id = message.get("contextId") if isinstance(message, dict) else None
+        return payload.get("method"), payload.get("id"), context_id
+    found = [pattern.search(body) for pattern in (_METHOD_PATTERN, _ID_PATTERN, _CONTEXT_PATTERN)]
+    method, request_id, context_id = (match.group(1) if match else None for match in found)
+    try:
+        request_id = json.loads(request_id) if request_id is not None else None
+    except ValueError:
+        request_id = None
+    return (
+        method.decode("utf-8", "replace") if method is not None else None,
+        request_id,
+        context_id.decode("utf-8", "replace") if context_id is not None else None,
+    )
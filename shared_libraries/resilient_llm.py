@@ -0,0 +1,268 @@
+"""
+Resilient model calls for every LlmAgent.
+
+ResilientLlm wraps the real model (Gemini, or FakeLlm when LLM_FAKE_SCRIPT
+is set) and gives each model call:
+
+- a deadline: LLM_ATTEMPT_TIMEOUT_SECONDS to the first response of an
+  attempt, LLM_CALL_DEADLINE_SECONDS for the whole call including retries;
+- retries of transient failures (timeouts, 408/429/5xx, connection errors)
+  with full-jitter exponential backoff, as long as nothing was streamed yet;
+- optional hedging: for agents built with hedge=True, a second identical
+  request is sent if the first has not answered within
+  LLM_HEDGE_AFTER_SECONDS, and whichever answers first is used;
+- a circuit breaker per model name, shared by all agents calling that model.
+  After LLM_BREAKER_FAILURES consecutive failed calls it opens and calls fail
+  at once for LLM_BREAKER_RESET_SECONDS, then a single probe is let through.
+
+A call that cannot be served raises ModelUnavailableError. The executor turns
+that into a degraded reply instead of failing the A2A task.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+import httpx
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors
+from pydantic import Field
+
+from shared_libraries.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying; other client errors would fail again.
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class ModelUnavailableError(RuntimeError):
+    """The model could not be reached: its circuit is open or every attempt failed."""
+
+
+@dataclass(frozen=True)
+class ResilienceConfig:
+    """Deadlines, retry, hedging and circuit breaker settings for model calls."""
+    attempt_timeout: float = 20.0
+    deadline: float = 60.0
+    max_attempts: int = 3
+    retry_base: float = 0.5
+    retry_max: float = 4.0
+    hedge_after: float = 0.0
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ResilienceConfig":
+        return cls(
+            attempt_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", cls.attempt_timeout)),
+            deadline=float(os.getenv("LLM_CALL_DEADLINE_SECONDS", cls.deadline)),
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", cls.max_attempts)),
+            retry_base=float(os.getenv("LLM_RETRY_BASE_SECONDS", cls.retry_base)),
+            retry_max=float(os.getenv("LLM_RETRY_MAX_SECONDS", cls.retry_max)),
+            hedge_after=float(os.getenv("LLM_HEDGE_AFTER_SECONDS", cls.hedge_after)),
+            breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", cls.breaker_failures)),
+            breaker_reset=float(os.getenv("LLM_BREAKER_RESET_SECONDS", cls.breaker_reset)),
+        )
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. Only used from the event loop.
+
+    closed: calls go through. open: calls are refused until `reset_seconds`
+    have passed. half_open: one probe call goes through; its outcome closes
+    or reopens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self._gauge = METRICS.gauge("llm_circuit_state", "0 closed, 1 half-open, 2 open.", model=name)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Model circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._gauge.set(BREAKER_STATES[state])
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0 or self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+            self._set_state("half_open")
+            self.probe_started = now
+            return True
+        if self.state == "half_open" and now - self.probe_started >= self.reset_seconds:
+            # The probe was abandoned without an outcome; send another.
+            self.probe_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or (0 < self.failure_threshold <= self.failures):
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+
+CIRCUIT_BREAKERS: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(model: str, config: ResilienceConfig) -> CircuitBreaker:
+    if model not in CIRCUIT_BREAKERS:
+        CIRCUIT_BREAKERS[model] = CircuitBreaker(model, config.breaker_failures, config.breaker_reset)
+    return CIRCUIT_BREAKERS[model]
+
+
+async def _close(responses, pending: Optional[asyncio.Task]) -> None:
+    """Abandons a response stream, cancelling its in-flight read first."""
+    if pending is not None and not pending.done():
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+    try:
+        await responses.aclose()
+    except Exception:
+        pass
+
+
+class ResilientLlm(BaseLlm):
+    """A BaseLlm that calls `inner` with deadlines, retries, hedging and a circuit breaker."""
+
+    inner: BaseLlm
+    hedge: bool = False
+    config: ResilienceConfig = Field(default_factory=ResilienceConfig.from_env)
+
+    async def _first_response(self, llm_request: LlmRequest, stream: bool, timeout: float):
+        """
+        Starts one request, plus a hedged duplicate if it is slow, and returns
+        (stream, first response) of whichever answers first.
+        """
+        primary = self.inner.generate_content_async(llm_request, stream=stream)
+        streams = {asyncio.ensure_future(primary.__anext__()): primary}
+        started = time.monotonic()
+        try:
+            if self.hedge and 0 < self.config.hedge_after < timeout:
+                done, _ = await asyncio.wait(streams, timeout=self.config.hedge_after)
+                if not done:
+                    # A copy, since the model may adjust the request while sending it.
+                    hedged = self.inner.generate_content_async(llm_request.model_copy(deep=True), stream=stream)
+                    streams[asyncio.ensure_future(hedged.__anext__())] = hedged
+                    METRICS.counter("llm_hedged_requests_total", "Hedged model requests sent.",
+                                    model=llm_request.model or self.model).inc()
+            error = None
+            while streams:
+                remaining = timeout - (time.monotonic() - started)
+                done, _ = await asyncio.wait(streams, timeout=max(0.0, remaining),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError(f"No model response within {timeout:.1f}s")
+                for task in done:
+                    responses = streams.pop(task)
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        # An empty stream answers with None.
+                        winner = (responses, None if task.exception() else task.result())
+                        for other_task, other in streams.items():
+                            await _close(other, other_task)
+                        streams.clear()
+                        return winner
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task, responses in streams.items():
+                await _close(responses, task)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        config = self.config
+        # The request names the model actually called, which model_config may have overridden.
+        model = llm_request.model or self.model
+        breaker = get_circuit_breaker(model, config)
+        if not breaker.allow():
+            METRICS.counter("llm_calls_refused_total", "Model calls refused by an open circuit.", model=model).inc()
+            raise ModelUnavailableError(f"Model {model} is unavailable (circuit open)")
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = config.deadline - (time.monotonic() - started)
+            try:
+                responses, response = await self._first_response(
+                    llm_request, stream, min(config.attempt_timeout, remaining))
+                break
+            except Exception as e:
+                if not is_transient(e):
+                    # e.g. an invalid request; says nothing about the model's health.
+                    breaker.record_success()
+                    raise
+                backoff = random.uniform(0, min(config.retry_max, config.retry_base * 2 ** (attempt - 1)))
+                METRICS.counter("llm_call_failures_total", "Failed model call attempts.", model=model,
+                                error=type(e).__name__).inc()
+                if attempt >= config.max_attempts or time.monotonic() - started + backoff >= config.deadline:
+                    breaker.record_failure()
+                    raise ModelUnavailableError(f"Model {model} failed after {attempt} attempt(s): {e!r}") from e
+                logger.warning(f"Model call to {model} failed ({e!r}), retry {attempt} in {backoff:.2f}s")
+                METRICS.counter("llm_call_retries_total", "Model call attempts retried.", model=model).inc()
+                await asyncio.sleep(backoff)
+
+        # Once something has been yielded the call can no longer be retried.
+        try:
+            while response is not None:
+                yield response
+                remaining = config.deadline - (time.monotonic() - started)
+                try:
+                    response = await asyncio.wait_for(responses.__anext__(), timeout=max(0.0, remaining))
+                except StopAsyncIteration:
+                    response = None
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            breaker.record_failure()
+            raise ModelUnavailableError(f"Model {model} failed while responding: {e!r}") from e
+        finally:
+            await _close(responses, None)
+        breaker.record_success()
+        METRICS.summary("llm_call_seconds", "Seconds per model call, retries included.",
+                        model=model).observe(time.monotonic() - started)
+
+
+def resilient_model(model: str, hedge: bool = False) -> ResilientLlm:
+    """
+    The model an LlmAgent should use. With LLM_FAKE_SCRIPT set, calls go to a
+    local FakeLlm instead of Gemini; see shared_libraries/fake_llm.py.
+    """
+    script = os.getenv("LLM_FAKE_SCRIPT")
+    if script:
+        from shared_libraries.fake_llm import FakeLlm
+
+        inner = FakeLlm(model=model, script=script.split(","))
+    else:
+        from google.adk.models.google_llm import Gemini
+
+        inner = Gemini(model=model)
+    return ResilientLlm(model=model, inner=inner, hedge=hedge)
+
@@ -0,0 +1,105 @@
+import asyncio
+import re
+import sqlite3
+from datetime import datetime
+
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions import Session
+from google.genai import types
+
+
+def _extract_words_lower(text: str) -> list[str]:
+    """Extracts words from a string and converts them to lowercase."""
+    return sorted(set(word.lower() for word in re.findall(r'[A-Za-z]+', text)))
+
+
+class SqliteMemoryService(BaseMemoryService):
+    """
+    A memory service backed by a local SQLite file with an FTS5 keyword index.
+
+    Unlike InMemoryMemoryService, every worker process sharing the file sees the
+    same memories. Matching stays keyword based, like the in-memory service.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS memory_events USING fts5(
+                    text,
+                    app_name UNINDEXED,
+                    user_id UNINDEXED,
+                    session_id UNINDEXED,
+                    event_id UNINDEXED,
+                    author UNINDEXED,
+                    timestamp UNINDEXED,
+                    content_json UNINDEXED
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _add_session(self, session: Session) -> None:
+        rows = []
+        for event in session.events:
+            if not event.content or not event.content.parts:
+                continue
+            text = ' '.join(part.text for part in event.content.parts if part.text)
+            if not text:
+                continue
+            rows.append((
+                text, session.app_name, session.user_id, session.id, event.id,
+                event.author, event.timestamp, event.content.model_dump_json(exclude_none=True),
+            ))
+        conn = self._connect()
+        try:
+            with conn:
+                # Re-adding a session replaces its previous snapshot, as in the in-memory service.
+                conn.execute(
+                    "DELETE FROM memory_events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                    (session.app_name, session.user_id, session.id),
+                )
+                conn.executemany("""
+                    INSERT INTO memory_events (text, app_name, user_id, session_id, event_id, author, timestamp, content_json)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+        finally:
+            conn.close()
+
+    def _search(self, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        words = _extract_words_lower(query)
+        response = SearchMemoryResponse()
+        if not words:
+            return response
+        match = ' OR '.join(f'"{word}"' for word in words)
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT author, timestamp, content_json FROM memory_events
+                WHERE memory_events MATCH ? AND app_name = ? AND user_id = ?
+                ORDER BY timestamp
+            """, (f"text : ({match})", app_name, user_id)).fetchall()
+        finally:
+            conn.close()
+        for author, timestamp, content_json in rows:
+            response.memories.append(
+                MemoryEntry(
+                    content=types.Content.model_validate_json(content_json),
+                    author=author,
+                    timestamp=datetime.fromtimestamp(timestamp).isoformat(),
+                )
+            )
+        return response
+
+    async def add_session_to_memory(self, session: Session):
+        await asyncio.to_thread(self._add_session, session)
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        return await asyncio.to_thread(self._search, app_name, user_id, query)
@@ -0,0 +1,133 @@
+"""
+Tenant resolution for multi-tenant deployments.
+
+With TENANT_DATABASE_DIR set, every city is a tenant with its own database
+(see sub_agents/ticket_management/database.py). TenantMiddleware is a plain
+ASGI middleware that picks the tenant of each HTTP request, in order:
+
+- a `/tenants/<tenant>` path prefix, which is stripped, so the agent card,
+  the A2A endpoint and every other route are served per tenant under it,
+- the TENANT_HEADER request header.
+
+It sets CURRENT_TENANT for the rest of the request; the A2A request handler
+starts agent runs from inside it, so their tool calls, and the tasks they
+spawn, open the tenant's database. Requests with neither use the default
+database, unless the A2A message names a tenant in its metadata (see
+adk_executor.py). Invalid tenant names get a 400, unknown tenants a 404.
+
+A tenant's agent card advertises the tenant's URL, so A2A clients that
+discover a city's card keep talking to that city.
+"""
+import json
+import os
+from typing import Optional
+
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH
+from shared_libraries.metrics import METRICS
+from sub_agents.ticket_management.database import (
+    CURRENT_TENANT, TENANT_DATABASE_DIR, current_tenant_label, tenant_exists, validate_tenant,
+)
+
+# Request header naming the tenant when the path does not.
+TENANT_HEADER = os.getenv("TENANT_HEADER", "x-tenant-id").lower()
+TENANT_PATH_PREFIX = "/tenants/"
+
+
+class TenantMiddleware:
+    """ASGI middleware that serves each request against its tenant's database; see the module docstring."""
+
+    def __init__(self, app, enabled: Optional[bool] = None, header: str = TENANT_HEADER):
+        self.app = app
+        self.enabled = bool(TENANT_DATABASE_DIR) if enabled is None else enabled
+        self.header = header.lower()
+
+    def _header_tenant(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers") or ():
+            if name.decode("latin-1") == self.header:
+                return value.decode("latin-1").strip() or None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        prefix = None
+        if path.startswith(TENANT_PATH_PREFIX):
+            tenant, _, rest = path[len(TENANT_PATH_PREFIX):].partition("/")
+            prefix = TENANT_PATH_PREFIX + tenant
+            scope = {
+                **scope,
+                "path": "/" + rest,
+                "raw_path": ("/" + rest).encode("latin-1"),
+                "root_path": scope.get("root_path", "") + prefix,
+            }
+        else:
+            tenant = self._header_tenant(scope)
+        if tenant is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            validate_tenant(tenant)
+        except ValueError as e:
+            await self._reject(send, 400, str(e))
+            return
+        if not tenant_exists(tenant):
+            await self._reject(send, 404, f"Unknown tenant: {tenant}")
+            return
+
+        token = CURRENT_TENANT.set(tenant)
+        try:
+            METRICS.counter("tenant_requests_total", "HTTP requests by tenant.", tenant=current_tenant_label()).inc()
+            if prefix is not None and scope["path"] == AGENT_CARD_WELL_KNOWN_PATH:
+                send = self._card_rewriter(send, prefix)
+            await self.app(scope, receive, send)
+        finally:
+            CURRENT_TENANT.reset(token)
+
+    @staticmethod
+    def _card_rewriter(send, prefix: str):
+        """Wraps `send` so the agent card's url points under the tenant's path prefix."""
+        start = None
+        chunks = []
+
+        async def rewrite(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if start["status"] == 200:
+                try:
+                    card = json.loads(body)
+                    card["url"] = card["url"].rstrip("/") + prefix + "/"
+                    body = json.dumps(card).encode()
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    pass  # Not a card; pass it through unchanged.
+            headers = [(name, value) for name, value in start.get("headers", ()) if name.lower() != b"content-length"]
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        return rewrite
+
+    @staticmethod
+    async def _reject(send, status: int, reason: str) -> None:
+        body = reason.encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
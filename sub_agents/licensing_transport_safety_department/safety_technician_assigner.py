@@ -1,113 +1,68 @@
-import sqlite3
-import os
 from datetime import date, datetime
-from sub_agents.ticket_management.ticket_manager import add_history_log
+from typing import Optional
+from sub_agents.ticket_management.availability import AVAILABILITY
+from sub_agents.ticket_management.dispatch import enqueue_ticket
+from sub_agents.ticket_management.idempotency import lookup, remember, request_key
+from sub_agents.ticket_management.technician_claims import (
+    CLAIMED, NO_TECHNICIAN, TICKET_UNAVAILABLE, assign_first_available, claim_technician,
+)
 
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared_libraries', 'city_office.db')
 
-def get_available_technicians(department="Licensing Transport Safety"):
+def get_available_technicians(department="Licensing Transport Safety", on_date=None):
     """
-    Queries the database to find available technicians in a specific department.
-    Availability is checked based on the technician_availability table and
-    if they are already assigned a ticket (assigned_ticket_id is NULL).
+    Finds the technicians in a specific department who are free on `on_date`
+    (today by default): they work that day according to the
+    technician_availability table and are not already assigned a ticket
+    (assigned_ticket_id is NULL). Answered from the in-memory availability
+    calendar, which follows the database.
     """
-    conn = None
-    available_techs = []
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Get technicians in the specified department who are not currently assigned a ticket
-        cursor.execute("""
-            SELECT t.id, t.name
-            FROM technicians t
-            WHERE t.department = ? AND t.assigned_ticket_id IS NULL
-        """, (department,))
-        technicians = cursor.fetchall()
-
-        # Check availability for today (simplified check)
-        # A more robust check would consider the specific time of the ticket
-        today_str = date.today().strftime('%Y-%m-%d')
-        for tech_id, tech_name in technicians:
-            cursor.execute("""
-                SELECT 1
-                FROM technician_availability
-                WHERE technician_id = ? AND available_date = ?
-            """, (tech_id, today_str))
-            if cursor.fetchone():
-                available_techs.append({'id': tech_id, 'name': tech_name})
-
-    except sqlite3.Error as e:
-        print(f"Database error in get_available_technicians: {e}")
-    except Exception as e:
-        print(f"An error occurred in get_available_technicians: {e}")
-    finally:
-        if conn:
-            conn.close()
-    return available_techs
+        return AVAILABILITY.free_technicians(department, on_date or date.today(), unassigned_only=True)
+    except ValueError:
+        print(f"Unrecognised work date {on_date!r}; checking availability for today instead.")
+        return AVAILABILITY.free_technicians(department, date.today(), unassigned_only=True)
 
 def assign_ticket_to_technician(ticket_id: int, technician_id: int, assigned_work_date: str):
     """
-    Assigns a ticket to a technician by updating the technicians table,
-    including the assigned work date.
+    Assigns a ticket to a technician, including the assigned work date, if the
+    technician is still free. The technician update, the ticket's assigned
+    technician and the history entry are committed together.
     """
-    conn = None
-    success = False
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-
-        # Update the technicians table
-        cursor.execute("""
-            UPDATE technicians
-            SET assigned_ticket_id = ?,
-                assigned_work_date = ?
-            WHERE id = ?
-        """, (ticket_id, assigned_work_date, technician_id))
-
-        # Update the tickets table with the assigned technician ID
-        cursor.execute("""
-            UPDATE tickets
-            SET assigned_technician_id = ?
-            WHERE id = ?
-        """, (technician_id, ticket_id))
-
-        conn.commit()
-        success = cursor.rowcount > 0
-        if success:
-            print(f"Ticket {ticket_id} assigned to technician {technician_id} with work date {assigned_work_date}.")
-            add_history_log(ticket_id, log_message=f"Assigned to technician {technician_id} for {assigned_work_date}.", assigned_technician_id=technician_id)
-        else:
-            print(f"Failed to assign ticket {ticket_id} to technician {technician_id}. Technician not found or already assigned?")
-
-    except sqlite3.Error as e:
-        print(f"Database error in assign_ticket_to_technician: {e}")
-    except Exception as e:
-        print(f"An error occurred in assign_ticket_to_technician: {e}")
-    finally:
-        if conn:
-            conn.close()
-    return success
+    outcome = claim_technician(ticket_id, technician_id, assigned_work_date)
+    if outcome != CLAIMED:
+        print(f"Failed to assign ticket {ticket_id} to technician {technician_id}: {outcome}.")
+        return False
+    print(f"Ticket {ticket_id} assigned to technician {technician_id} with work date {assigned_work_date}.")
+    return True
 
 # Define a tool for assigning tickets
-def assign_safety_ticket(ticket_id: int, assigned_work_date: str):
+def assign_safety_ticket(ticket_id: int, assigned_work_date: str, idempotency_key: Optional[str] = None):
     """
     Finds an available technician in the Licensing Transport Safety department
     and assigns the given ticket ID to them with a specified assigned work date.
+    Repeating a call returns its first result instead of assigning again;
+    `idempotency_key` defaults to one derived from the A2A message being served.
     """
-    available_techs = get_available_technicians("Licensing Transport Safety")
-
-    if not available_techs:
-        return "No available technicians found in the Licensing Transport Safety department."
-
-    # For simplicity, assign to the first available technician
-    technician_to_assign = available_techs[0]
-    success = assign_ticket_to_technician(ticket_id, technician_to_assign['id'], assigned_work_date)
-
-    if success:
-        return f"Ticket {ticket_id} successfully assigned to technician {technician_to_assign['name']} (ID: {technician_to_assign['id']}) for {assigned_work_date}."
-    else:
-        return f"Failed to assign ticket {ticket_id} to technician {technician_to_assign['name']}."
+    key = request_key('assign_ticket', idempotency_key, ticket_id)
+    previous = lookup('assign_ticket', key)
+    if previous is not None:
+        return previous
+
+    # Candidates are claimed one by one; one taken by a concurrent assignment is skipped
+    outcome, technician = assign_first_available(ticket_id, "Licensing Transport Safety", assigned_work_date, get_available_technicians)
+
+    if outcome == NO_TECHNICIAN:
+        # Queue the ticket; the dispatcher assigns it by priority once a technician frees up
+        position = enqueue_ticket(ticket_id, "Licensing Transport Safety", assigned_work_date)
+        if position is None:
+            return f"No available technicians found in the Licensing Transport Safety department, and ticket {ticket_id} could not be queued."
+        return remember('assign_ticket', key, f"No available technicians found in the Licensing Transport Safety department right now. Ticket {ticket_id} is queued for dispatch at position {position} and will be assigned automatically.")
+
+    if outcome == CLAIMED:
+        return remember('assign_ticket', key, f"Ticket {ticket_id} successfully assigned to technician {technician['name']} (ID: {technician['id']}) for {assigned_work_date}.")
+    if outcome == TICKET_UNAVAILABLE:
+        return f"Ticket {ticket_id} was not assigned: it does not exist or is already assigned to another technician."
+    return f"Failed to assign ticket {ticket_id}."
 
 # Example Usage (for testing purposes, can be removed later)
 # if __name__ == '__main__':
@@ -126,7 +81,7 @@ def assign_safety_ticket(ticket_id: int, assigned_work_date: str):
 #         if assign_success:
 #             conn = None
 #             try:
-#                 conn = sqlite3.connect(DATABASE_PATH)
+#                 conn = get_db_connection()
 #                 cursor = conn.cursor()
 #                 cursor.execute("SELECT assigned_ticket_id FROM technicians WHERE id = ?", (tech_to_assign['id'],))
 #                 assigned_id = cursor.fetchone()[0]
@@ -0,0 +1,275 @@
+"""
+Hot/cold partitioning of tickets.
+
+Resolved tickets whose last activity is older than TICKET_ARCHIVE_AFTER_DAYS
+are moved, with their history and snapshots, from the hot database into
+monthly archive databases named after the month of that last activity, e.g.
+archives/city_office-2025-06.db. The hot `archived_tickets` table records
+which file each ticket went to, so a lookup attaches exactly one archive.
+
+Run once from the repository root with:
+    python -m sub_agents.ticket_management.archive [--older-than-days N]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+from sub_agents.ticket_management import database
+from sub_agents.ticket_management.database import (
+    DEFAULT_TENANT, READ_POOLS, get_db_connection, list_tenants, use_tenant,
+)
+from sub_agents.ticket_management.idempotency import purge_expired
+from shared_libraries.metrics import METRICS
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("TICKET_ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_STATUSES = tuple(
+    s.strip().lower() for s in os.getenv("TICKET_ARCHIVE_STATUSES", "Resolved,Closed").split(",") if s.strip()
+)
+# Tickets moved per transaction; bounds how long the hot database is write-locked.
+ARCHIVE_BATCH_SIZE = int(os.getenv("TICKET_ARCHIVE_BATCH_SIZE", "500"))
+# Seconds between maintenance runs of the background scheduler; 0 disables it.
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("TICKET_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+# Free pages returned to the file system per maintenance run.
+INCREMENTAL_VACUUM_PAGES = int(os.getenv("TICKET_INCREMENTAL_VACUUM_PAGES", "1000"))
+
+# Tables moved per ticket, with the column that holds the ticket id.
+ARCHIVED_TABLES = (('tickets', 'id'), ('history', 'ticket_id'), ('ticket_snapshots', 'ticket_id'))
+ARCHIVE_SCHEMA = 'archive'
+
+_CREATE_TABLE_PREFIX = re.compile(r'^\s*CREATE\s+TABLE\s+(?:"?\w+"?\s*\.\s*)?"?(\w+)"?', re.IGNORECASE)
+
+
+def archive_dir_for(database_path: Optional[str] = None) -> str:
+    """Returns the directory holding the archives of a hot database."""
+    database_path = database_path or database.current_database_path()
+    return os.getenv("TICKET_ARCHIVE_DIR") or os.path.join(os.path.dirname(os.path.abspath(database_path)), 'archives')
+
+
+def archive_file_name(database_path: str, month: str) -> str:
+    """Returns the archive file name for tickets last active in `month` ('YYYY-MM')."""
+    stem = os.path.splitext(os.path.basename(database_path))[0]
+    return f"{stem}-{month}.db"
+
+
+def _archivable_condition() -> tuple[str, list]:
+    placeholders = ", ".join("?" for _ in ARCHIVE_STATUSES)
+    return (
+        f"LOWER(status) IN ({placeholders}) AND updated_at < datetime('now', ?)",
+        list(ARCHIVE_STATUSES),
+    )
+
+
+def _sync_archive_table(cursor, table: str) -> list[str]:
+    """
+    Creates `table` in the attached archive from the hot table's definition,
+    or adds the columns it is missing if an older schema created it.
+
+    Returns the hot table's column names.
+    """
+    cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    create_sql = cursor.fetchone()[0]
+    cursor.execute(
+        _CREATE_TABLE_PREFIX.sub(f'CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}."{table}"', create_sql, count=1)
+    )
+    hot_columns = cursor.execute(f'PRAGMA main.table_info("{table}")').fetchall()
+    archive_columns = {row[1] for row in cursor.execute(f'PRAGMA {ARCHIVE_SCHEMA}.table_info("{table}")')}
+    for row in hot_columns:
+        name, declared_type = row[1], row[2]
+        if name not in archive_columns:
+            cursor.execute(f'ALTER TABLE {ARCHIVE_SCHEMA}."{table}" ADD COLUMN "{name}" {declared_type}')
+    if table != 'tickets':
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}."idx_{table}_ticket_id" ON "{table}" (ticket_id)'
+        )
+    return [row[1] for row in hot_columns]
+
+
+def _archive_month(conn, database_path: str, month: str, older_than_days: int) -> int:
+    """Moves one batch of archivable tickets last active in `month`. Returns how many were moved."""
+    archive_dir = archive_dir_for(database_path)
+    os.makedirs(archive_dir, exist_ok=True)
+    file_name = archive_file_name(database_path, month)
+    condition, params = _archivable_condition()
+    cursor = conn.cursor()
+    # ATTACH is not allowed inside a transaction, so it brackets the BEGIN/COMMIT.
+    cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (os.path.join(archive_dir, file_name),))
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (ticket_id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM temp.archive_batch")
+            cursor.execute(f'''
+                INSERT INTO temp.archive_batch
+                SELECT id FROM main.tickets
+                WHERE {condition} AND strftime('%Y-%m', updated_at) = ?
+                ORDER BY id LIMIT ?
+            ''', params + [f"-{older_than_days} days", month, ARCHIVE_BATCH_SIZE])
+            moved = cursor.rowcount
+            if moved > 0:
+                for table, key in ARCHIVED_TABLES:
+                    columns = ", ".join(f'"{c}"' for c in _sync_archive_table(cursor, table))
+                    cursor.execute(f'''
+                        INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}."{table}" ({columns})
+                        SELECT {columns} FROM main."{table}"
+                        WHERE {key} IN (SELECT ticket_id FROM temp.archive_batch)
+                    ''')
+                # Children first, so the hot database never holds orphaned history.
+                for table, key in reversed(ARCHIVED_TABLES):
+                    cursor.execute(f'''
+                        DELETE FROM main."{table}"
+                        WHERE {key} IN (SELECT ticket_id FROM temp.archive_batch)
+                    ''')
+                cursor.execute('DELETE FROM main.ticket_locations WHERE id IN (SELECT ticket_id FROM temp.archive_batch)')
+                # The report aggregates stay; only the per-ticket state they were built from goes.
+                cursor.execute('DELETE FROM main.report_ticket_state WHERE ticket_id IN (SELECT ticket_id FROM temp.archive_batch)')
+                cursor.execute('''
+                    INSERT OR REPLACE INTO main.archived_tickets (ticket_id, archive_file)
+                    SELECT ticket_id, ? FROM temp.archive_batch
+                ''', (file_name,))
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    finally:
+        cursor.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+    return moved
+
+
+def archive_resolved_tickets(older_than_days: Optional[int] = None, database_path: Optional[str] = None) -> Optional[dict]:
+    """
+    Moves resolved tickets whose last activity is older than `older_than_days`
+    into the monthly archive databases.
+
+    Args:
+        older_than_days: Minimum age in days; defaults to TICKET_ARCHIVE_AFTER_DAYS.
+        database_path: The hot database; defaults to the city office database.
+    Returns:
+        A dictionary mapping archive file names to the number of tickets moved
+        into them, or None on a database error.
+    """
+    older_than_days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    database_path = database_path or database.current_database_path()
+    conn = get_db_connection(database_path)
+    if conn is None:
+        return None
+    # Explicit BEGIN/COMMIT below; autocommit mode keeps sqlite3 from opening its own.
+    conn.isolation_level = None
+    moved_per_file = {}
+    try:
+        condition, params = _archivable_condition()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT DISTINCT strftime('%Y-%m', updated_at) FROM tickets
+            WHERE {condition} ORDER BY 1
+        ''', params + [f"-{older_than_days} days"])
+        for (month,) in cursor.fetchall():
+            while True:
+                moved = _archive_month(conn, database_path, month, older_than_days)
+                if moved:
+                    file_name = archive_file_name(database_path, month)
+                    moved_per_file[file_name] = moved_per_file.get(file_name, 0) + moved
+                    METRICS.counter("tickets_archived_total", "Tickets moved to archive databases.").inc(moved)
+                if moved < ARCHIVE_BATCH_SIZE:
+                    break
+        if moved_per_file:
+            print(f"Archived tickets: {moved_per_file}")
+        return moved_per_file
+    except sqlite3.Error as e:
+        print(f"Error archiving tickets: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def attach_ticket_archive(conn, ticket_id, database_path: Optional[str] = None) -> Optional[str]:
+    """
+    Attaches the archive holding `ticket_id` to `conn` as schema 'archive'.
+
+    Returns the archive file name, or None if the ticket was never archived.
+    The caller detaches it with `DETACH DATABASE archive`.
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT archive_file FROM archived_tickets WHERE ticket_id = ?', (ticket_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    archive_path = os.path.join(archive_dir_for(database_path), row[0])
+    if not os.path.exists(archive_path):
+        print(f"Archive {archive_path} for ticket {ticket_id} is missing.")
+        return None
+    cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+    return row[0]
+
+
+def run_maintenance(database_path: Optional[str] = None, older_than_days: Optional[int] = None) -> None:
+    """Archives old resolved tickets, purges expired idempotency keys, frees pages and refreshes planner statistics."""
+    started = time.perf_counter()
+    archive_resolved_tickets(older_than_days, database_path)
+    conn = get_db_connection(database_path)
+    if conn is None:
+        return
+    conn.isolation_level = None
+    try:
+        cursor = conn.cursor()
+        purge_expired(cursor)
+        # Incremental vacuum only works once auto_vacuum is INCREMENTAL, and
+        # switching an existing database over takes one full VACUUM.
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("VACUUM")
+        cursor.execute(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES})").fetchall()
+        cursor.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        print(f"Error running database maintenance: {e}")
+    finally:
+        conn.close()
+        METRICS.summary(
+            "ticket_maintenance_duration_seconds", "Duration of archival and vacuum runs."
+        ).observe(time.perf_counter() - started)
+
+
+class MaintenanceScheduler:
+    """
+    Runs run_maintenance() every `interval_seconds` on a daemon thread, on
+    `database_path` if given, else on every tenant's database in turn.
+    """
+
+    def __init__(self, interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS, database_path: Optional[str] = None):
+        self.interval_seconds = interval_seconds
+        self.database_path = database_path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ticket-maintenance", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        # Wait one interval first so maintenance never competes with startup.
+        while not self._stop.wait(self.interval_seconds):
+            for tenant in [None] if self.database_path else list_tenants():
+                try:
+                    with use_tenant(tenant):
+                        run_maintenance(self.database_path)
+                except Exception as e:
+                    print(f"Ticket maintenance run failed for tenant {tenant or DEFAULT_TENANT}: {e}")
+            READ_POOLS.close_idle()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Archive resolved tickets and vacuum the hot database.")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--database", default=None, help="Hot database path (default: the city office database).")
+    args = parser.parse_args()
+    run_maintenance(args.database, args.older_than_days)
@@ -0,0 +1,369 @@
+"""
+In-memory calendar of when technicians are free.
+
+technician_availability holds one row per technician and working day. The
+calendar keeps each technician's working days as a bitmap of the days since
+its origin, 64 days to a uint64 word, next to their department, name,
+assigned ticket and assigned work date. Department-wide questions, such as
+who is free on any day next week or when each technician is next free, are
+then a few NumPy operations over one block of words instead of a query per
+technician and day.
+
+A technician is free on a day when they work that day and no assignment is
+booked on it. Assigners also require that they hold no ticket at all, since
+a technician works one ticket at a time.
+
+Triggers (see database.py) bump technician_versions whenever a technician or
+their availability changes, whoever writes it. Before answering, the
+calendar re-reads only the technicians whose version moved, at most every
+AVAILABILITY_SYNC_SECONDS. A calendar that is behind can only offer a
+technician who was just taken, and claims are compare-and-set (see
+technician_claims.py), so the assignment moves on to the next candidate.
+
+AVAILABILITY answers from the calendar of the tenant being served; see
+database.CURRENT_TENANT.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Iterable, Optional, Union
+import numpy as np
+from sub_agents.ticket_management import database
+from sub_agents.ticket_management.database import read_connection
+
+# Seconds a calendar may go without checking technician_versions; 0 checks before every query.
+AVAILABILITY_SYNC_SECONDS = float(os.getenv("AVAILABILITY_SYNC_SECONDS", "0"))
+# How far ahead earliest-free-date queries look.
+AVAILABILITY_SEARCH_DAYS = int(os.getenv("AVAILABILITY_SEARCH_DAYS", "366"))
+
+WORD_DAYS = 64
+_ALL_DAYS = np.uint64(0xFFFFFFFFFFFFFFFF)
+_ONE = np.uint64(1)
+
+Day = Union[date, str]
+
+
+def parse_day(value: Day) -> date:
+    """Accepts a date, 'YYYY-MM-DD' (availability) or 'DD-MM-YYYY' (work dates). Raises ValueError."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = value.strip()
+    if len(value) == 10 and value[2] == '-':
+        return datetime.strptime(value, '%d-%m-%Y').date()
+    return date.fromisoformat(value)
+
+
+class AvailabilityCalendar:
+    """Technician working days as packed bitmaps, kept in step with the database. Thread-safe."""
+
+    def __init__(self, sync_seconds: float = AVAILABILITY_SYNC_SECONDS, database_path: Optional[str] = None):
+        self.sync_seconds = sync_seconds
+        # None follows the current tenant's database, reloading when it changes
+        self.database_path = database_path
+        self._lock = threading.Lock()
+        self._database_path: Optional[str] = None
+        self._synced_at = 0.0
+        self._version = 0
+        self._origin = date.today()
+        self._ids: list[int] = []
+        self._rows: dict[int, int] = {}
+        self._names: list[Optional[str]] = []
+        self._departments: list[Optional[str]] = []
+        self._by_department: dict[str, np.ndarray] = {}
+        self._holding = np.zeros(0, dtype=bool)
+        self._booked = np.zeros(0, dtype=np.int64)
+        self._bits = np.zeros((0, 1), dtype=np.uint64)
+
+    # Loading
+
+    def _day_index(self, value: Optional[str]) -> int:
+        """Days from the origin to `value`, or -1 for no or unparseable dates."""
+        if not value:
+            return -1
+        try:
+            return (parse_day(value) - self._origin).days
+        except ValueError:
+            return -1
+
+    def _ensure_days(self, last_day: int) -> None:
+        words = last_day // WORD_DAYS + 1
+        if words > self._bits.shape[1]:
+            grown = np.zeros((self._bits.shape[0], max(words, 2 * self._bits.shape[1])), dtype=np.uint64)
+            grown[:, :self._bits.shape[1]] = self._bits
+            self._bits = grown
+
+    def _ensure_row(self, technician_id: int) -> int:
+        row = self._rows.get(technician_id)
+        if row is not None:
+            return row
+        row = len(self._ids)
+        self._rows[technician_id] = row
+        self._ids.append(technician_id)
+        self._names.append(None)
+        self._departments.append(None)
+        self._holding = np.append(self._holding, False)
+        self._booked = np.append(self._booked, -1)
+        self._bits = np.vstack([self._bits, np.zeros((1, self._bits.shape[1]), dtype=np.uint64)])
+        return row
+
+    def _set_days(self, rows: np.ndarray, days: np.ndarray) -> None:
+        if len(days):
+            self._ensure_days(int(days.max()))
+            np.bitwise_or.at(self._bits, (rows, days // WORD_DAYS), _ONE << (days % WORD_DAYS).astype(np.uint64))
+
+    def _index_departments(self) -> None:
+        departments = np.array(self._departments, dtype=object)
+        self._by_department = {
+            name: np.flatnonzero(departments == name) for name in set(self._departments) if name is not None
+        }
+
+    def _load_all(self, conn) -> None:
+        self._version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM technician_versions').fetchone()[0]
+        technicians = conn.execute(
+            'SELECT id, name, department, assigned_ticket_id, assigned_work_date FROM technicians ORDER BY id'
+        ).fetchall()
+        availability = conn.execute('SELECT technician_id, available_date FROM technician_availability').fetchall()
+        dates = {}
+        for _, available_date in availability:
+            if available_date not in dates:
+                try:
+                    dates[available_date] = parse_day(available_date)
+                except ValueError:
+                    dates[available_date] = None
+        known = [d for d in dates.values() if d is not None]
+        self._origin = min(known + [date.today()])
+        self._ids = [row[0] for row in technicians]
+        self._rows = {technician_id: row for row, technician_id in enumerate(self._ids)}
+        self._names = [row[1] for row in technicians]
+        self._departments = [row[2] for row in technicians]
+        self._holding = np.array([row[3] is not None for row in technicians], dtype=bool)
+        self._booked = np.array(
+            [self._day_index(row[4]) if row[3] is not None else -1 for row in technicians], dtype=np.int64
+        )
+        self._bits = np.zeros((len(self._ids), 1), dtype=np.uint64)
+        pairs = [(self._rows[t], (dates[d] - self._origin).days)
+                 for t, d in availability if t in self._rows and dates[d] is not None]
+        if pairs:
+            rows, days = np.array(pairs, dtype=np.int64).T
+            self._set_days(rows, days)
+        self._index_departments()
+
+    def _load_technicians(self, conn, technician_ids: Iterable[int]) -> bool:
+        """Re-reads some technicians. Returns False if a full reload is needed instead."""
+        for technician_id in technician_ids:
+            technician = conn.execute(
+                'SELECT name, department, assigned_ticket_id, assigned_work_date FROM technicians WHERE id = ?',
+                (technician_id,),
+            ).fetchone()
+            days = []
+            for (available_date,) in conn.execute(
+                'SELECT available_date FROM technician_availability WHERE technician_id = ?', (technician_id,)
+            ):
+                day = self._day_index(available_date)
+                if day < 0:
+                    # Before the origin: the bitmaps have to be rebuilt from an earlier origin.
+                    return False
+                days.append(day)
+            row = self._ensure_row(technician_id)
+            self._bits[row] = 0
+            if technician is None:
+                self._names[row], self._departments[row] = None, None
+                self._holding[row], self._booked[row] = False, -1
+                continue
+            self._names[row], self._departments[row] = technician[0], technician[1]
+            self._holding[row] = technician[2] is not None
+            self._booked[row] = self._day_index(technician[3]) if technician[2] is not None else -1
+            self._set_days(np.full(len(days), row, dtype=np.int64), np.array(days, dtype=np.int64))
+        self._index_departments()
+        return True
+
+    def _sync(self) -> None:
+        """Brings the calendar up to date with its database. Called with the lock held."""
+        path = self.database_path or database.current_database_path()
+        if path == self._database_path and time.monotonic() - self._synced_at < self.sync_seconds:
+            return
+        try:
+            with read_connection(path) as conn:
+                if path != self._database_path:
+                    self._load_all(conn)
+                    self._database_path = path
+                else:
+                    changed = conn.execute(
+                        'SELECT technician_id, version FROM technician_versions WHERE version > ?', (self._version,)
+                    ).fetchall()
+                    if changed:
+                        if not self._load_technicians(conn, [row[0] for row in changed]):
+                            self._load_all(conn)
+                        self._version = max(self._version, max(row[1] for row in changed))
+            self._synced_at = time.monotonic()
+        except sqlite3.Error as e:
+            # Answers come from the last good state until the database is readable again
+            print(f"Error syncing the availability calendar: {e}")
+
+    # Queries
+
+    def _rows_for(self, department: Optional[str]) -> np.ndarray:
+        if department is None:
+            return np.flatnonzero(np.array([d is not None for d in self._departments], dtype=bool))
+        return self._by_department.get(department, np.zeros(0, dtype=np.int64))
+
+    def _free_words(self, rows: np.ndarray, first_day: int, last_day: int) -> tuple[np.ndarray, np.ndarray]:
+        """The bitmap words of `rows` covering the days first_day..last_day, with other days and booked days cleared."""
+        self._ensure_days(last_day)
+        first_word, last_word = first_day // WORD_DAYS, last_day // WORD_DAYS
+        mask = np.full(last_word - first_word + 1, _ALL_DAYS, dtype=np.uint64)
+        mask[0] &= _ALL_DAYS << np.uint64(first_day % WORD_DAYS)
+        mask[-1] &= _ALL_DAYS >> np.uint64(WORD_DAYS - 1 - last_day % WORD_DAYS)
+        words = self._bits[rows, first_word:last_word + 1] & mask
+        booked = self._booked[rows]
+        hit = np.flatnonzero((booked >= first_day) & (booked <= last_day))
+        if len(hit):
+            words[hit, booked[hit] // WORD_DAYS - first_word] &= ~(_ONE << (booked[hit] % WORD_DAYS).astype(np.uint64))
+        return words, mask
+
+    def _window(self, start: Day, end: Optional[Day]) -> tuple[int, int]:
+        first_day = (parse_day(start) - self._origin).days
+        last_day = (parse_day(end) - self._origin).days if end is not None else first_day
+        if last_day < first_day:
+            raise ValueError("The end date is before the start date.")
+        # Days before the origin have no availability rows.
+        return max(first_day, 0), last_day
+
+    def _technician(self, row: int) -> dict:
+        return {'id': self._ids[row], 'name': self._names[row]}
+
+    def free_technicians(self, department: Optional[str], start: Day, end: Optional[Day] = None,
+                         every_day: bool = False, unassigned_only: bool = False) -> list[dict]:
+        """
+        Technicians of `department` (None: every department) who are free on any
+        day from `start` to `end` inclusive, or on every one of them. Raises ValueError.
+        """
+        with self._lock:
+            self._sync()
+            first_day, last_day = self._window(start, end)
+            rows = self._rows_for(department)
+            if last_day < 0 or not len(rows):
+                return []
+            if unassigned_only:
+                rows = rows[~self._holding[rows]]
+            words, mask = self._free_words(rows, first_day, last_day)
+            free = (words == mask).all(axis=1) if every_day else words.any(axis=1)
+            return [self._technician(row) for row in rows[free].tolist()]
+
+    def earliest_free_dates(self, department: Optional[str], on_or_after: Day,
+                            within_days: int = AVAILABILITY_SEARCH_DAYS) -> dict[int, Optional[date]]:
+        """Each technician's first free date on or after `on_or_after`, or None if not within `within_days`."""
+        with self._lock:
+            self._sync()
+            rows = self._rows_for(department)
+            return self._earliest(rows, on_or_after, within_days)
+
+    def earliest_free_date(self, technician_id: int, on_or_after: Day,
+                           within_days: int = AVAILABILITY_SEARCH_DAYS) -> Optional[date]:
+        """A technician's first free date on or after `on_or_after`, or None."""
+        with self._lock:
+            self._sync()
+            row = self._rows.get(technician_id)
+            if row is None or self._departments[row] is None:
+                return None
+            return self._earliest(np.array([row]), on_or_after, within_days)[technician_id]
+
+    def _earliest(self, rows: np.ndarray, on_or_after: Day, within_days: int) -> dict[int, Optional[date]]:
+        first_day, _ = self._window(on_or_after, None)
+        last_day = (parse_day(on_or_after) - self._origin).days + within_days - 1
+        if not len(rows) or last_day < 0:
+            return {self._ids[row]: None for row in rows}
+        words, _ = self._free_words(rows, first_day, last_day)
+        nonzero = words != 0
+        found = nonzero.any(axis=1)
+        first_word = nonzero.argmax(axis=1)
+        word = words[np.arange(len(rows)), first_word]
+        # The lowest set bit is the earliest day; it is a power of two, so log2 is exact.
+        lowest = word & (~word + _ONE)
+        bit = np.log2(np.where(found, lowest, _ONE).astype(np.float64)).astype(np.int64)
+        days = (first_day // WORD_DAYS + first_word) * WORD_DAYS + bit
+        dates = (np.datetime64(self._origin, 'D') + days).tolist()
+        return {self._ids[row]: day if ok else None for row, day, ok in zip(rows.tolist(), dates, found.tolist())}
+
+    def is_free(self, technician_id: int, day: Day) -> bool:
+        """Whether a technician works on `day` and has nothing booked on it."""
+        with self._lock:
+            self._sync()
+            row = self._rows.get(technician_id)
+            if row is None or self._departments[row] is None:
+                return False
+            index = (parse_day(day) - self._origin).days
+            if index < 0:
+                return False
+            words, _ = self._free_words(np.array([row]), index, index)
+            return bool(words[0, 0])
+
+    def works_on(self, technician_id: int, day: Day) -> bool:
+        """Whether a technician is on shift on `day`, booked or not."""
+        with self._lock:
+            self._sync()
+            row = self._rows.get(technician_id)
+            index = (parse_day(day) - self._origin).days
+            if row is None or self._departments[row] is None or index < 0 or index // WORD_DAYS >= self._bits.shape[1]:
+                return False
+            return bool(self._bits[row, index // WORD_DAYS] >> np.uint64(index % WORD_DAYS) & _ONE)
+
+    def technician(self, technician_id: int) -> Optional[dict]:
+        """A technician's id, name, department and whether they hold a ticket, or None."""
+        with self._lock:
+            self._sync()
+            row = self._rows.get(technician_id)
+            if row is None or self._departments[row] is None:
+                return None
+            return {**self._technician(row), 'department': self._departments[row], 'holding': bool(self._holding[row])}
+
+
+class TenantCalendars:
+    """
+    One AvailabilityCalendar per tenant database, answering for the tenant
+    being served. Thread-safe. Beyond `max_calendars` the least recently
+    used calendar is dropped; it is loaded again when next needed.
+    """
+
+    def __init__(self, max_calendars: int = database.DATABASE_MAX_OPEN_POOLS):
+        self.max_calendars = max_calendars
+        self._calendars: OrderedDict[str, AvailabilityCalendar] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current(self) -> AvailabilityCalendar:
+        """The calendar of the current tenant's database."""
+        path = os.path.realpath(database.current_database_path())
+        with self._lock:
+            calendar = self._calendars.get(path)
+            if calendar is None:
+                calendar = self._calendars[path] = AvailabilityCalendar(database_path=path)
+                while len(self._calendars) > max(1, self.max_calendars):
+                    self._calendars.popitem(last=False)
+            self._calendars.move_to_end(path)
+            return calendar
+
+    def free_technicians(self, *args, **kwargs) -> list[dict]:
+        return self.current().free_technicians(*args, **kwargs)
+
+    def earliest_free_dates(self, *args, **kwargs) -> dict[int, Optional[date]]:
+        return self.current().earliest_free_dates(*args, **kwargs)
+
+    def earliest_free_date(self, *args, **kwargs) -> Optional[date]:
+        return self.current().earliest_free_date(*args, **kwargs)
+
+    def is_free(self, *args, **kwargs) -> bool:
+        return self.current().is_free(*args, **kwargs)
+
+    def works_on(self, *args, **kwargs) -> bool:
+        return self.current().works_on(*args, **kwargs)
+
+    def technician(self, *args, **kwargs) -> Optional[dict]:
+        return self.current().technician(*args, **kwargs)
+
+
+AVAILABILITY = TenantCalendars()
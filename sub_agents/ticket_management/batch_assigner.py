@@ -0,0 +1,349 @@
+"""
+Bulk assignment of the open ticket backlog without going through the agents.
+
+After an outage or a weekend, hundreds of tickets may be waiting. Instead of
+one LLM round trip per ticket, each department's unassigned open tickets and
+free technicians are matched at once as a rectangular assignment problem,
+solved optimally with scipy's linear_sum_assignment. Each technician takes
+at most one ticket, matching the one-job-at-a-time technician model of the
+department assigners; the tickets left over stay in the backlog.
+
+Pair costs are in hours of urgency, so the terms can be traded off:
+- urgency: hours until the ticket's virtual deadline (see dispatch.py), so
+  overdue and critical tickets are picked first when technicians are short
+- date: days between the requested work date and the technician's first
+  available day on or after it
+- proximity: km from the technician's last located job (or the depot)
+- load: open tickets the technician already holds
+
+Tickets that were never queued have no department yet: legacy tickets,
+tickets created before routing and those logged while the model was down.
+They are matched to the department their title and description point to
+(see ticket_department), else to the requested department, and take that
+department when assigned.
+
+Every assignment and its history event are committed in one transaction.
+
+Run from the repository root with:
+    python -m sub_agents.ticket_management.batch_assigner [--date YYYY-MM-DD] [--department NAME] [--dry-run]
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sub_agents.ticket_management.archive import ARCHIVE_STATUSES as RESOLVED_STATUSES
+from sub_agents.ticket_management.availability import parse_day
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.dispatch import DEPARTMENT_ASSIGNERS, WORK_DATE_FORMAT, _epoch, virtual_deadline
+from sub_agents.ticket_management.route_planner import DEPOT_ADDRESS, distance_matrix
+from sub_agents.ticket_management.technician_claims import CLAIMED, claim_in_transaction
+from shared_libraries.gazetteer import GAZETTEER
+from shared_libraries.metrics import METRICS
+
+# Days from the start date within which a technician's availability is considered.
+BATCH_ASSIGN_HORIZON_DAYS = int(os.getenv("BATCH_ASSIGN_HORIZON_DAYS", "7"))
+# At most this many of the most urgent tickets per department enter the matching.
+BATCH_ASSIGN_MAX_TICKETS = int(os.getenv("BATCH_ASSIGN_MAX_TICKETS", "5000"))
+# Cost weights, in hours of urgency.
+URGENCY_COST_PER_HOUR = 1.0
+DATE_COST_PER_DAY = float(os.getenv("BATCH_ASSIGN_DATE_COST_PER_DAY", "24"))
+DISTANCE_COST_PER_KM = float(os.getenv("BATCH_ASSIGN_DISTANCE_COST_PER_KM", "0.5"))
+LOAD_COST_PER_TICKET = float(os.getenv("BATCH_ASSIGN_LOAD_COST_PER_TICKET", "4"))
+
+_INFEASIBLE = 1e9
+
+# Words that place a ticket without a department, as the routing prompt describes each department.
+DEPARTMENT_KEYWORDS = {
+    "Licensing Transport Safety": {
+        "vehicle", "car", "registration", "license", "licence", "inspection", "permit", "traffic",
+        "parking", "crosswalk", "speeding", "safety",
+    },
+    "Parks Community Civic": {
+        "park", "playground", "event", "festival", "community", "civic", "library", "volunteer",
+        "bench", "tree",
+    },
+    "Public Work": {
+        "pothole", "road", "street", "sidewalk", "streetlight", "light", "construction", "bridge",
+        "infrastructure", "sign", "graffiti", "pavement",
+    },
+    "Sanitation Utilities": {
+        "trash", "garbage", "waste", "recycling", "bin", "litter", "dumping", "water", "sewer",
+        "leak", "utility", "utilities", "drain", "power", "gas",
+    },
+}
+_KEYWORD_STEMS = set().union(*DEPARTMENT_KEYWORDS.values())
+
+
+def ticket_department(title: Optional[str], description: Optional[str] = None) -> Optional[str]:
+    """The department whose keywords a ticket's text mentions most, or None if none or tied."""
+    words = [word[:-1] if word.endswith('s') and word[:-1] in _KEYWORD_STEMS else word
+             for word in re.findall(r"[a-z]+", f"{title or ''} {description or ''}".lower())]
+    hits = {name: sum(word in keywords for word in words) for name, keywords in DEPARTMENT_KEYWORDS.items()}
+    best = max(hits.values())
+    leaders = [name for name, count in hits.items() if count == best]
+    return leaders[0] if best > 0 and len(leaders) == 1 else None
+
+
+def _load_technicians(conn, department: str, start: date, horizon_days: int) -> tuple[list, np.ndarray]:
+    """Returns the free technicians and a (technician, day offset) availability matrix."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT t.id, t.name, a.available_date
+        FROM technicians t
+        JOIN technician_availability a ON a.technician_id = t.id AND a.available_date BETWEEN ? AND ?
+        WHERE t.department = ? AND t.assigned_ticket_id IS NULL
+        ORDER BY t.id
+    ''', (start.isoformat(), (start + timedelta(days=horizon_days - 1)).isoformat(), department))
+    technicians = {}
+    days = {}
+    for row in cursor.fetchall():
+        technicians.setdefault(row['id'], {'id': row['id'], 'name': row['name']})
+        offset = (date.fromisoformat(row['available_date']) - start).days
+        days.setdefault(row['id'], set()).add(offset)
+    technicians = list(technicians.values())
+    available = np.zeros((len(technicians), horizon_days), dtype=bool)
+    for index, technician in enumerate(technicians):
+        available[index, sorted(days[technician['id']])] = True
+    return technicians, available
+
+
+def _technician_positions(conn, technician_ids: list[int], depot: tuple[float, float]) -> np.ndarray:
+    """Latitude/longitude of each technician's most recently assigned located ticket, else the depot."""
+    positions = np.tile(np.asarray(depot, dtype=np.float64), (len(technician_ids), 1))
+    if not technician_ids:
+        return positions
+    placeholders = ", ".join("?" for _ in technician_ids)
+    cursor = conn.cursor()
+    # SQLite takes the bare columns from the row holding MAX(h.id).
+    cursor.execute(f'''
+        SELECT h.assigned_technician_id, MAX(h.id), t.latitude, t.longitude
+        FROM history h JOIN tickets t ON t.id = h.ticket_id
+        WHERE h.event_type = 'assigned' AND t.latitude IS NOT NULL
+          AND h.assigned_technician_id IN ({placeholders})
+        GROUP BY h.assigned_technician_id
+    ''', technician_ids)
+    index = {technician_id: i for i, technician_id in enumerate(technician_ids)}
+    for row in cursor.fetchall():
+        positions[index[row[0]]] = (row['latitude'], row['longitude'])
+    return positions
+
+
+def _technician_loads(conn, technician_ids: list[int]) -> np.ndarray:
+    loads = np.zeros(len(technician_ids))
+    if not technician_ids:
+        return loads
+    id_placeholders = ", ".join("?" for _ in technician_ids)
+    status_placeholders = ", ".join("?" for _ in RESOLVED_STATUSES)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT assigned_technician_id, COUNT(*) FROM tickets
+        WHERE assigned_technician_id IN ({id_placeholders}) AND LOWER(status) NOT IN ({status_placeholders})
+        GROUP BY assigned_technician_id
+    ''', [*technician_ids, *RESOLVED_STATUSES])
+    index = {technician_id: i for i, technician_id in enumerate(technician_ids)}
+    for technician_id, count in cursor.fetchall():
+        loads[index[technician_id]] = count
+    return loads
+
+
+def _load_tickets(conn, department: str, limit: int, fallback_department: Optional[str] = None) -> list:
+    """
+    Unassigned open tickets of a department, skipping those a dispatcher is
+    assigning right now. Tickets without a department are included when
+    ticket_department() places them here or, failing that, when
+    `fallback_department` is this department.
+    """
+    status_placeholders = ", ".join("?" for _ in RESOLVED_STATUSES)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT tk.id, tk.title, tk.description, tk.department, tk.priority, tk.sla_deadline, tk.created_at,
+               tk.latitude, tk.longitude, q.virtual_deadline, q.assigned_work_date
+        FROM tickets tk LEFT JOIN dispatch_queue q ON q.ticket_id = tk.id
+        WHERE (tk.department = ? OR tk.department IS NULL) AND tk.assigned_technician_id IS NULL
+          AND LOWER(tk.status) NOT IN ({status_placeholders})
+          AND q.claimed_by IS NULL
+        ORDER BY tk.priority, tk.sla_deadline IS NULL, tk.sla_deadline, tk.created_at
+    ''', [department, *RESOLVED_STATUSES])
+    tickets = []
+    for row in cursor:
+        if row['department'] is None \
+                and (ticket_department(row['title'], row['description']) or fallback_department) != department:
+            continue
+        tickets.append(row)
+        if len(tickets) >= limit:
+            break
+    return tickets
+
+
+def match_department(conn, department: str, start: date, depot: tuple[float, float],
+                     horizon_days: int = BATCH_ASSIGN_HORIZON_DAYS,
+                     fallback_department: Optional[str] = None) -> dict:
+    """
+    Matches one department's backlog to its free technicians, without writing anything.
+
+    Returns {'assignments': [{'ticket_id', 'technician_id', 'assigned_work_date', 'department', 'cost'}, ...],
+    'waiting': number of tickets left unassigned, 'invalid_work_date': IDs of tickets skipped because
+    their requested work date could not be read}.
+    """
+    technicians, available = _load_technicians(conn, department, start, horizon_days)
+    tickets = []
+    wanted_dates = []
+    invalid = []
+    for row in _load_tickets(conn, department, BATCH_ASSIGN_MAX_TICKETS, fallback_department):
+        try:
+            wanted_dates.append(parse_day(row['assigned_work_date']) if row['assigned_work_date'] else None)
+        except (ValueError, AttributeError):
+            print(f"Skipping ticket {row['id']} in batch assignment: unreadable work date "
+                  f"{row['assigned_work_date']!r}")
+            invalid.append(row['id'])
+            continue
+        tickets.append(row)
+    if not technicians or not tickets:
+        return {'assignments': [], 'waiting': len(tickets), 'invalid_work_date': invalid}
+    technician_ids = [t['id'] for t in technicians]
+
+    now = time.time()
+    urgency_hours = np.empty(len(tickets))
+    wanted_day = np.zeros(len(tickets), dtype=int)
+    for i, (row, wanted) in enumerate(zip(tickets, wanted_dates)):
+        deadline = row['virtual_deadline']
+        if deadline is None:
+            created = _epoch(row['created_at']) if row['created_at'] else now
+            deadline = virtual_deadline(row['priority'], created, row['sla_deadline'])
+        urgency_hours[i] = (deadline - now) / 3600
+        if wanted is not None:
+            wanted_day[i] = max(0, (wanted - start).days)
+
+    # next_day[m, d]: technician m's first available day offset >= d, or the horizon if none.
+    day_index = np.where(available, np.arange(horizon_days), horizon_days)
+    next_day = np.minimum.accumulate(day_index[:, ::-1], axis=1)[:, ::-1]
+    next_day = np.concatenate([next_day, np.full((len(technicians), 1), horizon_days)], axis=1)
+    assigned_day = next_day[:, np.minimum(wanted_day, horizon_days)].T
+    delay_days = assigned_day - wanted_day[:, None]
+
+    positions = _technician_positions(conn, technician_ids, depot)
+    located = np.array([row['latitude'] is not None for row in tickets])
+    km = np.zeros((len(tickets), len(technicians)))
+    if located.any():
+        latitudes = np.array([row['latitude'] for row in tickets if row['latitude'] is not None])
+        longitudes = np.array([row['longitude'] for row in tickets if row['longitude'] is not None])
+        km[located] = distance_matrix(latitudes, longitudes, positions[:, 0], positions[:, 1]) / 1000
+        # Tickets without a location get a typical distance, neither favoured nor penalized.
+        km[~located] = np.median(km[located])
+
+    cost = (URGENCY_COST_PER_HOUR * urgency_hours[:, None]
+            + DATE_COST_PER_DAY * delay_days
+            + DISTANCE_COST_PER_KM * km
+            + LOAD_COST_PER_TICKET * _technician_loads(conn, technician_ids)[None, :])
+    cost[assigned_day >= horizon_days] = _INFEASIBLE
+    rows, columns = linear_sum_assignment(cost)
+
+    assignments = []
+    for i, m in zip(rows, columns):
+        if cost[i, m] >= _INFEASIBLE:
+            continue
+        assignments.append({
+            'ticket_id': tickets[i]['id'],
+            'technician_id': technician_ids[m],
+            'assigned_work_date': (start + timedelta(days=int(assigned_day[i, m]))).strftime(WORK_DATE_FORMAT),
+            'department': department,
+            'cost': round(float(cost[i, m]), 2),
+        })
+    return {'assignments': assignments, 'waiting': len(tickets) - len(assignments), 'invalid_work_date': invalid}
+
+
+def write_assignments(conn, assignments: list[dict]) -> int:
+    """Assigns the matched tickets through the event log, in the caller's transaction. Returns how many."""
+    written = 0
+    cursor = conn.cursor()
+    for assignment in assignments:
+        # Technicians and tickets claimed since the matching was computed are skipped.
+        outcome = claim_in_transaction(
+            conn, assignment['ticket_id'], assignment['technician_id'], assignment['assigned_work_date'],
+            log_message=f"Batch-assigned to technician {assignment['technician_id']} "
+                        f"for {assignment['assigned_work_date']}.",
+        )
+        if outcome == CLAIMED:
+            # A ticket that was never queued takes the department it was matched in.
+            cursor.execute('UPDATE tickets SET department = ? WHERE id = ? AND department IS NULL',
+                           (assignment['department'], assignment['ticket_id']))
+            written += 1
+    return written
+
+
+def assign_backlog(start_date: Optional[str] = None, department: Optional[str] = None,
+                   dry_run: bool = False) -> Optional[dict]:
+    """
+    Assigns every department's unassigned open tickets to its free technicians
+    in one optimal matching, committed in a single transaction.
+
+    Args:
+        start_date: The first work day to assign, 'YYYY-MM-DD'; defaults to today.
+        department: Only assign this department's backlog, e.g. 'Public Work'.
+        dry_run: Compute the matching without writing it.
+    Returns:
+        The assignments and number of tickets still waiting per department,
+        or None on a database error.
+    """
+    if department and department not in DEPARTMENT_ASSIGNERS:
+        print(f"Unknown department for batch assignment: {department}")
+        return None
+    start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else date.today()
+    depot_place = GAZETTEER.geocode(DEPOT_ADDRESS)
+    if depot_place is None:
+        print(f"Depot address is not in the gazetteer: {DEPOT_ADDRESS}")
+        return None
+    depot = (depot_place.latitude, depot_place.longitude)
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    results = {}
+    try:
+        # Reads and writes share one write transaction, so the matching cannot go stale.
+        conn.execute("BEGIN IMMEDIATE")
+        for name in ([department] if department else DEPARTMENT_ASSIGNERS):
+            started = time.perf_counter()
+            result = match_department(conn, name, start, depot, fallback_department=department)
+            if not dry_run:
+                result['assigned'] = write_assignments(conn, result['assignments'])
+            METRICS.summary(
+                "batch_assign_seconds", "Time to match one department's backlog.", department=name
+            ).observe(time.perf_counter() - started)
+            results[name] = result
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            for name, result in results.items():
+                METRICS.counter(
+                    "batch_assignments_total", "Tickets assigned by the batch assigner.", department=name
+                ).inc(result['assigned'])
+        for name, result in results.items():
+            print(f"{'Would assign' if dry_run else 'Assigned'} {len(result['assignments'])} {name} tickets; "
+                  f"{result['waiting']} still waiting"
+                  + (f", {len(result['invalid_work_date'])} skipped for unreadable work dates." if
+                     result['invalid_work_date'] else "."))
+        return results
+    except sqlite3.Error as e:
+        print(f"Error in batch assignment: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Assign the open ticket backlog in one batch.")
+    parser.add_argument("--date", default=None, help="First work day to assign, YYYY-MM-DD (default: today).")
+    parser.add_argument("--department", default=None, choices=list(DEPARTMENT_ASSIGNERS))
+    parser.add_argument("--dry-run", action="store_true", help="Print the matching without writing it.")
+    args = parser.parse_args()
+    result = assign_backlog(args.date, args.department, args.dry_run)
+    if args.dry_run and result:
+        print(json.dumps(result, indent=2))
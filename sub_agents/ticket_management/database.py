@@ -0,0 +1,645 @@
+import contextvars
+import sqlite3
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from urllib.request import pathname2url
+from shared_libraries.metrics import METRICS
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared_libraries', 'city_office.db')
+
+# Set once per database by the first connection. In WAL mode readers keep
+# reading their snapshot while a writer commits, instead of waiting for it.
+# Use "delete" where WAL cannot work, e.g. on a network file system.
+DATABASE_JOURNAL_MODE = os.getenv("DATABASE_JOURNAL_MODE", "wal")
+# Read-only connections kept open per database for read_connection().
+DATABASE_READ_POOL_SIZE = int(os.getenv("DATABASE_READ_POOL_SIZE", "8"))
+# Databases whose read pools stay open; beyond this the least recently used pool is closed...
+DATABASE_MAX_OPEN_POOLS = int(os.getenv("DATABASE_MAX_OPEN_POOLS", "64"))
+# ...as is any pool unused for this long.
+DATABASE_POOL_IDLE_SECONDS = float(os.getenv("DATABASE_POOL_IDLE_SECONDS", "300"))
+
+# Multi-tenant mode: when set, each tenant (a city) has its own database,
+# TENANT_DATABASE_DIR/<tenant>.db, chosen per request through CURRENT_TENANT.
+# Work without a tenant, and all work when unset, uses DATABASE_PATH.
+TENANT_DATABASE_DIR = os.getenv("TENANT_DATABASE_DIR", "")
+# Whether a tenant without a database gets a new, empty one; otherwise it is unknown.
+TENANT_AUTO_CREATE = os.getenv("TENANT_AUTO_CREATE", "FALSE").upper() == "TRUE"
+
+DEFAULT_TENANT = 'default'
+_TENANT_NAME = re.compile(r'[a-z0-9][a-z0-9_-]{0,63}')
+
+# The tenant whose database get_db_connection() and read_connection() open; None is DATABASE_PATH.
+CURRENT_TENANT: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('current_tenant', default=None)
+
+_schema_lock = threading.Lock()
+_migrated_paths = set()
+
+
+def validate_tenant(tenant) -> str:
+    """Returns `tenant` if it is a valid tenant name: lowercase letters, digits, '-' and '_'. Raises ValueError."""
+    if not isinstance(tenant, str) or not _TENANT_NAME.fullmatch(tenant):
+        raise ValueError(f"Invalid tenant name: {tenant!r}")
+    return tenant
+
+
+def tenant_database_path(tenant: Optional[str]) -> str:
+    """The database of `tenant`. Raises ValueError for an invalid name."""
+    if tenant is None or not TENANT_DATABASE_DIR:
+        return DATABASE_PATH
+    return os.path.join(TENANT_DATABASE_DIR, f"{validate_tenant(tenant)}.db")
+
+
+def current_database_path() -> str:
+    """The database of the tenant being served."""
+    return tenant_database_path(CURRENT_TENANT.get())
+
+
+def current_tenant_label() -> str:
+    """The tenant being served, as a metric label."""
+    return CURRENT_TENANT.get() or DEFAULT_TENANT
+
+
+def tenant_exists(tenant: Optional[str]) -> bool:
+    """Whether requests for `tenant` can be served: it has a database, or one will be created."""
+    path = tenant_database_path(tenant)
+    return path == DATABASE_PATH or TENANT_AUTO_CREATE or os.path.exists(path)
+
+
+def list_tenants() -> list[Optional[str]]:
+    """None, for DATABASE_PATH, then every tenant with a database; for background work that covers them all."""
+    tenants: list[Optional[str]] = [None]
+    if TENANT_DATABASE_DIR and os.path.isdir(TENANT_DATABASE_DIR):
+        names = (name[:-3] for name in os.listdir(TENANT_DATABASE_DIR) if name.endswith('.db'))
+        tenants += sorted(name for name in names if _TENANT_NAME.fullmatch(name))
+    return tenants
+
+
+@contextmanager
+def use_tenant(tenant: Optional[str]):
+    """Runs the block against `tenant`'s database. Raises ValueError for an invalid name."""
+    token = CURRENT_TENANT.set(None if tenant is None else validate_tenant(tenant))
+    try:
+        yield
+    finally:
+        CURRENT_TENANT.reset(token)
+
+
+def _create_base_tables(cursor):
+    # The original tables, for databases that do not have them yet.
+    cursor.executescript('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            status TEXT NOT NULL DEFAULT 'Open',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            assigned_technician_id INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status_change TEXT,
+            log_message TEXT,
+            assigned_technician,
+            assigned_technician_id INTEGER,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id)
+        );
+        CREATE TABLE IF NOT EXISTS technicians (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            department TEXT NOT NULL,
+            assigned_ticket_id INTEGER,
+            assigned_work_date TEXT,
+            reason_to_reassign TEXT
+        );
+        CREATE TABLE IF NOT EXISTS technician_availability (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            technician_id INTEGER NOT NULL,
+            available_date DATE NOT NULL,
+            start_time TIME NOT NULL,
+            end_time TIME NOT NULL,
+            FOREIGN KEY (technician_id) REFERENCES technicians(id) ON DELETE CASCADE
+        );
+    ''')
+
+
+def _migrate_event_sourced_history(cursor):
+    """
+    Makes `history` the append-only event log and `tickets` its materialized state.
+
+    Each history row gets an event_type and the state it sets; `tickets` keeps
+    the folded result plus the id of the last event applied to it.
+    """
+    cursor.execute("ALTER TABLE history ADD COLUMN event_type TEXT")
+    cursor.execute("ALTER TABLE history ADD COLUMN status TEXT")
+    cursor.execute("ALTER TABLE history ADD COLUMN assigned_work_date TEXT")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN assigned_work_date TEXT")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN last_event_id INTEGER")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN event_count INTEGER NOT NULL DEFAULT 0")
+    cursor.execute('''
+        CREATE TABLE ticket_snapshots (
+            ticket_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            taken_at DATETIME NOT NULL,
+            status TEXT,
+            assigned_technician_id INTEGER,
+            assigned_work_date TEXT,
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (ticket_id, event_id)
+        ) WITHOUT ROWID
+    ''')
+    # Covers timeline and point-in-time reads so they never touch the table itself.
+    cursor.execute('''
+        CREATE INDEX idx_history_ticket_timeline ON history (
+            ticket_id, timestamp, id, event_type, status, status_change, log_message,
+            assigned_technician_id, assigned_work_date
+        )
+    ''')
+
+    # Classify the rows written before history carried an event type.
+    cursor.execute("UPDATE history SET event_type = 'created', status = 'Open' WHERE log_message = 'Ticket created'")
+    cursor.execute('''
+        UPDATE history
+        SET event_type = 'status_changed',
+            status = TRIM(SUBSTR(status_change, INSTR(status_change, '->') + 2))
+        WHERE event_type IS NULL AND status_change LIKE '%->%'
+    ''')
+    cursor.execute('''
+        UPDATE history
+        SET event_type = 'assigned',
+            assigned_work_date = (SELECT t.assigned_work_date FROM technicians t
+                                  WHERE t.id = history.assigned_technician_id
+                                    AND t.assigned_ticket_id = history.ticket_id)
+        WHERE event_type IS NULL AND assigned_technician_id IS NOT NULL
+    ''')
+    cursor.execute("UPDATE history SET event_type = 'note' WHERE event_type IS NULL")
+    cursor.execute('''
+        UPDATE tickets
+        SET assigned_work_date = (SELECT t.assigned_work_date FROM technicians t
+                                  WHERE t.id = tickets.assigned_technician_id),
+            last_event_id = (SELECT MAX(h.id) FROM history h WHERE h.ticket_id = tickets.id),
+            event_count = (SELECT COUNT(*) FROM history h WHERE h.ticket_id = tickets.id)
+    ''')
+
+
+def _migrate_archived_tickets(cursor):
+    """Adds the directory of tickets moved out to archive databases (see archive.py)."""
+    cursor.execute('''
+        CREATE TABLE archived_tickets (
+            ticket_id INTEGER PRIMARY KEY,
+            archive_file TEXT NOT NULL,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migrate_dispatch_queue(cursor):
+    """Adds ticket priority and SLA deadline, and the persistent dispatch queue (see dispatch.py)."""
+    # 1 = critical ... 4 = low; existing tickets become normal priority.
+    cursor.execute("ALTER TABLE tickets ADD COLUMN priority INTEGER NOT NULL DEFAULT 3")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN sla_deadline DATETIME")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN department TEXT")
+    cursor.execute('''
+        CREATE TABLE dispatch_queue (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER NOT NULL UNIQUE,
+            department TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            enqueued_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            sla_deadline DATETIME,
+            virtual_deadline REAL NOT NULL,
+            assigned_work_date TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            claimed_by TEXT,
+            claimed_at REAL,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX idx_dispatch_queue_order ON dispatch_queue (department, virtual_deadline)")
+
+
+def _migrate_ticket_locations(cursor):
+    """Adds structured ticket locations and their R*Tree index (see locations.py)."""
+    from shared_libraries.gazetteer import GAZETTEER
+
+    cursor.execute("ALTER TABLE tickets ADD COLUMN address TEXT")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN latitude REAL")
+    cursor.execute("ALTER TABLE tickets ADD COLUMN longitude REAL")
+    # One zero-area box per located ticket; id is the ticket id.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE ticket_locations USING rtree(
+            id, min_latitude, max_latitude, min_longitude, max_longitude
+        )
+    ''')
+    # Older tickets only mention the place in their description.
+    cursor.execute("SELECT id, description FROM tickets WHERE description IS NOT NULL")
+    for ticket_id, description in cursor.fetchall():
+        place = GAZETTEER.geocode(description)
+        if place is None:
+            continue
+        cursor.execute(
+            "UPDATE tickets SET address = ?, latitude = ?, longitude = ? WHERE id = ?",
+            (place.address, place.latitude, place.longitude, ticket_id),
+        )
+        cursor.execute(
+            "INSERT INTO ticket_locations VALUES (?, ?, ?, ?, ?)",
+            (ticket_id, place.latitude, place.latitude, place.longitude, place.longitude),
+        )
+
+
+def _migrate_technician_routes(cursor):
+    """Adds the daily multi-stop routes written by route_planner.py."""
+    cursor.execute('''
+        CREATE TABLE technician_routes (
+            plan_date TEXT NOT NULL,
+            technician_id INTEGER NOT NULL,
+            stop_order INTEGER NOT NULL,
+            ticket_id INTEGER NOT NULL,
+            arrival_time TEXT NOT NULL,
+            departure_time TEXT NOT NULL,
+            leg_meters REAL NOT NULL,
+            planned_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (plan_date, technician_id, stop_order),
+            FOREIGN KEY (technician_id) REFERENCES technicians(id),
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id)
+        )
+    ''')
+
+
+def _migrate_operational_reports(cursor):
+    """Adds the incrementally maintained report tables and fills them from history (see reports.py)."""
+    from sub_agents.ticket_management.reports import rebuild_reports
+
+    cursor.execute('''
+        CREATE TABLE report_ticket_state (
+            ticket_id INTEGER PRIMARY KEY,
+            department TEXT NOT NULL,
+            status TEXT,
+            created_at REAL NOT NULL,
+            first_assigned_at REAL,
+            technician_id INTEGER,
+            assignment_started_at REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE report_backlog (
+            department TEXT NOT NULL,
+            status TEXT NOT NULL,
+            tickets INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (department, status)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE report_daily (
+            day TEXT NOT NULL,
+            department TEXT NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            assigned INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            assign_seconds REAL NOT NULL DEFAULT 0,
+            resolve_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE report_latency (
+            day TEXT NOT NULL,
+            department TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            le_seconds REAL NOT NULL,
+            tickets INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department, metric, le_seconds)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE report_technician_daily (
+            day TEXT NOT NULL,
+            technician_id INTEGER NOT NULL,
+            assignments INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            busy_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, technician_id)
+        ) WITHOUT ROWID
+    ''')
+    rebuild_reports(cursor)
+
+
+def _migrate_ticket_notifications(cursor):
+    """Adds webhook subscriptions to ticket changes and their delivery outbox (see notifications.py)."""
+    cursor.execute('''
+        CREATE TABLE ticket_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER,
+            url TEXT NOT NULL,
+            token TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # NULL ticket_id subscribes to every ticket.
+    cursor.execute("CREATE INDEX idx_ticket_subscriptions_ticket ON ticket_subscriptions (ticket_id)")
+    cursor.execute('''
+        CREATE TABLE notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subscription_id INTEGER NOT NULL,
+            ticket_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_by TEXT,
+            claimed_until REAL,
+            last_error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (subscription_id) REFERENCES ticket_subscriptions(id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX idx_notification_outbox_due ON notification_outbox (status, next_attempt_at)")
+    cursor.execute("CREATE INDEX idx_notification_outbox_subscription ON notification_outbox (subscription_id)")
+
+
+def _migrate_technician_versions(cursor):
+    """Adds per-technician change versions, bumped by triggers, for availability.py to sync from."""
+    cursor.execute('''
+        CREATE TABLE technician_versions (
+            technician_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX idx_technician_versions_version ON technician_versions (version)")
+    # Changed technicians are re-read one at a time.
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_technician_availability_technician "
+        "ON technician_availability (technician_id, available_date)"
+    )
+    bump = ("INSERT OR REPLACE INTO technician_versions VALUES "
+            "({}, (SELECT COALESCE(MAX(version), 0) + 1 FROM technician_versions))")
+    for table, event, row in (
+        ('technician_availability', 'INSERT', 'NEW.technician_id'),
+        ('technician_availability', 'UPDATE', 'NEW.technician_id'),
+        ('technician_availability', 'DELETE', 'OLD.technician_id'),
+        ('technicians', 'INSERT', 'NEW.id'),
+        ('technicians', 'UPDATE OF name, department, assigned_ticket_id, assigned_work_date', 'NEW.id'),
+        ('technicians', 'DELETE', 'OLD.id'),
+    ):
+        name = f"{table}_{event.split()[0].lower()}_version"
+        cursor.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {bump.format(row)}; END")
+    # An availability row moved to another technician changes both of them.
+    cursor.execute(f"""
+        CREATE TRIGGER technician_availability_move_version AFTER UPDATE OF technician_id ON technician_availability
+        WHEN OLD.technician_id IS NOT NEW.technician_id
+        BEGIN {bump.format('OLD.technician_id')}; END
+    """)
+
+
+def _migrate_idempotency_keys(cursor):
+    """Adds the results of idempotent calls, replayed for repeated keys (see idempotency.py)."""
+    cursor.execute('''
+        CREATE TABLE idempotency_keys (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE UNIQUE INDEX idx_idempotency_keys_key ON idempotency_keys (scope, key)")
+    cursor.execute("CREATE INDEX idx_idempotency_keys_expiry ON idempotency_keys (expires_at)")
+
+
+def _migrate_subscription_owners(cursor):
+    """Records which API client made each webhook subscription; NULL for A2A push configs."""
+    cursor.execute("ALTER TABLE ticket_subscriptions ADD COLUMN owner TEXT")
+    cursor.execute("CREATE INDEX idx_ticket_subscriptions_owner ON ticket_subscriptions (owner)")
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    _migrate_event_sourced_history,
+    _migrate_archived_tickets,
+    _migrate_dispatch_queue,
+    _migrate_ticket_locations,
+    _migrate_technician_routes,
+    _migrate_operational_reports,
+    _migrate_ticket_notifications,
+    _migrate_technician_versions,
+    _migrate_idempotency_keys,
+    _migrate_subscription_owners,
+]
+
+
+def ensure_schema(conn):
+    """Brings the database behind `conn` up to the latest schema version."""
+    cursor = conn.cursor()
+    _create_base_tables(cursor)
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    # IMMEDIATE takes the write lock up front, so concurrent processes migrate one at a time.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for index in range(version, len(MIGRATIONS)):
+            MIGRATIONS[index](cursor)
+            cursor.execute(f"PRAGMA user_version = {index + 1}")
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+def get_db_connection(database_path: Optional[str] = None):
+    """Creates and returns a connection, to the current tenant's database by default, on an up-to-date schema."""
+    conn = None
+    try:
+        database_path = database_path or current_database_path()
+        conn = sqlite3.connect(database_path, timeout=30)
+        conn.row_factory = sqlite3.Row # Allows accessing columns by name
+        key = os.path.realpath(database_path)
+        if key not in _migrated_paths:
+            with _schema_lock:
+                if key not in _migrated_paths:
+                    ensure_schema(conn)
+                    conn.execute(f"PRAGMA journal_mode = {DATABASE_JOURNAL_MODE}")
+                    _migrated_paths.add(key)
+        METRICS.counter(
+            "database_connections_total", "Read-write database connections opened.", tenant=current_tenant_label()
+        ).inc()
+        return conn
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Database connection error: {e}")
+        if conn:
+            conn.close()
+        return None
+
+
+class ReadConnectionPool:
+    """
+    Read-only connections to one database, reused across calls. Thread-safe.
+
+    Connections are opened with mode=ro and PRAGMA query_only, so a read path
+    cannot write by mistake. At most `size` are in use at once; further
+    callers wait for one to be returned.
+    """
+
+    def __init__(self, database_path: str, size: int = DATABASE_READ_POOL_SIZE):
+        self.database_path = database_path
+        self.last_used = time.monotonic()
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{pathname2url(os.path.abspath(self.database_path))}?mode=ro"
+        # Connections move between threads with the callers that borrow them
+        conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _return(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Closes the idle connections now and lent ones when they are returned."""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    @contextmanager
+    def connection(self):
+        """Lends a connection holding one read transaction, so every query in the block sees the same snapshot."""
+        self._slots.acquire()
+        self.last_used = time.monotonic()
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            conn.execute("BEGIN")
+            yield conn
+        except sqlite3.Error:
+            # A connection in an unknown state is not reused
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._return(conn)
+            self.last_used = time.monotonic()
+            self._slots.release()
+
+
+class ReadPoolCache:
+    """
+    The read pools of the databases in use, least recently used first. Thread-safe.
+
+    One process can serve many tenants without running out of file
+    descriptors: beyond `max_open` pools the least recently used is closed,
+    and so is any pool unused for `idle_seconds`. A closed pool's database
+    simply gets a new pool when it is read again.
+    """
+
+    def __init__(self, max_open: int = DATABASE_MAX_OPEN_POOLS, idle_seconds: float = DATABASE_POOL_IDLE_SECONDS):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._pools: OrderedDict[str, ReadConnectionPool] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, key: str, reason: str) -> None:
+        self._pools.pop(key).close()
+        METRICS.counter("database_read_pool_evictions_total", "Read pools closed, by reason.", reason=reason).inc()
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._pools:
+            key, pool = next(iter(self._pools.items()))
+            if pool.last_used > cutoff:
+                break
+            self._evict(key, 'idle')
+
+    def get(self, database_path: str) -> Optional[ReadConnectionPool]:
+        """The open pool of `database_path`, or None."""
+        key = os.path.realpath(database_path)
+        with self._lock:
+            self._evict_idle()
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+            return pool
+
+    def add(self, database_path: str) -> ReadConnectionPool:
+        """The pool of `database_path`, opening one if needed."""
+        key = os.path.realpath(database_path)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ReadConnectionPool(database_path)
+                while len(self._pools) > max(1, self.max_open):
+                    self._evict(next(iter(self._pools)), 'lru')
+            self._pools.move_to_end(key)
+            METRICS.gauge("database_read_pools_open", "Databases with an open read pool.").set(len(self._pools))
+            return pool
+
+    def close_idle(self) -> None:
+        """Closes the pools unused for `idle_seconds`; reads do this too."""
+        with self._lock:
+            self._evict_idle()
+            METRICS.gauge("database_read_pools_open", "Databases with an open read pool.").set(len(self._pools))
+
+    def close_all(self) -> None:
+        with self._lock:
+            for key in list(self._pools):
+                self._evict(key, 'shutdown')
+            METRICS.gauge("database_read_pools_open", "Databases with an open read pool.").set(0)
+
+
+READ_POOLS = ReadPoolCache()
+
+
+@contextmanager
+def read_connection(database_path: Optional[str] = None):
+    """
+    Yields a pooled read-only connection, to the current tenant's database by
+    default, for pure reads; writes keep using get_db_connection(). Raises
+    sqlite3.Error, like the queries it runs, if the database cannot be opened.
+    """
+    try:
+        database_path = database_path or current_database_path()
+    except ValueError as e:
+        raise sqlite3.OperationalError(str(e)) from e
+    pool = READ_POOLS.get(database_path)
+    if pool is None:
+        if os.path.realpath(database_path) not in _migrated_paths:
+            # A read-write connection first brings the schema and journal mode up to date
+            conn = get_db_connection(database_path)
+            if conn is None:
+                raise sqlite3.OperationalError(f"unable to open database {database_path}")
+            conn.close()
+        pool = READ_POOLS.add(database_path)
+    METRICS.counter(
+        "database_reads_total", "Read transactions served from the read pools.", tenant=current_tenant_label()
+    ).inc()
+    with pool.connection() as conn:
+        yield conn
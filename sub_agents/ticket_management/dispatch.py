@@ -0,0 +1,417 @@
+"""
+Priority and SLA-aware dispatch of tickets that could not be assigned right away.
+
+Tickets wait in the persistent `dispatch_queue` table. Each entry is ordered
+by its virtual deadline: the earlier of its SLA deadline and its enqueue time
+plus the grace period of its priority. A critical ticket is due at once, while
+a low-priority ticket that has waited out its grace period outranks anything
+enqueued after that moment. Waiting tickets therefore age without ever being
+re-keyed.
+
+Every process keeps the queue in an IndexedHeap per department, loaded
+incrementally from the table, so enqueue and dequeue cost O(log n). Entries
+are claimed in the database before assignment, so several workers can run
+dispatchers against the same database. In multi-tenant mode each pass
+drains every tenant's queue, each kept in its own heaps.
+"""
+import importlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+from sub_agents.ticket_management.database import (
+    current_database_path, current_tenant_label, get_db_connection, list_tenants, use_tenant,
+)
+from sub_agents.ticket_management.technician_claims import (
+    CLAIMED, TECHNICIAN_TAKEN, TICKET_UNAVAILABLE, claim_technician,
+)
+from sub_agents.ticket_management.ticket_events import append_ticket_event
+from shared_libraries.indexed_heap import IndexedHeap
+from shared_libraries.metrics import METRICS
+
+PRIORITIES = {'critical': 1, 'high': 2, 'normal': 3, 'low': 4}
+DEFAULT_PRIORITY = PRIORITIES['normal']
+# Hours from creation until a ticket of each priority breaches its SLA.
+SLA_HOURS = {
+    1: float(os.getenv("SLA_HOURS_CRITICAL", "4")),
+    2: float(os.getenv("SLA_HOURS_HIGH", "24")),
+    3: float(os.getenv("SLA_HOURS_NORMAL", "72")),
+    4: float(os.getenv("SLA_HOURS_LOW", "168")),
+}
+# Seconds a queued ticket of each priority may wait before it is due.
+PRIORITY_GRACE_SECONDS = {1: 0, 2: 30 * 60, 3: 4 * 3600, 4: 24 * 3600}
+
+# Seconds between dispatcher passes; 0 disables the background dispatcher.
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "10"))
+# Claims older than this are assumed to belong to a dead worker and are released.
+DISPATCH_CLAIM_TIMEOUT_SECONDS = float(os.getenv("DISPATCH_CLAIM_TIMEOUT_SECONDS", "300"))
+
+# Department name -> module providing get_available_technicians.
+DEPARTMENT_ASSIGNERS = {
+    "Licensing Transport Safety": "sub_agents.licensing_transport_safety_department.safety_technician_assigner",
+    "Parks Community Civic": "sub_agents.parks_community_civic_department.civic_technician_assigner",
+    "Public Work": "sub_agents.public_work_department.public_work_technician_assigner",
+    "Sanitation Utilities": "sub_agents.sanitation_utilities_department.sanitation_technician_assigner",
+}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+WORK_DATE_FORMAT = '%d-%m-%Y'
+
+
+def parse_priority(priority: Union[str, int, None]) -> int:
+    """Returns the numeric priority for a name ('critical', 'high', 'normal', 'low') or number 1-4."""
+    if priority is None or priority == '':
+        return DEFAULT_PRIORITY
+    if isinstance(priority, int) or str(priority).isdigit():
+        value = int(priority)
+        if value in SLA_HOURS:
+            return value
+    elif str(priority).strip().lower() in PRIORITIES:
+        return PRIORITIES[str(priority).strip().lower()]
+    raise ValueError(f"Unknown priority {priority!r}; use one of {', '.join(PRIORITIES)}.")
+
+
+def sla_deadline_for(priority: int, created_at: Optional[datetime] = None) -> str:
+    """Returns the SLA deadline (UTC, history timestamp format) of a ticket created at `created_at`."""
+    created_at = created_at or datetime.now(timezone.utc)
+    return (created_at + timedelta(hours=SLA_HOURS[priority])).strftime(TIMESTAMP_FORMAT)
+
+
+def _epoch(timestamp: str) -> float:
+    # SQLite CURRENT_TIMESTAMP values are UTC
+    return datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+def virtual_deadline(priority: int, enqueued_at: float, sla_deadline: Optional[str]) -> float:
+    """Returns the epoch second at which a queued ticket is due."""
+    deadline = enqueued_at + PRIORITY_GRACE_SECONDS[priority]
+    if sla_deadline:
+        deadline = min(deadline, _epoch(sla_deadline))
+    return deadline
+
+
+def enqueue_ticket(ticket_id: int, department: str, assigned_work_date: Optional[str] = None) -> Optional[int]:
+    """
+    Puts a ticket in its department's dispatch queue. A ticket that is already
+    queued keeps its place.
+
+    Args:
+        ticket_id: The ID of the ticket.
+        department: The department that should pick it up, e.g. 'Public Work'.
+        assigned_work_date: The work date to assign with, 'DD-MM-YYYY'; defaults to the dispatch day.
+    Returns:
+        The ticket's 1-based position in the department queue, or None if the
+        ticket does not exist or on a database error.
+    """
+    if department not in DEPARTMENT_ASSIGNERS:
+        print(f"Unknown department for dispatch: {department}")
+        return None
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT priority, sla_deadline FROM tickets WHERE id = ?', (ticket_id,))
+        row = cursor.fetchone()
+        if row is None:
+            print(f"Ticket with ID {ticket_id} not found.")
+            return None
+        priority = row['priority']
+        deadline = virtual_deadline(priority, time.time(), row['sla_deadline'])
+        cursor.execute('SELECT 1 FROM dispatch_queue WHERE ticket_id = ?', (ticket_id,))
+        if cursor.fetchone():
+            if assigned_work_date:
+                cursor.execute('UPDATE dispatch_queue SET assigned_work_date = ? WHERE ticket_id = ?',
+                               (assigned_work_date, ticket_id))
+        else:
+            cursor.execute('''
+                INSERT INTO dispatch_queue (ticket_id, department, priority, sla_deadline,
+                                            virtual_deadline, assigned_work_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (ticket_id, department, priority, row['sla_deadline'], deadline, assigned_work_date))
+            cursor.execute('UPDATE tickets SET department = ? WHERE id = ?', (department, ticket_id))
+            append_ticket_event(
+                conn, ticket_id, 'note',
+                log_message=f"Queued for dispatch to {department} (priority {priority}).",
+            )
+        cursor.execute('''
+            SELECT COUNT(*) FROM dispatch_queue
+            WHERE department = ? AND virtual_deadline <= (SELECT virtual_deadline FROM dispatch_queue WHERE ticket_id = ?)
+        ''', (department, ticket_id))
+        position = cursor.fetchone()[0]
+        conn.commit()
+        TICKET_DISPATCHER.wake()
+        return position
+    except sqlite3.Error as e:
+        print(f"Error enqueueing ticket {ticket_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+class DispatchQueue:
+    """The in-memory view of dispatch_queue: one IndexedHeap per department."""
+
+    def __init__(self):
+        self._heaps: dict[str, IndexedHeap] = {}
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    def push(self, department: str, ticket_id: int, deadline: float, seq: int) -> None:
+        with self._lock:
+            # seq breaks ties between equal deadlines in enqueue order
+            self._heaps.setdefault(department, IndexedHeap()).push(ticket_id, (deadline, seq))
+
+    def pop(self, department: str) -> Optional[tuple[int, float, int]]:
+        """Removes and returns (ticket_id, virtual_deadline, seq) of the most urgent ticket, or None."""
+        with self._lock:
+            heap = self._heaps.get(department)
+            if not heap:
+                return None
+            (deadline, seq), ticket_id = heap.pop()
+            return ticket_id, deadline, seq
+
+    def departments(self) -> list[str]:
+        with self._lock:
+            return [department for department, heap in self._heaps.items() if heap]
+
+    def depth(self, department: str) -> int:
+        with self._lock:
+            return len(self._heaps.get(department) or ())
+
+    def sync(self, conn) -> int:
+        """Loads entries added since the last sync plus entries released from stale claims."""
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE dispatch_queue SET claimed_by = NULL, claimed_at = NULL
+            WHERE claimed_by IS NOT NULL AND claimed_at < ?
+            RETURNING seq, ticket_id, department, virtual_deadline
+        ''', (time.time() - DISPATCH_CLAIM_TIMEOUT_SECONDS,))
+        released = cursor.fetchall()
+        conn.commit()
+        cursor.execute('''
+            SELECT seq, ticket_id, department, virtual_deadline FROM dispatch_queue
+            WHERE seq > ? AND claimed_by IS NULL ORDER BY seq
+        ''', (self._last_seq,))
+        added = cursor.fetchall()
+        for row in list(released) + added:
+            self.push(row['department'], row['ticket_id'], row['virtual_deadline'], row['seq'])
+        if added:
+            self._last_seq = max(self._last_seq, added[-1]['seq'])
+        return len(released) + len(added)
+
+
+def _assigner_for(department: str):
+    return importlib.import_module(DEPARTMENT_ASSIGNERS[department])
+
+
+class TicketDispatcher:
+    """Drains the dispatch queue into the department assigners on a daemon thread."""
+
+    def __init__(self, interval_seconds: float = DISPATCH_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        # Database path -> its queue
+        self.queues: dict[str, DispatchQueue] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ticket-dispatcher", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Runs the next pass now instead of at the end of the current interval."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.dispatch_once()
+            except Exception as e:
+                print(f"Ticket dispatch pass failed: {e}")
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+
+    def _claim(self, conn, ticket_id: int) -> Optional[sqlite3.Row]:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE dispatch_queue SET claimed_by = ?, claimed_at = ?
+            WHERE ticket_id = ? AND claimed_by IS NULL
+            RETURNING ticket_id, seq, virtual_deadline, enqueued_at, assigned_work_date
+        ''', (self.worker_id, time.time(), ticket_id))
+        rows = cursor.fetchall()
+        conn.commit()
+        return rows[0] if rows else None
+
+    def _release(self, conn, queue: DispatchQueue, department: str, entry, drop: bool) -> None:
+        cursor = conn.cursor()
+        if drop:
+            cursor.execute('DELETE FROM dispatch_queue WHERE ticket_id = ?', (entry['ticket_id'],))
+        else:
+            cursor.execute('''
+                UPDATE dispatch_queue SET claimed_by = NULL, claimed_at = NULL, attempts = attempts + 1
+                WHERE ticket_id = ?
+            ''', (entry['ticket_id'],))
+            queue.push(department, entry['ticket_id'], entry['virtual_deadline'], entry['seq'])
+        conn.commit()
+
+    def _queued_work_date(self, conn, ticket_id: int, today: str) -> Optional[str]:
+        """The work date of an unclaimed queue entry, read without claiming it; None if it is gone or claimed."""
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COALESCE(assigned_work_date, ?) FROM dispatch_queue WHERE ticket_id = ? AND claimed_by IS NULL
+        ''', (today, ticket_id))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _dispatch_department(self, conn, queue: DispatchQueue, department: str, today: str) -> int:
+        """
+        Assigns one department's queued tickets, most urgent first, each to a
+        technician who works on the ticket's own work date. Free technicians
+        are listed once per work date before the queue is walked; an entry
+        whose work date has nobody free is passed over without being claimed.
+        """
+        assigner = _assigner_for(department)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT DISTINCT COALESCE(assigned_work_date, ?) FROM dispatch_queue
+            WHERE department = ? AND claimed_by IS NULL
+        ''', (today, department))
+        # Work date -> technicians free that day who have not been given a ticket in this pass
+        candidates = {work_date: assigner.get_available_technicians(department, on_date=work_date)
+                      for (work_date,) in cursor.fetchall()}
+        assigned = 0
+        passed_over = []
+        # With nobody free on any queued work date, the heap is not walked at all.
+        while any(candidates.values()):
+            popped = queue.pop(department)
+            if popped is None:
+                break
+            work_date = self._queued_work_date(conn, popped[0], today)
+            if work_date is None:
+                # Assigned or claimed elsewhere since the last sync.
+                continue
+            if work_date not in candidates:
+                candidates[work_date] = assigner.get_available_technicians(department, on_date=work_date)
+            if not candidates[work_date]:
+                # Nobody is free on this entry's work date; it waits, unclaimed, while later entries are tried.
+                passed_over.append(popped)
+                continue
+            entry = self._claim(conn, popped[0])
+            if entry is None:
+                continue
+            while candidates[work_date]:
+                technician = candidates[work_date][0]
+                outcome = claim_technician(entry['ticket_id'], technician['id'], work_date)
+                if outcome in (CLAIMED, TECHNICIAN_TAKEN):
+                    # Either way the technician is no longer free on any day.
+                    for listed in candidates.values():
+                        listed[:] = [t for t in listed if t['id'] != technician['id']]
+                if outcome == CLAIMED:
+                    # The 'assigned' event removed the queue entry in the same transaction.
+                    assigned += 1
+                    METRICS.counter(
+                        "dispatch_assignments_total", "Tickets assigned by the dispatcher.", department=department
+                    ).inc()
+                    METRICS.summary(
+                        "dispatch_wait_seconds", "Time tickets spent in the dispatch queue.", department=department
+                    ).observe(max(0.0, time.time() - _epoch(entry['enqueued_at'])))
+                    entry = None
+                    break
+                if outcome != TECHNICIAN_TAKEN:
+                    # Deleted tickets and tickets assigned elsewhere leave the queue; errors are retried.
+                    self._release(conn, queue, department, entry, drop=outcome == TICKET_UNAVAILABLE)
+                    entry = None
+                    break
+                # A technician claimed by someone else since the listing is skipped; the entry tries the next one.
+            if entry is not None:
+                # Every technician listed for the day was taken elsewhere meanwhile.
+                self._release(conn, queue, department, entry, drop=False)
+        for popped in passed_over:
+            queue.push(department, *popped)
+        return assigned
+
+    def dispatch_once(self) -> int:
+        """Assigns queued tickets of every tenant to available technicians, most urgent first. Returns how many were assigned."""
+        assigned = 0
+        for tenant in list_tenants():
+            with use_tenant(tenant):
+                assigned += self._dispatch_tenant()
+        return assigned
+
+    def _dispatch_tenant(self) -> int:
+        conn = get_db_connection()
+        if conn is None:
+            return 0
+        queue = self.queues.setdefault(current_database_path(), DispatchQueue())
+        assigned = 0
+        try:
+            queue.sync(conn)
+            today = datetime.now().strftime(WORK_DATE_FORMAT)
+            for department in queue.departments():
+                assigned += self._dispatch_department(conn, queue, department, today)
+            for department in DEPARTMENT_ASSIGNERS:
+                METRICS.gauge(
+                    "dispatch_queue_depth", "Tickets waiting for a technician.",
+                    department=department, tenant=current_tenant_label(),
+                ).set(queue.depth(department))
+        except sqlite3.Error as e:
+            print(f"Database error in dispatch: {e}")
+        finally:
+            conn.close()
+        return assigned
+
+
+TICKET_DISPATCHER = TicketDispatcher()
+
+
+def get_dispatch_queue(department: Optional[str] = None, limit: int = 20) -> Optional[list]:
+    """
+    Lists the tickets waiting for a technician, most urgent first.
+
+    Args:
+        department: Only list this department's queue, e.g. 'Public Work'.
+        limit: The maximum number of tickets to return.
+    Returns:
+        A list of queued tickets with their priority, SLA deadline and time
+        they were queued, or None on a database error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        query = '''
+            SELECT q.ticket_id, t.title, q.department, q.priority, q.sla_deadline,
+                   q.enqueued_at, q.attempts, q.claimed_by IS NOT NULL AS being_assigned
+            FROM dispatch_queue q JOIN tickets t ON t.id = q.ticket_id
+        '''
+        params = []
+        if department:
+            query += ' WHERE q.department = ?'
+            params.append(department)
+        query += ' ORDER BY q.virtual_deadline, q.seq LIMIT ?'
+        params.append(limit)
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Error fetching dispatch queue: {e}")
+        return None
+    finally:
+        conn.close()
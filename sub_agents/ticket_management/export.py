@@ -0,0 +1,277 @@
+"""
+Streaming bulk export of tickets with their history, for audits.
+
+One output row per history event in the requested date range, joined with
+its ticket and the technician it names. Rows flow through generators:
+each source is read in keyset-paginated batches ordered by event id, the
+hot database and the monthly archives are merged by event id, and an
+encoder turns rows into CSV, JSONL or Parquet chunks. Memory stays bounded
+by the batch size, whatever the range.
+
+Every row carries its event_id. An interrupted export resumes from the last
+event id written (`--after` / `?after=`), since each batch is a fresh query
+for ids above the cursor; no server-side state is kept between requests.
+
+Run from the repository root with:
+    python -m sub_agents.ticket_management.export --since 2025-01-01 --until 2025-06-30 [--format csv|jsonl|parquet] [--output FILE]
+
+Parquet needs the optional pyarrow package.
+"""
+import argparse
+import csv
+import heapq
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Iterator, Optional
+from sub_agents.ticket_management import database
+from sub_agents.ticket_management.archive import archive_dir_for, archive_file_name
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.ticket_events import normalize_timestamp
+from shared_libraries.metrics import METRICS
+
+# Rows fetched per query, and per Parquet row group.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+EXPORT_COLUMNS = (
+    'event_id', 'ticket_id', 'event_timestamp', 'event_type', 'event_status', 'status_change', 'log_message',
+    'assigned_technician_id', 'technician_name', 'technician_department', 'assigned_work_date',
+    'title', 'description', 'ticket_status', 'priority', 'department', 'address', 'latitude', 'longitude',
+    'created_at', 'sla_deadline', 'archived_in',
+)
+# Ticket columns read from each source; archives written before a column existed return NULL for it.
+_TICKET_COLUMNS = ('title', 'description', 'status', 'priority', 'department', 'address', 'latitude',
+                   'longitude', 'created_at', 'sla_deadline')
+
+
+def _time_range(since: Optional[str], until: Optional[str]) -> tuple[str, str]:
+    """Returns inclusive history timestamp bounds for 'YYYY-MM-DD' or ISO 8601 inputs."""
+    low = '0000-00-00 00:00:00'
+    if since:
+        low = (datetime.strptime(since, '%Y-%m-%d').strftime(TIMESTAMP_FORMAT) if len(since) == 10
+               else normalize_timestamp(since))
+    high = normalize_timestamp(until) if until else '9999-12-31 23:59:59'
+    return low, high
+
+
+def _source_query(conn) -> str:
+    cursor = conn.execute('PRAGMA table_info(tickets)')
+    present = {row[1] for row in cursor.fetchall()}
+    ticket_columns = ", ".join(
+        f"t.{c} AS {'ticket_status' if c == 'status' else c}" if c in present
+        else f"NULL AS {'ticket_status' if c == 'status' else c}"
+        for c in _TICKET_COLUMNS
+    )
+    return f'''
+        SELECT h.id AS event_id, h.ticket_id, h.timestamp AS event_timestamp, h.event_type,
+               h.status AS event_status, h.status_change, h.log_message, h.assigned_technician_id,
+               h.assigned_work_date, {ticket_columns}
+        FROM history h JOIN tickets t ON t.id = h.ticket_id
+        WHERE h.id > ? AND h.timestamp >= ? AND h.timestamp <= ?
+        ORDER BY h.id LIMIT ?
+    '''
+
+
+def _iter_source(database_path: str, archive_name: Optional[str], low: str, high: str,
+                 after: int, batch_size: int) -> Iterator[dict]:
+    """
+    Yields one source's rows in event id order. Each batch opens its own
+    connection, so the generator may be advanced from any thread.
+    """
+    while True:
+        conn = get_db_connection(database_path) if archive_name is None else sqlite3.connect(database_path)
+        if conn is None:
+            return
+        try:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(_source_query(conn), (after, low, high, batch_size)).fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            record = dict(row)
+            record['archived_in'] = archive_name
+            yield record
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]['event_id']
+
+
+def _archive_paths(database_path: str, low: str) -> list[tuple[str, str]]:
+    """Archives that can hold events at or after `low`: those of its month and later."""
+    directory = archive_dir_for(database_path)
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(re.escape(archive_file_name(database_path, 'MONTH')).replace('MONTH', r'(\d{4}-\d{2})') + '$')
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        match = pattern.match(name)
+        if match and match.group(1) >= low[:7]:
+            paths.append((os.path.join(directory, name), name))
+    return paths
+
+
+def iter_export_rows(since: Optional[str] = None, until: Optional[str] = None, after: int = 0,
+                     include_archived: bool = True, batch_size: int = EXPORT_BATCH_SIZE,
+                     database_path: Optional[str] = None) -> Iterator[dict]:
+    """
+    Yields export rows (see EXPORT_COLUMNS) for history events between `since`
+    and `until` with event ids above `after`, in event id order.
+    """
+    database_path = database_path or database.current_database_path()
+    low, high = _time_range(since, until)
+    conn = get_db_connection(database_path)
+    if conn is None:
+        return
+    try:
+        # Small enough to hold, and absent from the archives.
+        technicians = {row['id']: (row['name'], row['department'])
+                       for row in conn.execute('SELECT id, name, department FROM technicians')}
+    finally:
+        conn.close()
+    sources = [_iter_source(database_path, None, low, high, after, batch_size)]
+    if include_archived:
+        sources += [_iter_source(path, name, low, high, after, batch_size)
+                    for path, name in _archive_paths(database_path, low)]
+    for record in heapq.merge(*sources, key=lambda r: r['event_id']):
+        name, department = technicians.get(record['assigned_technician_id'], (None, None))
+        record['technician_name'] = name
+        record['technician_department'] = department
+        yield {column: record.get(column) for column in EXPORT_COLUMNS}
+
+
+def iter_csv(rows: Iterator[dict], rows_per_chunk: int = 1000) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def iter_jsonl(rows: Iterator[dict], rows_per_chunk: int = 1000) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=str))
+        if len(lines) == rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class _ChunkSink:
+    """A write-only file that hands out what was written so far while keeping file offsets for the Parquet footer."""
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._position += len(data)
+        return self._buffer.write(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer = io.BytesIO()
+        return data
+
+
+def iter_parquet(rows: Iterator[dict], rows_per_group: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Writes one Parquet row group per `rows_per_group` rows and yields the bytes as they are produced."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, pa.float64() if column in ('latitude', 'longitude')
+         else pa.int64() if column in ('event_id', 'ticket_id', 'assigned_technician_id', 'priority')
+         else pa.string())
+        for column in EXPORT_COLUMNS
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    drain = sink.drain
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == rows_per_group:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch = []
+            yield drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield drain()
+
+
+def export_stream(export_format: str = 'csv', since: Optional[str] = None, until: Optional[str] = None,
+                  after: int = 0, include_archived: bool = True) -> Iterator[bytes]:
+    """
+    Returns an iterator of encoded chunks of the export. Raises ValueError for
+    an unknown format or bad dates, and ImportError for Parquet without pyarrow,
+    before any row is read.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}; use one of {', '.join(EXPORT_FORMATS)}.")
+    if export_format == 'parquet':
+        import pyarrow  # noqa: F401
+    _time_range(since, until)
+
+    def counted(rows):
+        counter = METRICS.counter("export_rows_total", "Rows written by ticket exports.", format=export_format)
+        for row in rows:
+            counter.inc()
+            yield row
+
+    # Resolved now: the rows are read later, while the response streams
+    rows = counted(iter_export_rows(since, until, after, include_archived,
+                                    database_path=database.current_database_path()))
+    encoder = {'csv': iter_csv, 'jsonl': iter_jsonl, 'parquet': iter_parquet}[export_format]
+    return encoder(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export tickets and their history for a date range.")
+    parser.add_argument("--since", default=None, help="First day, YYYY-MM-DD or ISO 8601 (default: everything).")
+    parser.add_argument("--until", default=None, help="Last day, inclusive.")
+    parser.add_argument("--format", default="csv", choices=EXPORT_FORMATS)
+    parser.add_argument("--after", type=int, default=0, help="Resume after this event id.")
+    parser.add_argument("--hot-only", action="store_true", help="Skip the archive databases.")
+    parser.add_argument("--output", default=None, help="Output file (default: standard output).")
+    args = parser.parse_args()
+    try:
+        chunks = export_stream(args.format, args.since, args.until, args.after, not args.hot_only)
+    except (ValueError, ImportError) as e:
+        print(f"Cannot export: {e}", file=sys.stderr)
+        raise SystemExit(2)
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
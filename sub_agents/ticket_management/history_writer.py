@@ -0,0 +1,229 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional
+from sub_agents.ticket_management.database import current_database_path, get_db_connection
+from sub_agents.ticket_management.ticket_events import EVENT_TYPES, append_ticket_event
+from shared_libraries.metrics import METRICS
+
+# A batch is committed when it reaches HISTORY_FLUSH_MAX_ROWS events or when
+# its oldest event has waited HISTORY_FLUSH_INTERVAL_MS, whichever comes first.
+HISTORY_FLUSH_INTERVAL_MS = float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "5"))
+HISTORY_FLUSH_MAX_ROWS = int(os.getenv("HISTORY_FLUSH_MAX_ROWS", "256"))
+# "wait": callers block until their event is committed (durable on return).
+# "fire_and_forget": callers return once the event is queued; events still
+# pending when the process dies are lost.
+HISTORY_DURABILITY = os.getenv("HISTORY_DURABILITY", "wait")
+DURABILITY_MODES = ("wait", "fire_and_forget")
+# Longest a waiting submit() blocks for its event to be committed.
+HISTORY_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("HISTORY_SUBMIT_TIMEOUT_SECONDS", "30"))
+
+
+class _PendingEvent:
+    __slots__ = ("database_path", "ticket_id", "event_type", "fields", "done", "event_id", "error")
+
+    def __init__(self, database_path: str, ticket_id: int, event_type: str, fields: dict):
+        self.database_path = database_path
+        self.ticket_id = ticket_id
+        self.event_type = event_type
+        self.fields = fields
+        self.done = threading.Event()
+        self.event_id: Optional[int] = None
+        self.error: Optional[Exception] = None
+
+
+class _FlushMarker:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for ticket history events with group commit.
+
+    Callers hand events to submit(); a single writer thread applies everything
+    queued since its last commit with append_ticket_event() and commits once,
+    so a burst of N events costs one transaction and one fsync instead of N.
+    Each event goes to the database of the tenant that submitted it; a batch
+    spanning several tenants is committed once per tenant.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[str] = None,
+        flush_interval_ms: float = HISTORY_FLUSH_INTERVAL_MS,
+        max_batch_rows: int = HISTORY_FLUSH_MAX_ROWS,
+        durability: str = HISTORY_DURABILITY,
+        submit_timeout: float = HISTORY_SUBMIT_TIMEOUT_SECONDS,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown history durability mode: {durability}")
+        self.database_path = database_path
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.durability = durability
+        self.submit_timeout = submit_timeout
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+        self._conn_path: Optional[str] = None
+
+    def _ensure_started(self) -> threading.Thread:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return thread
+        with self._lock:
+            # A writer thread that died is replaced; the events it left queued go to the new one.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def submit(self, ticket_id: int, event_type: str, wait: Optional[bool] = None, **fields):
+        """
+        Queues one event for `ticket_id`; `fields` are append_ticket_event's keyword arguments.
+
+        With wait (the default in "wait" durability) returns the committed event id,
+        or None if the ticket does not exist or the write failed. Otherwise returns
+        True as soon as the event is queued. Raises TimeoutError if the event is not
+        committed within submit_timeout seconds, and RuntimeError if the writer
+        thread stops before committing it.
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown ticket event type: {event_type}")
+        if wait is None:
+            wait = self.durability == "wait"
+        thread = self._ensure_started()
+        pending = _PendingEvent(self.database_path or current_database_path(), ticket_id, event_type, fields)
+        self._queue.put(pending)
+        METRICS.gauge("history_writer_queue_depth", "Events waiting for the history writer.").set(self._queue.qsize())
+        if not wait:
+            return True
+        deadline = time.monotonic() + self.submit_timeout
+        while not pending.done.wait(min(1.0, max(0.0, deadline - time.monotonic()))):
+            if not thread.is_alive():
+                raise RuntimeError(f"The history writer stopped before committing the event for ticket {ticket_id}.")
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"The history event for ticket {ticket_id} was not committed "
+                                   f"within {self.submit_timeout} seconds.")
+        return pending.event_id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every event queued before this call is committed."""
+        if self._thread is None:
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Commits everything still queued and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _connection(self, database_path: str):
+        # One connection is kept, to the database written last; most batches have one tenant.
+        if self._conn is not None and self._conn_path != database_path:
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            self._conn = get_db_connection(database_path)
+            self._conn_path = database_path
+        return self._conn
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # The thread must survive any batch, or every later waiting submit() would block.
+                print(f"Error in the history writer: {e}")
+                for pending in batch:
+                    if isinstance(pending, _PendingEvent) and pending.event_id is None and pending.error is None:
+                        pending.error = e
+                    pending.done.set()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _write_batch(self, batch: list) -> None:
+        markers = [p for p in batch if isinstance(p, _FlushMarker)]
+        events = [p for p in batch if isinstance(p, _PendingEvent)]
+        if events:
+            started = time.perf_counter()
+            by_database: dict[str, list] = {}
+            for pending in events:
+                by_database.setdefault(pending.database_path, []).append(pending)
+            for group in by_database.values():
+                try:
+                    self._apply(group)
+                except Exception as e:
+                    # One bad event must not sink the rest of the batch; retry them one by one.
+                    print(f"Error writing history batch of {len(group)}, retrying individually: {e}")
+                    for pending in group:
+                        try:
+                            self._apply([pending])
+                        except Exception as e:
+                            print(f"Error writing history event for ticket {pending.ticket_id}: {e}")
+                            pending.error = e
+            METRICS.summary("history_writer_batch_size", "Events committed per history transaction.").observe(len(events))
+            METRICS.summary(
+                "history_writer_flush_seconds", "Time to apply and commit one history batch."
+            ).observe(time.perf_counter() - started)
+            METRICS.counter("history_writer_events_total", "Events committed by the history writer.").inc(
+                sum(1 for p in events if p.event_id is not None)
+            )
+            for pending in events:
+                if pending.event_id is None and pending.error is None:
+                    print(f"Ticket with ID {pending.ticket_id} not found.")
+                pending.done.set()
+        METRICS.gauge("history_writer_queue_depth", "Events waiting for the history writer.").set(self._queue.qsize())
+        for marker in markers:
+            marker.done.set()
+
+    def _apply(self, events: list) -> None:
+        """Commits `events`, all for the same database."""
+        conn = self._connection(events[0].database_path)
+        if conn is None:
+            raise sqlite3.OperationalError("Could not open the ticket database.")
+        try:
+            event_ids = [
+                append_ticket_event(conn, p.ticket_id, p.event_type, **p.fields) for p in events
+            ]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for pending, event_id in zip(events, event_ids):
+            pending.event_id = event_id
+
+
+HISTORY_WRITER = HistoryWriter()
+# Fire-and-forget events still queued at interpreter exit are committed first.
+atexit.register(HISTORY_WRITER.close)
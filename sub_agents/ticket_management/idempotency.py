@@ -0,0 +1,213 @@
+"""
+Idempotency keys, so a retried request or a repeated tool call returns the
+original result instead of writing again.
+
+A2A clients retry message/send on timeouts, and the model sometimes calls
+the same tool twice in one run. Every call that writes (create_ticket and
+the assign_*_ticket tools) runs under a key, stored with its result in
+`idempotency_keys` under a unique (scope, key) index:
+
+- a key given explicitly (the tools' `idempotency_key` argument), or
+- one derived from REQUEST_KEY, the A2A message being served (or the
+  `idempotency_key` in its metadata), and the tool scope. Calls that name
+  what they act on (an assignment names its ticket) add that identifier,
+  so a repeated call in the run is answered from the first. Calls that
+  create something add their ordinal among the request's calls of that
+  scope instead.
+
+Derived keys never include free text the model wrote, such as a title or
+description. A retried message makes the model run again, and it usually
+paraphrases; the key of its first create_ticket call is the same anyway.
+
+A call whose key has a live result returns that result without writing.
+create_ticket records its key in the ticket's own transaction, so a ticket
+exists if and only if its key does; a concurrent duplicate loses on the
+unique index and rolls back. Assignments record theirs after the claim: a
+retry that slips in between cannot take a second technician, because the
+claim is compare-and-set (see technician_claims.py).
+
+The executor keeps each message's reply under scope 'a2a_message'. Before
+running the model it records an IN_PROGRESS marker for the message, so a
+retry that arrives while the first run is still going waits for its reply
+(see wait_for) instead of running again. A marker outlives a crashed run
+by at most IDEMPOTENCY_IN_PROGRESS_SECONDS.
+
+Results expire after IDEMPOTENCY_TTL_SECONDS; expired keys are reused in
+place and purged by the maintenance run (see archive.py).
+"""
+import contextvars
+import itertools
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+from sub_agents.ticket_management.database import get_db_connection, read_connection
+from shared_libraries.metrics import METRICS
+
+# How long a result is replayed for a repeated key.
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# How long a run may hold its message's IN_PROGRESS marker; a crashed run's marker lapses after this.
+IDEMPOTENCY_IN_PROGRESS_SECONDS = float(os.getenv("IDEMPOTENCY_IN_PROGRESS_SECONDS", "600"))
+
+# Key of the A2A message being served; the keys of the writes it makes are derived from it.
+REQUEST_KEY: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_key', default=None)
+# Calls made so far in the request, per scope; shared by the contexts copied from the request's.
+_CALL_ORDINALS: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('call_ordinals', default=None)
+
+# The result recorded for a message whose first run has not finished.
+IN_PROGRESS = "__in_progress__"
+_IN_PROGRESS_JSON = json.dumps(IN_PROGRESS)
+
+
+def begin_request(key: Optional[str]) -> None:
+    """Serves the rest of the current context under request `key`, with its call ordinals starting at 0."""
+    REQUEST_KEY.set(key)
+    _CALL_ORDINALS.set({})
+
+
+def request_key(scope: str, explicit_key: Optional[str], *identifiers) -> Optional[str]:
+    """
+    The idempotency key of a call: `explicit_key` if given, else one derived
+    from REQUEST_KEY, `scope` and the call's `identifiers`, or its ordinal in
+    the request when it has none; else None (not idempotent). Identifiers
+    must be values the model cannot paraphrase, such as IDs.
+    """
+    if explicit_key:
+        return explicit_key
+    request = REQUEST_KEY.get()
+    if request is None:
+        return None
+    if identifiers:
+        return f"{request}:{scope}:" + ":".join(str(identifier) for identifier in identifiers)
+    ordinals = _CALL_ORDINALS.get()
+    if ordinals is None:
+        ordinals = {}
+        _CALL_ORDINALS.set(ordinals)
+    # setdefault and next() on a count are atomic, so parallel tool calls get distinct ordinals
+    return f"{request}:{scope}#{next(ordinals.setdefault(scope, itertools.count()))}"
+
+
+def lookup(scope: str, key: Optional[str]) -> Optional[Any]:
+    """The live result recorded for `key`, IN_PROGRESS for a run still going, or None."""
+    if key is None:
+        return None
+    try:
+        with read_connection() as conn:
+            row = conn.execute(
+                'SELECT result FROM idempotency_keys WHERE scope = ? AND key = ? AND expires_at > ?',
+                (scope, key, time.time()),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error looking up idempotency key: {e}")
+        return None
+    if row is None:
+        return None
+    result = json.loads(row[0])
+    if result != IN_PROGRESS:
+        METRICS.counter("idempotent_replays_total", "Calls answered from a recorded result.", scope=scope).inc()
+    return result
+
+
+def record(conn, scope: str, key: str, result: Any, ttl: float = IDEMPOTENCY_TTL_SECONDS) -> bool:
+    """
+    Records `result` for `key` inside the caller's transaction, replacing an
+    expired record or an IN_PROGRESS marker. Returns False, writing nothing,
+    if a live result exists (or, when recording IN_PROGRESS, any live record).
+    """
+    now = time.time()
+    cursor = conn.execute('''
+        INSERT INTO idempotency_keys (scope, key, result, created_at, expires_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (scope, key) DO UPDATE SET
+            result = excluded.result, created_at = excluded.created_at, expires_at = excluded.expires_at
+        WHERE idempotency_keys.expires_at <= ?
+           OR (idempotency_keys.result = ? AND excluded.result != ?)
+    ''', (scope, key, json.dumps(result), now, now + ttl, now, _IN_PROGRESS_JSON, _IN_PROGRESS_JSON))
+    return cursor.rowcount > 0
+
+
+def remember(scope: str, key: Optional[str], result: Any) -> Any:
+    """
+    Records `result` for `key` in its own transaction and returns it, or the
+    result a concurrent call recorded first. Without a key, returns `result`.
+    """
+    if key is None:
+        return result
+    conn = get_db_connection()
+    if conn is None:
+        return result
+    try:
+        if record(conn, scope, key, result):
+            conn.commit()
+            return result
+        conn.rollback()
+    except sqlite3.Error as e:
+        print(f"Error recording idempotency key: {e}")
+        conn.rollback()
+        return result
+    finally:
+        conn.close()
+    previous = lookup(scope, key)
+    return result if previous is None else previous
+
+
+def mark_in_progress(scope: str, key: Optional[str]) -> Optional[Any]:
+    """
+    Marks `key` IN_PROGRESS for the caller's run. Returns None if the caller
+    may go ahead, else what is recorded already: a result or IN_PROGRESS.
+    """
+    if key is None:
+        return None
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        if record(conn, scope, key, IN_PROGRESS, ttl=IDEMPOTENCY_IN_PROGRESS_SECONDS):
+            conn.commit()
+            return None
+        conn.rollback()
+    except sqlite3.Error as e:
+        print(f"Error recording idempotency key: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+    return lookup(scope, key)
+
+
+def abandon(scope: str, key: Optional[str]) -> None:
+    """Drops the IN_PROGRESS marker of a run that ends without a result to keep, so a retry runs again."""
+    if key is None:
+        return
+    conn = get_db_connection()
+    if conn is None:
+        return
+    try:
+        conn.execute('DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND result = ?',
+                     (scope, key, _IN_PROGRESS_JSON))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error releasing idempotency key: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def wait_for(scope: str, key: str, timeout: float, poll_seconds: float = 0.25) -> Optional[Any]:
+    """
+    Waits up to `timeout` seconds for the run holding `key` to finish.
+    Returns its result, IN_PROGRESS if it is still going, or None if it
+    ended without a result. Blocking; call it off the event loop.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = lookup(scope, key)
+        if result != IN_PROGRESS or time.monotonic() >= deadline:
+            return result
+        time.sleep(poll_seconds)
+
+
+def purge_expired(cursor) -> int:
+    """Deletes expired keys. Returns how many were deleted."""
+    cursor.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (time.time(),))
+    return cursor.rowcount
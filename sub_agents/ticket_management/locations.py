@@ -0,0 +1,180 @@
+import os
+import sqlite3
+from typing import Optional
+from sub_agents.ticket_management.archive import ARCHIVE_STATUSES as RESOLVED_STATUSES
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.ticket_events import append_ticket_event
+from shared_libraries.gazetteer import GAZETTEER, Place, bounding_box, haversine_meters
+
+# Open tickets closer than this to a new report are flagged as possible repeats.
+DUPLICATE_RADIUS_METERS = float(os.getenv("DUPLICATE_RADIUS_METERS", "75"))
+
+
+def store_ticket_location(conn, ticket_id: int, address: Optional[str], place: Optional[Place]) -> None:
+    """Writes a ticket's address and coordinates, and its R*Tree entry, in the caller's transaction."""
+    cursor = conn.cursor()
+    if place is None:
+        cursor.execute('UPDATE tickets SET address = ?, latitude = NULL, longitude = NULL WHERE id = ?',
+                       (address, ticket_id))
+        cursor.execute('DELETE FROM ticket_locations WHERE id = ?', (ticket_id,))
+        return
+    cursor.execute('UPDATE tickets SET address = ?, latitude = ?, longitude = ? WHERE id = ?',
+                   (place.address, place.latitude, place.longitude, ticket_id))
+    cursor.execute('INSERT OR REPLACE INTO ticket_locations VALUES (?, ?, ?, ?, ?)',
+                   (ticket_id, place.latitude, place.latitude, place.longitude, place.longitude))
+
+
+def nearby_open_tickets(
+    conn,
+    latitude: float,
+    longitude: float,
+    radius_meters: float,
+    department: Optional[str] = None,
+    exclude_ticket_id: Optional[int] = None,
+    limit: int = 50,
+) -> list[dict]:
+    """
+    Returns open tickets within `radius_meters` of a point, nearest first.
+
+    The R*Tree narrows the search to the enclosing bounding box; the exact
+    great-circle distance then filters out the box's corners.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_meters)
+    placeholders = ", ".join("?" for _ in RESOLVED_STATUSES)
+    query = f'''
+        SELECT t.id, t.title, t.status, t.priority, t.department, t.address, t.latitude, t.longitude,
+               t.created_at, t.assigned_technician_id
+        FROM ticket_locations l JOIN tickets t ON t.id = l.id
+        WHERE l.min_latitude <= ? AND l.max_latitude >= ?
+          AND l.min_longitude <= ? AND l.max_longitude >= ?
+          AND LOWER(t.status) NOT IN ({placeholders})
+    '''
+    params = [max_lat, min_lat, max_lon, min_lon, *RESOLVED_STATUSES]
+    if department:
+        query += ' AND t.department = ?'
+        params.append(department)
+    if exclude_ticket_id is not None:
+        query += ' AND t.id != ?'
+        params.append(exclude_ticket_id)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    results = []
+    for row in cursor.fetchall():
+        distance = haversine_meters(latitude, longitude, row['latitude'], row['longitude'])
+        if distance <= radius_meters:
+            ticket = dict(row)
+            ticket['distance_meters'] = round(distance, 1)
+            results.append(ticket)
+    results.sort(key=lambda ticket: ticket['distance_meters'])
+    return results[:limit]
+
+
+def flag_possible_duplicates(conn, ticket_id: int, place: Place) -> list[int]:
+    """Notes on a freshly located ticket which open tickets were reported at the same spot."""
+    nearby = nearby_open_tickets(
+        conn, place.latitude, place.longitude, DUPLICATE_RADIUS_METERS, exclude_ticket_id=ticket_id,
+    )
+    duplicate_ids = [ticket['id'] for ticket in nearby]
+    if duplicate_ids:
+        append_ticket_event(
+            conn, ticket_id, 'note',
+            log_message=f"Possible repeat report: open tickets {', '.join(map(str, duplicate_ids))} "
+                        f"are within {DUPLICATE_RADIUS_METERS:.0f} m.",
+        )
+    return duplicate_ids
+
+
+def set_ticket_location(ticket_id: int, address: str) -> str:
+    """
+    Records where a ticket's issue is, e.g. '3rd street, South'. The address is
+    matched against the city gazetteer to get coordinates for proximity search.
+
+    Args:
+        ticket_id: The ID of the ticket.
+        address: The street address, intersection or landmark of the issue.
+    Returns:
+        A message with the normalized address and any open tickets reported at the same spot.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return "Database error: could not open the database."
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM tickets WHERE id = ?', (ticket_id,))
+        if cursor.fetchone() is None:
+            return f"Ticket with ID {ticket_id} not found."
+        place = GAZETTEER.geocode(address)
+        store_ticket_location(conn, ticket_id, address, place)
+        if place is None:
+            conn.commit()
+            return f"Saved the address for ticket {ticket_id}, but it is not in the city gazetteer, so it has no coordinates."
+        append_ticket_event(conn, ticket_id, 'note', log_message=f"Location set to {place.address}.")
+        duplicate_ids = flag_possible_duplicates(conn, ticket_id, place)
+        conn.commit()
+        message = f"Ticket {ticket_id} located at {place.address} ({place.latitude:.5f}, {place.longitude:.5f})."
+        if duplicate_ids:
+            message += f" Open tickets {', '.join(map(str, duplicate_ids))} were reported at the same spot."
+        return message
+    except sqlite3.Error as e:
+        print(f"Error setting ticket location: {e}")
+        conn.rollback()
+        return f"Database error: {e}"
+    finally:
+        conn.close()
+
+
+def find_open_tickets_near(address: str, radius_meters: float = 200) -> Optional[list]:
+    """
+    Lists open tickets within a distance of an address or landmark, nearest first.
+
+    Args:
+        address: A street address, intersection or landmark, e.g. '3rd street, South'.
+        radius_meters: The search radius in meters.
+    Returns:
+        A list of open tickets with their distance in meters, or None if the
+        address is not in the city gazetteer or on a database error.
+    """
+    place = GAZETTEER.geocode(address)
+    if place is None:
+        print(f"Address not found in gazetteer: {address}")
+        return None
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        return nearby_open_tickets(conn, place.latitude, place.longitude, radius_meters)
+    except sqlite3.Error as e:
+        print(f"Error searching tickets by location: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def find_open_tickets_near_ticket(ticket_id: int, radius_meters: float = 200) -> Optional[list]:
+    """
+    Lists other open tickets within a distance of a ticket's location, nearest
+    first, e.g. to spot repeated reports of the same problem.
+
+    Args:
+        ticket_id: The ID of the ticket whose location to search around.
+        radius_meters: The search radius in meters.
+    Returns:
+        A list of open tickets with their distance in meters, or None if the
+        ticket has no location or on a database error.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT latitude, longitude FROM tickets WHERE id = ?', (ticket_id,))
+        row = cursor.fetchone()
+        if row is None or row['latitude'] is None:
+            print(f"Ticket {ticket_id} not found or has no location.")
+            return None
+        return nearby_open_tickets(conn, row['latitude'], row['longitude'], radius_meters, exclude_ticket_id=ticket_id)
+    except sqlite3.Error as e:
+        print(f"Error searching tickets by location: {e}")
+        return None
+    finally:
+        conn.close()
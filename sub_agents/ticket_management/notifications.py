@@ -0,0 +1,450 @@
+"""
+Webhook notifications of ticket changes, so clients do not poll for status.
+
+A subscription is a webhook URL, with an optional token, for one ticket or,
+with no ticket, for every ticket. append_ticket_event() calls
+queue_ticket_notifications() for every event that changes a ticket (all
+but notes), which writes one `notification_outbox` row per matching
+subscription in the same transaction as the event. A notification is
+therefore sent if and only if the change was committed, whichever path made
+it: the history writer, an assigner, the dispatcher or a work date change.
+
+The NotificationDispatcher delivers the outbox on a daemon thread running
+its own event loop. Each pass claims the due rows, groups them by URL and
+sends one POST per URL, concurrently, with the body
+
+    {"notifications": [{"ticket_id": 12, "event_id": 340, "event_type": "assigned", ...}, ...]}
+
+and the subscription's token in the X-A2A-Notification-Token header, as A2A
+push notifications do. Delivered rows are deleted. Failed deliveries are
+retried with exponential backoff and jitter; after NOTIFY_MAX_ATTEMPTS, or
+on a 4xx other than 408 and 429, the rows are kept with status 'failed'.
+Rows are claimed in the database, so several workers can deliver from the
+same database, and claims of dead workers expire.
+
+A2A clients that send a pushNotificationConfig with message/send are
+subscribed to the tickets created while serving that request; see
+REQUEST_WEBHOOK. Other clients subscribe through POST /subscriptions, and
+own the subscriptions they make there (see shared_libraries/api_auth.py).
+
+Webhooks are only sent to public addresses: validate_webhook_url() rejects
+hosts that resolve to private, loopback, link-local or other non-global
+addresses, or, with WEBHOOK_ALLOWED_HOSTS set, hosts not on that list. It
+runs when a webhook is subscribed and again before every delivery, so a
+host that later resolves somewhere internal is not posted to.
+"""
+import asyncio
+import contextvars
+import ipaddress
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+from sub_agents.ticket_management.database import DEFAULT_TENANT, get_db_connection, list_tenants, use_tenant
+from shared_libraries.metrics import METRICS
+
+# Seconds between delivery passes when nothing wakes the dispatcher; 0 disables it.
+NOTIFY_INTERVAL_SECONDS = float(os.getenv("NOTIFY_INTERVAL_SECONDS", "5"))
+# Seconds to wait after a ticket change before delivering, so changes made
+# together go out in one request and the change's transaction has committed.
+NOTIFY_BATCH_WINDOW_SECONDS = float(os.getenv("NOTIFY_BATCH_WINDOW_SECONDS", "0.2"))
+# Outbox rows claimed per pass, and notifications sent per request.
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "200"))
+NOTIFY_MAX_PER_REQUEST = int(os.getenv("NOTIFY_MAX_PER_REQUEST", "50"))
+NOTIFY_TIMEOUT_SECONDS = float(os.getenv("NOTIFY_TIMEOUT_SECONDS", "10"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+# Retry delay after the first failed attempt; it doubles per attempt up to the maximum.
+NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "2"))
+NOTIFY_RETRY_MAX_SECONDS = float(os.getenv("NOTIFY_RETRY_MAX_SECONDS", "600"))
+
+# Hosts webhooks may be sent to, comma-separated; when set, no other host is
+# allowed and the listed ones are trusted whatever they resolve to.
+WEBHOOK_ALLOWED_HOSTS = frozenset(
+    host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+)
+# Allows webhooks on private and loopback addresses, for local development only.
+WEBHOOK_ALLOW_PRIVATE = os.getenv("WEBHOOK_ALLOW_PRIVATE", "FALSE").upper() == "TRUE"
+
+TOKEN_HEADER = 'X-A2A-Notification-Token'
+# Events that do not change a ticket's status or assignment are not sent.
+SILENT_EVENT_TYPES = ('note',)
+
+# (url, token) of the A2A caller being served; tickets it creates are subscribed to it.
+REQUEST_WEBHOOK: contextvars.ContextVar[Optional[tuple[str, Optional[str]]]] = contextvars.ContextVar(
+    'request_webhook', default=None
+)
+
+
+def _check_url_syntax(url) -> str:
+    if not isinstance(url, str) or urlsplit(url).scheme not in ('http', 'https') or not urlsplit(url).hostname:
+        raise ValueError(f"Webhook URL must be an absolute http or https URL, got {url!r}.")
+    return url
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def validate_webhook_url(url) -> str:
+    """
+    Returns `url` if it is an absolute http(s) URL on an allowed host: one in
+    WEBHOOK_ALLOWED_HOSTS when that is set, otherwise one whose addresses are
+    all public. Resolves the host, so call it outside transactions. Raises ValueError.
+    """
+    _check_url_syntax(url)
+    parts = urlsplit(url)
+    host = parts.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise ValueError(f"Webhook host {host} is not in WEBHOOK_ALLOWED_HOSTS.")
+        return url
+    if WEBHOOK_ALLOW_PRIVATE:
+        return url
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"Cannot resolve webhook host {host}: {e}")
+    except ValueError:
+        raise ValueError(f"Invalid webhook URL {url!r}.")
+    if not addresses or not all(_is_public(address) for address in addresses):
+        raise ValueError(f"Webhook host {host} resolves to a private, loopback or link-local address.")
+    return url
+
+
+async def check_webhook_request(request: httpx.Request) -> None:
+    """httpx request hook that refuses to send to a host validate_webhook_url() rejects."""
+    await asyncio.to_thread(validate_webhook_url, str(request.url))
+
+
+def add_subscription(conn, url: str, token: Optional[str] = None, ticket_id: Optional[int] = None,
+                     owner: Optional[str] = None) -> int:
+    """
+    Subscribes `url` to the changes of `ticket_id`, or of every ticket, for
+    `owner`, inside the caller's transaction. Subscribing the same URL twice
+    updates its token. Returns the subscription id. Raises ValueError for a
+    malformed URL; the host is checked by the caller, before the transaction,
+    with validate_webhook_url(), and again on delivery.
+    """
+    _check_url_syntax(url)
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT id FROM ticket_subscriptions WHERE ticket_id IS ? AND url = ? AND owner IS ?',
+        (ticket_id, url, owner)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        cursor.execute('UPDATE ticket_subscriptions SET token = ? WHERE id = ?', (token, row[0]))
+        return row[0]
+    cursor.execute(
+        'INSERT INTO ticket_subscriptions (ticket_id, url, token, owner) VALUES (?, ?, ?, ?)',
+        (ticket_id, url, token, owner)
+    )
+    return cursor.lastrowid
+
+
+def subscribe_request_webhook(conn, ticket_id: int) -> Optional[int]:
+    """
+    Subscribes the webhook of the A2A request being served, if any, to
+    `ticket_id`. The executor only sets REQUEST_WEBHOOK for URLs that pass
+    validate_webhook_url().
+    """
+    webhook = REQUEST_WEBHOOK.get()
+    if webhook is None:
+        return None
+    try:
+        return add_subscription(conn, webhook[0], webhook[1], ticket_id)
+    except ValueError as e:
+        print(f"Not subscribing ticket {ticket_id}: {e}")
+        return None
+
+
+def queue_ticket_notifications(cursor, ticket_id: int, event_id: int, event_type: str,
+                               state: dict, department: Optional[str]) -> int:
+    """
+    Queues a notification of one ticket event for each subscriber, in the
+    caller's transaction. Returns how many were queued.
+    """
+    if event_type in SILENT_EVENT_TYPES:
+        return 0
+    payload = json.dumps({
+        'ticket_id': ticket_id,
+        'event_id': event_id,
+        'event_type': event_type,
+        'status': state['status'],
+        'assigned_technician_id': state['assigned_technician_id'],
+        'assigned_work_date': state['assigned_work_date'],
+        'department': department,
+    })
+    cursor.execute('''
+        INSERT INTO notification_outbox (subscription_id, ticket_id, event_id, payload, next_attempt_at)
+        SELECT id, ?, ?, ?, ? FROM ticket_subscriptions WHERE ticket_id = ? OR ticket_id IS NULL
+    ''', (ticket_id, event_id, payload, time.time(), ticket_id))
+    queued = cursor.rowcount
+    if queued > 0:
+        NOTIFICATION_DISPATCHER.wake()
+    return queued
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next delivery after `attempts` failed ones: capped exponential backoff with jitter."""
+    ceiling = min(NOTIFY_RETRY_MAX_SECONDS, NOTIFY_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _is_permanent(status_code: int) -> bool:
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+class NotificationDispatcher:
+    """Delivers the notification outbox of every tenant to the subscribed webhooks on a daemon thread."""
+
+    def __init__(self, interval_seconds: float = NOTIFY_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Delivers after the batch window instead of at the end of the current interval."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        async with httpx.AsyncClient(timeout=NOTIFY_TIMEOUT_SECONDS) as client:
+            while not self._stop.is_set():
+                for tenant in list_tenants():
+                    try:
+                        with use_tenant(tenant):
+                            # Keep delivering while full batches are due.
+                            while await self.deliver_once(client) >= NOTIFY_BATCH_SIZE and not self._stop.is_set():
+                                pass
+                    except Exception as e:
+                        print(f"Notification delivery pass failed for tenant {tenant or DEFAULT_TENANT}: {e}")
+                woken = await asyncio.to_thread(self._wake.wait, self.interval_seconds)
+                self._wake.clear()
+                if woken and not self._stop.is_set():
+                    await asyncio.sleep(NOTIFY_BATCH_WINDOW_SECONDS)
+
+    def _claim(self) -> list:
+        """Claims the due outbox rows for this worker. Returns them with their subscription's url and token."""
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            now = time.time()
+            cursor = conn.cursor()
+            # Rows are claimed for longer than a delivery can take; a dead worker's claims then lapse.
+            cursor.execute('''
+                UPDATE notification_outbox SET claimed_by = ?, claimed_until = ?
+                WHERE id IN (
+                    SELECT id FROM notification_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ?
+                          AND (claimed_until IS NULL OR claimed_until < ?)
+                    ORDER BY next_attempt_at LIMIT ?
+                )
+                RETURNING id
+            ''', (self.worker_id, now + 3 * NOTIFY_TIMEOUT_SECONDS, now, now, NOTIFY_BATCH_SIZE))
+            ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            if not ids:
+                return []
+            cursor.execute(f'''
+                SELECT o.id, o.payload, o.attempts, s.url, s.token
+                FROM notification_outbox o JOIN ticket_subscriptions s ON s.id = o.subscription_id
+                WHERE o.id IN ({','.join('?' * len(ids))})
+                ORDER BY o.id
+            ''', ids)
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error claiming notifications: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def _settle(self, delivered: list[int], failed: list[tuple], error: Optional[str]) -> None:
+        """Deletes delivered rows and reschedules or fails the others; `failed` holds (id, attempts, permanent)."""
+        conn = get_db_connection()
+        if conn is None:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.executemany('DELETE FROM notification_outbox WHERE id = ?', [(i,) for i in delivered])
+            now = time.time()
+            for outbox_id, attempts, permanent in failed:
+                attempts += 1
+                status = 'failed' if permanent or attempts >= NOTIFY_MAX_ATTEMPTS else 'pending'
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET attempts = ?, status = ?, next_attempt_at = ?, last_error = ?,
+                        claimed_by = NULL, claimed_until = NULL
+                    WHERE id = ?
+                ''', (attempts, status, now + retry_delay(attempts), error, outbox_id))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error settling notifications: {e}")
+        finally:
+            conn.close()
+
+    async def _post(self, client, url: str, token: Optional[str], rows: list) -> None:
+        headers = {TOKEN_HEADER: token} if token else None
+        body = {'notifications': [json.loads(row['payload']) for row in rows]}
+        started = time.perf_counter()
+        error = None
+        permanent = False
+        try:
+            response = await client.post(url, json=body, headers=headers)
+            if response.status_code >= 300:
+                error = f"HTTP {response.status_code}"
+                permanent = _is_permanent(response.status_code)
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+        METRICS.summary(
+            "notification_request_seconds", "Time taken by webhook notification requests."
+        ).observe(time.perf_counter() - started)
+        outcome = 'delivered' if error is None else ('rejected' if permanent else 'retry')
+        METRICS.counter(
+            "notifications_total", "Ticket notifications by delivery outcome.", outcome=outcome
+        ).inc(len(rows))
+        if error is None:
+            await asyncio.to_thread(self._settle, [row['id'] for row in rows], [], None)
+        else:
+            print(f"Notification delivery to {url} failed: {error}")
+            await asyncio.to_thread(
+                self._settle, [], [(row['id'], row['attempts'], permanent) for row in rows], error
+            )
+
+    async def deliver_once(self, client) -> int:
+        """Sends the due notifications, one request per URL and batch. Returns how many rows were claimed."""
+        rows = await asyncio.to_thread(self._claim)
+        batches: dict[tuple, list] = {}
+        for row in rows:
+            batches.setdefault((row['url'], row['token']), []).append(row)
+        for url in {url for url, _ in batches}:
+            try:
+                await asyncio.to_thread(validate_webhook_url, url)
+            except ValueError as e:
+                # The host now resolves somewhere webhooks may not go; fail its rows for good.
+                blocked = [row for (batch_url, _), batch in batches.items() if batch_url == url for row in batch]
+                print(f"Not delivering to {url}: {e}")
+                METRICS.counter(
+                    "notifications_total", "Ticket notifications by delivery outcome.", outcome='blocked'
+                ).inc(len(blocked))
+                await asyncio.to_thread(
+                    self._settle, [], [(row['id'], row['attempts'], True) for row in blocked], str(e)
+                )
+                batches = {key: batch for key, batch in batches.items() if key[0] != url}
+        requests = [
+            self._post(client, url, token, batch[start:start + NOTIFY_MAX_PER_REQUEST])
+            for (url, token), batch in batches.items()
+            for start in range(0, len(batch), NOTIFY_MAX_PER_REQUEST)
+        ]
+        await asyncio.gather(*requests)
+        return len(rows)
+
+
+NOTIFICATION_DISPATCHER = NotificationDispatcher()
+
+
+def list_subscriptions(ticket_id: Optional[int] = None, owner: Optional[str] = None) -> Optional[list]:
+    """
+    Lists `owner`'s subscriptions, or everyone's when `owner` is None, with
+    their pending and failed notification counts; tokens are not returned.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT s.id, s.ticket_id, s.url, s.owner, s.created_at,
+                   (SELECT COUNT(*) FROM notification_outbox o
+                    WHERE o.subscription_id = s.id AND o.status = 'pending') AS pending,
+                   (SELECT COUNT(*) FROM notification_outbox o
+                    WHERE o.subscription_id = s.id AND o.status = 'failed') AS failed
+            FROM ticket_subscriptions s
+            WHERE (? IS NULL OR s.ticket_id = ?) AND (? IS NULL OR s.owner = ?)
+            ORDER BY s.id
+        ''', (ticket_id, ticket_id, owner, owner))
+        return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Error listing subscriptions: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def subscribe(url: str, token: Optional[str] = None, ticket_id: Optional[int] = None,
+              owner: Optional[str] = None) -> Optional[int]:
+    """
+    Subscribes `url` to one ticket's changes, or every ticket's, for `owner`.
+    Returns the subscription id. Raises ValueError.
+    """
+    validate_webhook_url(url)
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        if ticket_id is not None and conn.execute('SELECT 1 FROM tickets WHERE id = ?', (ticket_id,)).fetchone() is None:
+            raise ValueError(f"Ticket {ticket_id} does not exist.")
+        subscription_id = add_subscription(conn, url, token, ticket_id, owner)
+        conn.commit()
+        return subscription_id
+    except sqlite3.Error as e:
+        print(f"Error subscribing {url}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+def unsubscribe(subscription_id: int, owner: Optional[str] = None) -> bool:
+    """
+    Removes a subscription of `owner`, or of anyone when `owner` is None, and
+    its undelivered notifications. Returns False if there was no such subscription.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            'DELETE FROM ticket_subscriptions WHERE id = ? AND (? IS NULL OR owner = ?)',
+            (subscription_id, owner, owner)
+        )
+        removed = cursor.rowcount > 0
+        if removed:
+            cursor.execute('DELETE FROM notification_outbox WHERE subscription_id = ?', (subscription_id,))
+        conn.commit()
+        return removed
+    except sqlite3.Error as e:
+        print(f"Error removing subscription {subscription_id}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
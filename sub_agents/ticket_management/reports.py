@@ -0,0 +1,326 @@
+"""
+Operational reports maintained incrementally from the ticket event log.
+
+append_ticket_event() calls record_ticket_event() for every event, in the
+same transaction, which keeps these aggregate tables current:
+
+- report_backlog: unresolved tickets per department and status
+- report_daily: tickets created, first assigned and resolved per UTC day
+  and department, with summed time-to-assign and time-to-resolve
+- report_latency: per-day histograms of those two durations, for percentiles
+- report_technician_daily: assignments, completed jobs and busy time per
+  technician and day
+
+A ticket is counted under UNROUTED_DEPARTMENT until its department is
+known, from its own department column or its technician's: being queued
+for dispatch or assigned. Its creation and its backlog entry then move to
+that department, and it stays there if it is later unassigned.
+
+report_ticket_state holds the one row per ticket needed to update them. A
+report therefore reads a number of rows bounded by departments, technicians
+and the day window, however large `tickets` and `history` grow. Aggregates
+outlive archival; only the per-ticket state leaves with archived tickets.
+
+Rebuild the tables from history with:
+    python -m sub_agents.ticket_management.reports --rebuild
+"""
+import argparse
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sub_agents.ticket_management.archive import ARCHIVE_STATUSES as RESOLVED_STATUSES
+from sub_agents.ticket_management.database import get_db_connection
+
+# Tickets whose department is not known yet are counted here.
+UNROUTED_DEPARTMENT = 'Unrouted'
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (
+    300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 12 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400, float('inf'),
+)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _day(at: float) -> str:
+    return datetime.fromtimestamp(at, timezone.utc).strftime('%Y-%m-%d')
+
+
+def _is_resolved(status: Optional[str]) -> bool:
+    return status is not None and status.lower() in RESOLVED_STATUSES
+
+
+def _bump(cursor, table: str, keys: dict, increments: dict) -> None:
+    """Adds `increments` to the row of `table` identified by `keys`, creating it at zero."""
+    columns = list(keys) + list(increments)
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in increments)
+    cursor.execute(f'''
+        INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}
+    ''', [*keys.values(), *increments.values()])
+
+
+def _observe_latency(cursor, day: str, department: str, metric: str, seconds: float) -> None:
+    le_seconds = next(bound for bound in LATENCY_BUCKETS if seconds <= bound)
+    _bump(cursor, 'report_latency',
+          {'day': day, 'department': department, 'metric': metric, 'le_seconds': le_seconds}, {'tickets': 1})
+
+
+def _close_assignment(cursor, technician_id: int, started_at: Optional[float], at: float, completed: bool) -> None:
+    if started_at is None:
+        return
+    _bump(cursor, 'report_technician_daily', {'day': _day(at), 'technician_id': technician_id},
+          {'completed': int(completed), 'busy_seconds': max(0.0, at - started_at)})
+
+
+def record_ticket_event(cursor, ticket_id: int, event_type: str, state: dict,
+                        department: Optional[str], at: Optional[float] = None) -> None:
+    """
+    Folds one ticket event into the report tables, in the caller's transaction.
+
+    Args:
+        cursor: A cursor in the transaction that wrote the event.
+        ticket_id: The ticket the event belongs to.
+        event_type: The event's type, as in ticket_events.EVENT_TYPES.
+        state: The ticket's status and assigned_technician_id after the event.
+        department: The ticket's department column; the assigned technician's
+            department is used when it is empty, then the department already
+            recorded for the ticket.
+        at: Epoch seconds of the event; defaults to now.
+    """
+    at = time.time() if at is None else at
+    day = _day(at)
+    technician_id = state['assigned_technician_id']
+    if department is None and technician_id is not None:
+        cursor.execute('SELECT department FROM technicians WHERE id = ?', (technician_id,))
+        row = cursor.fetchone()
+        department = row[0] if row else None
+    status = state['status']
+
+    cursor.execute('''
+        SELECT department, status, created_at, first_assigned_at, technician_id, assignment_started_at
+        FROM report_ticket_state WHERE ticket_id = ?
+    ''', (ticket_id,))
+    old = cursor.fetchone()
+    if old is None:
+        old_department, old_status, created_at, first_assigned_at, old_technician_id, started_at = (
+            None, None, at, None, None, None)
+    else:
+        old_department, old_status, created_at, first_assigned_at, old_technician_id, started_at = old
+    department = department or old_department or UNROUTED_DEPARTMENT
+    if old is not None and department != old_department:
+        # The ticket was created under the department it had then; count it under its new one.
+        created_day = _day(created_at)
+        _bump(cursor, 'report_daily', {'day': created_day, 'department': old_department}, {'created': -1})
+        _bump(cursor, 'report_daily', {'day': created_day, 'department': department}, {'created': 1})
+    was_resolved = old is not None and _is_resolved(old_status)
+    resolved = _is_resolved(status)
+
+    old_bucket = (old_department, old_status) if old is not None and not was_resolved else None
+    new_bucket = (department, status) if status is not None and not resolved else None
+    if old_bucket != new_bucket:
+        if old_bucket is not None:
+            _bump(cursor, 'report_backlog', {'department': old_bucket[0], 'status': old_bucket[1]}, {'tickets': -1})
+        if new_bucket is not None:
+            _bump(cursor, 'report_backlog', {'department': new_bucket[0], 'status': new_bucket[1]}, {'tickets': 1})
+
+    if event_type == 'created':
+        _bump(cursor, 'report_daily', {'day': day, 'department': department}, {'created': 1})
+
+    if technician_id != old_technician_id:
+        if old_technician_id is not None:
+            _close_assignment(cursor, old_technician_id, started_at, at, completed=False)
+        started_at = None
+        if technician_id is not None:
+            started_at = None if resolved else at
+            _bump(cursor, 'report_technician_daily', {'day': day, 'technician_id': technician_id}, {'assignments': 1})
+            if first_assigned_at is None:
+                first_assigned_at = at
+                _bump(cursor, 'report_daily', {'day': day, 'department': department},
+                      {'assigned': 1, 'assign_seconds': at - created_at})
+                _observe_latency(cursor, day, department, 'time_to_assign', at - created_at)
+
+    if resolved and not was_resolved and old is not None:
+        _bump(cursor, 'report_daily', {'day': day, 'department': department},
+              {'resolved': 1, 'resolve_seconds': at - created_at})
+        _observe_latency(cursor, day, department, 'time_to_resolve', at - created_at)
+        if technician_id is not None:
+            _close_assignment(cursor, technician_id, started_at, at, completed=True)
+        started_at = None
+    elif was_resolved and not resolved and technician_id is not None:
+        # A reopened ticket puts its technician back to work on it.
+        started_at = at
+
+    cursor.execute('''
+        INSERT OR REPLACE INTO report_ticket_state (ticket_id, department, status, created_at,
+                                                    first_assigned_at, technician_id, assignment_started_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (ticket_id, department, status, created_at, first_assigned_at, technician_id, started_at))
+
+
+def rebuild_reports(cursor) -> int:
+    """
+    Recomputes every report table by replaying the history of the tickets in
+    the hot database, in the caller's transaction. Returns the events replayed.
+    """
+    from sub_agents.ticket_management.ticket_events import fold_event
+
+    for table in ('report_ticket_state', 'report_backlog', 'report_daily', 'report_latency',
+                  'report_technician_daily'):
+        cursor.execute(f'DELETE FROM {table}')
+    cursor.execute('''
+        SELECT h.ticket_id, h.timestamp, h.event_type, h.status, h.assigned_technician_id,
+               h.assigned_work_date, t.department
+        FROM history h JOIN tickets t ON t.id = h.ticket_id
+        ORDER BY h.ticket_id, h.timestamp, h.id
+    ''')
+    events = cursor.fetchall()
+    replayed = 0
+    state = None
+    current_ticket_id = None
+    for ticket_id, timestamp, event_type, status, technician_id, work_date, department in events:
+        if ticket_id != current_ticket_id:
+            current_ticket_id = ticket_id
+            state = {'status': None, 'assigned_technician_id': None, 'assigned_work_date': None}
+        state = fold_event(state, {
+            'event_type': event_type, 'status': status,
+            'assigned_technician_id': technician_id, 'assigned_work_date': work_date,
+        })
+        at = datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+        record_ticket_event(cursor, ticket_id, event_type, state, department, at)
+        replayed += 1
+    cursor.execute('DELETE FROM report_backlog WHERE tickets = 0')
+    return replayed
+
+
+def _percentile(buckets: list[tuple[float, int]], fraction: float) -> Optional[float]:
+    """Upper bound, in hours, of the histogram bucket holding the given fraction of observations."""
+    total = sum(count for _, count in buckets)
+    if total == 0:
+        return None
+    seen = 0
+    for le_seconds, count in sorted(buckets):
+        seen += count
+        if seen >= fraction * total:
+            return None if le_seconds == float('inf') else round(le_seconds / 3600, 2)
+    return None
+
+
+def get_operations_report(department: Optional[str] = None, days: int = 7) -> Optional[dict]:
+    """
+    Returns the operations dashboard: backlog per department and status,
+    ticket flow with time-to-assign and time-to-resolve, and technician
+    utilization over the last `days` days.
+
+    Args:
+        department: Only report on this department, e.g. 'Public Work'.
+        days: The number of days, including today, covered by the flow and utilization figures.
+    Returns:
+        A dictionary with 'backlog', 'flow' and 'technicians' sections, or None on a database error.
+    """
+    days = max(1, int(days))
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        department_filter = ' AND department = ?' if department else ''
+        department_params = [department] if department else []
+
+        backlog = {}
+        cursor.execute(f'''
+            SELECT department, status, tickets FROM report_backlog
+            WHERE tickets > 0{department_filter} ORDER BY department, status
+        ''', department_params)
+        for row in cursor.fetchall():
+            entry = backlog.setdefault(row['department'], {'total': 0, 'by_status': {}})
+            entry['by_status'][row['status']] = row['tickets']
+            entry['total'] += row['tickets']
+
+        flow = {}
+        cursor.execute(f'''
+            SELECT department, SUM(created) AS created, SUM(assigned) AS assigned, SUM(resolved) AS resolved,
+                   SUM(assign_seconds) AS assign_seconds, SUM(resolve_seconds) AS resolve_seconds
+            FROM report_daily WHERE day >= ?{department_filter}
+            GROUP BY department ORDER BY department
+        ''', [since, *department_params])
+        for row in cursor.fetchall():
+            flow[row['department']] = {
+                'created': row['created'],
+                'assigned': row['assigned'],
+                'resolved': row['resolved'],
+                'mean_hours_to_assign': round(row['assign_seconds'] / row['assigned'] / 3600, 2) if row['assigned'] else None,
+                'mean_hours_to_resolve': round(row['resolve_seconds'] / row['resolved'] / 3600, 2) if row['resolved'] else None,
+            }
+        cursor.execute(f'''
+            SELECT department, metric, le_seconds, SUM(tickets) AS tickets
+            FROM report_latency WHERE day >= ?{department_filter}
+            GROUP BY department, metric, le_seconds
+        ''', [since, *department_params])
+        histograms = {}
+        for row in cursor.fetchall():
+            histograms.setdefault((row['department'], row['metric']), []).append((row['le_seconds'], row['tickets']))
+        for (name, metric), buckets in histograms.items():
+            entry = flow.setdefault(name, {})
+            prefix = 'assign' if metric == 'time_to_assign' else 'resolve'
+            entry[f'p50_hours_to_{prefix}'] = _percentile(buckets, 0.5)
+            entry[f'p90_hours_to_{prefix}'] = _percentile(buckets, 0.9)
+
+        technicians = []
+        until = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        cursor.execute(f'''
+            SELECT t.id, t.name, t.department, t.assigned_ticket_id IS NOT NULL AS busy_now,
+                   COALESCE(r.assignments, 0) AS assignments, COALESCE(r.completed, 0) AS completed,
+                   COALESCE(r.busy_seconds, 0) AS busy_seconds,
+                   (SELECT SUM(strftime('%s', a.end_time) - strftime('%s', a.start_time))
+                    FROM technician_availability a
+                    WHERE a.technician_id = t.id AND a.available_date BETWEEN ? AND ?) AS available_seconds
+            FROM technicians t
+            LEFT JOIN (SELECT technician_id, SUM(assignments) AS assignments, SUM(completed) AS completed,
+                              SUM(busy_seconds) AS busy_seconds
+                       FROM report_technician_daily WHERE day >= ? GROUP BY technician_id) r
+                   ON r.technician_id = t.id
+            {'WHERE t.department = ?' if department else ''}
+            ORDER BY t.department, t.id
+        ''', [since, until, since, *department_params])
+        for row in cursor.fetchall():
+            available_seconds = row['available_seconds'] or 0
+            technicians.append({
+                'id': row['id'],
+                'name': row['name'],
+                'department': row['department'],
+                'busy_now': bool(row['busy_now']),
+                'assignments': row['assignments'],
+                'completed': row['completed'],
+                'busy_hours': round(row['busy_seconds'] / 3600, 2),
+                'available_hours': round(available_seconds / 3600, 2),
+                'utilization': round(min(1.0, row['busy_seconds'] / available_seconds), 3) if available_seconds else None,
+            })
+        return {'since': since, 'days': days, 'backlog': backlog, 'flow': flow, 'technicians': technicians}
+    except sqlite3.Error as e:
+        print(f"Error building operations report: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Print or rebuild the operations report.")
+    parser.add_argument("--department", default=None)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the report tables from history first.")
+    args = parser.parse_args()
+    if args.rebuild:
+        conn = get_db_connection()
+        if conn is None:
+            raise SystemExit(1)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            print(f"Replayed {rebuild_reports(conn.cursor())} events.")
+            conn.commit()
+        finally:
+            conn.close()
+    print(json.dumps(get_operations_report(args.department, args.days), indent=2))
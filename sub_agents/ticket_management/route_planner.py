@@ -0,0 +1,421 @@
+"""
+Daily multi-stop work plans per technician.
+
+For each department, the most urgent open tickets that have a location are
+split among the technicians available on the plan date. The split is an
+angular sweep around the depot, sized by how many jobs fit in each shift.
+Each technician's stops are ordered with a nearest-neighbour tour improved
+by 2-opt, both over a NumPy haversine distance matrix. Stops that do not fit
+in the shift once travel time is counted stay unplanned. The result is
+written to `technician_routes`, and the tickets are assigned through the
+event log.
+
+Each department is planned and written in one BEGIN IMMEDIATE transaction,
+so the technicians and tickets it reads cannot change before the plan is
+written. A technician's first stop is claimed with claim_in_transaction(),
+like any other assignment; a technician it reports as taken keeps their
+current job and gets no route. Jobs that a re-plan of the same day moves
+are released first. The daily job runs in one worker process per
+day and tenant: the first to record the day's run in `idempotency_keys`.
+
+Run from the repository root with:
+    python -m sub_agents.ticket_management.route_planner [--date YYYY-MM-DD] [--department NAME] [--dry-run]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+import numpy as np
+from sub_agents.ticket_management.archive import ARCHIVE_STATUSES as RESOLVED_STATUSES
+from sub_agents.ticket_management.database import DEFAULT_TENANT, get_db_connection, list_tenants, use_tenant
+from sub_agents.ticket_management.dispatch import DEPARTMENT_ASSIGNERS, WORK_DATE_FORMAT
+from sub_agents.ticket_management.idempotency import abandon, mark_in_progress, remember
+from sub_agents.ticket_management.technician_claims import CLAIMED, claim_in_transaction
+from sub_agents.ticket_management.ticket_events import append_ticket_event
+from shared_libraries.gazetteer import EARTH_RADIUS_METERS, GAZETTEER
+from shared_libraries.metrics import METRICS
+
+# Minutes spent on site per job, and average travel speed between jobs.
+SERVICE_MINUTES = float(os.getenv("ROUTE_SERVICE_MINUTES", "30"))
+TRAVEL_SPEED_KMH = float(os.getenv("ROUTE_TRAVEL_SPEED_KMH", "25"))
+# Where every route starts; any gazetteer address.
+DEPOT_ADDRESS = os.getenv("ROUTE_DEPOT_ADDRESS", "city hall")
+TWO_OPT_MAX_ITERATIONS = int(os.getenv("ROUTE_TWO_OPT_MAX_ITERATIONS", "2000"))
+# Local time ("HH:MM") at which the day's routes are planned; empty disables the daily job.
+ROUTE_PLANNING_TIME = os.getenv("ROUTE_PLANNING_TIME", "")
+
+
+def distance_matrix(latitudes, longitudes, to_latitudes=None, to_longitudes=None) -> np.ndarray:
+    """
+    Great-circle distances in meters from every point to every point, or to
+    every point of a second set when `to_latitudes`/`to_longitudes` are given.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    to_lat = lat if to_latitudes is None else np.radians(np.asarray(to_latitudes, dtype=np.float64))
+    to_lon = lon if to_longitudes is None else np.radians(np.asarray(to_longitudes, dtype=np.float64))
+    d_lat = lat[:, None] - to_lat[None, :]
+    d_lon = lon[:, None] - to_lon[None, :]
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(to_lat)[None, :] * np.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def sweep_clusters(latitudes, longitudes, depot: tuple[float, float], capacities) -> list[np.ndarray]:
+    """
+    Splits stops into one angular sector around the depot per capacity, each
+    sector holding a share of the stops proportional to its capacity.
+    Returns arrays of stop indices.
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    if len(lat) == 0:
+        return [np.array([], dtype=int) for _ in capacities]
+    angles = np.arctan2(lat - depot[0], (lon - depot[1]) * np.cos(np.radians(depot[0])))
+    order = np.argsort(angles, kind='stable')
+    # Start the sweep at the widest empty angle so no sector straddles a dense area.
+    sorted_angles = angles[order]
+    gaps = np.diff(np.concatenate([sorted_angles, sorted_angles[:1] + 2 * np.pi]))
+    order = np.roll(order, -((int(np.argmax(gaps)) + 1) % len(order)))
+    shares = np.cumsum(np.asarray(capacities, dtype=np.float64))
+    cuts = np.round(shares / shares[-1] * len(order)).astype(int)[:-1]
+    return np.split(order, cuts)
+
+
+def nearest_neighbour_route(dist: np.ndarray, start: int = 0) -> list[int]:
+    """An open tour from `start` that always moves to the closest unvisited node."""
+    visited = np.zeros(len(dist), dtype=bool)
+    visited[start] = True
+    route = [start]
+    for _ in range(len(dist) - 1):
+        current = int(np.argmin(np.where(visited, np.inf, dist[route[-1]])))
+        visited[current] = True
+        route.append(current)
+    return route
+
+
+def two_opt(dist: np.ndarray, route: list[int], max_iterations: int = TWO_OPT_MAX_ITERATIONS) -> list[int]:
+    """
+    Improves an open route that starts at route[0] with best-improvement 2-opt.
+    All candidate moves of an iteration are scored at once with NumPy.
+    """
+    n = len(dist)
+    if len(route) < 4:
+        return list(route)
+    # A dummy end node at distance 0 from everything lets 2-opt reverse the tail of an open route.
+    padded = np.zeros((n + 1, n + 1))
+    padded[:n, :n] = dist
+    path = np.array(list(route) + [n])
+    for _ in range(max_iterations):
+        a, b = path[:-1], path[1:]
+        edge = padded[a, b]
+        # delta[i, j]: change in length from replacing edges (a_i, b_i), (a_j, b_j) with (a_i, a_j), (b_i, b_j)
+        delta = padded[np.ix_(a, a)] + padded[np.ix_(b, b)] - edge[:, None] - edge[None, :]
+        delta = np.triu(delta, k=2)
+        i, j = np.unravel_index(int(np.argmin(delta)), delta.shape)
+        if delta[i, j] >= -1e-6:
+            break
+        path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+    return path[:-1].tolist()
+
+
+def _shift_minutes(start_time: str, end_time: str) -> float:
+    start = datetime.strptime(start_time, '%H:%M')
+    end = datetime.strptime(end_time, '%H:%M')
+    return max(0.0, (end - start).total_seconds() / 60)
+
+
+def plan_department(conn, department: str, plan_date: date, depot: tuple[float, float]) -> dict:
+    """
+    Builds, without writing anything, the routes of one department's technicians for `plan_date`.
+
+    Returns {'routes': {technician_id: [stop, ...]}, 'unplanned': [ticket_id, ...]}
+    where each stop has ticket_id, arrival_time, departure_time and leg_meters.
+    """
+    work_date = plan_date.strftime(WORK_DATE_FORMAT)
+    cursor = conn.cursor()
+    # Technicians already holding a job for another day keep it and are not planned.
+    cursor.execute('''
+        SELECT t.id, MIN(a.start_time) AS start_time, MAX(a.end_time) AS end_time
+        FROM technicians t
+        JOIN technician_availability a ON a.technician_id = t.id AND a.available_date = ?
+        WHERE t.department = ? AND (t.assigned_ticket_id IS NULL OR t.assigned_work_date = ?)
+        GROUP BY t.id ORDER BY t.id
+    ''', (plan_date.isoformat(), department, work_date))
+    technicians = [dict(row) for row in cursor.fetchall()]
+    capacities = [int(_shift_minutes(t['start_time'], t['end_time']) // SERVICE_MINUTES) for t in technicians]
+    technicians = [t for t, c in zip(technicians, capacities) if c > 0]
+    capacities = [c for c in capacities if c > 0]
+    if not technicians:
+        return {'routes': {}, 'unplanned': []}
+
+    # Only as many of the most urgent tickets as could possibly fit are routed.
+    technician_ids = [t['id'] for t in technicians]
+    status_placeholders = ", ".join("?" for _ in RESOLVED_STATUSES)
+    technician_placeholders = ", ".join("?" for _ in technician_ids)
+    cursor.execute(f'''
+        SELECT tk.id, tk.latitude, tk.longitude
+        FROM tickets tk
+        LEFT JOIN technicians tech ON tech.id = tk.assigned_technician_id
+        WHERE tk.latitude IS NOT NULL
+          AND LOWER(tk.status) NOT IN ({status_placeholders})
+          AND COALESCE(tk.department, tech.department) = ?
+          AND (tk.assigned_technician_id IS NULL
+               OR (tk.assigned_work_date = ? AND tk.assigned_technician_id IN ({technician_placeholders})))
+        ORDER BY tk.priority, tk.sla_deadline IS NULL, tk.sla_deadline, tk.created_at
+        LIMIT ?
+    ''', [*RESOLVED_STATUSES, department, work_date, *technician_ids, sum(capacities)])
+    tickets = cursor.fetchall()
+    ticket_ids = np.array([row['id'] for row in tickets], dtype=np.int64)
+    latitudes = np.array([depot[0]] + [row['latitude'] for row in tickets])
+    longitudes = np.array([depot[1]] + [row['longitude'] for row in tickets])
+    dist = distance_matrix(latitudes, longitudes)
+
+    meters_per_minute = TRAVEL_SPEED_KMH * 1000 / 60
+    routes = {}
+    unplanned = []
+    clusters = sweep_clusters(latitudes[1:], longitudes[1:], depot, capacities)
+    for technician, cluster in zip(technicians, clusters):
+        nodes = np.concatenate([[0], cluster + 1])
+        sub = dist[np.ix_(nodes, nodes)]
+        order = two_opt(sub, nearest_neighbour_route(sub))
+        clock = datetime.combine(plan_date, datetime.strptime(technician['start_time'], '%H:%M').time())
+        shift_end = datetime.combine(plan_date, datetime.strptime(technician['end_time'], '%H:%M').time())
+        stops = []
+        for previous, current in zip(order, order[1:]):
+            leg_meters = float(sub[previous, current])
+            arrival = clock + timedelta(minutes=leg_meters / meters_per_minute)
+            departure = arrival + timedelta(minutes=SERVICE_MINUTES)
+            ticket_id = int(ticket_ids[nodes[current] - 1])
+            if departure > shift_end:
+                unplanned.append(ticket_id)
+                continue
+            stops.append({
+                'ticket_id': ticket_id,
+                'arrival_time': arrival.strftime('%H:%M'),
+                'departure_time': departure.strftime('%H:%M'),
+                'leg_meters': round(leg_meters, 1),
+            })
+            clock = departure
+        routes[technician['id']] = stops
+    return {'routes': routes, 'unplanned': unplanned}
+
+
+def _stop_message(technician_id: int, work_date: str, stop_order: int, stop: dict) -> str:
+    return (f"Planned as stop {stop_order} of technician {technician_id}'s route "
+            f"for {work_date}, arriving around {stop['arrival_time']}.")
+
+
+def write_plan(conn, plan_date: date, plan: dict) -> None:
+    """
+    Stores a department plan and assigns its tickets, in the caller's
+    transaction. Technicians whose first stop cannot be claimed keep their
+    current job, get no route and are listed in plan['skipped'].
+    """
+    work_date = plan_date.strftime(WORK_DATE_FORMAT)
+    cursor = conn.cursor()
+    planned = {stop['ticket_id']: technician_id
+               for technician_id, stops in plan['routes'].items() for stop in stops}
+    planned.update((ticket_id, None) for ticket_id in plan['unplanned'])
+    first_stops = {stops[0]['ticket_id'] for stops in plan['routes'].values() if stops}
+    # A re-plan of the day takes back the jobs it moves before claiming anyone.
+    for ticket_id, technician_id in planned.items():
+        cursor.execute('SELECT assigned_technician_id FROM tickets WHERE id = ?', (ticket_id,))
+        current = cursor.fetchone()[0]
+        if current is None:
+            continue
+        if current != technician_id or ticket_id not in first_stops:
+            cursor.execute('''
+                UPDATE technicians SET assigned_ticket_id = NULL, assigned_work_date = NULL
+                WHERE id = ? AND assigned_ticket_id = ?
+            ''', (current, ticket_id))
+        if current != technician_id:
+            reason = ("Moved to another technician" if technician_id
+                      else "Did not fit") + f" in the {work_date} route plan; waiting for a later day."
+            append_ticket_event(conn, ticket_id, 'unassigned', log_message=reason)
+    plan['skipped'] = []
+    for technician_id, stops in plan['routes'].items():
+        cursor.execute('DELETE FROM technician_routes WHERE plan_date = ? AND technician_id = ?',
+                       (plan_date.isoformat(), technician_id))
+        if not stops:
+            continue
+        cursor.execute('SELECT assigned_ticket_id FROM technicians WHERE id = ?', (technician_id,))
+        # The technician's current job is the first stop of the day.
+        if cursor.fetchone()[0] != stops[0]['ticket_id']:
+            outcome = claim_in_transaction(conn, stops[0]['ticket_id'], technician_id, work_date,
+                                           _stop_message(technician_id, work_date, 1, stops[0]))
+            if outcome != CLAIMED:
+                print(f"Not routing technician {technician_id} on {work_date}: {outcome}")
+                plan['skipped'].append(technician_id)
+                continue
+        for stop_order, stop in enumerate(stops[1:], start=2):
+            cursor.execute('SELECT assigned_technician_id FROM tickets WHERE id = ?', (stop['ticket_id'],))
+            if cursor.fetchone()[0] != technician_id:
+                append_ticket_event(
+                    conn, stop['ticket_id'], 'assigned',
+                    log_message=_stop_message(technician_id, work_date, stop_order, stop),
+                    assigned_technician_id=technician_id, assigned_work_date=work_date,
+                )
+        cursor.executemany('''
+            INSERT INTO technician_routes (plan_date, technician_id, stop_order, ticket_id,
+                                           arrival_time, departure_time, leg_meters)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(plan_date.isoformat(), technician_id, stop_order, stop['ticket_id'],
+               stop['arrival_time'], stop['departure_time'], stop['leg_meters'])
+              for stop_order, stop in enumerate(stops, start=1)])
+    for technician_id in plan['skipped']:
+        del plan['routes'][technician_id]
+
+
+def plan_routes(plan_date: Optional[str] = None, department: Optional[str] = None, dry_run: bool = False) -> Optional[dict]:
+    """
+    Plans the day's routes for one or all departments and writes them back.
+
+    Args:
+        plan_date: The day to plan, 'YYYY-MM-DD'; defaults to today.
+        department: Only plan this department, e.g. 'Public Work'.
+        dry_run: Compute the plan without writing it.
+    Returns:
+        The plan per department, or None on a database error.
+    """
+    day = datetime.strptime(plan_date, '%Y-%m-%d').date() if plan_date else date.today()
+    depot_place = GAZETTEER.geocode(DEPOT_ADDRESS)
+    if depot_place is None:
+        print(f"Route depot address is not in the gazetteer: {DEPOT_ADDRESS}")
+        return None
+    depot = (depot_place.latitude, depot_place.longitude)
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    plans = {}
+    try:
+        for name in ([department] if department else DEPARTMENT_ASSIGNERS):
+            started = time.perf_counter()
+            # Reads and writes share one write transaction, so no claim made meanwhile is overwritten.
+            conn.execute("BEGIN IMMEDIATE")
+            plan = plan_department(conn, name, day, depot)
+            if dry_run:
+                conn.rollback()
+            else:
+                write_plan(conn, day, plan)
+                conn.commit()
+            METRICS.summary(
+                "route_planning_seconds", "Time to plan one department's routes.", department=name
+            ).observe(time.perf_counter() - started)
+            plans[name] = plan
+            planned = sum(len(stops) for stops in plan['routes'].values())
+            print(f"Planned {planned} stops for {len(plan['routes'])} {name} technicians on {day}; "
+                  f"{len(plan['unplanned'])} did not fit.")
+        return plans
+    except sqlite3.Error as e:
+        print(f"Error planning routes: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+
+def get_technician_route(technician_id: int, plan_date: Optional[str] = None) -> Optional[list]:
+    """
+    Fetches a technician's planned stops for a day, in visiting order.
+
+    Args:
+        technician_id: The ID of the technician.
+        plan_date: The day, 'YYYY-MM-DD'; defaults to today.
+    Returns:
+        A list of stops with ticket ID, title, address, arrival and departure
+        time, or None on a database error.
+    """
+    plan_date = plan_date or date.today().isoformat()
+    conn = get_db_connection()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT r.stop_order, r.ticket_id, t.title, t.address, r.arrival_time, r.departure_time, r.leg_meters
+            FROM technician_routes r JOIN tickets t ON t.id = r.ticket_id
+            WHERE r.technician_id = ? AND r.plan_date = ?
+            ORDER BY r.stop_order
+        ''', (technician_id, plan_date))
+        return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"Error fetching technician route: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+class DailyRoutePlanner:
+    """
+    Runs plan_routes() for the current day of every tenant at ROUTE_PLANNING_TIME
+    on a daemon thread. Every worker process starts one; only the first to mark
+    the day's run plans it.
+    """
+
+    def __init__(self, planning_time: str = ROUTE_PLANNING_TIME):
+        self.planning_time = planning_time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _seconds_until_next_run(self) -> float:
+        now = datetime.now()
+        at = datetime.combine(now.date(), datetime.strptime(self.planning_time, '%H:%M').time())
+        if at <= now:
+            at += timedelta(days=1)
+        return (at - now).total_seconds()
+
+    def start(self) -> None:
+        if not self.planning_time or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="route-planner", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._seconds_until_next_run()):
+            for tenant in list_tenants():
+                try:
+                    with use_tenant(tenant):
+                        self.run_once(date.today())
+                except Exception as e:
+                    print(f"Daily route planning failed for tenant {tenant or DEFAULT_TENANT}: {e}")
+
+    @staticmethod
+    def run_once(day: date) -> Optional[dict]:
+        """Plans `day` for the current tenant unless another process has. Returns the plans, or None."""
+        key = day.isoformat()
+        if mark_in_progress('daily_route_plan', key) is not None:
+            return None
+        plans = None
+        try:
+            plans = plan_routes(key)
+        finally:
+            if plans is None:
+                # A failed run may be retried, e.g. by a restarted worker.
+                abandon('daily_route_plan', key)
+        if plans is None:
+            return None
+        remember('daily_route_plan', key, {name: len(plan['routes']) for name, plan in plans.items()})
+        return plans
+
+    def stop(self, timeout: Optional[float] = 30.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan the day's technician routes.")
+    parser.add_argument("--date", default=None, help="Day to plan, YYYY-MM-DD (default: today).")
+    parser.add_argument("--department", default=None, choices=list(DEPARTMENT_ASSIGNERS))
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without writing it.")
+    args = parser.parse_args()
+    result = plan_routes(args.date, args.department, args.dry_run)
+    if args.dry_run and result:
+        for name, plan in result.items():
+            for technician_id, stops in plan['routes'].items():
+                print(f"{name} technician {technician_id}: "
+                      + " -> ".join(f"#{s['ticket_id']} {s['arrival_time']}" for s in stops))
@@ -0,0 +1,111 @@
+"""
+Race-free assignment of tickets to technicians.
+
+A technician works one ticket at a time, recorded in
+technicians.assigned_ticket_id. Assignments claim the technician with a
+compare-and-set: one conditional UPDATE that succeeds only while the
+technician is still free and the ticket is not held by another technician.
+Two conversations or dispatchers that picked the same technician therefore
+cannot overwrite each other; the one that loses the race changes nothing
+and tries its next candidate. The claim, the ticket's assignment and its
+history event are committed together.
+
+No lock is held while candidates are chosen; SQLite's write lock only
+spans the single claim transaction.
+"""
+import os
+import sqlite3
+from typing import Callable, Optional
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.ticket_events import append_ticket_event
+from shared_libraries.metrics import METRICS
+
+# Claim outcomes
+CLAIMED = 'claimed'
+# The technician was assigned another ticket since they were listed as free.
+TECHNICIAN_TAKEN = 'technician_taken'
+# The ticket does not exist or is assigned to another technician.
+TICKET_UNAVAILABLE = 'ticket_unavailable'
+# No listed technician could be claimed.
+NO_TECHNICIAN = 'no_technician'
+ERROR = 'error'
+
+# Times assign_first_available() re-lists free technicians after losing the race for every candidate.
+ASSIGN_CLAIM_ROUNDS = int(os.getenv("ASSIGN_CLAIM_ROUNDS", "3"))
+
+
+def claim_in_transaction(conn, ticket_id: int, technician_id: int, assigned_work_date: str,
+                         log_message: Optional[str] = None) -> str:
+    """
+    Claims `technician_id` for `ticket_id` and records the 'assigned' event,
+    inside the caller's transaction. The caller commits.
+
+    Returns CLAIMED, or TECHNICIAN_TAKEN / TICKET_UNAVAILABLE without having
+    written anything.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE technicians SET assigned_ticket_id = ?, assigned_work_date = ?
+        WHERE id = ? AND assigned_ticket_id IS NULL
+          AND EXISTS (SELECT 1 FROM tickets
+                      WHERE id = ? AND (assigned_technician_id IS NULL OR assigned_technician_id = ?))
+    ''', (ticket_id, assigned_work_date, technician_id, ticket_id, technician_id))
+    if cursor.rowcount == 0:
+        cursor.execute('''
+            SELECT 1 FROM tickets WHERE id = ? AND (assigned_technician_id IS NULL OR assigned_technician_id = ?)
+        ''', (ticket_id, technician_id))
+        return TECHNICIAN_TAKEN if cursor.fetchone() else TICKET_UNAVAILABLE
+    # The 'assigned' event also sets the ticket's technician and removes it from the dispatch queue.
+    append_ticket_event(
+        conn, ticket_id, 'assigned',
+        log_message=log_message or f"Assigned to technician {technician_id} for {assigned_work_date}.",
+        assigned_technician_id=technician_id, assigned_work_date=assigned_work_date,
+    )
+    return CLAIMED
+
+
+def claim_technician(ticket_id: int, technician_id: int, assigned_work_date: str,
+                     log_message: Optional[str] = None) -> str:
+    """Claims `technician_id` for `ticket_id` in its own transaction. Returns the claim outcome."""
+    conn = get_db_connection()
+    if conn is None:
+        return ERROR
+    try:
+        outcome = claim_in_transaction(conn, ticket_id, technician_id, assigned_work_date, log_message)
+        if outcome == CLAIMED:
+            conn.commit()
+        else:
+            conn.rollback()
+    except sqlite3.Error as e:
+        print(f"Database error claiming technician {technician_id} for ticket {ticket_id}: {e}")
+        conn.rollback()
+        outcome = ERROR
+    finally:
+        conn.close()
+    METRICS.counter("technician_claims_total", "Technician claim attempts by outcome.", outcome=outcome).inc()
+    return outcome
+
+
+def assign_first_available(ticket_id: int, department: str, assigned_work_date: str,
+                           list_available: Callable[[str, str], list]) -> tuple[str, Optional[dict]]:
+    """
+    Assigns `ticket_id` to a technician of `department` who is free on
+    `assigned_work_date`, as listed by list_available(department, date),
+    trying the next candidate whenever another assignment wins the race for
+    one, and listing the free technicians again if every candidate was taken.
+
+    Returns (CLAIMED, technician), or (NO_TECHNICIAN | TICKET_UNAVAILABLE | ERROR, None).
+    """
+    for _ in range(ASSIGN_CLAIM_ROUNDS):
+        candidates = list_available(department, assigned_work_date)
+        if not candidates:
+            break
+        # Concurrent assignments start at different candidates instead of all racing for the first one
+        start = ticket_id % len(candidates)
+        for technician in candidates[start:] + candidates[:start]:
+            outcome = claim_technician(ticket_id, technician['id'], assigned_work_date)
+            if outcome == CLAIMED:
+                return CLAIMED, technician
+            if outcome != TECHNICIAN_TAKEN:
+                return outcome, None
+    return NO_TECHNICIAN, None
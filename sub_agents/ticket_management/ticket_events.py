@@ -0,0 +1,173 @@
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from sub_agents.ticket_management.reports import record_ticket_event
+from sub_agents.ticket_management.notifications import queue_ticket_notifications
+
+# Every SNAPSHOT_INTERVAL events a ticket's folded state is written to
+# ticket_snapshots, which bounds how many events a point-in-time read replays.
+SNAPSHOT_INTERVAL = int(os.getenv("TICKET_SNAPSHOT_INTERVAL", "20"))
+
+EVENT_TYPES = ('created', 'status_changed', 'assigned', 'unassigned', 'work_date_changed', 'note')
+
+_EVENT_COLUMNS = '''
+    id, timestamp, event_type, status, status_change, log_message,
+    assigned_technician_id, assigned_work_date
+'''
+
+
+def fold_event(state: dict, event) -> dict:
+    """Returns the ticket state after applying one history event to `state`."""
+    event_type = event['event_type']
+    state = dict(state)
+    if event_type in ('created', 'status_changed') and event['status'] is not None:
+        state['status'] = event['status']
+    elif event_type == 'assigned':
+        state['assigned_technician_id'] = event['assigned_technician_id']
+        state['assigned_work_date'] = event['assigned_work_date']
+    elif event_type == 'unassigned':
+        state['assigned_technician_id'] = None
+        state['assigned_work_date'] = None
+    elif event_type == 'work_date_changed':
+        state['assigned_work_date'] = event['assigned_work_date']
+    return state
+
+
+def append_ticket_event(
+    conn,
+    ticket_id: int,
+    event_type: str,
+    status: Optional[str] = None,
+    status_change: Optional[str] = None,
+    log_message: Optional[str] = None,
+    assigned_technician_id: Optional[int] = None,
+    assigned_work_date: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Appends an event to a ticket's history and folds it into the materialized
+    `tickets` row, inside the caller's transaction. The caller commits.
+
+    Returns the new event id, or None if the ticket does not exist.
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown ticket event type: {event_type}")
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT status, assigned_technician_id, assigned_work_date, event_count, department
+        FROM tickets WHERE id = ?
+    ''', (ticket_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    if event_type == 'status_changed' and status_change is None:
+        # Derived here so the old status is read in the same transaction as the write
+        status_change = f"{row[0]} -> {status}"
+
+    cursor.execute('''
+        INSERT INTO history (ticket_id, event_type, status, status_change, log_message,
+                             assigned_technician_id, assigned_work_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (ticket_id, event_type, status, status_change, log_message, assigned_technician_id, assigned_work_date))
+    event_id = cursor.lastrowid
+
+    state = fold_event(
+        {
+            'status': row[0],
+            'assigned_technician_id': row[1],
+            'assigned_work_date': row[2],
+        },
+        {
+            'event_type': event_type,
+            'status': status,
+            'assigned_technician_id': assigned_technician_id,
+            'assigned_work_date': assigned_work_date,
+        },
+    )
+    event_count = row[3] + 1
+    cursor.execute('''
+        UPDATE tickets
+        SET status = ?, assigned_technician_id = ?, assigned_work_date = ?,
+            last_event_id = ?, event_count = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (state['status'], state['assigned_technician_id'], state['assigned_work_date'],
+          event_id, event_count, ticket_id))
+
+    if event_type == 'assigned':
+        # An assigned ticket no longer waits for dispatch, however it got assigned
+        cursor.execute('DELETE FROM dispatch_queue WHERE ticket_id = ?', (ticket_id,))
+
+    record_ticket_event(cursor, ticket_id, event_type, state, row[4])
+    # Subscribers are notified only once this transaction commits; see notifications.py
+    queue_ticket_notifications(cursor, ticket_id, event_id, event_type, state, row[4])
+
+    if event_count % SNAPSHOT_INTERVAL == 0:
+        cursor.execute('''
+            INSERT INTO ticket_snapshots (ticket_id, event_id, taken_at, status,
+                                          assigned_technician_id, assigned_work_date, event_count)
+            SELECT ?, ?, timestamp, ?, ?, ?, ? FROM history WHERE id = ?
+        ''', (ticket_id, event_id, state['status'], state['assigned_technician_id'],
+              state['assigned_work_date'], event_count, event_id))
+    return event_id
+
+
+def fetch_ticket_timeline(conn, ticket_id: int) -> list[dict]:
+    """Returns all events of a ticket in order. Served entirely from the timeline index."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {_EVENT_COLUMNS} FROM history
+        WHERE ticket_id = ? ORDER BY timestamp, id
+    ''', (ticket_id,))
+    return [dict(zip([d[0] for d in cursor.description], row)) for row in cursor.fetchall()]
+
+
+def normalize_timestamp(value: str) -> str:
+    """
+    Accepts 'YYYY-MM-DD' or ISO 8601 and returns the 'YYYY-MM-DD HH:MM:SS' form
+    used in history. History timestamps are UTC, so a time with an offset is
+    converted to UTC; one without is taken as UTC already.
+    """
+    if len(value) == 10:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d 23:59:59')
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def fetch_ticket_state_at(conn, ticket_id: int, as_of: str) -> Optional[dict]:
+    """
+    Reconstructs a ticket's status and assignment as they were at `as_of`
+    from the latest snapshot before that moment plus the events after it.
+    Returns None if the ticket did not exist yet.
+    """
+    as_of = normalize_timestamp(as_of)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT event_id, status, assigned_technician_id, assigned_work_date
+        FROM ticket_snapshots
+        WHERE ticket_id = ? AND taken_at <= ?
+        ORDER BY event_id DESC LIMIT 1
+    ''', (ticket_id, as_of))
+    snapshot = cursor.fetchone()
+    if snapshot is not None:
+        after_event_id = snapshot[0]
+        state = {'status': snapshot[1], 'assigned_technician_id': snapshot[2], 'assigned_work_date': snapshot[3]}
+    else:
+        after_event_id = 0
+        state = {'status': None, 'assigned_technician_id': None, 'assigned_work_date': None}
+
+    cursor.execute(f'''
+        SELECT {_EVENT_COLUMNS} FROM history
+        WHERE ticket_id = ? AND timestamp <= ? AND id > ?
+        ORDER BY timestamp, id
+    ''', (ticket_id, as_of, after_event_id))
+    columns = [d[0] for d in cursor.description]
+    events = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if snapshot is None and not events:
+        return None
+    for event in events:
+        state = fold_event(state, event)
+    state['ticket_id'] = ticket_id
+    state['as_of'] = as_of
+    return state
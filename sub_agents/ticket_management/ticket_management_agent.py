@@ -1,9 +1,10 @@
 from google.adk.agents import LlmAgent
-from sub_agents.ticket_management.tools import CREATE_TICKET_TOOL, UPDATE_TICKET_STATUS_TOOL, ADD_HISTORY_LOG_TOOL, FETCH_TICKET_TOOL, GET_TICKET_AND_TECHNICIAN_DETAILS_TOOL
+from sub_agents.ticket_management.tools import CREATE_TICKET_TOOL, UPDATE_TICKET_STATUS_TOOL, ADD_HISTORY_LOG_TOOL, FETCH_TICKET_TOOL, GET_TICKET_AND_TECHNICIAN_DETAILS_TOOL, GET_TICKET_TIMELINE_TOOL, GET_TICKET_STATE_AT_TOOL, GET_DISPATCH_QUEUE_TOOL, SET_TICKET_LOCATION_TOOL, FIND_OPEN_TICKETS_NEAR_TOOL, FIND_OPEN_TICKETS_NEAR_TICKET_TOOL, GET_TECHNICIAN_ROUTE_TOOL, GET_OPERATIONS_REPORT_TOOL
 from shared_libraries.prompts import TICKET_MANAGEMENT_AGENT_PROMPT
+from shared_libraries.model_config import MODEL_CONFIG
 
 ticket_management_agent = LlmAgent(
-    model="gemini-2.0-flash-001",
+    model=MODEL_CONFIG.build_model("TICKET_MANAGEMENT_AGENT"),
     name="TICKET_MANAGEMENT_AGENT",
     description="An agent that assists with ticket management, including creating, updating, ticket status related queries and resolving tickets.",
     instruction=TICKET_MANAGEMENT_AGENT_PROMPT,
@@ -11,6 +12,15 @@ ticket_management_agent = LlmAgent(
             UPDATE_TICKET_STATUS_TOOL,
             ADD_HISTORY_LOG_TOOL,
             FETCH_TICKET_TOOL,
-            GET_TICKET_AND_TECHNICIAN_DETAILS_TOOL
+            GET_TICKET_AND_TECHNICIAN_DETAILS_TOOL,
+            GET_TICKET_TIMELINE_TOOL,
+            GET_TICKET_STATE_AT_TOOL,
+            GET_DISPATCH_QUEUE_TOOL,
+            SET_TICKET_LOCATION_TOOL,
+            FIND_OPEN_TICKETS_NEAR_TOOL,
+            FIND_OPEN_TICKETS_NEAR_TICKET_TOOL,
+            GET_TECHNICIAN_ROUTE_TOOL,
+            GET_OPERATIONS_REPORT_TOOL
             ],
+    before_model_callback=MODEL_CONFIG.apply,
 )
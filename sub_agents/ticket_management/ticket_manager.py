@@ -1,29 +1,42 @@
 import sqlite3
-import os
-from datetime import datetime
 from typing import Optional
+from sub_agents.ticket_management.archive import ARCHIVE_SCHEMA, attach_ticket_archive
+from sub_agents.ticket_management.database import get_db_connection, read_connection
+from sub_agents.ticket_management.dispatch import parse_priority, sla_deadline_for
+from sub_agents.ticket_management.history_writer import HISTORY_WRITER
+from sub_agents.ticket_management.idempotency import lookup, record, request_key
+from sub_agents.ticket_management.locations import flag_possible_duplicates, store_ticket_location
+from sub_agents.ticket_management.notifications import subscribe_request_webhook
+from sub_agents.ticket_management.ticket_events import append_ticket_event, fetch_ticket_state_at, fetch_ticket_timeline
+from shared_libraries.gazetteer import GAZETTEER
 
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared_libraries', 'city_office.db')
-
-def get_db_connection():
-    """Creates and returns a database connection."""
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row # Allows accessing columns by name
-        return conn
-    except sqlite3.Error as e:
-        print(f"Database connection error: {e}")
-        return None
-
-def create_ticket(title: str, description: Optional[str] = None):
+def create_ticket(title: str, description: Optional[str] = None, priority: Optional[str] = None, location: Optional[str] = None,
+                  idempotency_key: Optional[str] = None):
     """
     Creates a new city office ticket with a title and optional description.
+    Repeating a call returns the ticket it created instead of a new one.
        
     Arg(s):
         title: The title of the ticket.
         description[optional]: A detailed description of the issue
+        priority[optional]: 'critical', 'high', 'normal' (default) or 'low'. Sets the SLA deadline
+            and the order in which waiting tickets are dispatched to technicians.
+        location[optional]: The street address or landmark of the issue, e.g. '3rd street, South'.
+        idempotency_key[optional]: Calls with the same key create one ticket. By default the key is
+            derived from the A2A message being served and how many tickets it created before.
     """
+    try:
+        priority_value = parse_priority(priority)
+    except ValueError as e:
+        print(f"Error creating ticket: {e}")
+        return None
+
+    key = request_key('create_ticket', idempotency_key)
+    previous = lookup('create_ticket', key)
+    if previous is not None:
+        print(f"Ticket {previous} was already created for this request")
+        return previous
+
     conn = get_db_connection()
     if conn is None:
         return None
@@ -32,17 +45,31 @@ def create_ticket(title: str, description: Optional[str] = None):
     try:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO tickets (title, description) VALUES (?, ?)
-        ''', (title, description))
-        conn.commit()
+            INSERT INTO tickets (title, description, priority, sla_deadline) VALUES (?, ?, ?, ?)
+        ''', (title, description, priority_value, sla_deadline_for(priority_value)))
         ticket_id = cursor.lastrowid
-        print(f"Ticket created with ID: {ticket_id}")
+        # An A2A caller that gave a webhook is told about this ticket's changes, starting with its creation
+        subscribe_request_webhook(conn, ticket_id)
 
-        # Add initial history log
-        add_history_log(ticket_id, status_change=None, log_message="Ticket created")
+        # The creation event is committed together with the ticket row
+        append_ticket_event(conn, ticket_id, 'created', status='Open', log_message="Ticket created")
+        if location:
+            place = GAZETTEER.geocode(location)
+            store_ticket_location(conn, ticket_id, location, place)
+            if place is not None:
+                flag_possible_duplicates(conn, ticket_id, place)
+        # The key is committed with the ticket; a concurrent duplicate that recorded it first wins
+        if key is not None and not record(conn, 'create_ticket', key, ticket_id):
+            conn.rollback()
+            ticket_id = lookup('create_ticket', key)
+            print(f"Ticket {ticket_id} was already created for this request")
+            return ticket_id
+        conn.commit()
+        print(f"Ticket created with ID: {ticket_id}")
 
     except sqlite3.Error as e:
         print(f"Error creating ticket: {e}")
+        ticket_id = None
         if conn:
             conn.rollback()
     finally:
@@ -52,123 +79,261 @@ def create_ticket(title: str, description: Optional[str] = None):
 
 def update_ticket_status(ticket_id: int, new_status: str):
     """Updates the status of an existing ticket."""
-    conn = get_db_connection()
-    if conn is None:
-        return False
-
-    try:
-        cursor = conn.cursor()
-        # Get current status for history log
-        cursor.execute('SELECT status FROM tickets WHERE id = ?', (ticket_id,))
-        row = cursor.fetchone()
-        if row:
-            old_status = row['status']
-            cursor.execute('''
-                UPDATE tickets SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
-            ''', (new_status, ticket_id))
-            conn.commit()
-            print(f"Ticket {ticket_id} status updated to {new_status}")
-
-            # Add history log for status change
-            add_history_log(ticket_id, status_change=f"{old_status} -> {new_status}", log_message=f"Status changed to {new_status}")
-            return True
-        else:
-            print(f"Ticket with ID {ticket_id} not found.")
-            return False
-
-    except sqlite3.Error as e:
-        print(f"Error updating ticket status: {e}")
-        if conn:
-            conn.rollback()
+    # The status change is committed by the history writer together with
+    # whatever other events are pending (group commit).
+    result = HISTORY_WRITER.submit(
+        ticket_id, 'status_changed', status=new_status, log_message=f"Status changed to {new_status}",
+    )
+    if not result:
         return False
-    finally:
-        if conn:
-            conn.close()
+    print(f"Ticket {ticket_id} status updated to {new_status}")
+    return True
 
 def add_history_log(ticket_id: int, status_change: Optional[str] = None, log_message: Optional[str] = None, assigned_technician_id: Optional[int] = None):
     """Adds a history log entry for a ticket."""
-    conn = get_db_connection()
-    if conn is None:
-        return False
+    # A free-form note; it does not change the ticket's status or assignment
+    result = HISTORY_WRITER.submit(
+        ticket_id, 'note', status_change=status_change,
+        log_message=log_message, assigned_technician_id=assigned_technician_id,
+    )
+    # print(f"History log added for ticket {ticket_id}") # Optional: avoid excessive printing
+    return bool(result)
 
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO history (ticket_id, status_change, log_message, assigned_technician_id) VALUES (?, ?, ?, ?)
-        ''', (ticket_id, status_change, log_message, assigned_technician_id))
-        conn.commit()
-        # print(f"History log added for ticket {ticket_id}") # Optional: avoid excessive printing
-        return True
-    except sqlite3.Error as e:
-        print(f"Error adding history log: {e}")
-        if conn:
-            conn.rollback()
-        return False
-    finally:
-        if conn:
-            conn.close()
+# Ticket columns a caller may ask for with `fields`, besides 'history' and
+# 'assigned_technician_info'. Archives written before a column existed return NULL for it.
+TICKET_FIELDS = (
+    'id', 'title', 'description', 'status', 'priority', 'department', 'address', 'latitude', 'longitude',
+    'created_at', 'updated_at', 'sla_deadline', 'assigned_technician_id', 'assigned_work_date', 'event_count',
+)
+# History columns returned when `fields` is given; the full view adds the
+# legacy and technician columns.
+COMPACT_HISTORY_COLUMNS = (
+    'h.id', 'h.timestamp', 'h.event_type', 'h.status', 'h.log_message', 'h.assigned_technician_id',
+    'h.assigned_work_date', 't.name AS technician_name',
+)
+FULL_HISTORY_COLUMNS = (
+    'h.*', 't.name AS technician_name', 't.department AS technician_department',
+    'h.assigned_work_date AS technician_assigned_work_date',
+    't.reason_to_reassign AS technician_reason_to_reassign',
+)
+# Events per page when paging back with a cursor but no limit.
+HISTORY_PAGE_SIZE = 20
 
-def fetch_ticket_by_id(ticket_id: str) -> Optional[dict]:
-    """Fetches a ticket and its history by ticket ID."""
-    conn = get_db_connection()
-    if conn is None:
+def _ticket_columns(cursor, schema: str, names) -> str:
+    cursor.execute(f'PRAGMA {schema}.table_info(tickets)')
+    present = {row[1] for row in cursor.fetchall()}
+    return ", ".join(f"tk.{c}" if c in present else f"NULL AS {c}" for c in names)
+
+def _fetch_ticket_summary(cursor, ticket_id, schema: str = 'main') -> Optional[dict]:
+    """One row: the ticket's headline fields, its technician's name and its latest event."""
+    columns = _ticket_columns(cursor, schema, (
+        'id', 'title', 'status', 'priority', 'department', 'address', 'assigned_work_date', 'updated_at',
+        'event_count', 'last_event_id',
+    ))
+    cursor.execute(f'''
+        SELECT {columns}, t.name AS technician_name,
+               h.timestamp AS last_event_at, h.log_message AS last_event
+        FROM {schema}.tickets tk
+        LEFT JOIN main.technicians t ON t.id = tk.assigned_technician_id
+        LEFT JOIN {schema}.history h ON h.id = tk.last_event_id
+        WHERE tk.id = ?
+    ''', (ticket_id,))
+    row = cursor.fetchone()
+    if not row:
         return None
+    summary = dict(row)
+    del summary['last_event_id']
+    return summary
 
-    ticket_data = None
-    history_data = []
-    try:
-        cursor = conn.cursor()
-        # Fetch ticket details
-        cursor.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,))
-        ticket_row = cursor.fetchone()
-
-        if ticket_row:
-            ticket_data = dict(ticket_row) # Convert Row object to dictionary
-
-            # Fetch history logs for the ticket, joining with technicians table
-            cursor.execute("""
-                SELECT h.*, t.name AS technician_name, t.department AS technician_department,
-                       t.assigned_work_date AS technician_assigned_work_date,
-                       t.reason_to_reassign AS technician_reason_to_reassign
-                FROM history h
-                LEFT JOIN technicians t ON h.assigned_technician_id = t.id
-                WHERE h.ticket_id = ? ORDER BY h.timestamp ASC
-            """, (ticket_id,))
-            history_rows = cursor.fetchall()
-            history_data = [dict(row) for row in history_rows] # Convert Row objects to dictionaries
-
-            ticket_data['history'] = history_data
-
-            # If a technician is assigned to the ticket itself (from tickets table), fetch technician details
-            if ticket_data.get('assigned_technician_id'):
-                cursor.execute('SELECT id, name, department, assigned_work_date, reason_to_reassign FROM technicians WHERE id = ?', (ticket_data['assigned_technician_id'],))
-                technician_row = cursor.fetchone()
-                if technician_row:
-                    ticket_data['assigned_technician_info'] = dict(technician_row)
-                else:
-                    ticket_data['assigned_technician_info'] = "Technician not found."
+def _fetch_history(cursor, ticket_id, schema: str, columns, limit: Optional[int], before: Optional[int]):
+    """
+    Returns (events in chronological order, cursor for the previous page or None).
+    With a limit only the newest `limit` events (older than the `before` event,
+    if given) are read, walking the timeline index backwards.
+    """
+    where = "h.ticket_id = ?"
+    params = [ticket_id]
+    if before is not None:
+        where += f" AND (h.timestamp, h.id) < (SELECT timestamp, id FROM {schema}.history WHERE id = ?)"
+        params.append(before)
+    query = f'''
+        SELECT {", ".join(columns)}
+        FROM {schema}.history h
+        LEFT JOIN main.technicians t ON h.assigned_technician_id = t.id
+        WHERE {where}
+    '''
+    if limit is None:
+        cursor.execute(query + " ORDER BY h.timestamp ASC, h.id ASC", params)
+        return [dict(row) for row in cursor.fetchall()], None
+    # One extra row tells whether an older page exists.
+    cursor.execute(query + " ORDER BY h.timestamp DESC, h.id DESC LIMIT ?", params + [limit + 1])
+    rows = [dict(row) for row in cursor.fetchall()]
+    older = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, (rows[0]['id'] if older and rows else None)
+
+def _fetch_ticket(cursor, ticket_id, schema: str = 'main', fields: Optional[list] = None,
+                  history_limit: Optional[int] = None, history_before: Optional[int] = None) -> Optional[dict]:
+    """
+    Reads a ticket and its history from the hot database or an attached archive.
+    With `fields`, only those ticket columns are selected, and the history and
+    technician details only if named.
+    """
+    if fields is None:
+        cursor.execute(f'SELECT * FROM {schema}.tickets WHERE id = ?', (ticket_id,))
+    else:
+        columns = [f for f in TICKET_FIELDS if f in fields]
+        # The technician details need the assignment even when it was not asked for.
+        if 'assigned_technician_info' in fields and 'assigned_technician_id' not in columns:
+            columns.append('assigned_technician_id')
+        cursor.execute(f'SELECT {_ticket_columns(cursor, schema, ["id"] + [c for c in columns if c != "id"])} '
+                       f'FROM {schema}.tickets tk WHERE tk.id = ?', (ticket_id,))
+    ticket_row = cursor.fetchone()
+    if not ticket_row:
+        return None
+
+    ticket_data = dict(ticket_row) # Convert Row object to dictionary
+
+    # Fetch history logs for the ticket, joining with technicians table.
+    # The work date comes from the event itself, i.e. as it was at that time.
+    if fields is None or 'history' in fields:
+        if history_before is not None and history_limit is None:
+            history_limit = HISTORY_PAGE_SIZE
+        history, history_cursor = _fetch_history(
+            cursor, ticket_id, schema, FULL_HISTORY_COLUMNS if fields is None else COMPACT_HISTORY_COLUMNS,
+            history_limit, history_before,
+        )
+        ticket_data['history'] = history
+        if history_limit is not None:
+            ticket_data['history_cursor'] = history_cursor
 
+    # If a technician is assigned to the ticket itself (from tickets table), fetch technician details
+    if ticket_data.get('assigned_technician_id') and (fields is None or 'assigned_technician_info' in fields):
+        cursor.execute('SELECT id, name, department, assigned_work_date, reason_to_reassign FROM main.technicians WHERE id = ?', (ticket_data['assigned_technician_id'],))
+        technician_row = cursor.fetchone()
+        if technician_row:
+            ticket_data['assigned_technician_info'] = dict(technician_row)
         else:
+            ticket_data['assigned_technician_info'] = "Technician not found."
+    if fields is not None and 'assigned_technician_id' not in fields:
+        ticket_data.pop('assigned_technician_id', None)
+    return ticket_data
+
+def fetch_ticket_by_id(ticket_id: str, fields: Optional[list[str]] = None, history_limit: Optional[int] = None,
+                       history_before: Optional[int] = None, summary: bool = False) -> Optional[dict]:
+    """
+    Fetches a ticket and its history by ticket ID. Tickets that were moved to an
+    archive database are read from there and carry an 'archived_in' key.
+
+    Args:
+        ticket_id: The ID of the ticket to fetch.
+        fields[optional]: Only return these ticket fields, e.g. ['status', 'assigned_work_date'].
+            Any of id, title, description, status, priority, department, address, latitude,
+            longitude, created_at, updated_at, sla_deadline, assigned_technician_id,
+            assigned_work_date and event_count, plus 'history' for a compact event list and
+            'assigned_technician_info' for the technician's details. Default: everything.
+        history_limit[optional]: Only return the most recent this many history events.
+            The result then has a 'history_cursor' to pass as history_before for older
+            events, or null when there are none.
+        history_before[optional]: Return the events before this history cursor.
+        summary[optional]: Return only the ticket's title, status, priority, department,
+            address, work date, technician name and latest event. Use it when the
+            current state is all that is needed.
+    Returns:
+        A dictionary with the ticket, or None if the ticket is not found or an argument is invalid.
+    """
+    if fields is not None:
+        unknown = set(fields) - set(TICKET_FIELDS) - {'history', 'assigned_technician_info'}
+        if unknown:
+            print(f"Error fetching ticket: unknown fields {sorted(unknown)}")
+            return None
+    if (history_limit is not None and history_limit < 1) or (history_before is not None and history_before < 1):
+        print("Error fetching ticket: history_limit and history_before must be positive")
+        return None
+
+    def read(cursor, schema):
+        if summary:
+            return _fetch_ticket_summary(cursor, ticket_id, schema)
+        return _fetch_ticket(cursor, ticket_id, schema, fields, history_limit, history_before)
+
+    ticket_data = None
+    try:
+        # A read-only snapshot: the lookup does not wait for writers to commit
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            ticket_data = read(cursor, 'main')
+            if ticket_data is None:
+                # ATTACH cannot run inside the snapshot; archived tickets no longer change
+                conn.rollback()
+                archive_file = attach_ticket_archive(conn, ticket_id)
+                if archive_file:
+                    try:
+                        ticket_data = read(cursor, ARCHIVE_SCHEMA)
+                    finally:
+                        cursor.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+                    if ticket_data is not None:
+                        ticket_data['archived_in'] = archive_file
+        if ticket_data is None:
             print(f"Ticket with ID {ticket_id} not found.")
 
     except sqlite3.Error as e:
         print(f"Error fetching ticket: {e}")
-    finally:
-        if conn:
-            conn.close()
     return ticket_data
 
-def get_ticket_and_technician_details(ticket_id: str) -> Optional[dict]:
+def get_ticket_and_technician_details(ticket_id: str, fields: Optional[list[str]] = None,
+                                      history_limit: Optional[int] = None, history_before: Optional[int] = None,
+                                      summary: bool = False) -> Optional[dict]:
     """
     Fetches comprehensive details for a given ticket ID, including ticket information,
     history, and assigned technician details if available.
 
     Args:
         ticket_id: The ID of the ticket to fetch.
+        fields[optional]: Only return these ticket fields; see fetch_ticket_by_id.
+        history_limit[optional]: Only return the most recent this many history events.
+        history_before[optional]: Return the events before this history cursor.
+        summary[optional]: Return only the ticket's headline fields and latest event.
     Returns:
         A dictionary containing ticket and technician details, or None if the ticket is not found.
     """
-    return fetch_ticket_by_id(ticket_id)
+    return fetch_ticket_by_id(ticket_id, fields, history_limit, history_before, summary)
+
+def get_ticket_timeline(ticket_id: int) -> Optional[list]:
+    """
+    Fetches the ordered event history of a ticket: creation, status changes,
+    assignments, work date changes and notes, each with the values it set.
+
+    Args:
+        ticket_id: The ID of the ticket.
+    Returns:
+        A list of events in chronological order, or None on a database error.
+    """
+    try:
+        with read_connection() as conn:
+            return fetch_ticket_timeline(conn, ticket_id)
+    except sqlite3.Error as e:
+        print(f"Error fetching ticket timeline: {e}")
+        return None
+
+def get_ticket_state_at(ticket_id: int, as_of: str) -> Optional[dict]:
+    """
+    Reconstructs what a ticket's status, assigned technician and assigned work
+    date were at a given moment.
+
+    Args:
+        ticket_id: The ID of the ticket.
+        as_of: The moment to look at, as 'YYYY-MM-DD' (end of that day) or 'YYYY-MM-DD HH:MM:SS'.
+    Returns:
+        A dictionary with status, assigned_technician_id and assigned_work_date,
+        or None if the ticket did not exist at that time.
+    """
+    try:
+        with read_connection() as conn:
+            return fetch_ticket_state_at(conn, ticket_id, as_of)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error fetching ticket state: {e}")
+        return None
 
 # Example Usage (optional)
 # if __name__ == '__main__':
@@ -1,6 +1,10 @@
 from google.adk.tools import FunctionTool
 from dotenv import load_dotenv
 import sub_agents.ticket_management.ticket_manager as ticket_manager
+import sub_agents.ticket_management.dispatch as dispatch
+import sub_agents.ticket_management.locations as locations
+import sub_agents.ticket_management.route_planner as route_planner
+import sub_agents.ticket_management.reports as reports
 
 load_dotenv()
 
@@ -23,3 +27,27 @@ GET_TICKET_AND_TECHNICIAN_DETAILS_TOOL = FunctionTool(
     # name="get_ticket_and_technician_details",
     # description="Fetches comprehensive details for a given ticket ID, including ticket information, history, and assigned technician details if available."
 )
+
+GET_TICKET_TIMELINE_TOOL = FunctionTool(
+    func=ticket_manager.get_ticket_timeline)
+
+GET_TICKET_STATE_AT_TOOL = FunctionTool(
+    func=ticket_manager.get_ticket_state_at)
+
+GET_DISPATCH_QUEUE_TOOL = FunctionTool(
+    func=dispatch.get_dispatch_queue)
+
+SET_TICKET_LOCATION_TOOL = FunctionTool(
+    func=locations.set_ticket_location)
+
+FIND_OPEN_TICKETS_NEAR_TOOL = FunctionTool(
+    func=locations.find_open_tickets_near)
+
+FIND_OPEN_TICKETS_NEAR_TICKET_TOOL = FunctionTool(
+    func=locations.find_open_tickets_near_ticket)
+
+GET_TECHNICIAN_ROUTE_TOOL = FunctionTool(
+    func=route_planner.get_technician_route)
+
+GET_OPERATIONS_REPORT_TOOL = FunctionTool(
+    func=reports.get_operations_report)
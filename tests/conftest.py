@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import shutil
+
+import pytest
+
+from shared_libraries import api_auth
+from sub_agents.ticket_management import database
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = "admin-token"
+CLIENT_TOKENS = {"crm-token": "crm", "field-token": "field-app"}
+
+
+@pytest.fixture
+def city_db(tmp_path, monkeypatch):
+    """A migrated copy of the city office database, used as the default database for the test."""
+    path = str(tmp_path / "city_office.db")
+    shutil.copyfile(database.DATABASE_PATH, path)
+    monkeypatch.setattr(database, "DATABASE_PATH", path)
+    database.get_db_connection(path).close()
+    yield path
+    database.READ_POOLS.close_all()
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The server's __main__ module, loaded under another name so nothing starts serving."""
+    spec = importlib.util.spec_from_file_location("city_office_server", os.path.join(REPO_ROOT, "__main__.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def api_tokens(server, monkeypatch):
+    """Configures ADMIN_TOKEN and CLIENT_TOKENS as the server's bearer tokens."""
+    monkeypatch.setattr(api_auth, "API_TOKENS", dict(CLIENT_TOKENS))
+    monkeypatch.setattr(api_auth, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setattr(server, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+
+
+@pytest.fixture
+def client(server, city_db):
+    """A test client of the app, without its lifespan, so no background workers run."""
+    from starlette.testclient import TestClient
+    from server import ServerConfig
+
+    return TestClient(server.create_app(ServerConfig()))
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
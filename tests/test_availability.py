@@ -0,0 +1,93 @@
+from datetime import date
+
+from sub_agents.ticket_management.availability import AvailabilityCalendar
+from sub_agents.ticket_management.database import get_db_connection
+
+PETER_JONES = 3  # Public Work, on shift 2025-06-23 to 25
+MARY_BROWN = 4  # Sanitation Utilities, holds ticket 5
+CHARLIE_WILSON = 7  # Public Work, on shift 2025-06-21, 22 and 25
+
+
+def write(sql, params=()):
+    conn = get_db_connection()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ids(technicians):
+    return sorted(technician['id'] for technician in technicians)
+
+
+def test_free_technicians_by_day(city_db):
+    calendar = AvailabilityCalendar(database_path=city_db)
+    assert ids(calendar.free_technicians('Public Work', '2025-06-24')) == [PETER_JONES]
+    assert ids(calendar.free_technicians('Public Work', '2025-06-21')) == [CHARLIE_WILSON]
+    assert ids(calendar.free_technicians('Public Work', '2025-06-25')) == [PETER_JONES, CHARLIE_WILSON]
+    assert ids(calendar.free_technicians('Public Work', '2025-06-21', '2025-06-23', every_day=True)) == []
+    assert ids(calendar.free_technicians('Public Work', '2025-06-21', '2025-06-23')) == [PETER_JONES, CHARLIE_WILSON]
+    assert calendar.free_technicians('Public Work', '2025-07-01') == []
+
+
+def test_booked_day_is_not_free(city_db):
+    # Work dates may be written in DD-MM-YYYY form.
+    write("UPDATE technicians SET assigned_ticket_id = 2, assigned_work_date = '24-06-2025' WHERE id = ?",
+          (PETER_JONES,))
+    calendar = AvailabilityCalendar(database_path=city_db)
+    assert calendar.works_on(PETER_JONES, '2025-06-24')
+    assert not calendar.is_free(PETER_JONES, '2025-06-24')
+    assert calendar.is_free(PETER_JONES, '2025-06-25')
+    assert calendar.technician(PETER_JONES)['holding']
+    assert calendar.technician(MARY_BROWN)['holding']
+
+
+def test_earliest_free_date(city_db):
+    calendar = AvailabilityCalendar(database_path=city_db)
+    assert calendar.earliest_free_date(CHARLIE_WILSON, '2025-06-23') == date(2025, 6, 25)
+    assert calendar.earliest_free_dates('Public Work', '2025-06-22') == {
+        PETER_JONES: date(2025, 6, 23), CHARLIE_WILSON: date(2025, 6, 22),
+    }
+    assert calendar.earliest_free_date(CHARLIE_WILSON, '2025-06-26', within_days=30) is None
+
+
+def test_syncs_availability_changes_through_triggers(city_db):
+    calendar = AvailabilityCalendar(sync_seconds=0, database_path=city_db)
+    assert not calendar.is_free(CHARLIE_WILSON, '2025-06-24')
+
+    write("INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+          "VALUES (?, ?, '09:00', '17:00')",
+          (CHARLIE_WILSON, '2025-06-24'))
+    assert calendar.is_free(CHARLIE_WILSON, '2025-06-24')
+
+    write('DELETE FROM technician_availability WHERE technician_id = ? AND available_date = ?',
+          (PETER_JONES, '2025-06-24'))
+    assert ids(calendar.free_technicians('Public Work', '2025-06-24')) == [CHARLIE_WILSON]
+
+
+def test_syncs_assignments_and_new_technicians(city_db):
+    calendar = AvailabilityCalendar(sync_seconds=0, database_path=city_db)
+    write("UPDATE technicians SET assigned_ticket_id = 1, assigned_work_date = '2025-06-24' WHERE id = ?",
+          (PETER_JONES,))
+    assert not calendar.is_free(PETER_JONES, '2025-06-24')
+    assert calendar.works_on(PETER_JONES, '2025-06-24')
+    assert ids(calendar.free_technicians('Public Work', '2025-06-25', unassigned_only=True)) == [CHARLIE_WILSON]
+
+    write("INSERT INTO technicians (id, name, department) VALUES (9, 'Eve Green', 'Public Work')")
+    write("INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+          "VALUES (9, '2025-06-24', '09:00', '17:00')")
+    assert ids(calendar.free_technicians('Public Work', '2025-06-24')) == [9]
+
+    write("UPDATE technicians SET department = 'Sanitation Utilities' WHERE id = 9")
+    assert calendar.free_technicians('Public Work', '2025-06-24') == []
+    assert calendar.technician(9)['department'] == 'Sanitation Utilities'
+
+
+def test_availability_before_the_origin_reloads(city_db):
+    calendar = AvailabilityCalendar(sync_seconds=0, database_path=city_db)
+    assert calendar.earliest_free_date(PETER_JONES, '2025-06-01') == date(2025, 6, 23)
+    write("INSERT INTO technician_availability (technician_id, available_date, start_time, end_time) "
+          "VALUES (?, '2025-06-02', '09:00', '17:00')", (PETER_JONES,))
+    assert calendar.earliest_free_date(PETER_JONES, '2025-06-01') == date(2025, 6, 2)
+    assert calendar.is_free(PETER_JONES, '2025-06-24')
@@ -0,0 +1,90 @@
+from sub_agents.ticket_management.batch_assigner import assign_backlog, ticket_department, write_assignments
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.dispatch import enqueue_ticket
+from sub_agents.ticket_management.technician_claims import claim_technician
+from tests.conftest import ADMIN_TOKEN, bearer
+
+PETER_JONES = 3
+CHARLIE_WILSON = 7
+
+
+def ticket_columns(column):
+    conn = get_db_connection()
+    try:
+        return dict(conn.execute(f'SELECT id, {column} FROM tickets').fetchall())
+    finally:
+        conn.close()
+
+
+def test_ticket_department_from_keywords():
+    assert ticket_department("potholes open") == "Public Work"
+    assert ticket_department("Trash bins fallen over on 3rd street") == "Sanitation Utilities"
+    assert ticket_department("clean up") is None
+    # A tie between departments places nothing.
+    assert ticket_department("trash on the road") is None
+
+
+def test_assigns_tickets_that_were_never_queued(city_db):
+    result = assign_backlog('2025-06-23')
+    public_work = result['Public Work']
+    assert [a['ticket_id'] for a in public_work['assignments']] == [2]
+    assert public_work['assigned'] == 1
+    technicians = ticket_columns('assigned_technician_id')
+    assert technicians[2] in (PETER_JONES, CHARLIE_WILSON)
+    departments = ticket_columns('department')
+    assert departments[2] == 'Public Work'
+    # "clean up" names no department and stays in the backlog.
+    assert departments[3] is None and technicians[3] is None
+    assigned = [a['technician_id'] for r in result.values() for a in r['assignments']]
+    assert len(assigned) == len(set(assigned))
+
+
+def test_dry_run_writes_nothing(city_db):
+    result = assign_backlog('2025-06-23', dry_run=True)
+    assert result['Public Work']['assignments']
+    assert set(ticket_columns('assigned_technician_id').values()) == {None}
+    assert set(ticket_columns('department').values()) == {None}
+
+
+def test_unreadable_work_date_is_skipped(city_db):
+    assert enqueue_ticket(2, 'Public Work') == 1
+    conn = get_db_connection()
+    conn.execute("UPDATE dispatch_queue SET assigned_work_date = 'next week' WHERE ticket_id = 2")
+    conn.commit()
+    conn.close()
+    result = assign_backlog('2025-06-23', department='Public Work')
+    assert result['Public Work']['invalid_work_date'] == [2]
+    assert 2 not in [a['ticket_id'] for a in result['Public Work']['assignments']]
+
+
+def test_write_assignments_skips_technicians_claimed_since_matching(city_db):
+    assert claim_technician(3, PETER_JONES, '2025-06-24') == 'claimed'
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        written = write_assignments(conn, [
+            {'ticket_id': 2, 'technician_id': PETER_JONES, 'assigned_work_date': '2025-06-24',
+             'department': 'Public Work'},
+            {'ticket_id': 4, 'technician_id': CHARLIE_WILSON, 'assigned_work_date': '2025-06-25',
+             'department': 'Public Work'},
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    assert written == 1
+    assert ticket_columns('assigned_technician_id')[2] is None
+    assert ticket_columns('department')[2] is None
+    assert ticket_columns('department')[4] == 'Public Work'
+
+
+def test_batch_route_needs_the_admin_token(client, api_tokens):
+    assert client.post("/assignments/batch", json={"dry_run": True}).status_code == 401
+    assert client.post("/assignments/batch", json={"dry_run": True}, headers=bearer("crm-token")).status_code == 401
+    response = client.post("/assignments/batch", json={"date": "2025-06-23", "dry_run": True},
+                           headers=bearer(ADMIN_TOKEN))
+    assert response.status_code == 200
+    assert response.json()['Public Work']['assignments']
+
+
+def test_batch_route_is_disabled_without_an_admin_token(client):
+    assert client.post("/assignments/batch", json={"dry_run": True}).status_code == 403
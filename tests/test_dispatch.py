@@ -0,0 +1,47 @@
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.dispatch import DispatchQueue, TicketDispatcher, enqueue_ticket
+
+PETER_JONES = 3
+
+
+def dispatch_public_work(queue, today='23-06-2025'):
+    conn = get_db_connection()
+    try:
+        queue.sync(conn)
+        return TicketDispatcher()._dispatch_department(conn, queue, 'Public Work', today)
+    finally:
+        conn.close()
+
+
+def queued():
+    conn = get_db_connection()
+    try:
+        return [tuple(row) for row in conn.execute(
+            'SELECT ticket_id, claimed_by, attempts FROM dispatch_queue ORDER BY ticket_id'
+        )]
+    finally:
+        conn.close()
+
+
+def test_entry_without_a_free_technician_is_passed_over_unclaimed(city_db):
+    # Nobody in Public Work works on the 26th.
+    enqueue_ticket(1, 'Public Work', '26-06-2025')
+    enqueue_ticket(2, 'Public Work', '23-06-2025')
+    queue = DispatchQueue()
+    assert dispatch_public_work(queue) == 1
+    assert queued() == [(1, None, 0)]
+    assert queue.depth('Public Work') == 1
+    conn = get_db_connection()
+    try:
+        assert conn.execute('SELECT assigned_technician_id FROM tickets WHERE id = 2').fetchone()[0] == PETER_JONES
+    finally:
+        conn.close()
+
+
+def test_queue_is_not_walked_when_nobody_is_free(city_db):
+    enqueue_ticket(1, 'Public Work', '26-06-2025')
+    enqueue_ticket(2, 'Public Work', '26-06-2025')
+    queue = DispatchQueue()
+    assert dispatch_public_work(queue) == 0
+    assert queued() == [(1, None, 0), (2, None, 0)]
+    assert queue.depth('Public Work') == 2
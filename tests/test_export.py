@@ -0,0 +1,76 @@
+import csv
+import io
+import os
+import sqlite3
+
+import pytest
+
+from sub_agents.ticket_management.archive import archive_dir_for, archive_file_name
+from sub_agents.ticket_management.export import EXPORT_COLUMNS, export_stream, iter_export_rows
+from tests.conftest import ADMIN_TOKEN, bearer
+
+
+def event_ids(rows):
+    return [row['event_id'] for row in rows]
+
+
+def test_batches_resume_from_the_cursor(city_db):
+    everything = list(iter_export_rows())
+    assert event_ids(everything) == sorted(event_ids(everything))
+    assert len(everything) == 8
+    assert event_ids(iter_export_rows(batch_size=3)) == event_ids(everything)
+    resume_after = everything[4]['event_id']
+    assert event_ids(iter_export_rows(after=resume_after, batch_size=2)) == event_ids(everything[5:])
+    assert set(everything[0]) == set(EXPORT_COLUMNS)
+
+
+def test_merges_archives_by_event_id(city_db):
+    everything = list(iter_export_rows())
+    archive = os.path.join(archive_dir_for(city_db), archive_file_name(city_db, everything[0]['event_timestamp'][:7]))
+    os.makedirs(os.path.dirname(archive))
+    # Tickets 1 and 3 move to the archive; their events interleave with the hot ones.
+    source = sqlite3.connect(city_db)
+    source.execute("VACUUM INTO ?", (archive,))
+    source.execute("DELETE FROM history WHERE ticket_id IN (1, 3)")
+    source.commit()
+    source.close()
+    archived = sqlite3.connect(archive)
+    archived.execute("DELETE FROM history WHERE ticket_id NOT IN (1, 3)")
+    archived.commit()
+    archived.close()
+
+    merged = list(iter_export_rows(batch_size=2))
+    assert event_ids(merged) == event_ids(everything)
+    assert {row['ticket_id'] for row in merged if row['archived_in']} == {1, 3}
+    assert event_ids(iter_export_rows(include_archived=False)) == [
+        row['event_id'] for row in everything if row['ticket_id'] not in (1, 3)
+    ]
+
+
+def test_date_range(city_db):
+    everything = list(iter_export_rows())
+    day = everything[-1]['event_timestamp'][:10]
+    assert all(row['event_timestamp'] >= day for row in iter_export_rows(since=day))
+    assert list(iter_export_rows(until='2000-01-01')) == []
+    with pytest.raises(ValueError):
+        export_stream('csv', since='yesterday')
+    with pytest.raises(ValueError):
+        export_stream('xml')
+
+
+def test_csv_has_a_row_per_event(city_db):
+    body = b"".join(export_stream('csv')).decode()
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [int(row['event_id']) for row in rows] == event_ids(iter_export_rows())
+
+
+def test_export_route_needs_the_admin_token(client, api_tokens):
+    assert client.get("/export").status_code == 401
+    assert client.get("/export", headers=bearer("crm-token")).status_code == 401
+    response = client.get("/export?format=jsonl", headers=bearer(ADMIN_TOKEN))
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 8
+
+
+def test_export_route_is_disabled_without_an_admin_token(client):
+    assert client.get("/export").status_code == 403
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+
+import pytest
+
+from sub_agents.ticket_management import history_writer
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.history_writer import HistoryWriter
+
+
+def notes(ticket_id):
+    conn = get_db_connection()
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT log_message FROM history WHERE ticket_id = ? AND event_type = 'note' ORDER BY id", (ticket_id,)
+        )]
+    finally:
+        conn.close()
+
+
+def submit_together(writer, ticket_ids):
+    """Submits a note for each ticket from its own thread, in one batch; returns their event ids."""
+    results = {}
+
+    def submit(ticket_id):
+        results[ticket_id] = writer.submit(ticket_id, 'note', log_message=f"note {ticket_id}")
+
+    threads = [threading.Thread(target=submit, args=(ticket_id,)) for ticket_id in ticket_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_commits_a_batch(city_db):
+    writer = HistoryWriter(database_path=city_db, flush_interval_ms=100)
+    try:
+        results = submit_together(writer, [2, 4, 6])
+    finally:
+        writer.close()
+    assert all(results.values())
+    assert notes(2) == ["note 2"] and notes(4) == ["note 4"] and notes(6) == ["note 6"]
+
+
+def test_a_failing_event_does_not_sink_its_batch(city_db, monkeypatch):
+    append = history_writer.append_ticket_event
+
+    def append_failing_for_ticket_4(conn, ticket_id, *args, **kwargs):
+        if ticket_id == 4:
+            raise sqlite3.IntegrityError("simulated failure")
+        return append(conn, ticket_id, *args, **kwargs)
+
+    monkeypatch.setattr(history_writer, 'append_ticket_event', append_failing_for_ticket_4)
+    writer = HistoryWriter(database_path=city_db, flush_interval_ms=100)
+    try:
+        results = submit_together(writer, [2, 4, 6])
+    finally:
+        writer.close()
+    assert results[4] is None
+    assert results[2] is not None and results[6] is not None
+    assert notes(2) == ["note 2"] and notes(4) == [] and notes(6) == ["note 6"]
+
+
+def test_missing_ticket_gets_no_event_id(city_db):
+    writer = HistoryWriter(database_path=city_db, flush_interval_ms=100)
+    try:
+        results = submit_together(writer, [2, 999])
+    finally:
+        writer.close()
+    assert results[999] is None
+    assert notes(2) == ["note 2"]
+
+
+def test_close_commits_fire_and_forget_events(city_db):
+    writer = HistoryWriter(database_path=city_db, durability="fire_and_forget")
+    assert writer.submit(2, 'note', log_message="queued") is True
+    writer.close()
+    assert notes(2) == ["queued"]
+
+
+def test_an_unexpected_error_fails_only_its_event(city_db, monkeypatch):
+    append = history_writer.append_ticket_event
+
+    def append_raising_for_ticket_4(conn, ticket_id, *args, **kwargs):
+        if ticket_id == 4:
+            raise ValueError("simulated bug")
+        return append(conn, ticket_id, *args, **kwargs)
+
+    monkeypatch.setattr(history_writer, 'append_ticket_event', append_raising_for_ticket_4)
+    writer = HistoryWriter(database_path=city_db, flush_interval_ms=100)
+    try:
+        results = submit_together(writer, [2, 4])
+        # The writer thread survived and still commits.
+        assert writer.submit(6, 'note', log_message="later") is not None
+    finally:
+        writer.close()
+    assert results[4] is None and results[2] is not None
+    assert notes(6) == ["later"]
+
+
+def test_submit_raises_when_the_writer_thread_is_gone(city_db, monkeypatch):
+    monkeypatch.setattr(HistoryWriter, '_run', lambda self: None)
+    writer = HistoryWriter(database_path=city_db)
+    with pytest.raises(RuntimeError):
+        writer.submit(2, 'note', log_message="lost")
+
+
+def test_submit_wait_is_bounded(city_db, monkeypatch):
+    stuck = threading.Event()
+    monkeypatch.setattr(HistoryWriter, '_run', lambda self: stuck.wait(5))
+    writer = HistoryWriter(database_path=city_db, submit_timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            writer.submit(2, 'note', log_message="slow")
+    finally:
+        stuck.set()
@@ -0,0 +1,120 @@
+import contextvars
+
+from sub_agents.ticket_management import idempotency
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.idempotency import (
+    IN_PROGRESS, abandon, begin_request, lookup, mark_in_progress, record, remember, request_key,
+)
+
+
+def record_committed(scope, key, result, **kwargs) -> bool:
+    conn = get_db_connection()
+    try:
+        recorded = record(conn, scope, key, result, **kwargs)
+        conn.commit()
+        return recorded
+    finally:
+        conn.close()
+
+
+def test_record_and_lookup(city_db):
+    assert lookup('create_ticket', 'k1') is None
+    assert record_committed('create_ticket', 'k1', {'ticket_id': 7})
+    assert lookup('create_ticket', 'k1') == {'ticket_id': 7}
+    # Keys are per scope.
+    assert lookup('assign_ticket', 'k1') is None
+
+
+def test_live_result_is_not_replaced(city_db):
+    assert record_committed('create_ticket', 'k1', {'ticket_id': 7})
+    assert not record_committed('create_ticket', 'k1', {'ticket_id': 8})
+    assert lookup('create_ticket', 'k1') == {'ticket_id': 7}
+    assert remember('create_ticket', 'k1', {'ticket_id': 9}) == {'ticket_id': 7}
+
+
+def test_expired_result_is_replaced(city_db):
+    assert record_committed('create_ticket', 'k1', {'ticket_id': 7}, ttl=-1)
+    assert lookup('create_ticket', 'k1') is None
+    assert record_committed('create_ticket', 'k1', {'ticket_id': 8})
+    assert lookup('create_ticket', 'k1') == {'ticket_id': 8}
+
+
+def test_remember_without_a_key(city_db):
+    assert remember('create_ticket', None, 'result') == 'result'
+    assert lookup('create_ticket', None) is None
+
+
+def test_in_progress_marker(city_db):
+    assert mark_in_progress('a2a_message', 'm1') is None
+    assert mark_in_progress('a2a_message', 'm1') == IN_PROGRESS
+    assert lookup('a2a_message', 'm1') == IN_PROGRESS
+    # The run's reply replaces its marker, and is then replayed.
+    assert remember('a2a_message', 'm1', 'reply') == 'reply'
+    assert mark_in_progress('a2a_message', 'm1') == 'reply'
+    abandon('a2a_message', 'm1')
+    assert lookup('a2a_message', 'm1') == 'reply'
+
+
+def test_abandoned_run_lets_a_retry_run(city_db):
+    assert mark_in_progress('a2a_message', 'm1') is None
+    abandon('a2a_message', 'm1')
+    assert lookup('a2a_message', 'm1') is None
+    assert mark_in_progress('a2a_message', 'm1') is None
+
+
+def test_crashed_run_marker_lapses(city_db, monkeypatch):
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_IN_PROGRESS_SECONDS', -1)
+    assert mark_in_progress('a2a_message', 'm1') is None
+    assert mark_in_progress('a2a_message', 'm1') is None
+
+
+def test_request_keys():
+    def keys():
+        assert request_key('create_ticket', None) is None
+        begin_request('msg-1')
+        return [
+            request_key('create_ticket', 'explicit'),
+            request_key('create_ticket', None),
+            request_key('create_ticket', None),
+            request_key('assign_ticket', None, 12),
+            request_key('assign_ticket', None, 12),
+            request_key('assign_ticket', None),
+        ]
+
+    assert contextvars.copy_context().run(keys) == [
+        'explicit',
+        'msg-1:create_ticket#0',
+        'msg-1:create_ticket#1',
+        'msg-1:assign_ticket:12',
+        'msg-1:assign_ticket:12',
+        'msg-1:assign_ticket#0',
+    ]
+    # A retry of the message derives the same keys.
+    assert contextvars.copy_context().run(keys)[1] == 'msg-1:create_ticket#0'
+
+
+def test_create_ticket_replays_a_repeated_key(city_db):
+    from sub_agents.ticket_management.ticket_manager import create_ticket
+
+    first = create_ticket("Broken streetlight on Elm", idempotency_key="client-key")
+    assert first is not None
+    assert create_ticket("Streetlight broken on Elm street", idempotency_key="client-key") == first
+    conn = get_db_connection()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM tickets WHERE id >= ?', (first,)).fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_retried_message_creates_its_tickets_once(city_db):
+    from sub_agents.ticket_management.ticket_manager import create_ticket
+
+    def run(titles):
+        begin_request('msg-1')
+        return [create_ticket(title) for title in titles]
+
+    first = contextvars.copy_context().run(run, ["Pothole on Main", "Graffiti at the library"])
+    # The retry's model run paraphrases the titles; the keys do not depend on them.
+    retry = contextvars.copy_context().run(run, ["Main street pothole", "Library wall graffiti"])
+    assert retry == first
+    assert len(set(first)) == 2
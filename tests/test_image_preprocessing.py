@@ -0,0 +1,37 @@
+import asyncio
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from shared_libraries.artifact_store import ContentAddressedArtifactStore
+from shared_libraries.image_preprocessing import ImagePreprocessConfig, ImagePreprocessor
+
+
+class BrokenPool(Executor):
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args, **kwargs):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_output_format_must_be_one_pillow_can_save(monkeypatch):
+    monkeypatch.setenv("IMAGE_OUTPUT_FORMAT", "png")
+    assert ImagePreprocessConfig.from_env().output_format == "PNG"
+    monkeypatch.setenv("IMAGE_OUTPUT_FORMAT", "JPG")
+    with pytest.raises(ValueError, match="IMAGE_OUTPUT_FORMAT"):
+        ImagePreprocessConfig.from_env()
+
+
+def test_broken_pool_forwards_the_original_and_is_replaced(tmp_path):
+    store = ContentAddressedArtifactStore(str(tmp_path))
+    stored = store.put_bytes(b"not really a photo", "image/png")
+    pool = BrokenPool()
+    preprocessor = ImagePreprocessor(store, ImagePreprocessConfig(), executor=pool)
+    assert asyncio.run(preprocessor.process_digest(stored.digest)) is None
+    assert pool.shut_down
+    assert preprocessor._executor is None
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from shared_libraries.indexed_heap import IndexedHeap
+
+
+def drain(heap):
+    return [heap.pop() for _ in range(len(heap))]
+
+
+def test_pops_in_key_order():
+    heap = IndexedHeap()
+    for item, key in [("c", 3), ("a", 1), ("e", 5), ("b", 2), ("d", 4)]:
+        heap.push(item, key)
+    assert heap.peek() == (1, "a")
+    assert drain(heap) == [(1, "a"), (2, "b"), (3, "c"), (4, "d"), (5, "e")]
+
+
+def test_push_of_a_queued_item_rekeys_it():
+    heap = IndexedHeap()
+    for item, key in [("a", 1), ("b", 2), ("c", 3)]:
+        heap.push(item, key)
+    heap.push("c", 0)
+    heap.push("a", 10)
+    assert len(heap) == 3
+    assert heap.key_of("a") == 10
+    assert drain(heap) == [(0, "c"), (2, "b"), (10, "a")]
+
+
+def test_remove():
+    heap = IndexedHeap()
+    for item in range(10):
+        heap.push(item, item)
+    assert heap.remove(4)
+    assert not heap.remove(4)
+    assert 4 not in heap
+    assert [item for _, item in drain(heap)] == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+
+
+def test_pop_from_empty_heap():
+    with pytest.raises(IndexError):
+        IndexedHeap().pop()
+    assert IndexedHeap().peek() is None
+
+
+def test_matches_a_sorted_model_under_random_operations():
+    rng = random.Random(7)
+    heap = IndexedHeap()
+    model = {}
+    for _ in range(2000):
+        operation = rng.random()
+        item = rng.randrange(50)
+        if operation < 0.5:
+            key = (rng.randrange(100), item)
+            heap.push(item, key)
+            model[item] = key
+        elif operation < 0.75:
+            assert heap.remove(item) == (item in model)
+            model.pop(item, None)
+        elif model:
+            key, popped = heap.pop()
+            assert key == min(model.values())
+            assert model.pop(popped) == key
+        assert len(heap) == len(model)
+    assert drain(heap) == sorted((key, item) for item, key in model.items())
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from shared_libraries.rate_limit import RateLimitConfig, RateLimitMiddleware
+
+
+def rpc_body(method="message/send", request_id=1, context_id=None, padding=0):
+    message = {"role": "user", "parts": [{"kind": "text", "text": "x" * padding}], "messageId": "m1"}
+    if context_id is not None:
+        message["contextId"] = context_id
+    return json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method,
+                       "params": {"message": message}}).encode()
+
+
+class Receiver:
+    """An ASGI receive callable delivering `body` in chunks and counting the chunks read."""
+
+    def __init__(self, body: bytes, chunk_size: int = 1024):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+        self.reads = 0
+
+    async def __call__(self):
+        chunk = self.chunks[self.reads]
+        self.reads += 1
+        return {"type": "http.request", "body": chunk, "more_body": self.reads < len(self.chunks)}
+
+
+class EchoApp:
+    """The downstream app: reads the whole body and answers 200."""
+
+    def __init__(self):
+        self.bodies = []
+
+    async def __call__(self, scope, receive, send):
+        body, more_body = b"", True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        self.bodies.append(body)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+def call(middleware, body, client="10.0.0.1", headers=(), receiver=None):
+    scope = {"type": "http", "method": "POST", "path": "/", "client": (client, 5000),
+             "headers": list(headers), "query_string": b""}
+    receiver = receiver or Receiver(body)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receiver, send))
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_client_bucket_sheds_with_retry_after():
+    app = EchoApp()
+    middleware = RateLimitMiddleware(app, config=RateLimitConfig(client_per_minute=60, burst=2))
+    assert call(middleware, rpc_body())[0] == 200
+    assert call(middleware, rpc_body())[0] == 200
+    status, headers, body = call(middleware, rpc_body(request_id=7))
+    assert status == 429
+    assert headers[b"retry-after"] == b"1"
+    error = json.loads(body)
+    assert error["id"] == 7 and error["error"]["data"]["reason"] == "client"
+    # Another client has its own bucket; polling methods are never limited.
+    assert call(middleware, rpc_body(), client="10.0.0.2")[0] == 200
+    assert call(middleware, rpc_body(method="tasks/get"))[0] == 200
+    assert len(app.bodies) == 4
+
+
+def test_context_bucket_is_per_conversation():
+    middleware = RateLimitMiddleware(EchoApp(), config=RateLimitConfig(client_per_minute=0, context_per_minute=60, burst=1))
+    assert call(middleware, rpc_body(context_id="c1"))[0] == 200
+    status, _, body = call(middleware, rpc_body(context_id="c1"))
+    assert status == 429 and json.loads(body)["error"]["data"]["reason"] == "context"
+    assert call(middleware, rpc_body(context_id="c2"))[0] == 200
+
+
+def test_in_flight_cap_answers_503():
+    middleware = RateLimitMiddleware(EchoApp(), config=RateLimitConfig(max_in_flight=1))
+    middleware.in_flight = 1
+    status, headers, body = call(middleware, rpc_body())
+    assert status == 503
+    assert json.loads(body)["error"]["data"]["reason"] == "in_flight"
+    middleware.in_flight = 0
+    assert call(middleware, rpc_body())[0] == 200
+
+
+def test_rejected_body_is_read_only_up_to_the_prefix():
+    middleware = RateLimitMiddleware(EchoApp(), config=RateLimitConfig(burst=1, peek_bytes=2048))
+    assert call(middleware, rpc_body())[0] == 200
+    receiver = Receiver(rpc_body(padding=100_000))
+    assert call(middleware, b"", receiver=receiver)[0] == 429
+    assert receiver.reads == 2
+    assert len(receiver.chunks) > 90
+
+
+def test_admitted_large_body_reaches_the_app_whole():
+    app = EchoApp()
+    middleware = RateLimitMiddleware(app, config=RateLimitConfig(peek_bytes=2048))
+    body = rpc_body(padding=100_000)
+    assert call(middleware, body)[0] == 200
+    assert app.bodies == [body]
+    assert middleware.in_flight == 0
+
+
+def test_in_flight_cap_is_divided_between_workers(monkeypatch):
+    monkeypatch.setenv("MAX_IN_FLIGHT_REQUESTS", "10")
+    assert RateLimitConfig.from_env().max_in_flight == 10
+    assert RateLimitConfig.from_env(workers=4).max_in_flight == 3
+    monkeypatch.setenv("MAX_IN_FLIGHT_REQUESTS", "0")
+    assert RateLimitConfig.from_env(workers=4).max_in_flight == 0
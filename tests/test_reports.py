@@ -0,0 +1,28 @@
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.dispatch import enqueue_ticket
+from sub_agents.ticket_management.reports import UNROUTED_DEPARTMENT, rebuild_reports
+
+
+def report_counts():
+    conn = get_db_connection()
+    try:
+        backlog = dict(conn.execute('SELECT department, SUM(tickets) FROM report_backlog GROUP BY department').fetchall())
+        created = dict(conn.execute('SELECT department, SUM(created) FROM report_daily GROUP BY department').fetchall())
+        return backlog, created
+    finally:
+        conn.close()
+
+
+def test_routed_ticket_moves_out_of_unrouted(city_db):
+    assert report_counts() == ({UNROUTED_DEPARTMENT: 6}, {UNROUTED_DEPARTMENT: 6})
+    assert enqueue_ticket(1, 'Sanitation Utilities') == 1
+    expected = ({UNROUTED_DEPARTMENT: 5, 'Sanitation Utilities': 1}, {UNROUTED_DEPARTMENT: 5, 'Sanitation Utilities': 1})
+    assert report_counts() == expected
+
+    conn = get_db_connection()
+    try:
+        rebuild_reports(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    assert report_counts() == expected
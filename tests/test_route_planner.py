@@ -0,0 +1,77 @@
+from datetime import date
+
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.route_planner import DailyRoutePlanner, plan_routes
+from sub_agents.ticket_management.technician_claims import CLAIMED, claim_technician
+
+PETER_JONES = 3
+
+
+def place_in_public_work(*ticket_ids):
+    conn = get_db_connection()
+    conn.executemany("UPDATE tickets SET department = 'Public Work' WHERE id = ?", [(i,) for i in ticket_ids])
+    conn.commit()
+    conn.close()
+
+
+def query(sql, *params):
+    conn = get_db_connection()
+    try:
+        return [tuple(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def test_plan_claims_the_first_stop_and_assigns_the_rest(city_db):
+    place_in_public_work(1, 2)
+    plans = plan_routes('2025-06-23', department='Public Work')
+    stops = [stop['ticket_id'] for stop in plans['Public Work']['routes'][PETER_JONES]]
+    assert sorted(stops) == [1, 2]
+    assert query('SELECT assigned_ticket_id, assigned_work_date FROM technicians WHERE id = ?', PETER_JONES) \
+        == [(stops[0], '23-06-2025')]
+    assert query('SELECT id, assigned_technician_id FROM tickets WHERE id IN (1, 2) ORDER BY id') \
+        == [(1, PETER_JONES), (2, PETER_JONES)]
+    assert query('SELECT ticket_id FROM technician_routes WHERE technician_id = ? ORDER BY stop_order',
+                 PETER_JONES) == [(stops[0],), (stops[1],)]
+
+
+def test_replanning_the_same_day_writes_no_new_events(city_db):
+    place_in_public_work(1, 2)
+    plan_routes('2025-06-23', department='Public Work')
+    events = query('SELECT COUNT(*) FROM history')
+    plans = plan_routes('2025-06-23', department='Public Work')
+    assert plans['Public Work']['skipped'] == []
+    assert query('SELECT COUNT(*) FROM history') == events
+    assert query('SELECT COUNT(*) FROM technician_routes') == [(2,)]
+
+
+def test_technician_claimed_elsewhere_is_skipped(city_db):
+    place_in_public_work(1, 2)
+    # Ticket 6 has no location, so the plan cannot route it.
+    conn = get_db_connection()
+    conn.execute('UPDATE tickets SET latitude = NULL, longitude = NULL WHERE id = 6')
+    conn.commit()
+    conn.close()
+    assert claim_technician(6, PETER_JONES, '23-06-2025') == CLAIMED
+    plans = plan_routes('2025-06-23', department='Public Work')
+    assert plans['Public Work']['skipped'] == [PETER_JONES]
+    assert plans['Public Work']['routes'] == {}
+    assert query('SELECT assigned_ticket_id FROM technicians WHERE id = ?', PETER_JONES) == [(6,)]
+    assert query('SELECT assigned_technician_id FROM tickets WHERE id IN (1, 2)') == [(None,), (None,)]
+    assert query('SELECT COUNT(*) FROM technician_routes') == [(0,)]
+
+
+def test_dry_run_writes_nothing(city_db):
+    place_in_public_work(1, 2)
+    plans = plan_routes('2025-06-23', department='Public Work', dry_run=True)
+    assert plans['Public Work']['routes'][PETER_JONES]
+    assert query('SELECT assigned_ticket_id FROM technicians WHERE id = ?', PETER_JONES) == [(None,)]
+    assert query('SELECT COUNT(*) FROM technician_routes') == [(0,)]
+
+
+def test_daily_run_plans_once_per_day(city_db):
+    place_in_public_work(1, 2)
+    assert DailyRoutePlanner.run_once(date(2025, 6, 23))['Public Work']['routes']
+    # Another worker's scheduler firing for the same day does nothing.
+    assert DailyRoutePlanner.run_once(date(2025, 6, 23)) is None
+    assert DailyRoutePlanner.run_once(date(2025, 6, 24)) is not None
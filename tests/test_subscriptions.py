@@ -0,0 +1,91 @@
+import socket
+
+import pytest
+
+from sub_agents.ticket_management import notifications
+from sub_agents.ticket_management.notifications import validate_webhook_url
+from tests.conftest import ADMIN_TOKEN, bearer
+
+PUBLIC_ADDRESS = "93.184.216.34"
+
+
+def resolving_to(*addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in addresses]
+    return getaddrinfo
+
+
+@pytest.fixture
+def public_dns(monkeypatch):
+    monkeypatch.setattr(notifications.socket, "getaddrinfo", resolving_to(PUBLIC_ADDRESS))
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::1", "::ffff:192.168.1.1"])
+def test_webhook_on_a_private_address_is_refused(monkeypatch, address):
+    monkeypatch.setattr(notifications.socket, "getaddrinfo", resolving_to(address))
+    with pytest.raises(ValueError, match="private"):
+        validate_webhook_url("https://hooks.example.com/city")
+
+
+def test_webhook_host_with_any_private_address_is_refused(monkeypatch):
+    monkeypatch.setattr(notifications.socket, "getaddrinfo", resolving_to(PUBLIC_ADDRESS, "10.0.0.5"))
+    with pytest.raises(ValueError):
+        validate_webhook_url("https://hooks.example.com/city")
+
+
+def test_webhook_url_checks(monkeypatch, public_dns):
+    assert validate_webhook_url("https://hooks.example.com/city") == "https://hooks.example.com/city"
+    for url in ("ftp://hooks.example.com/", "/relative", None):
+        with pytest.raises(ValueError, match="absolute"):
+            validate_webhook_url(url)
+    monkeypatch.setattr(notifications, "WEBHOOK_ALLOWED_HOSTS", frozenset({"crm.internal"}))
+    assert validate_webhook_url("http://crm.internal/hook") == "http://crm.internal/hook"
+    with pytest.raises(ValueError, match="WEBHOOK_ALLOWED_HOSTS"):
+        validate_webhook_url("https://hooks.example.com/city")
+
+
+def test_private_webhooks_allowed_for_development(monkeypatch):
+    monkeypatch.setattr(notifications.socket, "getaddrinfo", resolving_to("127.0.0.1"))
+    monkeypatch.setattr(notifications, "WEBHOOK_ALLOW_PRIVATE", True)
+    assert validate_webhook_url("http://localhost:8080/hook") == "http://localhost:8080/hook"
+
+
+def test_subscriptions_need_a_token(client, api_tokens):
+    assert client.get("/subscriptions").status_code == 401
+    assert client.get("/subscriptions", headers=bearer("unknown-token")).status_code == 401
+    response = client.post("/subscriptions", json={"url": "https://hooks.example.com/city"})
+    assert response.status_code == 401
+
+
+def test_clients_only_see_and_remove_their_own(client, api_tokens, public_dns):
+    crm = client.post("/subscriptions", json={"url": "https://hooks.example.com/crm", "ticket_id": 1},
+                      headers=bearer("crm-token"))
+    assert crm.status_code == 201
+    field = client.post("/subscriptions", json={"url": "https://hooks.example.com/field"},
+                        headers=bearer("field-token"))
+    assert field.status_code == 201
+
+    listed = client.get("/subscriptions", headers=bearer("crm-token")).json()
+    assert [(s["id"], s["owner"]) for s in listed] == [(crm.json()["id"], "crm")]
+    assert len(client.get("/subscriptions", headers=bearer(ADMIN_TOKEN)).json()) == 2
+
+    field_id = field.json()["id"]
+    assert client.delete(f"/subscriptions/{field_id}", headers=bearer("crm-token")).status_code == 404
+    assert client.delete(f"/subscriptions/{field_id}", headers=bearer("field-token")).status_code == 204
+    crm_id = crm.json()["id"]
+    assert client.delete(f"/subscriptions/{crm_id}", headers=bearer(ADMIN_TOKEN)).status_code == 204
+    assert client.get("/subscriptions", headers=bearer(ADMIN_TOKEN)).json() == []
+
+
+def test_subscribing_a_private_webhook_is_a_bad_request(client, api_tokens, monkeypatch):
+    monkeypatch.setattr(notifications.socket, "getaddrinfo", resolving_to("169.254.169.254"))
+    response = client.post("/subscriptions", json={"url": "http://metadata.example.com/"},
+                           headers=bearer("crm-token"))
+    assert response.status_code == 400
+    assert client.get("/subscriptions", headers=bearer(ADMIN_TOKEN)).json() == []
+
+
+def test_subscribing_to_a_missing_ticket_is_a_bad_request(client, api_tokens, public_dns):
+    response = client.post("/subscriptions", json={"url": "https://hooks.example.com/crm", "ticket_id": 999},
+                           headers=bearer("crm-token"))
+    assert response.status_code == 400
@@ -0,0 +1,82 @@
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.technician_claims import (
+    CLAIMED, TECHNICIAN_TAKEN, TICKET_UNAVAILABLE, claim_in_transaction, claim_technician,
+)
+
+PETER_JONES = 3
+MARY_BROWN = 4  # Holds ticket 5 in the sample data
+CHARLIE_WILSON = 7
+
+
+def history_count(conn) -> int:
+    return conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+
+def test_claims_a_free_technician(city_db):
+    conn = get_db_connection()
+    try:
+        assert claim_in_transaction(conn, 1, PETER_JONES, '2025-06-24') == CLAIMED
+        conn.commit()
+        technician = conn.execute(
+            'SELECT assigned_ticket_id, assigned_work_date FROM technicians WHERE id = ?', (PETER_JONES,)
+        ).fetchone()
+        assert tuple(technician) == (1, '2025-06-24')
+        ticket = conn.execute('SELECT assigned_technician_id FROM tickets WHERE id = 1').fetchone()
+        assert ticket[0] == PETER_JONES
+        event = conn.execute(
+            "SELECT event_type, assigned_technician_id FROM history WHERE ticket_id = 1 ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        assert tuple(event) == ('assigned', PETER_JONES)
+    finally:
+        conn.close()
+
+
+def test_technician_holding_a_ticket_is_taken(city_db):
+    conn = get_db_connection()
+    try:
+        before = history_count(conn)
+        assert claim_in_transaction(conn, 1, MARY_BROWN, '2025-06-25') == TECHNICIAN_TAKEN
+        assert history_count(conn) == before
+        assert conn.execute('SELECT assigned_ticket_id FROM technicians WHERE id = ?', (MARY_BROWN,)).fetchone()[0] == 5
+    finally:
+        conn.close()
+
+
+def test_ticket_held_by_another_technician_is_unavailable(city_db):
+    assert claim_technician(1, PETER_JONES, '2025-06-24') == CLAIMED
+    conn = get_db_connection()
+    try:
+        before = history_count(conn)
+        assert claim_in_transaction(conn, 1, CHARLIE_WILSON, '2025-06-25') == TICKET_UNAVAILABLE
+        assert claim_in_transaction(conn, 999, CHARLIE_WILSON, '2025-06-25') == TICKET_UNAVAILABLE
+        assert history_count(conn) == before
+        assert conn.execute(
+            'SELECT assigned_ticket_id FROM technicians WHERE id = ?', (CHARLIE_WILSON,)
+        ).fetchone()[0] is None
+    finally:
+        conn.close()
+
+
+def test_second_claim_for_the_same_technician_loses(city_db):
+    first, second = get_db_connection(), get_db_connection()
+    try:
+        assert claim_in_transaction(first, 1, PETER_JONES, '2025-06-24') == CLAIMED
+        first.commit()
+        # The second caller listed Peter as free before the first claim committed.
+        assert claim_in_transaction(second, 2, PETER_JONES, '2025-06-24') == TECHNICIAN_TAKEN
+        second.rollback()
+        assert second.execute('SELECT assigned_technician_id FROM tickets WHERE id = 2').fetchone()[0] is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_rollback_discards_the_claim(city_db):
+    conn = get_db_connection()
+    try:
+        assert claim_in_transaction(conn, 1, PETER_JONES, '2025-06-24') == CLAIMED
+        conn.rollback()
+        assert conn.execute('SELECT assigned_ticket_id FROM technicians WHERE id = ?', (PETER_JONES,)).fetchone()[0] is None
+        assert conn.execute('SELECT assigned_technician_id FROM tickets WHERE id = 1').fetchone()[0] is None
+    finally:
+        conn.close()
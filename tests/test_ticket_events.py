@@ -0,0 +1,83 @@
+from sub_agents.ticket_management import ticket_events
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.ticket_events import (
+    append_ticket_event, fetch_ticket_state_at, fold_event, normalize_timestamp,
+)
+
+MARY_BROWN = 4
+
+
+def test_fold_event():
+    state = {'status': 'Open', 'assigned_technician_id': None, 'assigned_work_date': None}
+    state = fold_event(state, {'event_type': 'assigned', 'status': None,
+                               'assigned_technician_id': 4, 'assigned_work_date': '23-06-2025'})
+    assert state == {'status': 'Open', 'assigned_technician_id': 4, 'assigned_work_date': '23-06-2025'}
+    state = fold_event(state, {'event_type': 'work_date_changed', 'status': None,
+                               'assigned_technician_id': None, 'assigned_work_date': '24-06-2025'})
+    assert state['assigned_technician_id'] == 4 and state['assigned_work_date'] == '24-06-2025'
+    state = fold_event(state, {'event_type': 'status_changed', 'status': 'In Progress',
+                               'assigned_technician_id': None, 'assigned_work_date': None})
+    assert state['status'] == 'In Progress' and state['assigned_technician_id'] == 4
+    state = fold_event(state, {'event_type': 'note', 'status': None,
+                               'assigned_technician_id': 7, 'assigned_work_date': None})
+    assert state['assigned_technician_id'] == 4
+    state = fold_event(state, {'event_type': 'unassigned', 'status': None,
+                               'assigned_technician_id': None, 'assigned_work_date': None})
+    assert state == {'status': 'In Progress', 'assigned_technician_id': None, 'assigned_work_date': None}
+
+
+def test_normalize_timestamp_converts_offsets_to_utc():
+    assert normalize_timestamp('2025-06-23') == '2025-06-23 23:59:59'
+    assert normalize_timestamp('2025-06-23T10:15:00') == '2025-06-23 10:15:00'
+    assert normalize_timestamp('2025-06-23T10:15:00Z') == '2025-06-23 10:15:00'
+    assert normalize_timestamp('2025-06-23T10:15:00+02:00') == '2025-06-23 08:15:00'
+    assert normalize_timestamp('2025-06-23T22:30:00-05:00') == '2025-06-24 03:30:00'
+
+
+def test_append_folds_into_the_ticket_row(city_db):
+    conn = get_db_connection()
+    try:
+        event_id = append_ticket_event(conn, 2, 'assigned', assigned_technician_id=MARY_BROWN,
+                                       assigned_work_date='23-06-2025')
+        append_ticket_event(conn, 2, 'status_changed', status='In Progress')
+        conn.commit()
+        assert event_id is not None
+        row = conn.execute('SELECT status, assigned_technician_id, assigned_work_date, event_count '
+                           'FROM tickets WHERE id = 2').fetchone()
+        assert tuple(row) == ('In Progress', MARY_BROWN, '23-06-2025', 3)
+        change = conn.execute("SELECT status_change FROM history WHERE ticket_id = 2 "
+                              "AND event_type = 'status_changed'").fetchone()[0]
+        assert change == 'Open -> In Progress'
+        assert append_ticket_event(conn, 999, 'note', log_message="nobody") is None
+    finally:
+        conn.close()
+
+
+def test_state_at_a_moment_uses_the_latest_snapshot(city_db, monkeypatch):
+    monkeypatch.setattr(ticket_events, 'SNAPSHOT_INTERVAL', 3)
+    conn = get_db_connection()
+    try:
+        # Ticket 2 has its created event; the third event is snapshotted.
+        append_ticket_event(conn, 2, 'status_changed', status='In Progress')
+        third = append_ticket_event(conn, 2, 'assigned', assigned_technician_id=MARY_BROWN,
+                                    assigned_work_date='23-06-2025')
+        append_ticket_event(conn, 2, 'status_changed', status='Resolved')
+        conn.execute("UPDATE history SET timestamp = '2025-06-20 09:00:00' WHERE ticket_id = 2 AND id < ?", (third,))
+        conn.execute("UPDATE history SET timestamp = '2025-06-21 09:00:00' WHERE id = ?", (third,))
+        conn.execute("UPDATE history SET timestamp = '2025-06-22 09:00:00' WHERE ticket_id = 2 AND id > ?", (third,))
+        conn.execute("UPDATE ticket_snapshots SET taken_at = '2025-06-21 09:00:00' WHERE event_id = ?", (third,))
+        conn.commit()
+        snapshots = conn.execute('SELECT event_id, status, assigned_technician_id FROM ticket_snapshots '
+                                 'WHERE ticket_id = 2').fetchall()
+        assert [tuple(s) for s in snapshots] == [(third, 'In Progress', MARY_BROWN)]
+
+        before = fetch_ticket_state_at(conn, 2, '2025-06-20T12:00:00')
+        assert before['status'] == 'In Progress' and before['assigned_technician_id'] is None
+        on_snapshot = fetch_ticket_state_at(conn, 2, '2025-06-21T12:00:00')
+        assert on_snapshot['assigned_technician_id'] == MARY_BROWN and on_snapshot['status'] == 'In Progress'
+        # 10:00 in UTC+02:00 is 08:00 UTC, before the resolution at 09:00.
+        assert fetch_ticket_state_at(conn, 2, '2025-06-22T10:00:00+02:00')['status'] == 'In Progress'
+        assert fetch_ticket_state_at(conn, 2, '2025-06-22')['status'] == 'Resolved'
+        assert fetch_ticket_state_at(conn, 2, '2025-06-19') is None
+    finally:
+        conn.close()
@@ -1,10 +1,10 @@
 import sqlite3
-import os
 from google.adk.tools import FunctionTool
 from typing import Optional
 from datetime import datetime
-
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared_libraries', 'city_office.db')
+from sub_agents.ticket_management.availability import AVAILABILITY
+from sub_agents.ticket_management.database import get_db_connection
+from sub_agents.ticket_management.ticket_events import append_ticket_event
 
 def update_technician_work_date(existing_date: str, updated_date: str, reason_to_reassign: Optional[str] = None):
     """
@@ -20,7 +20,9 @@ def update_technician_work_date(existing_date: str, updated_date: str, reason_to
     """
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = get_db_connection()
+        if conn is None:
+            return "Database error: could not open the database."
         cursor = conn.cursor()
 
         # Convert dates from YYYY-MM-DD (expected input) to DD-MM-YYYY (database format)
@@ -30,6 +32,13 @@ def update_technician_work_date(existing_date: str, updated_date: str, reason_to
         except ValueError:
             return "Error: Date format mismatch. Expected YYYY-MM-DD for input dates."
 
+        # Tickets whose technician is moved, so the change lands in their history too
+        cursor.execute("""
+            SELECT id, assigned_ticket_id FROM technicians
+            WHERE assigned_work_date = ? AND assigned_ticket_id IS NOT NULL
+        """, (parsed_existing_date,))
+        affected_assignments = cursor.fetchall()
+
         if reason_to_reassign:
             cursor.execute("""
                 UPDATE technicians
@@ -44,17 +53,37 @@ def update_technician_work_date(existing_date: str, updated_date: str, reason_to
                 WHERE assigned_work_date = ?
             """, (parsed_updated_date, parsed_existing_date))
 
-        conn.commit()
         rows_affected = cursor.rowcount
+
+        for technician_id, ticket_id in affected_assignments:
+            log_message = f"Work date for technician {technician_id} moved from {parsed_existing_date} to {parsed_updated_date}."
+            if reason_to_reassign:
+                log_message += f" Reason: {reason_to_reassign}"
+            append_ticket_event(
+                conn, ticket_id, 'work_date_changed', log_message=log_message,
+                assigned_technician_id=technician_id, assigned_work_date=parsed_updated_date,
+            )
+        conn.commit()
         if rows_affected > 0:
             message = f"Successfully updated assigned work date from {existing_date} to {updated_date} for {rows_affected} technicians."
             if reason_to_reassign:
                 message += f" Reason: {reason_to_reassign}"
+            # Technicians moved to a day they are not scheduled to work, with when they next could
+            off_shift = []
+            for technician_id, _ in affected_assignments:
+                if not AVAILABILITY.works_on(technician_id, updated_date):
+                    next_free = AVAILABILITY.earliest_free_date(technician_id, updated_date)
+                    off_shift.append(f"{technician_id} (next free {next_free or 'day not scheduled yet'})")
+            if off_shift:
+                message += "" if message.endswith('.') else "."
+                message += f" Not scheduled to work on {updated_date}: technicians {', '.join(off_shift)}."
             return message
         else:
             return f"No technicians found with assigned work date {existing_date} to update."
 
     except sqlite3.Error as e:
+        if conn:
+            conn.rollback()
         return f"Database error: {e}"
     except Exception as e:
         return f"An unexpected error occurred: {e}"
@@ -62,6 +91,38 @@ def update_technician_work_date(existing_date: str, updated_date: str, reason_to
         if conn:
             conn.close()
 
+def find_free_technicians(department: str, start_date: str, end_date: Optional[str] = None, every_day: bool = False):
+    """
+    Finds the technicians of a department who are free between two dates, e.g.
+    to pick a reassignment date that technicians can actually work.
+
+    Args:
+        department: 'Licensing Transport Safety', 'Parks Community Civic', 'Public Work' or 'Sanitation Utilities'.
+        start_date: The first date to check (e.g., 'YYYY-MM-DD').
+        end_date: The last date to check (e.g., 'YYYY-MM-DD'); defaults to start_date.
+        every_day: Only list technicians free on every date in the range, not just on one of them.
+    Returns:
+        A string listing each free technician with their first free date in the range.
+    """
+    try:
+        technicians = AVAILABILITY.free_technicians(department, start_date, end_date, every_day=every_day)
+        first_free = AVAILABILITY.earliest_free_dates(department, start_date)
+    except ValueError:
+        return "Error: Date format mismatch. Expected YYYY-MM-DD for input dates, with end_date not before start_date."
+    period = f"from {start_date} to {end_date}" if end_date else f"on {start_date}"
+    if not technicians:
+        return f"No technicians in the {department} department are free {period}."
+    lines = [f"Technicians in the {department} department free {'every day ' if every_day and end_date else ''}{period}:"]
+    for technician in technicians:
+        details = AVAILABILITY.technician(technician['id'])
+        busy = " (currently assigned a ticket)" if details and details['holding'] else ""
+        lines.append(f"- {technician['name']} (ID: {technician['id']}), first free {first_free[technician['id']]}{busy}")
+    return "\n".join(lines)
+
 UPDATE_TECHNICIAN_WORK_DATE_TOOL = FunctionTool(
     func=update_technician_work_date
 )
+
+FIND_FREE_TECHNICIANS_TOOL = FunctionTool(
+    func=find_free_technicians
+)